@@ -0,0 +1,104 @@
+"""
+Streams many simulated devices from one asyncio event loop with labjack.ljm.aio
+and checks that the loop stays responsive while every eStreamRead blocks.
+
+The stand-in LJM library runs in real time here: eStreamRead waits until
+SCANS_PER_READ scans would have arrived at SCAN_RATE, like LJM does. A ticker
+coroutine measures how late the event loop wakes it while all the streams
+are read. The checks then cover backpressure (a slow consumer holds at most
+maxChunks chunks plus the read in progress), and that cancelling the
+consumers stops every stream so the handles close cleanly.
+
+Usage:
+    python benchmarks/aio_benchmark.py
+
+Author: Liam Eime
+"""
+
+import asyncio
+import time
+
+from labjack import ljm
+from labjack.ljm import aio
+
+import ljm_stand_in
+
+NUM_DEVICES = 24
+SCAN_LIST = [0, 2]
+SCAN_RATE = 10000
+SCANS_PER_READ = 500
+RUN_SECONDS = 2.0
+TICK_SECONDS = 0.005
+MAX_CHUNKS = 2
+
+
+async def consume(handle, counts, delay=0.0):
+    async with aio.Stream(handle, SCANS_PER_READ, len(SCAN_LIST), SCAN_LIST, SCAN_RATE,
+                          maxChunks=MAX_CHUNKS) as stream:
+        async for data, device_backlog, ljm_backlog in stream:
+            assert len(data) == SCANS_PER_READ * len(SCAN_LIST)
+            counts[handle] += 1
+            if delay:
+                await asyncio.sleep(delay)
+
+
+async def ticker(lateness, stop):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        due = loop.time() + TICK_SECONDS
+        await asyncio.sleep(TICK_SECONDS)
+        lateness.append(loop.time() - due)
+
+
+async def stream_fleet(library):
+    handles = await asyncio.gather(*[aio.openS("T7", "ANY", "ANY") for _ in range(NUM_DEVICES)])
+    assert len(set(handles)) == NUM_DEVICES, handles
+    counts = dict.fromkeys(handles, 0)
+    lateness = []
+    stop = asyncio.Event()
+    ticks = asyncio.ensure_future(ticker(lateness, stop))
+
+    # All but one consumer keep up; the last one is ten times too slow.
+    slow = handles[-1]
+    read_period = SCANS_PER_READ / SCAN_RATE
+    consumers = [asyncio.ensure_future(consume(h, counts, 10 * read_period if h == slow else 0.0))
+                 for h in handles]
+    start = time.perf_counter()
+    await asyncio.sleep(RUN_SECONDS)
+    elapsed = time.perf_counter() - start
+
+    # Reads continue until cancellation, so check backpressure before it.
+    reads = library.stream_reads[slow]
+    assert reads <= counts[slow] + MAX_CHUNKS + 2, (reads, counts[slow])
+
+    for consumer in consumers:
+        consumer.cancel()
+    await asyncio.gather(*consumers, return_exceptions=True)
+    stop.set()
+    await ticks
+    assert not library._streams, "streams left running after cancellation"
+
+    # Other calls still work on the handles once their streams are stopped.
+    values = await asyncio.gather(*[aio.eReadAddress(h, 2, ljm.constants.FLOAT32) for h in handles])
+    assert values == [0.002] * NUM_DEVICES, values
+    await asyncio.gather(*[aio.close(h) for h in handles])
+    assert not library._open_handles and not aio._g_threads
+    return counts, slow, reads, lateness, elapsed
+
+
+if __name__ == "__main__":
+    library = ljm_stand_in.StandInLibrary(real_time=True)
+    ljm_stand_in.install(library)
+    counts, slow, slow_reads, lateness, elapsed = asyncio.run(stream_fleet(library))
+
+    fast = [count for handle, count in counts.items() if handle != slow]
+    expected = elapsed * SCAN_RATE / SCANS_PER_READ
+    lateness.sort()
+    print(f"{NUM_DEVICES} streams at {SCAN_RATE} scans/s x {len(SCAN_LIST)} channels, {SCANS_PER_READ} scans/read, "
+          f"{elapsed:.1f} s on one event loop\n")
+    print(f"chunks per stream: min {min(fast)}, max {max(fast)}, expected {expected:.0f}")
+    print(f"slow consumer: {counts[slow]} chunks consumed, {slow_reads} eStreamReads "
+          f"(maxChunks={MAX_CHUNKS})")
+    print(f"event loop lateness over {len(lateness)} ticks: median {lateness[len(lateness) // 2] * 1000:.2f} ms, "
+          f"max {lateness[-1] * 1000:.2f} ms")
+    print("\nCancellation stopped every stream and all handles closed")
@@ -0,0 +1,40 @@
+"""
+Measures array writes of 10k to 1M values through ljm.eWriteNameArray for
+Python lists, array.array("d") and NumPy arrays. Contiguous float64 buffers
+are passed to LJM without copying; other NumPy dtypes are converted in one
+bulk pass. Runs against the LJM stand-in so no device is needed.
+
+Usage:
+    python benchmarks/array_conversion_benchmark.py
+
+Author: Liam Eime
+"""
+
+import array
+import timeit
+
+import numpy as np
+from labjack import ljm
+
+import ljm_stand_in
+
+HANDLE = 1
+SIZES = [10_000, 100_000, 1_000_000]
+NAME = "STREAM_OUT0_BUFFER_F32"
+
+
+def best_ms(call, number):
+    """Best of five runs, in milliseconds per call."""
+    return min(timeit.repeat(call, number=number, repeat=5)) / number * 1e3
+
+
+if __name__ == "__main__":
+    ljm_stand_in.install()
+    print(f"{'values':>10}{'list ms':>12}{'array(d) ms':>14}{'float64 ms':>13}{'float32 ms':>13}")
+    for size in SIZES:
+        values = np.linspace(0.0, 5.0, size)
+        inputs = [values.tolist(), array.array("d", values), values, values.astype(np.float32)]
+        number = max(1, 1_000_000 // size)
+        timings = [best_ms(lambda data=data: ljm.eWriteNameArray(HANDLE, NAME, size, data), number)
+                   for data in inputs]
+        print(f"{size:>10}{timings[0]:12.3f}{timings[1]:14.3f}{timings[2]:13.3f}{timings[3]:13.3f}")
@@ -0,0 +1,136 @@
+"""
+Checks t7stream's AinCalibration against the stand-in T7: the constants
+read from flash, codes streamed with LJM_STREAM_AIN_BINARY converted back
+to the volts of the same stream, and raw recordings read back and replayed
+as volts.
+
+Then compares what a second of main.py's stream at 30 kscans/s costs the
+host after eStreamRead, as float64 volts and as uint16 codes: the bytes
+kept and recorded, and the time to convert them to g and queue them for
+the recorder. Also times converting only a capture window of the codes.
+
+Usage:
+    python benchmarks/binary_stream_benchmark.py
+
+Author: Liam Eime
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+from labjack import ljm
+
+import ljm_stand_in
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from t7stream import AinCalibration, Recorder, RecordingReader, ReplaySource, ScanClock  # noqa: E402
+
+NUM_CHANNELS = 3
+SCAN_RATE = 30000
+SCANS_PER_READ = 750  # main.py's READ_SECONDS
+NUM_SECONDS = 20
+WINDOW_SCANS = 9000  # A 0.3 s capture window
+OFFSET, SENSITIVITY = 2.5, 1.0
+
+
+def stream(binary, num_reads):
+    """Return num_reads reads of the stand-in waveform, as LJM returns them
+    with LJM_STREAM_AIN_BINARY set to binary."""
+    ljm.writeLibraryConfigS(ljm.constants.STREAM_AIN_BINARY, int(binary))
+    handle = ljm.openS("T7", "USB", "ANY")
+    ljm.eStreamStart(handle, SCANS_PER_READ, NUM_CHANNELS, list(range(0, 2 * NUM_CHANNELS, 2)), SCAN_RATE)
+    reads = np.empty((num_reads, SCANS_PER_READ * NUM_CHANNELS))
+    for read in reads:
+        ljm.eStreamReadInto(handle, read)
+    ljm.eStreamStop(handle)
+    ljm.close(handle)
+    return reads.ravel()
+
+
+def check(directory):
+    library = ljm_stand_in.install()
+    library.waveform = ljm_stand_in.accelerometer_waveform(SCAN_RATE)
+    handle = ljm.openS("T7", "USB", "ANY")
+    mixed = AinCalibration.from_device(handle, [10, 10, 1])
+    calibration = AinCalibration.from_device(handle, [10] * NUM_CHANNELS, offset=OFFSET, sensitivity=SENSITIVITY,
+                                             unit="g")
+    ljm.close(handle)
+    expected = np.array(ljm_stand_in.CALIBRATION, dtype=np.float32).astype(np.float64)
+    assert np.array_equal(mixed.positive_slope, expected[[0, 0, 1], 0])
+    assert np.array_equal(mixed.center, expected[[0, 0, 1], 2])
+    assert AinCalibration.nominal([10]).center[0] == 33523.0
+
+    volts = stream(False, 40).reshape(-1, NUM_CHANNELS).T
+    codes = stream(True, 40).astype(np.uint16).reshape(-1, NUM_CHANNELS).T
+    # Within half a code, 0.16 mV
+    assert np.abs(calibration.volts(codes) - volts).max() <= 0.5 * calibration.positive_slope.max() + 1e-12
+    assert np.allclose(calibration.convert(codes), (calibration.volts(codes) - OFFSET) / SENSITIVITY)
+    table = calibration.volts_table()[0]
+    center = int(calibration.center[0])
+    assert table[center] == 0 and table[center + 1000] > 0 > table[center - 1000]
+
+    clock = ScanClock(1.7e9, SCAN_RATE)
+    names = [f"AIN{i}" for i in range(NUM_CHANNELS)]
+    with Recorder(os.path.join(directory, "raw.t7r"), names, SCAN_RATE, clock, calibration.to_dict(), np.uint16,
+                  block=True) as recorder:
+        recorder.write(codes)
+    with Recorder(os.path.join(directory, "volts.t7r"), names, SCAN_RATE, clock, block=True) as volts_recorder:
+        volts_recorder.write(volts)
+    with RecordingReader(recorder.files) as reader:
+        assert reader.raw and reader.dtype == np.uint16
+        assert np.array_equal(reader.read(0, reader.total), codes)
+        assert np.array_equal(reader.calibrated(reader.read(100, 200)), calibration.convert(codes[:, 100:200]))
+    source = ReplaySource(recorder.files, SCANS_PER_READ)
+    played = np.empty(SCANS_PER_READ * NUM_CHANNELS)
+    source.eStreamReadInto(played)
+    assert np.array_equal(played.reshape(-1, NUM_CHANNELS).T, calibration.volts(codes[:, :SCANS_PER_READ]))
+    source.close()
+    raw_bytes, volts_bytes = (sum(os.path.getsize(path) for path in files)
+                              for files in (recorder.files, volts_recorder.files))
+    return calibration, raw_bytes / volts_bytes
+
+
+def host_cost(calibration):
+    """Return (seconds per stream second, bytes per stream second) of
+    main.py's host work after eStreamRead, for volts and codes."""
+    volts = ljm_stand_in.accelerometer_waveform(SCAN_RATE)(0, SCAN_RATE, NUM_CHANNELS)
+    codes = np.round(calibration.center[0] + volts / calibration.positive_slope[0]).astype(np.uint16)
+    scratch = codes[:SCANS_PER_READ * NUM_CHANNELS].astype(np.float64)  # A read of codes as LJM returns them
+    times = {"volts": [], "codes": [], "window": []}
+    for _ in range(NUM_SECONDS):
+        start = time.perf_counter()
+        g = ((volts - OFFSET) / SENSITIVITY).reshape(-1, NUM_CHANNELS).T  # As handle_stream_read
+        recorded = np.array(volts.reshape(-1, NUM_CHANNELS).T, order="C")  # As Recorder.write_interleaved
+        times["volts"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for read in codes.reshape(-1, scratch.size):
+            np.copyto(read, scratch, casting="unsafe")  # As read_chunk
+        g = calibration.convert(codes.reshape(-1, NUM_CHANNELS).T)
+        recorded = np.array(codes.reshape(-1, NUM_CHANNELS).T, order="C")
+        times["codes"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        calibration.convert(recorded[:, :WINDOW_SCANS])
+        times["window"].append(time.perf_counter() - start)
+    del g
+    return {name: np.median(values) for name, values in times.items()}, {"volts": volts.nbytes, "codes": codes.nbytes}
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as directory:
+        calibration, size_ratio = check(directory)
+    print("Binary codes matched the volts of the same stream and round-tripped through a uint16 recording\n")
+
+    seconds, nbytes = host_cost(calibration)
+    print(f"One second of {NUM_CHANNELS} channels at {SCAN_RATE} scans/s, in {SCANS_PER_READ}-scan reads")
+    print(f"{'':>8}{'MB kept/recorded':>18}{'ms to g + record':>18}")
+    for name in ("volts", "codes"):
+        print(f"{name:>8}{nbytes[name] / 1e6:18.2f}{seconds[name] * 1000:18.2f}")
+    print(f"A raw recording is {size_ratio:.2f} of the size of a float64 one; converting only a "
+          f"{WINDOW_SCANS / SCAN_RATE:g} s window takes {seconds['window'] * 1000:.2f} ms")
+    assert nbytes["codes"] * 4 == nbytes["volts"] and size_ratio < 0.26
+    assert seconds["codes"] < 0.05 and seconds["window"] < seconds["codes"]
@@ -0,0 +1,183 @@
+"""
+Reports the per-call overhead of the hot labjack.ljm wrappers before and after
+declaring the LJM prototypes at load time and reusing per-handle scratch
+ctypes arrays in the multiple-frame functions. Runs against the LJM stand-in
+so no device is needed. eReadAddress and eStreamRead build their ctypes
+objects per call, as reusing them measured no faster: their cost is the
+call itself and, for eStreamRead, building the list it returns. The argtypes
+of these hot calls are left undeclared, since ctypes converting declared
+arguments on every call measured slower than passing ints and ctypes objects.
+
+"before" replays the wrapper bodies as they were (new ctypes objects on every
+call, prototypes left undeclared), "after" calls the current labjack.ljm
+functions. The "floor" column is the bare stand-in call with prebuilt
+arguments, which both include. Fails if a wrapper is slower than before, or
+if the scratch arrays stop paying for themselves in the multiple-frame
+functions.
+
+Usage:
+    python benchmarks/binding_overhead_benchmark.py
+
+Author: Liam Eime
+"""
+
+import ctypes
+import threading
+import timeit
+
+from labjack import ljm
+
+import ljm_stand_in
+
+HANDLE = 1
+NUM_CALLS = 20000
+ADDRESSES = [0, 2, 4, 6]  # AIN0-AIN3
+DATA_TYPES = [ljm.constants.FLOAT32] * len(ADDRESSES)
+WRITES = [ljm.constants.READ] * len(ADDRESSES)
+NUM_VALUES = [1] * len(ADDRESSES)
+VALUES = [0.0] * len(ADDRESSES)
+SCANS_PER_READ = 100
+NOISE = 1.2  # Timing noise allowed before a wrapper counts as slower than before
+
+
+def legacy_e_read_address(library, handle, address, data_type):
+    c_addr = ctypes.c_int32(address)
+    c_type = ctypes.c_int32(data_type)
+    c_val = ctypes.c_double(0)
+    library.LJM_eReadAddress(handle, c_addr, c_type, ctypes.byref(c_val))
+    return c_val.value
+
+
+def legacy_e_read_addresses(library, handle, num_frames, addresses, data_types):
+    c_num_frames = ctypes.c_int32(num_frames)
+    c_addrs = (ctypes.c_int32 * len(addresses))(*addresses)
+    c_types = (ctypes.c_int32 * len(data_types))(*data_types)
+    c_vals = (ctypes.c_double * num_frames)()
+    c_error_addr = ctypes.c_int32(-1)
+    library.LJM_eReadAddresses(handle, c_num_frames, ctypes.byref(c_addrs), ctypes.byref(c_types),
+                               ctypes.byref(c_vals), ctypes.byref(c_error_addr))
+    return c_vals[:]
+
+
+def legacy_e_addresses(library, handle, num_frames, addresses, data_types, writes, num_values, values):
+    c_num_frames = ctypes.c_int32(num_frames)
+    c_addrs = (ctypes.c_int32 * len(addresses))(*addresses)
+    c_types = (ctypes.c_int32 * len(data_types))(*data_types)
+    c_writes = (ctypes.c_int32 * len(writes))(*writes)
+    c_num_vals = (ctypes.c_int32 * len(num_values))(*num_values)
+    c_vals = (ctypes.c_double * len(values))(*values)
+    c_error_addr = ctypes.c_int32(-1)
+    library.LJM_eAddresses(handle, c_num_frames, ctypes.byref(c_addrs), ctypes.byref(c_types),
+                           ctypes.byref(c_writes), ctypes.byref(c_num_vals), ctypes.byref(c_vals),
+                           ctypes.byref(c_error_addr))
+    return c_vals[:]
+
+
+def legacy_e_stream_read(library, handle, data_size):
+    c_data = (ctypes.c_double * data_size)()
+    c_d_sbl = ctypes.c_int32(0)
+    c_ljm_sbl = ctypes.c_int32(0)
+    library.LJM_eStreamRead(handle, ctypes.byref(c_data), ctypes.byref(c_d_sbl), ctypes.byref(c_ljm_sbl))
+    return c_data[:], c_d_sbl.value, c_ljm_sbl.value
+
+
+def check_scratch():
+    """Check that tuple arguments reuse the scratch arrays and that close
+    drops the scratch every thread made for the handle."""
+    from labjack.ljm import ljm as ljm_module
+    addresses, types = tuple(ADDRESSES), tuple(DATA_TYPES)
+    ljm.eReadAddresses(HANDLE, len(ADDRESSES), addresses, types)
+    scratch = ljm_module._getScratch(HANDLE)
+    cached = scratch.array("eReadAddresses.aAddresses", ctypes.c_int32, addresses)
+    cached[0] = -1  # Only a reused array keeps this
+    assert scratch.array("eReadAddresses.aAddresses", ctypes.c_int32, addresses)[0] == -1
+    assert scratch.array("eReadAddresses.aAddresses", ctypes.c_int32, list(addresses))[0] == ADDRESSES[0]
+
+    handle = ljm.openS("T7", "USB", "ANY")
+    tables = []
+    worker = threading.Thread(target=lambda: (ljm.eReadAddresses(handle, 1, [0], [ljm.constants.FLOAT32]),
+                                              tables.append(ljm_module._g_threadScratch.scratches)))
+    worker.start()
+    worker.join()
+    assert handle in tables[0]
+    ljm.close(handle)
+    assert handle not in tables[0]
+
+
+def per_call_us(calls, rounds=7):
+    """Time each call NUM_CALLS times per round, alternating between the
+    calls so machine noise affects them alike. Returns the best round of
+    each, in microseconds per call."""
+    best = [float("inf")] * len(calls)
+    for _ in range(rounds):
+        for i, (library, call) in enumerate(calls):
+            ljm_stand_in.install(library, declare_prototypes=False)
+            best[i] = min(best[i], timeit.timeit(call, number=NUM_CALLS) / NUM_CALLS * 1e6)
+    return best
+
+
+if __name__ == "__main__":
+    data_size = SCANS_PER_READ * len(ADDRESSES)
+    before_lib = ljm_stand_in.StandInLibrary(prototyped=False)  # Prototypes left undeclared
+    after_lib = ljm_stand_in.install()
+    check_scratch()
+    ljm.eStreamStart(HANDLE, SCANS_PER_READ, len(ADDRESSES), ADDRESSES, 1000)
+    before_lib.LJM_eStreamStart(HANDLE, SCANS_PER_READ, len(ADDRESSES),
+                                ctypes.byref((ctypes.c_int32 * len(ADDRESSES))(*ADDRESSES)),
+                                ctypes.byref(ctypes.c_double(1000)))
+
+    # Prebuilt arguments for the bare stand-in calls
+    value = ctypes.c_double()
+    error_address = ctypes.c_int32()
+    addrs = (ctypes.c_int32 * len(ADDRESSES))(*ADDRESSES)
+    types = (ctypes.c_int32 * len(ADDRESSES))(*DATA_TYPES)
+    writes = (ctypes.c_int32 * len(ADDRESSES))(*WRITES)
+    num_vals = (ctypes.c_int32 * len(ADDRESSES))(*NUM_VALUES)
+    vals = (ctypes.c_double * len(ADDRESSES))()
+    data = (ctypes.c_double * data_size)()
+    backlog = ctypes.c_int32()
+
+    # (name, before, after, floor) as (library, call) pairs
+    cases = [
+        ("eReadAddress",
+         (before_lib, lambda: legacy_e_read_address(before_lib, HANDLE, 0, ljm.constants.FLOAT32)),
+         (after_lib, lambda: ljm.eReadAddress(HANDLE, 0, ljm.constants.FLOAT32)),
+         (after_lib, lambda: after_lib.LJM_eReadAddress(HANDLE, 0, 3, ctypes.byref(value)))),
+        ("eReadAddresses",
+         (before_lib, lambda: legacy_e_read_addresses(before_lib, HANDLE, len(ADDRESSES), ADDRESSES, DATA_TYPES)),
+         (after_lib, lambda: ljm.eReadAddresses(HANDLE, len(ADDRESSES), ADDRESSES, DATA_TYPES)),
+         (after_lib, lambda: after_lib.LJM_eReadAddresses(HANDLE, len(ADDRESSES), addrs, types, vals,
+                                                          ctypes.byref(error_address)))),
+        ("eAddresses, tuples",
+         (before_lib, lambda: legacy_e_addresses(before_lib, HANDLE, len(ADDRESSES), tuple(ADDRESSES),
+                                                 tuple(DATA_TYPES), tuple(WRITES), tuple(NUM_VALUES), VALUES)),
+         (after_lib, lambda: ljm.eAddresses(HANDLE, len(ADDRESSES), tuple(ADDRESSES), tuple(DATA_TYPES), tuple(WRITES),
+                                            tuple(NUM_VALUES), VALUES)),
+         (after_lib, lambda: after_lib.LJM_eAddresses(HANDLE, len(ADDRESSES), addrs, types, writes, num_vals, vals,
+                                                      ctypes.byref(error_address)))),
+        ("eAddresses",
+         (before_lib, lambda: legacy_e_addresses(before_lib, HANDLE, len(ADDRESSES), ADDRESSES, DATA_TYPES, WRITES,
+                                                 NUM_VALUES, VALUES)),
+         (after_lib, lambda: ljm.eAddresses(HANDLE, len(ADDRESSES), ADDRESSES, DATA_TYPES, WRITES, NUM_VALUES,
+                                            VALUES)),
+         (after_lib, lambda: after_lib.LJM_eAddresses(HANDLE, len(ADDRESSES), addrs, types, writes, num_vals, vals,
+                                                      ctypes.byref(error_address)))),
+        ("eStreamRead",
+         (before_lib, lambda: legacy_e_stream_read(before_lib, HANDLE, data_size)),
+         (after_lib, lambda: ljm.eStreamRead(HANDLE)),
+         (after_lib, lambda: after_lib.LJM_eStreamRead(HANDLE, data, ctypes.byref(backlog), ctypes.byref(backlog)))),
+    ]
+
+    print(f"{NUM_CALLS} calls per round, {len(ADDRESSES)} frames, {data_size} stream values per read\n")
+    print(f"{'function':<20}{'before us':>11}{'after us':>11}{'floor us':>11}{'overhead before':>17}"
+          f"{'overhead after':>16}")
+    slower = []
+    for name, *calls in cases:
+        before, after, floor = per_call_us(calls)
+        if after > before * NOISE or (name.startswith(("eReadAddresses", "eAddresses")) and after >= before):
+            slower.append(name)
+        print(f"{name:<20}{before:11.2f}{after:11.2f}{floor:11.2f}{before - floor:17.2f}{after - floor:16.2f}")
+
+    ljm_stand_in.install(after_lib, declare_prototypes=False)
+    ljm.eStreamStop(HANDLE)
+    assert not slower, slower
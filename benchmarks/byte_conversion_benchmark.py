@@ -0,0 +1,92 @@
+"""
+Compares the LJM byte array conversions in labjack.ljm (lists converted to
+ctypes arrays and back around a library call) with the NumPy
+implementations in labjack.ljm.conversions, for FLOAT32 payloads from 1 KB
+to 64 MB. The list round trip is only timed up to LIST_LIMIT bytes, since
+it needs a Python object per byte.
+
+Each round trip result is also checked against the labjack.ljm functions
+bit for bit on values that exercise float rounding, overflow and integer
+wraparound. The library calls go to the LJM stand-in.
+
+Usage:
+    python benchmarks/byte_conversion_benchmark.py
+
+Author: Liam Eime
+"""
+
+import time
+
+import numpy as np
+
+from labjack import ljm
+from labjack.ljm import conversions
+
+import ljm_stand_in
+
+SIZES = [1 << 10, 64 << 10, 1 << 20, 16 << 20, 64 << 20]
+LIST_LIMIT = 4 << 20
+
+CONVERSIONS = [
+    (ljm.float32ToByteArray, ljm.byteArrayToFLOAT32, conversions.float32ToByteArray, conversions.byteArrayToFLOAT32),
+    (ljm.uint16ToByteArray, ljm.byteArrayToUINT16, conversions.uint16ToByteArray, conversions.byteArrayToUINT16),
+    (ljm.uint32ToByteArray, ljm.byteArrayToUINT32, conversions.uint32ToByteArray, conversions.byteArrayToUINT32),
+    (ljm.int32ToByteArray, ljm.byteArrayToINT32, conversions.int32ToByteArray, conversions.byteArrayToINT32),
+]
+
+
+def check_bit_for_bit():
+    floats = [0.1, -1.5, 1e39, -1e39, 1e-46, float("inf"), float(2**60 + 1), 16777217.0, -0.0]
+    integers = [0, 1, 65535, 65536, -1, -40000, 2**31, 2**40 + 3]
+    rng = np.random.default_rng(0)
+    random_bytes = rng.integers(0, 256, 4096, dtype=np.uint8).tobytes()
+    for (to_bytes, from_bytes, fast_to_bytes, fast_from_bytes), values in zip(
+            CONVERSIONS, [floats, integers, integers, integers]):
+        assert bytes(to_bytes(values)) == bytes(fast_to_bytes(values)), to_bytes.__name__
+        assert bytes(to_bytes(values, 3, 4, [7] * 64)) == bytes(fast_to_bytes(values, 3, 4, [7] * 64))
+        # Compared as the Python numbers the list functions return. NaN
+        # payloads do not survive the conversion to a Python float, so NaNs
+        # only need to be NaN in both.
+        expected = np.array(from_bytes(list(random_bytes)), dtype=np.float64)
+        with np.errstate(invalid="ignore"):
+            actual = fast_from_bytes(random_bytes).astype(np.float64)
+        nan = np.isnan(expected)
+        assert np.array_equal(nan, np.isnan(actual)), from_bytes.__name__
+        assert expected[~nan].tobytes() == actual[~nan].tobytes(), from_bytes.__name__
+
+
+def best_ms(call, rounds=3):
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        call()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def size_label(size):
+    return f"{size >> 20} MB" if size >= 1 << 20 else f"{size >> 10} KB"
+
+
+if __name__ == "__main__":
+    ljm_stand_in.install()
+    check_bit_for_bit()
+    print("Round trips match labjack.ljm bit for bit\n")
+
+    rng = np.random.default_rng(1)
+    print(f"{'FLOAT32 payload':<16}{'list decode ms':>16}{'numpy decode ms':>17}{'list encode ms':>16}"
+          f"{'numpy encode ms':>17}{'numpy decode MB/s':>19}")
+    for size in SIZES:
+        payload = rng.standard_normal(size // 4).astype(">f4").tobytes()
+        values = conversions.byteArrayToFLOAT32(payload)
+        fast_decode = best_ms(lambda: conversions.byteArrayToFLOAT32(payload))
+        fast_encode = best_ms(lambda: conversions.float32ToByteArray(values))
+        if size <= LIST_LIMIT:
+            payload_list = list(payload)
+            values_list = values.tolist()
+            list_decode = f"{best_ms(lambda: ljm.byteArrayToFLOAT32(payload_list), rounds=1):16.2f}"
+            list_encode = f"{best_ms(lambda: ljm.float32ToByteArray(values_list), rounds=1):16.2f}"
+        else:
+            list_decode = list_encode = f"{'skipped':>16}"
+        print(f"{size_label(size):<16}{list_decode}{fast_decode:17.3f}{list_encode}{fast_encode:17.3f}"
+              f"{size / (1 << 20) / (fast_decode / 1000):19.0f}")
@@ -0,0 +1,123 @@
+"""
+Checks t7stream's ReadCadence on made-up analysis costs: it settles on the
+shortest chunk that keeps the fixed cost under max_overhead, follows a jump
+in the host's load, and grows chunks while the LJM backlog is above its
+setpoint.
+
+Then streams the stand-in in real time through main.py's read loop for
+RUN_SECONDS with one-second reads, with the adaptive cadence, and with the
+adaptive cadence on a loaded host where every chunk costs LOAD_SECONDS more
+to analyse. Reports the detection latency, from when the scans that end an
+event arrive to when main.py reports it, and the chunks analysed per second.
+
+Usage:
+    python benchmarks/cadence_benchmark.py
+
+Author: Liam Eime
+"""
+
+import contextlib
+import io
+import os
+import sys
+import time
+
+import numpy as np
+from labjack import ljm
+
+import ljm_stand_in
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import main  # noqa: E402
+from t7stream import ReadCadence  # noqa: E402
+
+RUN_SECONDS = 8
+LOAD_SECONDS = 0.015
+
+
+def settle(cadence, fixed_seconds, seconds_per_read, chunks, ljm_backlog=lambda chunk: 0):
+    for chunk in range(chunks):
+        reads = cadence.reads_per_chunk
+        cadence.observe(reads * cadence.scans_per_read, fixed_seconds + seconds_per_read * reads)
+        cadence.update(ljm_backlog(chunk))
+    return cadence.status()["reads_per_chunk"]
+
+
+def check():
+    cadence = ReadCadence(30000, 750)  # 25 ms reads
+    # 5 ms fixed is 5% of a 100 ms chunk
+    assert settle(cadence, 0.005, 0.001, 60) == 4
+    assert abs(cadence.fixed_seconds - 0.005) < 1e-6 and abs(cadence.seconds_per_read - 0.001) < 1e-6
+    assert settle(cadence, 0.02, 0.001, 100) == 16
+    # 20 reads of backlog for five chunks, then caught up
+    assert settle(cadence, 0.02, 0.001, 5, lambda chunk: 15000) == cadence.max_reads
+    assert settle(cadence, 0.02, 0.001, 40) == 16
+    assert settle(cadence, 0.005, 0.001, 100) == 4
+
+
+def stream(adaptive, load_seconds=0.0):
+    """Run RUN_SECONDS of real-time reads through main.py's read loop and
+    return (detection latencies, chunks, reads, largest LJM backlog)."""
+    main.SCAN_RATE = 30000
+    main.RECORD_DATA = False  # Timed by recorder_benchmark.py
+    main.CAPTURE_EVENTS = False  # Timed by capture_benchmark.py
+    library = ljm_stand_in.install(ljm_stand_in.StandInLibrary(real_time=True))
+    library.waveform = ljm_stand_in.accelerometer_waveform(main.SCAN_RATE)
+    latencies = []
+
+    def report(events):
+        now = time.time()
+        hold_off = int(main.BUFFER_PERIOD * main.scan_clock.scan_rate)
+        latencies.extend(now - main.scan_clock.time_of(events["end"] + hold_off))
+
+    def loaded(data, first_scan):
+        time.sleep(load_seconds)
+        process_data(data, first_scan)
+
+    print_events, process_data = main.print_events, main.process_data
+    main.print_events, main.process_data = report, loaded
+    chunks = reads = max_backlog = 0
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            handle = main.open_device()
+            aScanList = main.configure_device(handle)
+            scansPerRead = int(main.SCAN_RATE * main.READ_SECONDS) if adaptive else int(main.SCAN_RATE)
+            scanRate, _ = main.start_stream(handle, aScanList, scansPerRead)
+            main.cadence = ReadCadence(scanRate, scansPerRead, main.MAX_CHUNK_SECONDS, main.MAX_CHUNK_OVERHEAD)
+            stream_buffer = np.empty(main.cadence.max_reads * scansPerRead * len(aScanList))
+            try:
+                end = time.perf_counter() + RUN_SECONDS
+                while time.perf_counter() < end:
+                    reads += main.cadence.reads_per_chunk
+                    chunk, backlogs = main.read_chunk(handle, stream_buffer, scansPerRead)
+                    main.handle_stream_read(chunk)
+                    chunks += 1
+                    max_backlog = max(max_backlog, backlogs[1])
+            finally:
+                main.stop_stream(handle)
+                ljm.close(handle)
+    finally:
+        main.print_events, main.process_data = print_events, process_data
+        main.cadence = None
+    return np.array(latencies), chunks, reads, max_backlog
+
+
+if __name__ == "__main__":
+    check()
+    print("ReadCadence settled on the shortest affordable chunk, followed the load and caught up a backlog\n")
+
+    print(f"Real-time stream of {main.NUMBER_OF_AINS} channels at 30000 scans/s for {RUN_SECONDS} s, "
+          f"{main.READ_SECONDS * 1000:g} ms reads when adaptive")
+    print(f"{'':>26}{'latency median':>16}{'latency max':>13}{'chunks/s':>10}{'reads/s':>9}{'LJM backlog':>13}")
+    results = {}
+    for name, adaptive, load_seconds in [("one-second reads", False, 0.0), ("adaptive", True, 0.0),
+                                         (f"adaptive, +{LOAD_SECONDS * 1000:g} ms per chunk", True, LOAD_SECONDS)]:
+        latencies, chunks, reads, max_backlog = stream(adaptive, load_seconds)
+        results[name] = latencies, chunks
+        print(f"{name:>26}{np.median(latencies) * 1000:13.0f} ms{latencies.max() * 1000:10.0f} ms"
+              f"{chunks / RUN_SECONDS:10.1f}{reads / RUN_SECONDS:9.1f}{max_backlog:13d}")
+    (fixed, _), (adaptive, adaptive_chunks), (loaded, loaded_chunks) = results.values()
+    assert np.median(adaptive) < 0.1 < np.median(fixed), (np.median(adaptive), np.median(fixed))
+    # The fixed cost of a chunk is held near 5% of the stream time by analysing fewer, longer chunks
+    assert loaded_chunks / RUN_SECONDS < 1.5 * main.MAX_CHUNK_OVERHEAD / LOAD_SECONDS, loaded_chunks
+    assert loaded_chunks < adaptive_chunks and np.median(loaded) < 0.5
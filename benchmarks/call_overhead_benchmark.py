@@ -0,0 +1,123 @@
+"""
+Measures the per-call cost of the labjack.ljm calls main.py makes, against the
+simulated T7 in ljm_stand_in, with no latency and with LATENCY_MS of injected
+command-response latency like a USB round trip.
+
+The stream rows time one eStreamReadInto of a one-second read (scansPerRead =
+scan rate, as in main.py) at each scan rate. The last table is the handoff
+latency of setStreamCallback in real time: how long after a chunk is due the
+callback has finished reading it.
+
+Usage:
+    python benchmarks/call_overhead_benchmark.py
+
+Author: Liam Eime
+"""
+
+import statistics
+import threading
+import time
+
+import numpy as np
+from labjack import ljm
+
+import ljm_stand_in
+
+NUMBER_OF_AINS = 3
+AIN_NAMES = ["AIN0", "AIN1", "AIN2"]
+CONFIG_NAMES = ["AIN_ALL_RANGE", "STREAM_RESOLUTION_INDEX", "AIN_ALL_NEGATIVE_CH", "STREAM_SETTLING_US"]
+CONFIG_VALUES = [10.0, 0, ljm.constants.GND, 0]
+SCAN_RATES = [10000, 30000, 50000, 100000]
+LATENCY_MS = 1.0
+NUM_CALLS = 2000
+NUM_LATENCY_CALLS = 50
+CALLBACK_SCAN_RATE = 10000
+CALLBACK_SCANS_PER_READ = 500
+NUM_CALLBACKS = 40
+
+
+def per_call_us(call, number):
+    """Best of 5 rounds of number calls, in microseconds per call."""
+    best = float("inf")
+    call()
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(number):
+            call()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best * 1e6
+
+
+def command_calls(handle):
+    return [
+        ("eReadName CORE_TIMER", lambda: ljm.eReadName(handle, "CORE_TIMER")),
+        ("eWriteName", lambda: ljm.eWriteName(handle, "STREAM_TRIGGER_INDEX", 0)),
+        ("eWriteNames, 4 frames", lambda: ljm.eWriteNames(handle, 4, CONFIG_NAMES, CONFIG_VALUES)),
+        ("eReadAddress AIN0", lambda: ljm.eReadAddress(handle, 0, ljm.constants.FLOAT32)),
+        ("eReadNames, 3 AINs", lambda: ljm.eReadNames(handle, 3, AIN_NAMES)),
+        ("getHandleInfo", lambda: ljm.getHandleInfo(handle)),
+    ]
+
+
+def stream_read_us(handle, scan_rate):
+    buffer = np.empty(scan_rate * NUMBER_OF_AINS)
+    ljm.eStreamStart(handle, scan_rate, NUMBER_OF_AINS, [0, 2, 4], scan_rate)
+    try:
+        return per_call_us(lambda: ljm.eStreamReadInto(handle, buffer), 20)
+    finally:
+        ljm.eStreamStop(handle)
+
+
+def callback_handoff_ms(library, handle):
+    """Start a real-time stream read by a callback and return how late
+    after each chunk was due the callback finished reading it."""
+    buffer = np.empty(CALLBACK_SCANS_PER_READ * NUMBER_OF_AINS)
+    done_times = []
+    finished = threading.Event()
+
+    def callback(callback_handle):
+        ljm.eStreamReadInto(callback_handle, buffer)
+        done_times.append(time.perf_counter())
+        if len(done_times) == NUM_CALLBACKS:
+            finished.set()
+
+    ljm.eStreamStart(handle, CALLBACK_SCANS_PER_READ, NUMBER_OF_AINS, [0, 2, 4], CALLBACK_SCAN_RATE)
+    start = library._streams[handle].start
+    ljm.setStreamCallback(handle, callback)
+    finished.wait(NUM_CALLBACKS * CALLBACK_SCANS_PER_READ / CALLBACK_SCAN_RATE + 5)
+    ljm.eStreamStop(handle)
+    assert len(done_times) >= NUM_CALLBACKS, f"only {len(done_times)} callbacks"
+    period = CALLBACK_SCANS_PER_READ / CALLBACK_SCAN_RATE
+    return [(t - (start + (i + 1) * period)) * 1000 for i, t in enumerate(done_times[:NUM_CALLBACKS])]
+
+
+if __name__ == "__main__":
+    library = ljm_stand_in.install()
+    handle = ljm.openS("T7", "USB", "ANY")
+
+    rows = []
+    for name, call in command_calls(handle):
+        overhead = per_call_us(call, NUM_CALLS)
+        library.latency = LATENCY_MS / 1000
+        with_latency = per_call_us(call, NUM_LATENCY_CALLS)
+        library.latency = 0.0
+        rows.append((name, overhead, with_latency))
+    print(f"{'call':<26}{'overhead us':>12}{f'with {LATENCY_MS:g} ms latency, us':>30}")
+    for name, overhead, with_latency in rows:
+        print(f"{name:<26}{overhead:12.1f}{with_latency:30.1f}")
+
+    print(f"\neStreamReadInto of one-second reads, {NUMBER_OF_AINS} channels")
+    print(f"{'scans/s':>10}{'us/read':>12}{'% of read period':>18}")
+    for scan_rate in SCAN_RATES:
+        read_us = stream_read_us(handle, scan_rate)
+        print(f"{scan_rate:10d}{read_us:12.1f}{read_us / 1e4:18.4f}")
+    ljm.close(handle)
+
+    real_time = ljm_stand_in.StandInLibrary(real_time=True)
+    ljm_stand_in.install(real_time)
+    handle = ljm.openS("T7", "USB", "ANY")
+    lateness = sorted(callback_handoff_ms(real_time, handle))
+    ljm.close(handle)
+    print(f"\nsetStreamCallback handoff, {CALLBACK_SCANS_PER_READ} scans every "
+          f"{CALLBACK_SCANS_PER_READ / CALLBACK_SCAN_RATE * 1000:g} ms, {NUM_CALLBACKS} chunks")
+    print(f"chunk due to read done: median {statistics.median(lateness):.3f} ms, max {lateness[-1]:.3f} ms")
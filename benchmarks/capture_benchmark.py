@@ -0,0 +1,148 @@
+"""
+Checks t7stream's EventCapture: windows wait for their later scans, events
+within a window share its capture, the rate, memory and retention
+limits hold, and a window overwritten while it is copied is not saved.
+Then feeds it an event storm, an event on every channel every 10 ms for a
+minute of 30 kscans/s, and reports the captures made and the time add and
+poll take per one-second read.
+
+Usage:
+    python benchmarks/capture_benchmark.py
+
+Author: Liam Eime
+"""
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from t7stream import EventCapture, RingBuffer, ScanClock, load_capture  # noqa: E402
+from t7stream.events import EVENT_DTYPE  # noqa: E402
+
+NUM_CHANNELS = 3
+SCAN_RATE = 30000
+STORM_SECONDS = 60
+STORM_INTERVAL = 0.01
+
+
+def events_at(peaks, channels=None):
+    events = np.zeros(len(peaks), EVENT_DTYPE)
+    events["peak_index"] = events["start"] = peaks
+    events["end"] = np.asarray(peaks) + 1
+    events["channel"] = channels if channels is not None else 0
+    return events
+
+
+def write(ring, num_scans):
+    first = ring.total
+    ring.write(np.arange(first, first + num_scans, dtype=np.float64)[None, :].repeat(2, axis=0))
+
+
+class OvertakenRing(RingBuffer):
+    """A RingBuffer whose writer starts overwriting everything while each
+    read is being copied."""
+
+    def read(self, start, stop, out=None):
+        out = super().read(start, stop, out)
+        self.reserved = self.total + self.capacity  # As write() does before it copies
+        return out
+
+
+def check(directory):
+    ring = RingBuffer(2, 5000)
+    capture = EventCapture(ring, directory, 1000, ScanClock(1.7e9, 1000), pre_seconds=0.1, post_seconds=0.2,
+                           max_per_minute=3)
+    write(ring, 1000)
+    capture.add(events_at([950]))
+    capture.poll()
+    assert capture.pending == 1 and capture.captured == 0  # Waits for scans up to 1150
+    write(ring, 1000)
+    capture.add(events_at([1500, 1510], channels=[0, 1]))  # The second peaks in the first's window
+    capture.poll()
+    assert capture.pending == 0 and capture.captured == 2
+    capture.add(events_at([1900, 2500]))  # The fourth in a minute is over max_per_minute
+    capture.poll()
+    assert capture.rate_limited == 1 and capture.pending == 1
+    capture.add(events_at([61000]))  # A minute after the first
+    capture.close()  # Saves 1800:2000 of the 1900 window; no scans of the last arrived
+    assert (capture.captured, capture.lost, capture.errors) == (3, 1, 0), capture.last_error
+
+    captures = sorted((load_capture(path) for path in capture.files), key=lambda c: c[0]["first_scan"])
+    header, scans = captures[0]
+    assert (header["first_scan"], header["num_scans"], header["truncated"]) == (850, 301, False)
+    assert np.array_equal(scans, np.arange(850, 1151)[None, :].repeat(2, axis=0))
+    assert abs(header["events"][0]["peak_time"] - (1.7e9 + 0.95)) < 1e-6
+    header, scans = captures[1]
+    assert (header["first_scan"], header["num_scans"]) == (1400, 301) and len(header["events"]) == 2
+    header, scans = captures[2]
+    assert (header["first_scan"], header["num_scans"], header["truncated"]) == (1800, 200, True)
+
+    # Windows overwritten before they are complete are lost
+    ring = RingBuffer(2, 1000)
+    capture = EventCapture(ring, directory, 1000, ScanClock(1.7e9, 1000))
+    write(ring, 500)
+    capture.add(events_at([450]))
+    write(ring, 2000)
+    capture.close()
+    assert capture.lost == 1 and capture.captured == 0
+
+    # A window the writer starts to overwrite while poll() copies it, on another thread, is lost too
+    ring = OvertakenRing(2, 1000)
+    capture = EventCapture(ring, directory, 1000, ScanClock(1.7e9, 1000))
+    write(ring, 500)
+    capture.add(events_at([200]))
+    capture.close()
+    assert capture.lost == 1 and capture.captured == 0 and not capture.files
+
+    # Captures that would take more than max_bytes to hold are dropped
+    ring = RingBuffer(2, 100000)
+    capture = EventCapture(ring, directory, 1000, ScanClock(1.7e9, 1000), max_per_minute=1000, max_bytes=1000)
+    write(ring, 60000)
+    capture.add(events_at(np.arange(1000, 50000, 1000)))
+    capture.close()
+    assert capture.dropped == 49 and capture.captured == 0
+
+
+def storm(directory):
+    """Returns (capture, seconds of add and poll per read, peak MB)."""
+    ring = RingBuffer.for_retention(NUM_CHANNELS, SCAN_RATE, 10)
+    capture = EventCapture(ring, directory, SCAN_RATE, ScanClock(1.7e9, SCAN_RATE))
+    block = np.random.default_rng(0).normal(size=(NUM_CHANNELS, SCAN_RATE))
+    step = int(STORM_INTERVAL * SCAN_RATE)
+    times = []
+    tracemalloc.start()
+    for read in range(STORM_SECONDS):
+        ring.write(block)
+        first = read * SCAN_RATE
+        peaks = np.repeat(np.arange(first, first + SCAN_RATE, step), NUM_CHANNELS)
+        events = events_at(peaks, np.tile(np.arange(NUM_CHANNELS), len(peaks) // NUM_CHANNELS))
+        start = time.perf_counter()
+        capture.add(events)
+        capture.poll()
+        times.append(time.perf_counter() - start)
+    capture.close()
+    peak_mb = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    return capture, np.array(times), peak_mb
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as directory:
+        check(directory)
+        print("EventCapture waited for post-trigger scans, shared windows between events and kept to its limits\n")
+
+        capture, times, peak_mb = storm(directory)
+    num_events = STORM_SECONDS * NUM_CHANNELS / STORM_INTERVAL
+    print(f"Event storm: {num_events:,.0f} events in {STORM_SECONDS} s of {NUM_CHANNELS} channels at "
+          f"{SCAN_RATE} scans/s")
+    print(f"captured {capture.captured}, over the rate limit {capture.rate_limited:,}, dropped {capture.dropped}, "
+          f"lost {capture.lost}")
+    print(f"add + poll per one-second read: median {np.median(times) * 1000:.2f} ms, max {times.max() * 1000:.2f} ms, "
+          f"peak {peak_mb:.1f} MB allocated")
+    assert capture.captured <= capture.max_per_minute * (STORM_SECONDS / 60 + 1)
+    assert np.median(times) < 0.1
@@ -0,0 +1,121 @@
+"""
+Streams from a stand-in T7 whose crystal runs DRIFT_PPM fast, with jittery
+command-response latency and a CORE_TIMER that rolls over during the run, and
+compares the scan timestamps of main.py's one-shot alignment with those of a
+ClockSynchronizer resampling CORE_TIMER in the background.
+
+The drift is exaggerated so its effect shows within seconds; a real T7 drifts
+by tens of ppm, which the one-shot alignment accumulates over hours. Also
+checks that a ClockSynchronizer keeps counting CORE_TIMER rollovers across a
+gap in its samples longer than one rollover.
+
+Usage:
+    python benchmarks/clock_sync_benchmark.py
+
+Author: Liam Eime
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+from labjack import ljm
+
+import ljm_stand_in
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import main  # noqa: E402
+from t7stream.clock import ScanClock  # noqa: E402
+from t7stream.sync import ROLLOVER_SECONDS, TICK_ROLLOVER, ClockSynchronizer, TickUnwrapper  # noqa: E402
+
+DRIFT_PPM = 500.0
+# About 1 ms of round-trip jitter over RUN_SECONDS of samples leaves tens of ppm
+# of error in the fitted drift, more when other work delays the samples.
+DRIFT_TOLERANCE_PPM = 100.0
+LATENCY_S = 0.0005
+LATENCY_JITTER_S = 0.001
+SCAN_RATE = 10000
+SCANS_PER_READ = 1000
+RUN_SECONDS = 8.0
+SYNC_INTERVAL_S = 0.2
+SLEW_SECONDS = 1.0
+
+
+def check_unwrapper():
+    unwrapper = TickUnwrapper(0xFFFFFF00)
+    assert unwrapper.unwrap(0xFFFFFFFF) == 0xFF
+    assert unwrapper.unwrap(5) == 0x105
+    assert unwrapper.unwrap(0x80000000) == 0x80000000 + 0x100
+    # Two rollovers and 10 ticks later, found from the seconds elapsed
+    assert unwrapper.unwrap(0x8000000A, elapsed=2 * ROLLOVER_SECONDS + 0.01) == 2 * TICK_ROLLOVER + 0x8000000A + 0x100
+
+
+def check_sample_gap():
+    """A sample after a gap of 2.5 rollovers counts them from the host clock
+    and restarts the fit."""
+    library = ljm_stand_in.install(ljm_stand_in.StandInLibrary())
+    handle = ljm.openS("T7", "USB", "ANY")
+    start_ticks = int(ljm.eReadName(handle, "CORE_TIMER"))
+    synchronizer = ClockSynchronizer(handle, ScanClock(time.time(), SCAN_RATE), start_ticks, SCAN_RATE)
+    synchronizer.sample()
+    synchronizer.sample()
+    gap = 2.5 * ROLLOVER_SECONDS
+    library._epoch -= gap  # The device runs on by the gap...
+    synchronizer._last_sample -= gap  # ...while no sample succeeded
+    device_seconds = synchronizer.sample()
+    ljm.close(handle)
+    assert abs(device_seconds - gap) < 0.1 and len(synchronizer.estimator) == 1, (device_seconds, synchronizer.estimator)
+
+
+if __name__ == "__main__":
+    check_unwrapper()
+    check_sample_gap()
+    library = ljm_stand_in.StandInLibrary(real_time=True)
+    library.clock_drift_ppm = DRIFT_PPM
+    library.latency = LATENCY_S
+    library.latency_jitter = LATENCY_JITTER_S
+    library.core_timer_offset = (1 << 32) - int(3 * ljm_stand_in.CORE_TIMER_HZ)  # Rolls over after 3 s
+    ljm_stand_in.install(library)
+    handle = ljm.openS("T7", "USB", "ANY")
+
+    scan_rate = ljm.eStreamStart(handle, SCANS_PER_READ, 1, [0], SCAN_RATE)
+    start_ticks = int(ljm.eReadName(handle, "STREAM_START_TIME_STAMP"))
+    core_ticks = ljm.eReadName(handle, "CORE_TIMER")
+    host_time = time.perf_counter()
+    one_shot = ScanClock(host_time - main.tick_diff_with_roll(start_ticks, core_ticks) / main.TICK_PER_SECOND,
+                         scan_rate)
+    synced = ScanClock(one_shot.start_time, scan_rate)
+    synchronizer = ClockSynchronizer(handle, synced, start_ticks, scan_rate, interval=SYNC_INTERVAL_S,
+                                     slew_seconds=SLEW_SECONDS, host_clock=time.perf_counter)
+
+    buffer = np.empty(SCANS_PER_READ)
+    read_times = []
+    round_trips = []
+    with synchronizer:
+        end = time.perf_counter() + RUN_SECONDS
+        while time.perf_counter() < end:
+            start = time.perf_counter()
+            ljm.eStreamReadInto(handle, buffer)
+            read_times.append(time.perf_counter() - start)
+            if synchronizer.last_round_trip is not None:
+                round_trips.append(synchronizer.last_round_trip)
+    stream = library._streams[handle]
+    ljm.eStreamStop(handle)
+    ljm.close(handle)
+    assert synchronizer.last_error is None, synchronizer.last_error
+
+    last_scan = len(read_times) * SCANS_PER_READ - 1
+    true_time = stream.start + last_scan / (scan_rate * (1 + DRIFT_PPM * 1e-6))
+    one_shot_error = (one_shot.time_of(last_scan) - true_time) * 1000
+    synced_error = (synced.time_of(last_scan) - true_time) * 1000
+    print(f"{len(read_times)} reads over {RUN_SECONDS:g} s, device clock {DRIFT_PPM:+g} ppm, CORE_TIMER rolled over\n")
+    print(f"{'':<28}{'last scan error ms':>20}")
+    print(f"{'one-shot alignment':<28}{one_shot_error:20.3f}")
+    print(f"{'ClockSynchronizer':<28}{synced_error:20.3f}")
+    print(f"\nEstimated drift {synchronizer.device_drift_ppm:+.1f} ppm from {len(synchronizer.estimator)} samples, "
+          f"median CORE_TIMER round trip {np.median(round_trips) * 1000:.2f} ms")
+    print(f"eStreamRead time: median {np.median(read_times) * 1000:.2f} ms, max {max(read_times) * 1000:.2f} ms "
+          f"for {SCANS_PER_READ / SCAN_RATE * 1000:g} ms reads")
+    assert abs(synced_error) < abs(one_shot_error) / 2, (synced_error, one_shot_error)
+    assert abs(synchronizer.device_drift_ppm - DRIFT_PPM) < DRIFT_TOLERANCE_PPM, synchronizer.device_drift_ppm
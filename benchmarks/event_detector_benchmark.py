@@ -0,0 +1,126 @@
+"""
+Checks t7stream's EventDetector against a scan-by-scan reference, with
+hysteresis and events split across reads of random sizes, then measures its
+throughput on a 14-channel stream at 100 kscans/s, one core.
+
+Usage:
+    python benchmarks/event_detector_benchmark.py
+
+Author: Liam Eime
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+import ljm_stand_in
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from t7stream import EventDetector  # noqa: E402
+from t7stream.events import EVENT_DTYPE  # noqa: E402
+
+NUM_CHANNELS = 14
+SCAN_RATE = 100000
+TARGET_SCANS_PER_S = 100000
+HOLD_OFF_S = 0.05
+THRESHOLD_G = 0.6
+RELEASE_G = 0.4
+CHECK_SECONDS = 3
+TIMED_SECONDS = 10
+
+
+def signal(seconds, seed=0):
+    """(channels, scans) of g values with events every few tenths of a
+    second and noise around the release level."""
+    waveform = ljm_stand_in.accelerometer_waveform(SCAN_RATE, event_interval=0.13, event_duration=0.01,
+                                                   noise_g=0.05, seed=seed)
+    volts = waveform(0, seconds * SCAN_RATE, NUM_CHANNELS)
+    return (volts - 2.5).reshape(-1, NUM_CHANNELS).T.copy()
+
+
+def reference(values, threshold, release, hold_off):
+    """Scan-by-scan state machine for one channel."""
+    events = []
+    run = None  # [start, peak, peak_index, hot]
+    for i, value in enumerate(values):
+        if value > release:
+            if run is None:
+                run = [i, value, i, False]
+            elif value > run[1]:
+                run[1], run[2] = value, i
+            run[3] |= value > threshold
+        elif run is not None:
+            if run[3]:
+                if events and run[0] - events[-1][1] <= hold_off:
+                    last = events[-1]
+                    last[1] = i
+                    if run[1] > last[2]:
+                        last[2], last[3] = run[1], run[2]
+                else:
+                    events.append([run[0], i, run[1], run[2]])
+            run = None
+    assert run is None, "the reference expects the signal to end below the release level"
+    return events
+
+
+def detect(detector, data, splits):
+    events = []
+    for start, stop in zip(splits[:-1], splits[1:]):
+        events.append(detector.process(data[:, start:stop], start))
+    events.append(detector.flush())
+    events = np.concatenate(events)
+    # Each call returns its events by start, but calls finish events at different times
+    return events[np.lexsort((events["channel"], events["start"]))]
+
+
+def check_against_reference():
+    data = signal(CHECK_SECONDS, seed=1)
+    data[:, -1] = 0.0
+    hold_off = int(HOLD_OFF_S * SCAN_RATE)
+    thresholds = np.full(NUM_CHANNELS, THRESHOLD_G)
+    releases = np.full(NUM_CHANNELS, RELEASE_G)
+    expected = np.array([(channel, *event) for channel in range(NUM_CHANNELS)
+                         for event in reference(data[channel], THRESHOLD_G, RELEASE_G, hold_off)],
+                        dtype=EVENT_DTYPE)
+    expected = expected[np.lexsort((expected["channel"], expected["start"]))]
+    rng = np.random.default_rng(2)
+    num_scans = data.shape[1]
+    for read_sizes in [[num_scans], [1000], [37], "random"]:
+        if read_sizes == "random":
+            sizes = rng.integers(1, 5000, num_scans)
+        else:
+            sizes = np.full(num_scans // read_sizes[0] + 1, read_sizes[0])
+        splits = np.minimum(np.r_[0, np.cumsum(sizes)], num_scans)
+        splits = splits[np.r_[True, np.diff(splits) > 0]]
+        found = detect(EventDetector(thresholds, hold_off, releases), data, splits)
+        assert np.array_equal(found, expected), (read_sizes, found[:5], expected[:5])
+    return len(expected)
+
+
+def throughput(read_seconds):
+    """Scans per second handled with reads of read_seconds."""
+    data = signal(TIMED_SECONDS)
+    detector = EventDetector(np.full(NUM_CHANNELS, THRESHOLD_G), int(HOLD_OFF_S * SCAN_RATE),
+                             np.full(NUM_CHANNELS, RELEASE_G))
+    read_scans = int(read_seconds * SCAN_RATE)
+    num_events = 0
+    start = time.perf_counter()
+    for first in range(0, data.shape[1], read_scans):
+        num_events += len(detector.process(data[:, first:first + read_scans], first))
+    elapsed = time.perf_counter() - start
+    return data.shape[1] / elapsed, num_events
+
+
+if __name__ == "__main__":
+    num_events = check_against_reference()
+    print(f"Same {num_events} events as the scan-by-scan reference for whole, 1000, 37 and random size reads\n")
+
+    print(f"{NUM_CHANNELS} channels, threshold {THRESHOLD_G:g} g, release {RELEASE_G:g} g, "
+          f"hold-off {HOLD_OFF_S * 1000:g} ms, one core")
+    print(f"{'read':>10}{'scans/s':>14}{'x real time':>14}{'events':>10}")
+    for read_seconds in [1.0, 0.1, 0.01]:
+        scans_per_s, events = throughput(read_seconds)
+        print(f"{read_seconds * 1000:8g}ms{scans_per_s:14,.0f}{scans_per_s / SCAN_RATE:14.1f}{events:10}")
+        assert scans_per_s > TARGET_SCANS_PER_S, scans_per_s
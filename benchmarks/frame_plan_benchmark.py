@@ -0,0 +1,65 @@
+"""
+Compares the Python-side overhead of one command-response transaction done
+with ljm.eNames, ljm.eAddresses and a compiled ljm.FramePlan, as in a 1 kHz
+polling loop. Runs against the LJM stand-in so no device is needed.
+
+The overhead column subtracts the bare stand-in call (LJM_eNames or
+LJM_eAddresses) with prebuilt arguments, which every method pays.
+
+Usage:
+    python benchmarks/frame_plan_benchmark.py
+
+Author: Liam Eime
+"""
+
+import ctypes
+import timeit
+
+from labjack import ljm
+
+import ljm_stand_in
+
+HANDLE = 1
+NUM_CALLS = 20000
+NAMES = ["AIN0", "AIN1", "AIN2", "AIN3", "DAC0"]
+WRITES = [ljm.constants.READ] * 4 + [ljm.constants.WRITE]
+NUM_VALUES = [1] * len(NAMES)
+VALUES = [0.0] * 4 + [2.5]
+
+
+def best_us(call, rounds=7):
+    """Best round of NUM_CALLS calls, in microseconds per call."""
+    return min(timeit.repeat(call, number=NUM_CALLS, repeat=rounds)) / NUM_CALLS * 1e6
+
+
+if __name__ == "__main__":
+    library = ljm_stand_in.install()
+    num_frames = len(NAMES)
+    addresses, data_types = ljm.namesToAddresses(num_frames, NAMES)
+    plan = ljm.FramePlan.fromNames(num_frames, NAMES, WRITES, NUM_VALUES, VALUES)
+
+    c_addrs = (ctypes.c_int32 * num_frames)(*addresses)
+    c_types = (ctypes.c_int32 * num_frames)(*data_types)
+    c_writes = (ctypes.c_int32 * num_frames)(*WRITES)
+    c_num_vals = (ctypes.c_int32 * num_frames)(*NUM_VALUES)
+    c_vals = (ctypes.c_double * num_frames)(*VALUES)
+    c_error_addr = ctypes.c_int32()
+    c_names = (ctypes.c_char_p * num_frames)(*[name.encode("ascii") for name in NAMES])
+    names_floor = best_us(lambda: library.LJM_eNames(HANDLE, num_frames, c_names, c_writes, c_num_vals, c_vals,
+                                                     ctypes.byref(c_error_addr)))
+    addresses_floor = best_us(lambda: library.LJM_eAddresses(HANDLE, num_frames, c_addrs, c_types, c_writes,
+                                                             c_num_vals, c_vals, ctypes.byref(c_error_addr)))
+
+    timings = [
+        ("eNames", names_floor,
+         best_us(lambda: ljm.eNames(HANDLE, num_frames, NAMES, WRITES, NUM_VALUES, VALUES))),
+        ("eAddresses", addresses_floor,
+         best_us(lambda: ljm.eAddresses(HANDLE, num_frames, addresses, data_types, WRITES, NUM_VALUES, VALUES))),
+        ("FramePlan.execute", addresses_floor, best_us(lambda: plan.execute(HANDLE))),
+    ]
+
+    print(f"{num_frames} frames, {NUM_CALLS} calls per round\n")
+    print(f"{'method':<20}{'us/call':>10}{'floor us':>10}{'overhead us':>14}")
+    for name, floor, per_call in timings:
+        print(f"{name:<20}{per_call:10.2f}{floor:10.2f}{per_call - floor:14.2f}")
+    print(f"\nLast FramePlan reads: {plan.readValues()}")
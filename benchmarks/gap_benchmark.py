@@ -0,0 +1,165 @@
+"""
+Checks t7stream's gap detection: find_gaps() returns the exact runs of
+DUMMY_VALUE, SCAN_NOT_READ and binary dummy codes, a GapMap joins a run
+split across reads, and recordings read back with NaN for skipped samples.
+
+Then streams the stand-in through main.py's read loop, as volts and as raw
+codes, with LJM's auto-recovery gaps injected, and checks that the gap map
+matches them, the ring buffer holds NaN for them and every event after a
+gap is found at its true scan index and time. Finally times find_gaps()
+on one-second reads against counting -9999 in the list eStreamRead
+returns, as LJM's examples do.
+
+Usage:
+    python benchmarks/gap_benchmark.py
+
+Author: Liam Eime
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+from labjack import ljm
+
+import ljm_stand_in
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import main  # noqa: E402
+from t7stream import AinCalibration, GapMap, Recorder, RecordingReader, ScanClock, find_gaps  # noqa: E402
+
+SCAN_RATE = 10000
+SCANS_PER_READ = 1000
+NUM_READS = 60
+# (first scan, scans) within a read, by read index. Reads 14 and 15 hold one gap.
+SKIPPED = {3: [(500, 200)], 14: [(900, 100)], 15: [(0, 300)], 27: [(10, 1), (20, 5)]}
+GAPS = [(3500, 200), (14900, 400), (27010, 1), (27020, 5)]
+TIMED_SCAN_RATE = 30000
+TIMED_READS = 200
+
+
+def check(directory):
+    dummy, not_read = ljm.constants.DUMMY_VALUE, ljm.constants.SCAN_NOT_READ
+    values = np.full((10, 3), 2.5)
+    values[0, 1] = dummy
+    values[4:6] = dummy
+    values[6, 2] = not_read
+    values[9] = dummy
+    gaps = find_gaps(values.ravel(), 3, 100)
+    assert gaps.tolist() == [(100, 1), (104, 3), (109, 1)], gaps
+    assert find_gaps(np.full(30, 2.5), 3).size == 0
+    codes = np.full((10, 3), 33000, dtype=np.uint16)
+    codes[2:4, 0] = ljm_stand_in.BINARY_DUMMY_VALUE
+    assert find_gaps(codes, 3).tolist() == [(2, 2)]
+
+    gap_map = GapMap()
+    assert gap_map.add(find_gaps(values[:5].ravel(), 3, 0)) == 2
+    assert gap_map.add(find_gaps(values[5:].ravel(), 3, 5)) == 1  # Scan 5 continues the gap from scans 4
+    assert gap_map.gaps().tolist() == [(0, 1), (4, 3), (9, 1)] and gap_map.skipped_scans == 5
+
+    calibration = AinCalibration.nominal([10] * 3, offset=2.5, unit="g")
+    assert calibration.volts(codes.T)[0, 2] == dummy and np.isnan(calibration.convert(codes.T)[0, 2])
+    assert not np.isnan(calibration.convert(codes.T)[:, :2]).any()
+
+    names = ["AIN0", "AIN1", "AIN2"]
+    with Recorder(os.path.join(directory, "gaps.t7r"), names, SCAN_RATE, ScanClock(0.0, SCAN_RATE),
+                  {"offset": 2.5, "sensitivity": 1.0, "unit": "g"}, block=True) as recorder:
+        recorder.write(values.T)
+    with RecordingReader(recorder.files) as reader:
+        skipped = np.isnan(reader.calibrated(reader.read(0, 10)))
+    assert np.array_equal(skipped, values.T <= -1000)
+
+
+def stream(binary):
+    """Run NUM_READS reads with the SKIPPED gaps through main.py's read loop
+    and return (events, gap map, whether the ring buffer holds NaN exactly
+    at the gaps)."""
+    main.SCAN_RATE = SCAN_RATE
+    main.RECORD_DATA = False  # Timed by recorder_benchmark.py
+    main.CAPTURE_EVENTS = False  # Timed by capture_benchmark.py
+    main.RETENTION_SECONDS = NUM_READS * SCANS_PER_READ / SCAN_RATE
+    library = ljm_stand_in.install()
+    library.waveform = ljm_stand_in.accelerometer_waveform(SCAN_RATE)
+    library.skipped_scans = lambda handle, read: SKIPPED.get(read)
+    events = []
+    print_events = main.print_events
+    main.print_events = events.append
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            handle = main.open_device()
+            aScanList = main.configure_device(handle, binary)
+            if binary:
+                main.ain_calibration = AinCalibration.from_device(handle, [main.AIN_RANGE] * len(aScanList),
+                                                                  offset=main.ACCEL_TO_G_OFFSET,
+                                                                  sensitivity=main.ACCEL_TO_G_SENSITIVITY, unit="g")
+            read = np.empty(SCANS_PER_READ * len(aScanList))
+            stream_buffer = np.empty(read.size, np.uint16 if binary else np.float64)
+            main.start_stream(handle, aScanList, SCANS_PER_READ)
+            try:
+                for _ in range(NUM_READS):
+                    ljm.eStreamReadInto(handle, read)
+                    np.copyto(stream_buffer, read, casting="unsafe")  # As main.read_chunk
+                    main.handle_stream_read(stream_buffer)
+            finally:
+                main.stop_stream(handle)
+                ljm.close(handle)
+    finally:
+        main.print_events = print_events
+        main.ain_calibration = None
+        ljm.writeLibraryConfigS(ljm.constants.STREAM_AIN_BINARY, 0)
+    in_gap = np.zeros(main.samples.total, dtype=bool)
+    for start, num_scans in GAPS:
+        in_gap[start:start + num_scans] = True
+    masked = np.isnan(main.samples.read(0, main.samples.total))
+    return np.concatenate(events), main.gap_map, np.array_equal(masked, np.broadcast_to(in_gap, masked.shape))
+
+
+def time_find_gaps():
+    """Return the seconds per one-second read to find the gaps with
+    find_gaps(), without and with a gap, and with list.count(-9999.0)."""
+    volts = ljm_stand_in.accelerometer_waveform(TIMED_SCAN_RATE)(0, TIMED_SCAN_RATE, 3)
+    with_gap = volts.copy()
+    with_gap[3000:6000] = ljm.constants.DUMMY_VALUE
+    as_list = volts.tolist()  # As eStreamRead returns it
+    seconds = {}
+    for name, work in [("find_gaps", lambda: find_gaps(volts, 3)),
+                       ("find_gaps, one gap", lambda: find_gaps(with_gap, 3)),
+                       ("list.count(-9999.0)", lambda: as_list.count(-9999.0))]:
+        start = time.perf_counter()
+        for _ in range(TIMED_READS):
+            work()
+        seconds[name] = (time.perf_counter() - start) / TIMED_READS
+    return seconds
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as directory:
+        check(directory)
+    print("find_gaps found the exact runs of skipped samples and GapMap joined a run split across reads\n")
+
+    expected_events = NUM_READS * SCANS_PER_READ // SCAN_RATE * main.NUMBER_OF_AINS
+    for binary in (False, True):
+        events, gap_map, masked = stream(binary)
+        print(f"{'raw codes' if binary else 'volts'}: {gap_map.count} gaps of {gap_map.skipped_scans} scans, "
+              f"{len(events)} events of {expected_events}, gaps NaN in the ring buffer: {masked}")
+        assert gap_map.gaps().tolist() == GAPS and masked
+        assert len(events) == expected_events
+        # Events after the gaps are still at their true scan index, a whole number of seconds into the stream
+        assert np.all(events["peak_index"] % SCAN_RATE == 0) and np.all(events["peak"] < 3), events
+        seconds = main.scan_clock.time_of(events["peak_index"]) - main.scan_clock.start_time
+        assert np.allclose(seconds, np.round(seconds), atol=1e-9)
+
+    slope = AinCalibration.nominal([10]).positive_slope[0]
+    dummy_g = ((ljm_stand_in.BINARY_DUMMY_VALUE - 33523) * slope - main.ACCEL_TO_G_OFFSET) / main.ACCEL_TO_G_SENSITIVITY
+    print(f"Unmasked, a dummy sample would read as {ljm.constants.DUMMY_VALUE - main.ACCEL_TO_G_OFFSET:g} g from volts "
+          f"and {dummy_g:.1f} g, a false event, from raw codes\n")
+
+    seconds = time_find_gaps()
+    print(f"One-second read of 3 channels at {TIMED_SCAN_RATE} scans/s")
+    for name, value in seconds.items():
+        print(f"{name:>22}{value * 1e6:10.0f} us")
+    assert seconds["find_gaps"] < seconds["list.count(-9999.0)"]
@@ -0,0 +1,149 @@
+"""
+Checks t7stream's StreamHealth on made-up reads: a growing device backlog
+warns before the device buffer overflows with the right time to overflow,
+a growing LJM backlog warns, and a flat or noisy backlog does not.
+
+Then streams the stand-in in real time through main.py's read loop with a
+device backlog that grows until it would overflow, and reports when main.py
+started shedding analysis load, how close its overflow prediction was, and
+what StreamHealth.record costs per read.
+
+Usage:
+    python benchmarks/health_benchmark.py
+
+Author: Liam Eime
+"""
+
+import contextlib
+import io
+import os
+import sys
+import time
+
+import numpy as np
+from labjack import ljm
+
+import ljm_stand_in
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import main  # noqa: E402
+from t7stream.health import DEVICE_OVERFLOW, LJM_BACKLOG, StreamHealth  # noqa: E402
+
+SCAN_RATE = 10000
+SCANS_PER_READ = 1000  # 0.1 s reads
+GROWTH_PER_READ = 100  # Injected device backlog growth, 1000 scans/s
+RECOVER_READ = 45  # The injected backlog clears at this read
+NUM_READS = 60
+WARN_SECONDS = 2
+TIMED_RECORDS = 100000
+
+
+class FakeClock:
+    def __init__(self, step):
+        self.now = 0.0
+        self.step = step
+
+    def __call__(self):
+        self.now += self.step
+        return self.now
+
+
+def check():
+    changes = []
+    health = StreamHealth(30000, 30000, 3, on_change=lambda warnings, status: changes.append((warnings, status)),
+                          clock=FakeClock(1.0))
+    assert health.device_capacity == 32768 // 6
+    for read in range(1, 41):
+        health.record(100 * read, 0)
+        if health.warnings:
+            break
+    # 5461 - 2500 scans left at 100 scans/s is the first prediction under 30 s
+    assert read == 25 and health.warnings == {DEVICE_OVERFLOW}, (read, health.warnings)
+    assert abs(changes[0][1]["seconds_to_overflow"] - 29.61) < 1e-6, changes[0][1]
+    assert changes[0][1]["jitter_rms"] == 0.0
+    for _ in range(30):
+        health.record(0, 0)
+    assert not health.warnings and len(changes) == 2  # Recovered once, without repeating either change
+
+    rng = np.random.default_rng(0)
+    health = StreamHealth(30000, 30000, 3, clock=FakeClock(1.0))
+    for _ in range(500):
+        assert not health.record(int(rng.integers(0, 400)), int(rng.integers(0, 3000)))
+
+    health = StreamHealth(30000, 30000, 3, clock=FakeClock(1.0))
+    warned = [health.record(0, 10000 * read) for read in range(1, 5)]
+    # From the third read the trend predicts 150000 scans, 5 s, of LJM backlog within 30 s
+    assert [LJM_BACKLOG in warnings for warnings in warned] == [False, False, True, True], warned
+
+
+def stream():
+    """Run NUM_READS real-time reads through main.py's read loop and return
+    (read index of each health change with its status, seconds per record)."""
+    main.SCAN_RATE = SCAN_RATE
+    main.HEALTH_WARN_SECONDS = WARN_SECONDS
+    main.RECORD_DATA = False  # Timed by recorder_benchmark.py
+    main.CAPTURE_EVENTS = False  # Timed by capture_benchmark.py
+    library = ljm_stand_in.install(ljm_stand_in.StandInLibrary(real_time=True))
+    library.waveform = ljm_stand_in.accelerometer_waveform(SCAN_RATE)
+    library.backlog = lambda handle, read: (GROWTH_PER_READ * (read + 1) if read < RECOVER_READ else 0, 0)
+    changes = []
+    on_stream_health = main.on_stream_health
+    # The pipeline's block state once on_stream_health has handled the change
+    main.on_stream_health = lambda warnings, status: (on_stream_health(warnings, status),
+                                                      changes.append((read, warnings, status, main.pipeline.block)))
+    record_seconds = []
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            handle = main.open_device()
+            aScanList = main.configure_device(handle)
+            stream_buffer = np.empty(SCANS_PER_READ * len(aScanList))
+            main.start_stream(handle, aScanList, SCANS_PER_READ)
+            try:
+                for read in range(1, NUM_READS + 1):
+                    read_start = time.perf_counter()
+                    backlogs = ljm.eStreamReadInto(handle, stream_buffer)
+                    start = time.perf_counter()
+                    main.record_stream_read(backlogs, start - read_start)
+                    record_seconds.append(time.perf_counter() - start)
+                    main.handle_stream_read(stream_buffer)
+            finally:
+                main.stop_stream(handle)
+                ljm.close(handle)
+    finally:
+        main.on_stream_health = on_stream_health
+    return changes, np.array(record_seconds)
+
+
+def time_record():
+    health = StreamHealth(30000, 30000, 3)
+    start = time.perf_counter()
+    for read in range(TIMED_RECORDS):
+        health.record(read % 500, read % 700, 0.001)
+    return (time.perf_counter() - start) / TIMED_RECORDS
+
+
+if __name__ == "__main__":
+    check()
+    print("StreamHealth warned before overflow with the right prediction and stayed quiet on flat backlogs\n")
+
+    changes, record_seconds = stream()
+    capacity = 32768 // (2 * main.NUMBER_OF_AINS)
+    overflow_read = -(-capacity // GROWTH_PER_READ)
+    read_period = SCANS_PER_READ / SCAN_RATE
+    print(f"Real-time stream of {main.NUMBER_OF_AINS} channels at {SCAN_RATE} scans/s in {read_period:g} s reads, "
+          f"device backlog growing {GROWTH_PER_READ / read_period:.0f} scans/s to overflow {capacity} scans at read "
+          f"{overflow_read}")
+    assert len(changes) == 2, [change[:2] for change in changes]
+    (warn_read, warnings, status, block), (recover_read, recovered, _, recovered_block) = changes
+    actual = (overflow_read - warn_read) * read_period
+    print(f"warned at read {warn_read} ({', '.join(sorted(warnings))}): overflow predicted in "
+          f"{status['seconds_to_overflow']:.2f} s, actual {actual:.2f} s; analysis skips reads that would wait")
+    print(f"recovered at read {recover_read} and went back to analysing every read")
+    assert warnings == {DEVICE_OVERFLOW} and not block and warn_read < overflow_read
+    assert abs(status["seconds_to_overflow"] - actual) < 0.25 * actual + read_period
+    assert not recovered and recovered_block and recover_read > RECOVER_READ
+
+    per_record = time_record()
+    print(f"StreamHealth.record: {per_record * 1e6:.1f} us per read, in the loop median "
+          f"{np.median(record_seconds) * 1e6:.1f} us, max {record_seconds.max() * 1e6:.1f} us")
+    assert per_record < 0.001
@@ -0,0 +1,58 @@
+"""
+Measures how long `import labjack.ljm` takes with `python -X importtime`,
+and checks that the import is free of side effects: nothing is printed and
+the LJM library is not loaded until an LJM function is used.
+
+Each measurement runs in a fresh interpreter so no module is already cached.
+The table lists the labjack modules and the slowest other imports they pull
+in, using the best of ROUNDS runs for each module.
+
+Usage:
+    python benchmarks/import_time_benchmark.py
+
+Author: Liam Eime
+"""
+
+import os
+import subprocess
+import sys
+
+ROUNDS = 15
+LIB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib", "python_ljm_2020_11_20")
+CHILD = ("import labjack.ljm\n"
+         "assert labjack.ljm.ljm._staticLib._library is None, 'the LJM library was loaded on import'\n")
+
+
+def import_times():
+    """Import labjack.ljm in a new interpreter and return its stdout and
+    {module: (self us, cumulative us)} from the -X importtime report."""
+    env = dict(os.environ, PYTHONPATH=LIB_PATH + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", CHILD], env=env,
+                            capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        times[module.strip()] = (int(self_us), int(cumulative_us))
+    return result.stdout, times
+
+
+if __name__ == "__main__":
+    best = {}
+    for _ in range(ROUNDS):
+        stdout, times = import_times()
+        if stdout:
+            sys.exit(f"import labjack.ljm printed output:\n{stdout}")
+        for module, (self_us, cumulative_us) in times.items():
+            previous = best.get(module, (float("inf"), float("inf")))
+            best[module] = (min(previous[0], self_us), min(previous[1], cumulative_us))
+
+    print(f"import labjack.ljm, best of {ROUNDS} fresh interpreters. No output, LJM library not loaded.\n")
+    labjack_modules = sorted(module for module in best if module.startswith("labjack"))
+    others = sorted((module for module in best if not module.startswith("labjack")),
+                    key=lambda module: best[module][1], reverse=True)[:5]
+    print(f"{'module':<28}{'self ms':>10}{'cumulative ms':>16}")
+    for module in labjack_modules + others:
+        self_us, cumulative_us = best[module]
+        print(f"{module:<28}{self_us / 1000:10.2f}{cumulative_us / 1000:16.2f}")
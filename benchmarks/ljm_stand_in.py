@@ -0,0 +1,591 @@
+"""
+Stand-in for the LJM shared library (libLabJackM), so the labjack.ljm
+wrapper and the acquisition code can be exercised and benchmarked without a
+LabJack or the LJM library installed.
+
+Every LJM_* attribute is a ctypes function pointer wrapping a Python function,
+so calls made by labjack.ljm go through the same ctypes argument marshalling
+as calls into the real library.
+
+The simulated device keeps the values written to it, runs CORE_TIMER at
+40 MHz, and streams at the requested scan rate either as fast as it is read
+or in real time. Command-response latency, stream backlogs and skipped
+samples (-9999) can be injected to exercise the code that handles them.
+With LJM_STREAM_AIN_BINARY set, stream reads return raw 16-bit codes of
+the CALIBRATION constants, which the device also serves from flash.
+
+Author: Liam Eime
+"""
+
+import ctypes
+import itertools
+import json
+import struct
+import threading
+import time
+
+import numpy as np
+from labjack.ljm import constants
+from labjack.ljm import errorcodes
+from labjack.ljm import ljm as ljm_wrapper
+from labjack.ljm import registers
+
+CORE_TIMER_HZ = 40e6
+DEVICE_TYPE = constants.dtT7
+CONNECTION_TYPE = constants.ctUSB
+SERIAL_NUMBER_BASE = 470000000
+MAX_BYTES_PER_MB = 64
+# High speed (PSlope, NSlope, Center, Offset) of the +/-10, 1, 0.1 and 0.01 V ranges, a little off nominal
+CALIBRATION = [[0.000316128, -0.000315951, 33490.0, -10.5874], [0.0000316128, -0.0000315951, 33490.0, -1.05874],
+               [0.00000316128, -0.00000315951, 33490.0, -0.105874],
+               [0.000000316128, -0.000000315951, 33490.0, -0.0105874]]
+CALIBRATION_FLASH_ADDRESS = 0x3C4000
+BINARY_DUMMY_VALUE = 0xFFFF  # The raw code of a skipped sample in binary stream mode
+
+
+def accelerometer_waveform(scan_rate, event_interval=1.0, event_duration=0.02, peak_g=2.0, noise_g=0.01,
+                           offset=2.5, sensitivity=1.0, seed=0):
+    """Return a stream waveform of accelerometer channels, for
+    StandInLibrary.waveform.
+
+    Every channel sits at offset volts (0 g) with Gaussian noise, and every
+    event_interval seconds all channels ring with a 200 Hz burst that starts
+    at peak_g and decays over event_duration, so main.py sees one event per
+    channel per interval.
+    """
+    noise = np.random.default_rng(seed).normal(0.0, noise_g * sensitivity, 1 << 16)
+    interval_scans = max(int(event_interval * scan_rate), 1)
+    t = np.arange(max(int(event_duration * scan_rate), 1)) / scan_rate
+    burst = peak_g * sensitivity * np.exp(-4 * t / event_duration) * np.cos(2 * np.pi * 200 * t)
+
+    def waveform(first_scan, num_scans, num_addresses):
+        first = first_scan * num_addresses
+        values = offset + noise.take(np.arange(first, first + num_scans * num_addresses) % len(noise))
+        values = values.reshape(num_scans, num_addresses)
+        phase = np.arange(first_scan, first_scan + num_scans) % interval_scans
+        in_burst = phase < len(burst)
+        values[in_burst] += burst[phase[in_burst], None]
+        return values.ravel()
+    return waveform
+
+
+class _Stream:
+    """A stream running on one handle of the stand-in."""
+
+    def __init__(self, library, scans_per_read, num_addresses, scan_rate):
+        self.scans_per_read = scans_per_read
+        self.num_addresses = num_addresses
+        self.scan_rate = scan_rate
+        # The device clocks scans and CORE_TIMER from the same crystal.
+        self.read_period = scans_per_read / (scan_rate * (1 + library.clock_drift_ppm * 1e-6))
+        self.start = time.perf_counter()
+        self.start_ticks = library.core_timer()
+        self.reads = 0
+        self.stopped = threading.Event()
+        self.callback_thread = None
+        self.block = None
+        if library.waveform is None:
+            num_values = scans_per_read * num_addresses
+            self.block = (ctypes.c_double * num_values)(*[(i % 1000) / 100.0 for i in range(num_values)])
+
+    def stop_callback(self):
+        """Stop calling the stream callback, waiting for a call in progress
+        unless it is the caller."""
+        thread, self.callback_thread = self.callback_thread, None
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+class StandInLibrary:
+    """Minimal simulated LJM library and T7.
+
+    Registers read back what was last written to them, or address / 1000
+    before that. INTERNAL_FLASH_READ reads CALIBRATION from
+    INTERNAL_FLASH_READ_POINTER onwards. Stream reads return a repeating ramp, or the waveform, as
+    fast as they are called by default, so benchmarks measure the wrapper
+    rather than a device.
+
+    Args:
+        prototyped: When False, the LJM_* attributes start without argtypes
+            like a freshly loaded shared library, and argument conversion is
+            inferred by ctypes on every call until labjack.ljm declares the
+            prototypes.
+        real_time: When True, eStreamRead blocks until scansPerRead scans
+            would have arrived at the stream's scan rate, as LJM does, and
+            reading late shows up in the LJM scan backlog.
+
+    The attributes below may be changed at any time:
+        latency: Seconds each command-response call takes, like the USB or
+            Ethernet round trip to a device.
+        latency_jitter: Up to this many more seconds, chosen at random for
+            each command-response call.
+        clock_drift_ppm: How fast the device crystal runs relative to the
+            host clock. CORE_TIMER and real-time streams follow it.
+        core_timer_offset: The CORE_TIMER value when the stand-in was
+            created, e.g. close to 2**32 to roll over early.
+        read_latency: Extra seconds each eStreamRead takes.
+        waveform: waveform(first_scan, num_scans, num_addresses) returning
+            the interleaved stream values of those scans, or None for the
+            ramp. See accelerometer_waveform.
+        skipped_scans: skipped_scans(handle, read_index) returning
+            (first_scan, num_scans) runs within that read to fill with
+            constants.DUMMY_VALUE, or BINARY_DUMMY_VALUE in binary mode, as
+            LJM does after auto-recovery, or None.
+        backlog: backlog(handle, read_index) returning the
+            (deviceScanBacklog, ljmScanBacklog) to add to that read's, or
+            None.
+    """
+
+    def __init__(self, prototyped=True, real_time=False):
+        self._prototyped = prototyped
+        self._real_time = real_time
+        self.latency = 0.0
+        self.latency_jitter = 0.0
+        self.clock_drift_ppm = 0.0
+        self.core_timer_offset = 0
+        self.read_latency = 0.0
+        self._random = np.random.default_rng(0)
+        self._call = threading.local()
+        self.waveform = None
+        self.skipped_scans = None
+        self.backlog = None
+        self.stream_reads = {}
+        self._functions = {}
+        self._streams = {}
+        self._registers = {}
+        self._epoch = time.perf_counter()
+        self.constants_file = None
+        self.library_config = {}
+        self._handles = itertools.count(1)
+        self._open_handles = set()
+        self._define("LJM_OpenS", self._open)
+        self._define("LJM_Open", self._open)
+        self._define("LJM_Close", self._close)
+        self._define("LJM_GetHandleInfo", self._get_handle_info)
+        self._define("LJM_NumberToIP", self._number_to_ip, argtypes=[ctypes.c_uint32, ctypes.c_void_p])
+        self._define("LJM_eReadAddress", self._e_read_address)
+        self._define("LJM_eReadAddresses", self._e_read_addresses)
+        self._define("LJM_eWriteAddress", self._e_write_address)
+        self._define("LJM_eWriteAddresses", self._e_write_addresses)
+        self._define("LJM_eReadName", self._e_read_name)
+        self._define("LJM_eReadNames", self._e_read_names)
+        self._define("LJM_eWriteName", self._e_write_name)
+        self._define("LJM_eWriteNames", self._e_write_names)
+        self._define("LJM_eAddresses", self._e_addresses)
+        self._define("LJM_eNames", self._e_names)
+        self._define("LJM_NamesToAddresses", self._names_to_addresses)
+        self._define("LJM_NameToAddress", self._name_to_address)
+        self._define("LJM_AddressToType", self._address_to_type)
+        self._define("LJM_AddressesToTypes", self._addresses_to_types)
+        self._define("LJM_LoadConstantsFromFile", self._load_constants)
+        self._define("LJM_LoadConstantsFromString", self._load_constants)
+        self._define("LJM_ReadLibraryConfigStringS", self._read_library_config_string_s,
+                     argtypes=[ctypes.c_char_p, ctypes.c_void_p])
+        self._define("LJM_WriteLibraryConfigS", self._write_library_config_s)
+        self._define("LJM_ReadLibraryConfigS", self._read_library_config_s)
+        self._define("LJM_eWriteAddressArray", self._e_write_array)
+        self._define("LJM_eWriteNameArray", self._e_write_array)
+        for type_name, format_char in [("FLOAT32", "f"), ("UINT16", "H"), ("UINT32", "I"), ("INT32", "i")]:
+            self._define(f"LJM_{type_name}ToByteArray", self._values_to_bytes(format_char))
+            self._define(f"LJM_ByteArrayTo{type_name}", self._bytes_to_values(format_char))
+        self._define("LJM_eStreamStart", self._e_stream_start)
+        self._define("LJM_eStreamRead", self._e_stream_read)
+        self._define("LJM_SetStreamCallback", self._set_stream_callback)
+        self._define("LJM_eStreamStop", self._e_stream_stop)
+
+    def _define(self, name, function, argtypes=None):
+        """Expose function as a ctypes function pointer attribute called name,
+        using the prototype labjack.ljm declares for it unless argtypes
+        overrides how the stand-in receives the arguments."""
+        restype, declared_argtypes = ljm_wrapper._FUNCTION_PROTOTYPES[name]
+        if argtypes is None:
+            argtypes = declared_argtypes
+        pointer = ctypes.CFUNCTYPE(restype, *argtypes)(function)
+        self._functions[name] = pointer  # Keep the callback alive
+        if not self._prototyped:
+            pointer = ctypes.CFUNCTYPE(restype)(ctypes.cast(pointer, ctypes.c_void_p).value)
+        setattr(self, name, pointer)
+
+    @staticmethod
+    def _value_of(address):
+        return address / 1000.0
+
+    # A few T7 registers in the constants file format
+    REGISTERS = [
+        {"name": "AIN#(0:254)", "address": 0, "type": "FLOAT32"},
+        {"name": "DAC#(0:1)", "address": 1000, "type": "FLOAT32"},
+        {"name": "DIO_STATE", "address": 2800, "type": "UINT32"},
+        {"name": "CORE_TIMER", "address": 61520, "type": "UINT32"},
+        {"name": "STREAM_START_TIME_STAMP", "address": 4440, "type": "UINT32"},
+        {"name": "STREAM_OUT#(0:3)_BUFFER_F32", "address": 4400, "type": "FLOAT32"},
+        {"name": "STREAM_SCANRATE_HZ", "address": 4002, "type": "FLOAT32"},
+        {"name": "STREAM_SETTLING_US", "address": 4008, "type": "FLOAT32"},
+        {"name": "STREAM_RESOLUTION_INDEX", "address": 4010, "type": "UINT32"},
+        {"name": "STREAM_BUFFER_SIZE_BYTES", "address": 4012, "type": "UINT32"},
+        {"name": "STREAM_CLOCK_SOURCE", "address": 4014, "type": "UINT32"},
+        {"name": "STREAM_TRIGGER_INDEX", "address": 4024, "type": "UINT32"},
+        {"name": "AIN_ALL_RANGE", "address": 43900, "type": "FLOAT32"},
+        {"name": "AIN_ALL_NEGATIVE_CH", "address": 43902, "type": "UINT16"},
+        {"name": "INTERNAL_FLASH_READ_POINTER", "address": 61810, "type": "UINT32"},
+        {"name": "INTERNAL_FLASH_READ", "address": 61812, "type": "UINT32"},
+    ]
+    CORE_TIMER = 61520
+    STREAM_START_TIME_STAMP = 4440
+    INTERNAL_FLASH_READ_POINTER = 61810
+    INTERNAL_FLASH_READ = 61812
+    FLASH_READ_WORDS = 32  # Words one read of INTERNAL_FLASH_READ returns at most
+    _NAMES = registers.RegisterMap(REGISTERS)
+
+    @classmethod
+    def constants_json(cls):
+        """Return the stand-in registers as a constants file JSON string."""
+        return json.dumps({"registers": cls.REGISTERS})
+
+    @classmethod
+    def lookup(cls, name):
+        """Return (address, data type) of a register name, or (-1, 0) when the
+        stand-in does not know it."""
+        return cls._NAMES.get(name, (-1, 0))
+
+    def core_timer(self, ago=0.0):
+        """Return the simulated CORE_TIMER, a 40 MHz uint32 count that rolls
+        over about every 107 s, as it was ago seconds ago."""
+        ticks = (time.perf_counter() - ago - self._epoch) * CORE_TIMER_HZ * (1 + self.clock_drift_ppm * 1e-6)
+        return (int(ticks) + self.core_timer_offset) & 0xFFFFFFFF
+
+    def _command_response(self):
+        delay = 0.0
+        if self.latency or self.latency_jitter:
+            delay = self.latency + self._random.uniform(0, self.latency_jitter)
+            time.sleep(delay)
+        # The device answers halfway through the round trip.
+        self._call.answered_ago = delay / 2
+
+    def _read_register(self, handle, address):
+        if address == self.CORE_TIMER:
+            return float(self.core_timer(getattr(self._call, "answered_ago", 0.0)))
+        if address == self.STREAM_START_TIME_STAMP:
+            stream = self._streams.get(handle)
+            return float(stream.start_ticks) if stream is not None else 0.0
+        if self.INTERNAL_FLASH_READ <= address < self.INTERNAL_FLASH_READ + 2 * self.FLASH_READ_WORDS:
+            pointer = int(self._registers.get((handle, self.INTERNAL_FLASH_READ_POINTER), 0))
+            word = (pointer - CALIBRATION_FLASH_ADDRESS) // 4 + (address - self.INTERNAL_FLASH_READ) // 2
+            words = np.array(CALIBRATION, dtype=np.float32).ravel().view(np.uint32)
+            return float(words[word]) if 0 <= word < len(words) else float(0xFFFFFFFF)
+        return self._registers.get((handle, address), self._value_of(address))
+
+    def _write_register(self, handle, address, value):
+        self._registers[(handle, address)] = value
+
+    def _open(self, device_type, connection_type, identifier, handle):
+        self._command_response()
+        new_handle = next(self._handles)
+        self._open_handles.add(new_handle)
+        ctypes.c_int32.from_address(handle).value = new_handle
+        return errorcodes.NOERROR
+
+    def _close(self, handle):
+        if handle not in self._open_handles:
+            return errorcodes.INVALID_HANDLE
+        self._open_handles.discard(handle)
+        self._e_stream_stop(handle)
+        return errorcodes.NOERROR
+
+    def _get_handle_info(self, handle, device_type, connection_type, serial_number, ip_address, port,
+                         max_bytes_per_mb):
+        if handle not in self._open_handles:
+            return errorcodes.INVALID_HANDLE
+        for pointer, value in [(device_type, DEVICE_TYPE), (connection_type, CONNECTION_TYPE),
+                               (serial_number, SERIAL_NUMBER_BASE + handle), (ip_address, 0), (port, 0),
+                               (max_bytes_per_mb, MAX_BYTES_PER_MB)]:
+            ctypes.c_int32.from_address(pointer).value = value
+        return errorcodes.NOERROR
+
+    def _number_to_ip(self, number, ip_string):
+        encoded = ".".join(str((number >> shift) & 0xFF) for shift in (24, 16, 8, 0)).encode("ascii") + b"\0"
+        ctypes.memmove(ip_string, encoded, len(encoded))
+        return errorcodes.NOERROR
+
+    def _names_to_addresses(self, num_frames, names, addresses, data_types):
+        names = (ctypes.c_char_p * num_frames).from_address(names)
+        addresses = (ctypes.c_int32 * num_frames).from_address(addresses)
+        data_types = (ctypes.c_int32 * num_frames).from_address(data_types)
+        for i in range(num_frames):
+            addresses[i], data_types[i] = self.lookup(names[i].decode("ascii"))
+        return errorcodes.NOERROR
+
+    def _name_to_address(self, name, address, data_type):
+        found_address, found_type = self.lookup(name.decode("ascii"))
+        if found_address == -1:
+            return errorcodes.INVALID_NAME
+        ctypes.c_int32.from_address(address).value = found_address
+        ctypes.c_int32.from_address(data_type).value = found_type
+        return errorcodes.NOERROR
+
+    def _address_to_type(self, address, data_type):
+        found_type = self._NAMES.getType(address)
+        if found_type is None:
+            return errorcodes.INVALID_ADDRESS
+        ctypes.c_int32.from_address(data_type).value = found_type
+        return errorcodes.NOERROR
+
+    def _addresses_to_types(self, num_addresses, addresses, data_types):
+        addresses = (ctypes.c_int32 * num_addresses).from_address(addresses)
+        data_types = (ctypes.c_int32 * num_addresses).from_address(data_types)
+        for i in range(num_addresses):
+            data_types[i] = self._NAMES.getType(addresses[i], 0)
+        return errorcodes.NOERROR
+
+    def _load_constants(self, file_name_or_json):
+        return errorcodes.NOERROR
+
+    def _read_library_config_string_s(self, parameter, string):
+        if parameter.decode("ascii").upper() != constants.MODBUS_MAP_CONSTANTS_FILE or self.constants_file is None:
+            return errorcodes.INVALID_CONFIG_NAME
+        encoded = self.constants_file.encode("ascii") + b"\0"
+        ctypes.memmove(string, encoded, len(encoded))
+        return errorcodes.NOERROR
+
+    def _write_library_config_s(self, parameter, value):
+        self.library_config[parameter.decode("ascii").upper()] = value
+        return errorcodes.NOERROR
+
+    def _read_library_config_s(self, parameter, value):
+        parameter = parameter.decode("ascii").upper()
+        if parameter not in self.library_config:
+            return errorcodes.INVALID_CONFIG_NAME
+        ctypes.c_double.from_address(value).value = self.library_config[parameter]
+        return errorcodes.NOERROR
+
+    @staticmethod
+    def _swap_bytes(format_char, source, destination, num_values):
+        """Copy num_values values from source to destination, reversing the
+        byte order of each one. Swapped as unsigned integers of the same size,
+        so float NaN payloads are copied exactly, as by LJM."""
+        unsigned = {"f": "I", "H": "H", "I": "I", "i": "I"}[format_char]
+        size = struct.calcsize(unsigned)
+        source = (ctypes.c_char * (num_values * size)).from_address(source)
+        destination = (ctypes.c_char * (num_values * size)).from_address(destination)
+        destination[:] = struct.pack(f">{num_values}{unsigned}", *struct.unpack(f"<{num_values}{unsigned}", source))
+
+    def _values_to_bytes(self, format_char):
+        def convert(values, register_offset, num_values, data):
+            self._swap_bytes(format_char, values, data + register_offset * 2, num_values)
+        return convert
+
+    def _bytes_to_values(self, format_char):
+        def convert(data, register_offset, num_values, values):
+            self._swap_bytes(format_char, data + register_offset * 2, values, num_values)
+        return convert
+
+    def _e_read_address(self, handle, address, data_type, value):
+        self._command_response()
+        ctypes.c_double.from_address(value).value = self._read_register(handle, address)
+        return errorcodes.NOERROR
+
+    def _e_read_addresses(self, handle, num_frames, addresses, data_types, values, error_address):
+        self._command_response()
+        addresses = (ctypes.c_int32 * num_frames).from_address(addresses)
+        values = (ctypes.c_double * num_frames).from_address(values)
+        for i in range(num_frames):
+            values[i] = self._read_register(handle, addresses[i])
+        return errorcodes.NOERROR
+
+    def _e_write_address(self, handle, address, data_type, value):
+        self._command_response()
+        self._write_register(handle, address, value)
+        return errorcodes.NOERROR
+
+    def _e_write_addresses(self, handle, num_frames, addresses, data_types, values, error_address):
+        self._command_response()
+        addresses = (ctypes.c_int32 * num_frames).from_address(addresses)
+        values = (ctypes.c_double * num_frames).from_address(values)
+        for i in range(num_frames):
+            self._write_register(handle, addresses[i], values[i])
+        return errorcodes.NOERROR
+
+    def _e_read_name(self, handle, name, value):
+        self._command_response()
+        address = self.lookup(name.decode("ascii"))[0]
+        if address == -1:
+            return errorcodes.INVALID_NAME
+        ctypes.c_double.from_address(value).value = self._read_register(handle, address)
+        return errorcodes.NOERROR
+
+    def _e_write_name(self, handle, name, value):
+        self._command_response()
+        address = self.lookup(name.decode("ascii"))[0]
+        if address == -1:
+            return errorcodes.INVALID_NAME
+        self._write_register(handle, address, value)
+        return errorcodes.NOERROR
+
+    def _e_read_names(self, handle, num_frames, names, values, error_address):
+        return self._e_names_frames(handle, num_frames, names, None, None, values, error_address)
+
+    def _e_write_names(self, handle, num_frames, names, values, error_address):
+        return self._e_names_frames(handle, num_frames, names, constants.WRITE, None, values, error_address)
+
+    def _e_addresses(self, handle, num_frames, addresses, data_types, writes, num_values, values, error_address):
+        self._command_response()
+        addresses = (ctypes.c_int32 * num_frames).from_address(addresses)
+        writes = (ctypes.c_int32 * num_frames).from_address(writes)
+        num_values = (ctypes.c_int32 * num_frames).from_address(num_values)
+        values = (ctypes.c_double * sum(num_values)).from_address(values)
+        index = 0
+        for i in range(num_frames):
+            for j in range(num_values[i]):
+                if writes[i]:
+                    self._write_register(handle, addresses[i] + 2 * j, values[index])
+                else:
+                    values[index] = self._read_register(handle, addresses[i] + 2 * j)
+                index += 1
+        return errorcodes.NOERROR
+
+    def _e_names(self, handle, num_frames, names, writes, num_values, values, error_address):
+        return self._e_names_frames(handle, num_frames, names, writes, num_values, values, error_address)
+
+    def _e_names_frames(self, handle, num_frames, names, writes, num_values, values, error_address):
+        """eNames, also used by eReadNames and eWriteNames. writes and
+        num_values are pointers, or None for frames that all read, or
+        constants.WRITE for frames that all write, one value each."""
+        self._command_response()
+        names = (ctypes.c_char_p * num_frames).from_address(names)
+        if writes is None or writes == constants.WRITE:
+            writes = [writes == constants.WRITE] * num_frames
+        else:
+            writes = (ctypes.c_int32 * num_frames).from_address(writes)
+        if num_values is None:
+            num_values = [1] * num_frames
+        else:
+            num_values = (ctypes.c_int32 * num_frames).from_address(num_values)
+        values = (ctypes.c_double * sum(num_values)).from_address(values)
+        index = 0
+        for i in range(num_frames):
+            address = self.lookup(names[i].decode("ascii"))[0]
+            if address == -1:
+                ctypes.c_int32.from_address(error_address).value = i
+                return errorcodes.INVALID_NAME
+            for j in range(num_values[i]):
+                if writes[i]:
+                    self._write_register(handle, address + 2 * j, values[index])
+                else:
+                    values[index] = self._read_register(handle, address + 2 * j)
+                index += 1
+        return errorcodes.NOERROR
+
+    def _e_write_array(self, handle, address_or_name, *args):
+        return errorcodes.NOERROR
+
+    def _e_stream_start(self, handle, scans_per_read, num_addresses, scan_list, scan_rate):
+        if not scan_list or not scan_rate:  # NULL arrives as None; raising here would be swallowed by ctypes
+            return errorcodes.NULL_POINTER
+        self._e_stream_stop(handle)
+        scan_rate = ctypes.c_double.from_address(scan_rate).value
+        self._streams[handle] = _Stream(self, scans_per_read, num_addresses, scan_rate)
+        self.stream_reads[handle] = 0
+        return errorcodes.NOERROR
+
+    def _e_stream_read(self, handle, data, device_backlog, ljm_backlog):
+        stream = self._streams.get(handle)
+        if stream is None:
+            return errorcodes.STREAM_NOT_RUNNING
+        read_index = stream.reads
+        stream.reads += 1
+        self.stream_reads[handle] = stream.reads
+        scan_backlog = 0
+        if self._real_time:
+            delay = stream.start + stream.reads * stream.read_period - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                scan_backlog = int(-delay * stream.scan_rate)
+        if self.read_latency:
+            time.sleep(self.read_latency)
+
+        if stream.block is not None:
+            ctypes.memmove(data, stream.block, ctypes.sizeof(stream.block))
+        else:
+            values = np.ascontiguousarray(
+                self.waveform(read_index * stream.scans_per_read, stream.scans_per_read, stream.num_addresses),
+                dtype=np.float64)
+            ctypes.memmove(data, values.ctypes.data, values.nbytes)
+        binary = self.library_config.get(constants.STREAM_AIN_BINARY, 0)
+        if binary:
+            scans = np.ctypeslib.as_array(
+                (ctypes.c_double * (stream.scans_per_read * stream.num_addresses)).from_address(data))
+            # Streams at +/-10 V, with the constants as stored in flash
+            positive_slope, negative_slope, center, _ = np.array(CALIBRATION[0], dtype=np.float32).tolist()
+            codes = np.where(scans >= 0, center + scans / positive_slope, center - scans / negative_slope)
+            np.clip(np.round(codes), 0, 0xFFFF, out=scans)
+        if self.skipped_scans is not None:
+            runs = self.skipped_scans(handle, read_index)
+            if runs:
+                scans = np.ctypeslib.as_array(
+                    (ctypes.c_double * (stream.scans_per_read * stream.num_addresses)).from_address(data))
+                scans = scans.reshape(stream.scans_per_read, stream.num_addresses)
+                for first_scan, num_scans in runs:
+                    scans[first_scan:first_scan + num_scans] = BINARY_DUMMY_VALUE if binary else constants.DUMMY_VALUE
+
+        device_scan_backlog = 0
+        if self.backlog is not None:
+            injected_device, injected_ljm = self.backlog(handle, read_index)
+            device_scan_backlog += injected_device
+            scan_backlog += injected_ljm
+        ctypes.c_int32.from_address(device_backlog).value = device_scan_backlog
+        ctypes.c_int32.from_address(ljm_backlog).value = scan_backlog
+        return errorcodes.NOERROR
+
+    def _set_stream_callback(self, handle, callback, arg):
+        stream = self._streams.get(handle)
+        if stream is None:
+            return errorcodes.STREAM_NOT_RUNNING
+        stream.stop_callback()
+        if callback:
+            thread = threading.Thread(target=self._run_stream_callback,
+                                      args=(stream, ctypes.CFUNCTYPE(None, ctypes.c_void_p)(callback), arg),
+                                      name="ljm-stand-in-callback-" + str(handle), daemon=True)
+            stream.callback_thread = thread
+            thread.start()
+        return errorcodes.NOERROR
+
+    def _run_stream_callback(self, stream, callback, arg):
+        """Call the stream callback whenever scansPerRead scans are ready,
+        from this thread like LJM's stream thread, until the stream stops
+        or the callback is replaced."""
+        thread = threading.current_thread()
+        chunks = stream.reads
+        while stream.callback_thread is thread and not stream.stopped.is_set():
+            if self._real_time:
+                chunks += 1
+                delay = stream.start + chunks * stream.read_period - time.perf_counter()
+                if delay > 0 and stream.stopped.wait(delay):
+                    return
+            callback(arg)
+
+    def _e_stream_stop(self, handle):
+        stream = self._streams.pop(handle, None)
+        if stream is None:
+            return errorcodes.STREAM_NOT_RUNNING
+        stream.stopped.set()
+        stream.stop_callback()
+        return errorcodes.NOERROR
+
+
+def install(library=None, declare_prototypes=True):
+    """Route labjack.ljm calls to a stand-in library.
+
+    Args:
+        library: The stand-in to install. A new StandInLibrary is created
+            when omitted.
+        declare_prototypes: Declare the labjack.ljm prototypes on the
+            stand-in, as labjack.ljm does when it loads the real library.
+
+    Returns:
+        The installed stand-in library.
+    """
+    if library is None:
+        library = StandInLibrary(prototyped=False)
+    if declare_prototypes:
+        ljm_wrapper._declarePrototypes(library)
+    ljm_wrapper._staticLib = library
+    return library
@@ -0,0 +1,89 @@
+"""
+Simulates an hour of main.py streaming against the stand-in T7 and reports how
+its memory grows, measured with tracemalloc after every simulated minute.
+
+Reads are taken back to back rather than in real time, so an hour takes far
+less than an hour. Each read's analysis finishes before the next read.
+A run that grows past MEMORY_CAP_MB is stopped early and the growth rate is
+extrapolated to the full hour.
+
+Usage:
+    python benchmarks/memory_growth_benchmark.py
+
+Author: Liam Eime
+"""
+
+import contextlib
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+from labjack import ljm
+
+import ljm_stand_in
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import main  # noqa: E402
+
+main.RECORD_DATA = False  # An hour of recording would fill the disk, not memory
+main.CAPTURE_EVENTS = False  # As would an event file every second
+
+SIMULATED_SECONDS = 3600
+SAMPLE_EVERY_SECONDS = 60
+MEMORY_CAP_MB = 1024
+
+
+def simulate():
+    """Return [(simulated seconds, traced MB, ms per read)] samples."""
+    library = ljm_stand_in.install()
+    library.waveform = ljm_stand_in.accelerometer_waveform(main.SCAN_RATE)
+    samples = []
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        handle = main.open_device()
+        aScanList = main.configure_device(handle)
+        scansPerRead = int(main.SCAN_RATE)
+        stream_buffer = np.empty(scansPerRead * len(aScanList))
+        scanRate = main.start_stream(handle, aScanList, scansPerRead)[0]
+        read_seconds = scansPerRead / scanRate
+        tracemalloc.start()
+        try:
+            simulated = 0.0
+            interval_start = time.perf_counter()
+            interval_reads = 0
+            while simulated < SIMULATED_SECONDS:
+                ljm.eStreamReadInto(handle, stream_buffer)
+                main.handle_stream_read(stream_buffer)
+                main.pipeline.join()
+                simulated += read_seconds
+                interval_reads += 1
+                traced_mb = tracemalloc.get_traced_memory()[0] / 2**20
+                if simulated % SAMPLE_EVERY_SECONDS < read_seconds or traced_mb > MEMORY_CAP_MB:
+                    ms_per_read = (time.perf_counter() - interval_start) / interval_reads * 1000
+                    samples.append((simulated, traced_mb, ms_per_read))
+                    interval_start = time.perf_counter()
+                    interval_reads = 0
+                    if traced_mb > MEMORY_CAP_MB:
+                        break
+        finally:
+            tracemalloc.stop()
+            main.stop_stream(handle)
+            ljm.close(handle)
+    return samples
+
+
+if __name__ == "__main__":
+    samples = simulate()
+    print(f"main.py at {main.SCAN_RATE} scans/s x {main.NUMBER_OF_AINS} channels, "
+          f"{SIMULATED_SECONDS / 60:g} simulated minutes\n")
+    print(f"{'simulated s':>12}{'traced MB':>12}{'ms/read':>10}")
+    for simulated, traced_mb, ms_per_read in samples:
+        print(f"{simulated:12.0f}{traced_mb:12.1f}{ms_per_read:10.2f}")
+
+    seconds = np.array([s[0] for s in samples])
+    traced = np.array([s[1] for s in samples])
+    growth_mb_per_hour = np.polyfit(seconds, traced, 1)[0] * 3600 if len(samples) > 1 else 0.0
+    if seconds[-1] < SIMULATED_SECONDS:
+        print(f"\nStopped at the {MEMORY_CAP_MB} MB cap after {seconds[-1]:.0f} simulated s")
+    print(f"Memory growth: {growth_mb_per_hour:.1f} MB per simulated hour")
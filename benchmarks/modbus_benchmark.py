@@ -0,0 +1,140 @@
+"""
+Exercises the pure Python Modbus TCP backend (labjack.ljm.modbus) against
+stand-in MBFB servers, then times it.
+
+The checks cover every supported data type, mixed read/write frames, a call
+that is split into several pipelined packets, and Modbus exceptions, for both
+the blocking handle functions and AsyncDevice. The timings are the per-call
+cost of a 4-channel read on one handle, and polling a fleet of devices with
+DEVICE_LATENCY_MS command-response time, one device after another with the
+blocking functions or all at once from one asyncio event loop.
+
+Usage:
+    python benchmarks/modbus_benchmark.py
+
+Author: Liam Eime
+"""
+
+import asyncio
+import struct
+import time
+import timeit
+
+from labjack import ljm
+from labjack.ljm import modbus
+
+from modbus_stand_in import StandInModbusServer
+
+AIN_ADDRESSES = [0, 2, 4, 6]
+AIN_TYPES = [ljm.constants.FLOAT32] * 4
+NUM_DEVICES = 16
+DEVICE_LATENCY_MS = 2.0
+FLEET_ROUNDS = 20
+NUM_CALLS = 2000
+
+READ, WRITE = ljm.constants.READ, ljm.constants.WRITE
+CHECK_FRAMES = (
+    [46180, 46000, 46002, 46004, 46100, 0, 2],
+    [ljm.constants.UINT16, ljm.constants.UINT32, ljm.constants.INT32, ljm.constants.FLOAT32,
+     ljm.constants.BYTE, ljm.constants.FLOAT32, ljm.constants.FLOAT32],
+    [WRITE, WRITE, WRITE, WRITE, WRITE, READ, READ],
+    [1, 1, 1, 1, 3, 1, 1],
+    [65535, 4000000000, -123456, 1.5, 7, 8, 9, 0, 0],
+)
+
+
+def f32(value):
+    """value rounded to FLOAT32, as the device stores it."""
+    return struct.unpack(">f", struct.pack(">f", value))[0]
+
+
+def check_blocking(port):
+    handle = modbus.open("127.0.0.1", port)
+    try:
+        values = modbus.eAddresses(handle, 7, *CHECK_FRAMES)
+        assert values[-2:] == [0.0, f32(0.002)], values
+        read_back = modbus.eAddresses(handle, 5, CHECK_FRAMES[0], CHECK_FRAMES[1], [READ] * 5, CHECK_FRAMES[3],
+                                      [0] * 7)
+        assert read_back == [65535, 4000000000, -123456, 1.5, 7, 8, 9], read_back
+
+        # 400 single-register frames need several 1040 byte packets.
+        addresses = list(range(30000, 30400))
+        types = [ljm.constants.UINT16] * len(addresses)
+        modbus.eWriteAddresses(handle, len(addresses), addresses, types, list(range(len(addresses))))
+        assert modbus.eReadAddresses(handle, len(addresses), addresses, types) == list(range(len(addresses)))
+
+        try:
+            modbus.eReadAddress(handle, 65535, ljm.constants.FLOAT32)
+            raise AssertionError("expected a Modbus exception")
+        except ljm.LJMError as e:
+            assert e.errorCode == ljm.errorcodes.MBE2_ILLEGAL_DATA_ADDRESS, e
+        assert modbus.eReadAddress(handle, 2, ljm.constants.FLOAT32) == f32(0.002)
+        try:
+            modbus.eWriteAddress(handle, 2, ljm.constants.FLOAT32, 1e39)  # Beyond FLOAT32
+            raise AssertionError("expected an out of range value")
+        except ljm.LJMError as e:
+            assert e.errorCode == ljm.errorcodes.INVALID_VALUE, e
+    finally:
+        modbus.close(handle)
+
+
+async def check_async(port):
+    async with await modbus.AsyncDevice.open("127.0.0.1", port) as device:
+        values = await device.eAddresses(7, *CHECK_FRAMES)
+        assert values[-2:] == [0.0, f32(0.002)], values
+        results = await asyncio.gather(*[device.eReadAddress(2 * i, ljm.constants.FLOAT32) for i in range(50)])
+        assert results == [f32(2 * i / 1000.0) for i in range(50)], results
+        try:
+            await device.eReadAddress(65535, ljm.constants.FLOAT32)
+            raise AssertionError("expected a Modbus exception")
+        except ljm.LJMError as e:
+            assert e.errorCode == ljm.errorcodes.MBE2_ILLEGAL_DATA_ADDRESS, e
+
+
+def poll_fleet_blocking(handles):
+    start = time.perf_counter()
+    for _ in range(FLEET_ROUNDS):
+        for handle in handles:
+            modbus.eReadAddresses(handle, 4, AIN_ADDRESSES, AIN_TYPES)
+    return time.perf_counter() - start
+
+
+async def poll_fleet_async(ports):
+    devices = [await modbus.AsyncDevice.open("127.0.0.1", port) for port in ports]
+    try:
+        start = time.perf_counter()
+        for _ in range(FLEET_ROUNDS):
+            await asyncio.gather(*[device.eReadAddresses(4, AIN_ADDRESSES, AIN_TYPES) for device in devices])
+        return time.perf_counter() - start
+    finally:
+        for device in devices:
+            await device.close()
+
+
+if __name__ == "__main__":
+    with StandInModbusServer() as server:
+        check_blocking(server.port)
+        asyncio.run(check_async(server.port))
+        print("Blocking and asyncio checks passed\n")
+
+        handle = modbus.open("127.0.0.1", server.port)
+        per_call = min(timeit.repeat(lambda: modbus.eReadAddresses(handle, 4, AIN_ADDRESSES, AIN_TYPES),
+                                     number=NUM_CALLS, repeat=5)) / NUM_CALLS
+        modbus.close(handle)
+    print(f"eReadAddresses, 4 FLOAT32 frames over loopback: {per_call * 1e6:.1f} us/call\n")
+
+    servers = [StandInModbusServer(latency=DEVICE_LATENCY_MS / 1000).start() for _ in range(NUM_DEVICES)]
+    try:
+        handles = [modbus.open("127.0.0.1", s.port) for s in servers]
+        blocking = poll_fleet_blocking(handles)
+        modbus.closeAll()
+        concurrent = asyncio.run(poll_fleet_async([s.port for s in servers]))
+    finally:
+        for s in servers:
+            s.stop()
+
+    polls = NUM_DEVICES * FLEET_ROUNDS
+    print(f"{NUM_DEVICES} devices with {DEVICE_LATENCY_MS:g} ms latency, {FLEET_ROUNDS} polling rounds")
+    print(f"{'method':<30}{'total ms':>10}{'polls/s':>10}")
+    for name, seconds in [("blocking, one after another", blocking), ("asyncio, one event loop", concurrent)]:
+        print(f"{name:<30}{seconds * 1000:10.1f}{polls / seconds:10.0f}")
@@ -0,0 +1,105 @@
+"""
+Stand-in Modbus TCP server that answers Modbus Feedback (MBFB) packets like a
+T7, so labjack.ljm.modbus can be exercised and benchmarked without a device.
+
+The server keeps a 16-bit register map in memory. AIN registers start out
+holding address / 1000 as FLOAT32, matching ljm_stand_in, and writes are
+stored so later reads return them. Each connection is served by its own
+thread, and pipelined packets are answered in order.
+
+Author: Liam Eime
+"""
+
+import socket
+import socketserver
+import struct
+import threading
+import time
+
+MBFB_FUNCTION = 76
+HEADER = struct.Struct(">HHHBB")
+FRAME = struct.Struct(">BHB")
+NUM_REGISTERS = 1 << 16
+NUM_AIN = 255
+ILLEGAL_DATA_ADDRESS = 2
+
+
+class _Handler(socketserver.BaseRequestHandler):
+
+    def handle(self):
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        stream = self.request.makefile("rb")
+        while True:
+            header = stream.read(HEADER.size)
+            if len(header) < HEADER.size:
+                return
+            transaction_id, protocol_id, length, unit_id, function = HEADER.unpack(header)
+            command = stream.read(length - 2)
+            if self.server.latency:
+                time.sleep(self.server.latency)
+            function, data = self.server.execute(function, command)
+            self.request.sendall(HEADER.pack(transaction_id, 0, len(data) + 2, unit_id, function) + data)
+
+
+class StandInModbusServer(socketserver.ThreadingTCPServer):
+    """MBFB server on 127.0.0.1 and a free port.
+
+    Args:
+        latency: Seconds to wait before answering each packet, like a
+            device's command-response time.
+
+    Use as a context manager, or call start() and stop().
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, latency=0.0):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.latency = latency
+        self.registers = bytearray(NUM_REGISTERS * 2)
+        self._lock = threading.Lock()
+        self._thread = None
+        for i in range(NUM_AIN):
+            struct.pack_into(">f", self.registers, i * 4, i * 2 / 1000.0)
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def execute(self, function, command):
+        """Run the frames of one MBFB command and return the response function
+        code and data."""
+        if function != MBFB_FUNCTION:
+            return function | 0x80, bytes([1])
+        response = bytearray()
+        offset = 0
+        with self._lock:
+            while offset < len(command):
+                direction, address, num_registers = FRAME.unpack_from(command, offset)
+                offset += FRAME.size
+                start, end = address * 2, (address + num_registers) * 2
+                if address + num_registers > NUM_REGISTERS:
+                    return function | 0x80, bytes([ILLEGAL_DATA_ADDRESS])
+                if direction:
+                    self.registers[start:end] = command[offset:offset + end - start]
+                    offset += end - start
+                else:
+                    response += self.registers[start:end]
+        return function, bytes(response)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,126 @@
+"""
+Compares main.py's former thread per stream read with t7stream's
+AnalysisPipeline: the cost of handing a read to analysis, and what happens
+when analysis is slower than the reads.
+
+The overload run submits a read every READ_PERIOD_S while analysing each one
+takes SLOW_ANALYSIS_S, outside the GIL like large NumPy operations. Analysis
+carries state from read to read, so the threads of the former version take a
+lock around it, queue up behind each other and pile up without bound. The
+pipeline keeps at most max_pending reads queued and either holds the read
+loop back or drops reads, and counts both.
+
+Also checks that process sees chunks in submission order with several
+workers, and that close() drains the queue.
+
+Usage:
+    python benchmarks/pipeline_benchmark.py
+
+Author: Liam Eime
+"""
+
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from t7stream import AnalysisPipeline  # noqa: E402
+
+NUM_HANDOFFS = 2000
+READ_PERIOD_S = 0.005
+SLOW_ANALYSIS_S = 0.008
+NUM_OVERLOAD_READS = 200
+MAX_PENDING = 4
+
+
+def analyse(chunk=None):
+    time.sleep(SLOW_ANALYSIS_S)
+
+
+def check_order():
+    seen = []
+
+    def prepare(chunk):
+        time.sleep(random.uniform(0, 0.002))  # Finishes out of order
+        return chunk
+
+    with AnalysisPipeline(seen.append, prepare=prepare, workers=4, max_pending=8) as pipeline:
+        for i in range(500):
+            pipeline.submit(i)
+    assert seen == list(range(500)), seen[:20]
+    assert pipeline.processed == 500 and pipeline.dropped == 0
+
+
+def handoff_us_threads():
+    done = threading.Event()
+    start = time.perf_counter()
+    for _ in range(NUM_HANDOFFS):
+        threading.Thread(target=done.is_set).start()
+    return (time.perf_counter() - start) / NUM_HANDOFFS * 1e6
+
+
+def handoff_us_pipeline():
+    pipeline = AnalysisPipeline(lambda chunk: None, max_pending=NUM_HANDOFFS)
+    start = time.perf_counter()
+    for i in range(NUM_HANDOFFS):
+        pipeline.submit(i)
+    elapsed = time.perf_counter() - start
+    pipeline.close()
+    return elapsed / NUM_HANDOFFS * 1e6
+
+
+def overload_threads():
+    """Returns (most analysis threads alive at once, read loop seconds)."""
+    most = 0
+    threads = []
+    state_lock = threading.Lock()
+
+    def analyse_locked():
+        with state_lock:
+            analyse()
+
+    start = time.perf_counter()
+    for _ in range(NUM_OVERLOAD_READS):
+        time.sleep(READ_PERIOD_S)
+        thread = threading.Thread(target=analyse_locked)
+        thread.start()
+        threads.append(thread)
+        most = max(most, sum(t.is_alive() for t in threads))
+    elapsed = time.perf_counter() - start
+    for thread in threads:
+        thread.join()
+    return most, elapsed
+
+
+def overload_pipeline(block):
+    pipeline = AnalysisPipeline(analyse, max_pending=MAX_PENDING, block=block,
+                                late_seconds=READ_PERIOD_S * 2)
+    start = time.perf_counter()
+    for i in range(NUM_OVERLOAD_READS):
+        time.sleep(READ_PERIOD_S)
+        pipeline.submit(i)
+    elapsed = time.perf_counter() - start
+    pipeline.close()
+    return pipeline, elapsed
+
+
+if __name__ == "__main__":
+    check_order()
+    print("Chunks processed in submission order with 4 workers; close() drained the queue\n")
+
+    print(f"Handing a read to analysis: thread per read {handoff_us_threads():.1f} us, "
+          f"pipeline {handoff_us_pipeline():.1f} us\n")
+
+    ideal = NUM_OVERLOAD_READS * READ_PERIOD_S
+    print(f"Overload: a read every {READ_PERIOD_S * 1000:g} ms, {SLOW_ANALYSIS_S * 1000:g} ms of analysis each, "
+          f"{NUM_OVERLOAD_READS} reads (read loop {ideal:.2f} s when never held back)")
+    most, elapsed = overload_threads()
+    print(f"{'thread per read':<26} read loop {elapsed:5.2f} s, up to {most} analysis threads alive")
+    for name, block in [("pipeline, blocking", True), ("pipeline, dropping", False)]:
+        pipeline, elapsed = overload_pipeline(block)
+        print(f"{name:<26} read loop {elapsed:5.2f} s, max depth {pipeline.max_depth}, "
+              f"dropped {pipeline.dropped}, late {pipeline.late}, processed {pipeline.processed}")
+        assert pipeline.max_depth <= MAX_PENDING
+        assert pipeline.processed + pipeline.dropped == NUM_OVERLOAD_READS
@@ -0,0 +1,171 @@
+"""
+Checks that t7stream's Recorder and RecordingReader round-trip a stream
+across rotated files and that a failed write leaves no misplaced chunks,
+then compares what recording costs the acquisition
+loop: writing each read as CSV, as OUTPUT_FILENAME = "data.csv" suggested,
+writing its bytes straight to a file, and handing it to a Recorder. Finally
+reads one second by time from a long recording through the memory maps.
+
+Usage:
+    python benchmarks/recorder_benchmark.py
+
+Author: Liam Eime
+"""
+
+import errno
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from t7stream import Recorder, RecordingReader, ScanClock  # noqa: E402
+from t7stream import recorder as recorder_module  # noqa: E402
+
+NUM_CHANNELS = 3
+SCAN_RATE = 30000
+SCANS_PER_READ = 30000
+NUM_READS = 60
+NUM_CSV_READS = 3
+
+
+def check_round_trip(directory):
+    rng = np.random.default_rng(1)
+    clock = ScanClock(1.7e9, 1000)
+    calibration = {"offset": [2.5, 2.5, 2.5], "sensitivity": [1, 1, 2], "unit": "g"}
+    everything = []
+    # Small files and batches so the recording rotates and batches often
+    with Recorder(os.path.join(directory, "check.t7r"), ["AIN0", "AIN1", "AIN2"], 1000, clock, calibration,
+                  max_bytes=40000, max_seconds=3, batch_bytes=20000, max_pending=1000, block=True) as recorder:
+        for num_scans in rng.integers(1, 700, 60):
+            block = rng.normal(size=(NUM_CHANNELS, num_scans))
+            recorder.write_interleaved(block.T.ravel())
+            everything.append(block)
+            clock.update(clock.start_time + 1e-4, clock.seconds_per_scan)
+    everything = np.concatenate(everything, axis=1)
+    assert len(recorder.files) > 3 and recorder.scans == everything.shape[1] and recorder.dropped == 0
+
+    with RecordingReader(os.path.join(directory, "check_*.t7r")) as reader:
+        assert (reader.first, reader.total) == (0, everything.shape[1])
+        assert reader.channel_names == ["AIN0", "AIN1", "AIN2"]
+        for start in rng.integers(0, reader.total, 50).tolist():
+            stop = int(rng.integers(start, reader.total + 1))
+            assert np.array_equal(reader.read(start, stop), everything[:, start:stop])
+        assert np.array_equal(reader.calibrated(reader.read(0, 10)), (everything[:, :10] - 2.5) / [[1], [1], [2]])
+        # Times use the clock model recorded with each chunk
+        first_chunk, last_chunk, last = reader.index[0], reader.index[-1], reader.total - 1
+        assert reader.time_of(0) == first_chunk["start_time"]
+        assert reader.time_of(last) == last_chunk["start_time"] + last * last_chunk["seconds_per_scan"]
+        start, scans = reader.read_time(reader.time_of(1234), reader.time_of(4321))
+        assert start == 1234 and np.array_equal(scans, everything[:, 1234:4321])
+        for start in rng.integers(0, reader.total, 200).tolist():  # At epoch times, in every chunk
+            stop = int(rng.integers(start, reader.total + 1))
+            assert reader.index_range(reader.time_of(start), reader.time_of(stop)) == (start, stop), (start, stop)
+
+
+def check_failed_write(directory):
+    """Fails one batch part way through its data, as a full disk would, and
+    checks that the chunks either side of it are still where the index
+    says."""
+    write_all = recorder_module._write_all
+    failed = []
+
+    def fail_once(fd, buffers):
+        if recorder.chunks == 5 and not failed:
+            failed.append(True)
+            os.write(fd, memoryview(buffers[0]).cast("B")[:1000])
+            raise OSError(errno.ENOSPC, "No space left on device")
+        write_all(fd, buffers)
+
+    rng = np.random.default_rng(2)
+    blocks = [rng.normal(size=(NUM_CHANNELS, 300)) for _ in range(10)]
+    recorder_module._write_all = fail_once
+    try:
+        with Recorder(os.path.join(directory, "failed.t7r"), ["AIN0", "AIN1", "AIN2"], 1000, batch_bytes=1,
+                      max_pending=100, block=True) as recorder:
+            for block in blocks:
+                recorder.write(block)
+    finally:
+        recorder_module._write_all = write_all
+    assert failed and recorder.errors == 1 and recorder.chunks == 9, (recorder.errors, recorder.chunks)
+    with RecordingReader(recorder.files) as reader:
+        assert list(reader.index["first_scan"]) == [300 * i for i in range(10) if i != 5]
+        for record in reader.index:
+            first = int(record["first_scan"])
+            assert np.array_equal(reader.read(first, first + 300), blocks[first // 300])
+
+
+def write_csv(path, reads):
+    times = []
+    with open(path, "w") as f:
+        for read in reads:
+            start = time.perf_counter()
+            np.savetxt(f, read.reshape(-1, NUM_CHANNELS), delimiter=",")
+            times.append(time.perf_counter() - start)
+    return times
+
+
+def write_bytes(path, reads):
+    times = []
+    with open(path, "wb") as f:
+        for read in reads:
+            start = time.perf_counter()
+            f.write(read.tobytes())
+            f.flush()
+            times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        os.fsync(f.fileno())
+    return times, time.perf_counter() - start
+
+
+def write_recorder(path, reads):
+    times = []
+    recorder = Recorder(path, [f"AIN{i}" for i in range(NUM_CHANNELS)], SCAN_RATE)
+    for read in reads:
+        start = time.perf_counter()
+        recorder.write_interleaved(read)
+        times.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    recorder.close()
+    assert recorder.dropped == 0 and recorder.errors == 0, (recorder.dropped, recorder.last_error)
+    return times, time.perf_counter() - start, recorder
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as directory:
+        check_round_trip(directory)
+        print("Reader returned every scan and time range written across rotated files")
+        check_failed_write(directory)
+        print("A failed write lost only its own chunk\n")
+
+        reads = [np.random.default_rng(i).normal(2.5, 0.1, SCANS_PER_READ * NUM_CHANNELS) for i in range(NUM_READS)]
+        csv_times = write_csv(os.path.join(directory, "data.csv"), reads[:NUM_CSV_READS])
+        bytes_times, bytes_sync = write_bytes(os.path.join(directory, "data.bin"), reads)
+        recorder_times, recorder_close, recorder = write_recorder(os.path.join(directory, "data.t7r"), reads)
+
+        print(f"Recording {NUM_READS} one-second reads of {SCANS_PER_READ} scans x {NUM_CHANNELS} channels, "
+              f"ms of the read loop per read")
+        print(f"{'':<24}{'median':>10}{'max':>10}{'close s':>10}")
+        for name, times, close in [("CSV (np.savetxt)", csv_times, float("nan")),
+                                   ("write + flush", bytes_times, bytes_sync),
+                                   ("Recorder", recorder_times, recorder_close)]:
+            print(f"{name:<24}{np.median(times) * 1000:10.2f}{np.max(times) * 1000:10.2f}{close:10.2f}")
+        assert np.median(recorder_times) < np.median(csv_times) / 10
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        with RecordingReader(recorder.files) as reader:
+            middle = reader.time_of(reader.total // 2)
+            first_scan, scans = reader.read_time(middle, middle + 1.0)
+            scans.sum()  # Touches every page of the range
+        seconds = time.perf_counter() - start
+        traced_mb = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+        file_mb = sum(os.path.getsize(path) for path in recorder.files) / 2**20
+        print(f"\nRead 1 s by time from a {file_mb:.0f} MB recording in {seconds * 1000:.2f} ms, "
+              f"peak {traced_mb:.1f} MB allocated")
+        assert first_scan == reader.total // 2 and scans.shape == (NUM_CHANNELS, SCAN_RATE)
+        assert traced_mb < file_mb / 10
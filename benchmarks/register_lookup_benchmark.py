@@ -0,0 +1,101 @@
+"""
+Compares register name resolution through the LJM library call on every
+lookup (the previous wrapper behaviour) with the least recently used cache
+and the in-process register map index. Runs against the LJM stand-in, whose
+constants file is written to a temporary directory.
+
+Single lookups cycle through a small working set, as ljm_stream_util does
+while building scan lists. The bulk case resolves a few thousand names with
+one namesToAddresses call.
+
+Usage:
+    python benchmarks/register_lookup_benchmark.py
+
+Author: Liam Eime
+"""
+
+import ctypes
+import os
+import tempfile
+import timeit
+
+from labjack import ljm
+from labjack.ljm import ljm as ljm_wrapper
+
+import ljm_stand_in
+
+SINGLE_NAMES = [f"AIN{i}" for i in range(16)] + ["DAC0", "DAC1", "DIO_STATE", "CORE_TIMER"]
+BULK_NAMES = [f"AIN{i % 255}" for i in range(5000)]
+NUM_CALLS = 20000
+
+
+def legacy_name_to_address(name):
+    """The previous ljm.nameToAddress body: one LJM call per lookup."""
+    if not isinstance(name, str):
+        raise TypeError("Expected a string instead of " + str(type(name)) + ".")
+    c_addr = ctypes.c_int32(0)
+    c_type = ctypes.c_int32(0)
+    error = ljm_wrapper._staticLib.LJM_NameToAddress(name.encode("ascii"), ctypes.byref(c_addr),
+                                                     ctypes.byref(c_type))
+    if error != ljm.errorcodes.NOERROR:
+        raise ljm.LJMError(error)
+    return c_addr.value, c_type.value
+
+
+def legacy_names_to_addresses(num_frames, names):
+    """The previous ljm.namesToAddresses body: one LJM call for all names."""
+    ascii_names = []
+    for x in names:
+        if not isinstance(x, str):
+            raise TypeError("Expected a string list but found an item " + str(type(x)) + ".")
+        ascii_names.append(x.encode("ascii"))
+    c_names = (ctypes.c_char_p * num_frames)(*ascii_names)
+    c_addrs = (ctypes.c_int32 * num_frames)()
+    c_types = (ctypes.c_int32 * num_frames)()
+    error = ljm_wrapper._staticLib.LJM_NamesToAddresses(num_frames, ctypes.byref(c_names), ctypes.byref(c_addrs),
+                                                        ctypes.byref(c_types))
+    if error != ljm.errorcodes.NOERROR:
+        raise ljm.LJMError(error)
+    return list(c_addrs), list(c_types)
+
+
+def lookup_working_set(name_to_address):
+    for name in SINGLE_NAMES:
+        name_to_address(name)
+
+
+def best_us(call, number, rounds=7):
+    """Best of rounds, in microseconds per call."""
+    return min(timeit.repeat(call, number=number, repeat=rounds)) / number * 1e6
+
+
+if __name__ == "__main__":
+    library = ljm_stand_in.install()
+    with tempfile.TemporaryDirectory() as directory:
+        library.constants_file = os.path.join(directory, "ljm_constants.json")
+        with open(library.constants_file, "w") as f:
+            f.write(library.constants_json())
+
+        calls = NUM_CALLS // len(SINGLE_NAMES)
+        bulk_calls = 20
+        legacy_single = best_us(lambda: lookup_working_set(legacy_name_to_address), calls) / len(SINGLE_NAMES)
+        legacy_bulk = best_us(lambda: legacy_names_to_addresses(len(BULK_NAMES), BULK_NAMES), bulk_calls)
+
+        ljm_wrapper._setRegisterMap(False)
+        lru_single = best_us(lambda: lookup_working_set(ljm.nameToAddress), calls) / len(SINGLE_NAMES)
+        lru_bulk = best_us(lambda: ljm.namesToAddresses(len(BULK_NAMES), BULK_NAMES), bulk_calls)
+
+        ljm_wrapper._setRegisterMap(None)
+        build_ms = best_us(lambda: ljm.RegisterMap.fromFile(library.constants_file), 20) / 1000
+        index_single = best_us(lambda: lookup_working_set(ljm.nameToAddress), calls) / len(SINGLE_NAMES)
+        index_bulk = best_us(lambda: ljm.namesToAddresses(len(BULK_NAMES), BULK_NAMES), bulk_calls)
+
+        assert ljm.namesToAddresses(len(BULK_NAMES), BULK_NAMES) == \
+            legacy_names_to_addresses(len(BULK_NAMES), BULK_NAMES)
+
+    print(f"Stand-in register map: {len(ljm_wrapper._getRegisterMap())} names, built in {build_ms:.2f} ms\n")
+    print(f"{'method':<24}{'nameToAddress us':>18}{f'{len(BULK_NAMES)} names ms':>16}")
+    for name, single, bulk in [("LJM call every lookup", legacy_single, legacy_bulk),
+                               ("LRU cache", lru_single, lru_bulk),
+                               ("register map index", index_single, index_bulk)]:
+        print(f"{name:<24}{single:18.2f}{bulk / 1000:16.3f}")
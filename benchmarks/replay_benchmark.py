@@ -0,0 +1,129 @@
+"""
+Records RECORD_SECONDS of the stand-in accelerometer waveform with
+t7stream's Recorder, then replays it through main.py's analysis as fast as
+it runs and reports the throughput and how long a day of data would take.
+The replay must find the one event per channel per second the waveform
+holds, so a change that slows down or breaks the detector shows up here.
+
+Also checks that ReplaySource plays scans in order, stops at the last full
+read, paces reads at a multiple of real time, and plays a chunk missing
+from a recording as skipped scans that main.py reports.
+
+Usage:
+    python benchmarks/replay_benchmark.py
+
+Author: Liam Eime
+"""
+
+import contextlib
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import ljm_stand_in
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import main  # noqa: E402
+from t7stream import ArrayRecording, Recorder, ReplaySource, ScanClock, find_gaps  # noqa: E402
+from t7stream.calibration import DUMMY_VALUE  # noqa: E402
+
+main.CAPTURE_EVENTS = False  # Times the detection alone
+
+RECORD_SECONDS = 120
+PACED_SPEED = 20
+
+
+def check():
+    scans = np.arange(1050 * 2, dtype=np.float64).reshape(-1, 2)
+    source = ReplaySource(ArrayRecording(scans, 1000, start_time=1.7e9), 100)
+    played = []
+    while True:
+        try:
+            aData, device_backlog, ljm_backlog = source.eStreamRead()
+        except EOFError:
+            break
+        played.append(aData)
+        assert (device_backlog, ljm_backlog) == (0, 0)
+    assert np.array_equal(np.concatenate(played), scans[:1000].ravel()) and source.remaining == 50
+    assert source.scan_clock.time_of(1000) == 1.7e9 + 1.0
+
+    source = ReplaySource(ArrayRecording(scans, 1000), 100, speed=PACED_SPEED)
+    aData = np.empty(200)
+    start = time.perf_counter()
+    for _ in range(10):
+        source.eStreamReadInto(aData)
+    seconds = time.perf_counter() - start
+    expected = 1.0 / PACED_SPEED
+    assert expected * 0.85 < seconds < expected * 1.5, seconds
+
+
+def check_missing_chunk(directory):
+    """Replays a recording missing one chunk, as when the Recorder's queue
+    was full, directly and through main.py."""
+    blocks = [np.full((2, 100), i, dtype=np.float64) for i in range(10)]
+    with Recorder(os.path.join(directory, "missing.t7r"), ["AIN0", "AIN1"], 1000, block=True) as recorder:
+        for i, block in enumerate(blocks):
+            if i != 4:
+                recorder.write(block, i * 100)
+    expected = np.concatenate(blocks, axis=1)
+    expected[:, 400:500] = DUMMY_VALUE
+    source = ReplaySource(recorder.files, 70)  # Reads that straddle the hole
+    played = []
+    while source.remaining >= source.scans_per_read:
+        played.append(source.eStreamRead()[0])
+    played = np.concatenate(played)
+    assert np.array_equal(played, expected[:, :played.size // 2].T.ravel()) and source.missing == 100
+    assert find_gaps(played, 2).tolist() == [(400, 100)]
+
+    files = record(os.path.join(directory, "missing_read.t7r"), 10, missing=4)
+    source, _ = replay(files)
+    assert source.scans == 10 * main.SCAN_RATE and source.missing == main.SCAN_RATE
+    assert main.gap_map.skipped_scans == main.SCAN_RATE, main.gap_map.skipped_scans
+
+
+def record(path, seconds=RECORD_SECONDS, missing=None):
+    """Record seconds of the waveform, one main.py read at a time, leaving
+    out the read numbered missing."""
+    waveform = ljm_stand_in.accelerometer_waveform(main.SCAN_RATE)
+    scans_per_read = int(main.SCAN_RATE)
+    channel_names = [f"AIN{i}" for i in range(main.NUMBER_OF_AINS)]
+    with Recorder(path, channel_names, main.SCAN_RATE, ScanClock(1.7e9, main.SCAN_RATE), block=True) as recorder:
+        for read in range(seconds * main.SCAN_RATE // scans_per_read):
+            first_scan = read * scans_per_read
+            if read != missing:
+                recorder.write_interleaved(waveform(first_scan, scans_per_read, main.NUMBER_OF_AINS), first_scan)
+    return recorder.files
+
+
+def replay(files):
+    """Replay through main.py and return (ReplaySource, number of events)."""
+    events = []
+    print_events = main.print_events
+    main.print_events = lambda found: events.extend(found)
+    try:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            source = main.main_replay(files)
+    finally:
+        main.print_events = print_events
+    return source, len(events)
+
+
+if __name__ == "__main__":
+    check()
+    print("ReplaySource played every full read in order and paced reads to the requested speed")
+
+    with tempfile.TemporaryDirectory() as directory:
+        check_missing_chunk(directory)
+        print("A chunk missing from a recording replayed as skipped scans\n")
+        files = record(os.path.join(directory, "replay.t7r"))
+        source, num_events = replay(files)
+    speedup = source.scans_per_second / source.scan_rate
+    print(f"Replayed {RECORD_SECONDS} s of {main.NUMBER_OF_AINS} channels at {source.scan_rate:g} scans/s "
+          f"through main.py's analysis")
+    print(f"{source.scans_per_second:,.0f} scans/s, {speedup:.1f} x real time, "
+          f"a day of data in {24 * 60 / speedup:.1f} minutes, {num_events} events")
+    assert source.scans == RECORD_SECONDS * main.SCAN_RATE
+    assert num_events == RECORD_SECONDS * main.NUMBER_OF_AINS, num_events
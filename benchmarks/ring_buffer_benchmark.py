@@ -0,0 +1,93 @@
+"""
+Checks t7stream.RingBuffer against a plain list of every scan, then compares
+the cost of storing one-second reads as the history grows: main.py's former
+list.extend plus np.concatenate of the timestamps, against writing both into
+ring buffers that keep RETENTION_SECONDS.
+
+Usage:
+    python benchmarks/ring_buffer_benchmark.py
+
+Author: Liam Eime
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from t7stream import RingBuffer  # noqa: E402
+
+NUMBER_OF_AINS = 3
+SCAN_RATE = 30000
+RETENTION_SECONDS = 10
+NUM_READS = 300
+REPORT_EVERY = 60
+
+
+def check():
+    rng = np.random.default_rng(1)
+    ring = RingBuffer(NUMBER_OF_AINS, 1000)
+    everything = np.empty((NUMBER_OF_AINS, 0))
+    for num_scans in rng.integers(1, 700, 200).tolist() + [2500, 3]:
+        block = rng.normal(size=(NUMBER_OF_AINS, num_scans))
+        first = ring.write_interleaved(block.T.ravel())
+        everything = np.concatenate((everything, block), axis=1)
+        assert first == everything.shape[1] - num_scans and ring.total == everything.shape[1]
+        assert len(ring) == min(ring.total, ring.capacity)
+        for start in rng.integers(ring.first, ring.total + 1, 5).tolist():
+            stop = int(rng.integers(start, ring.total + 1))
+            assert np.array_equal(ring.read(start, stop), everything[:, start:stop])
+            assert np.array_equal(np.concatenate(ring.segments(start, stop), axis=1), everything[:, start:stop])
+        assert np.array_equal(ring.latest(250), everything[:, -250:])
+    try:
+        ring.read(ring.first - 1, ring.total)
+        raise AssertionError("expected an IndexError for an overwritten scan")
+    except IndexError:
+        pass
+
+
+def store_list_and_concatenate(reads):
+    raw_data = []
+    scan_system_times = []
+    times = []
+    for data, timestamps in reads:
+        start = time.perf_counter()
+        raw_data.extend(data.tolist())
+        scan_system_times = np.concatenate((scan_system_times, timestamps))
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def store_ring_buffers(reads):
+    samples = RingBuffer.for_retention(NUMBER_OF_AINS, SCAN_RATE, RETENTION_SECONDS)
+    scan_system_times = RingBuffer.for_retention(1, SCAN_RATE, RETENTION_SECONDS)
+    times = []
+    for data, timestamps in reads:
+        start = time.perf_counter()
+        samples.write_interleaved(data)
+        scan_system_times.write(timestamps[None, :])
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def reads():
+    """NUM_READS one-second reads of interleaved values and timestamps,
+    reusing the same arrays."""
+    data = np.random.default_rng(2).normal(size=SCAN_RATE * NUMBER_OF_AINS)
+    timestamps = np.arange(SCAN_RATE) / SCAN_RATE
+    return [(data, timestamps)] * NUM_READS
+
+
+if __name__ == "__main__":
+    check()
+    print("RingBuffer matches a list of every scan\n")
+
+    before = store_list_and_concatenate(reads())
+    after = store_ring_buffers(reads())
+    print(f"Storing one-second reads of {SCAN_RATE} scans x {NUMBER_OF_AINS} channels, ms per read")
+    print(f"{'reads':>10}{'list + concatenate':>20}{'ring buffers':>14}")
+    for end in range(REPORT_EVERY, NUM_READS + 1, REPORT_EVERY):
+        window = slice(end - REPORT_EVERY, end)
+        print(f"{end:10d}{np.mean(before[window]) * 1000:20.2f}{np.mean(after[window]) * 1000:14.2f}")
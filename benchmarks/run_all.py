@@ -0,0 +1,42 @@
+"""
+Runs every benchmark in this folder against the LJM stand-in, each in a fresh
+interpreter, and prints their reports followed by a pass/fail summary. Exits
+with status 1 if any benchmark's checks fail.
+
+Usage:
+    python benchmarks/run_all.py [name ...]
+
+Names select benchmarks by substring, e.g. `run_all.py stream memory`.
+
+Author: Liam Eime
+"""
+
+import glob
+import os
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+LIB_PATH = os.path.join(HERE, "..", "lib", "python_ljm_2020_11_20")
+
+
+if __name__ == "__main__":
+    scripts = sorted(glob.glob(os.path.join(HERE, "*_benchmark.py")))
+    if len(sys.argv) > 1:
+        scripts = [s for s in scripts if any(name in os.path.basename(s) for name in sys.argv[1:])]
+    env = dict(os.environ, PYTHONPATH=LIB_PATH + os.pathsep + os.environ.get("PYTHONPATH", ""))
+
+    results = []
+    for script in scripts:
+        name = os.path.basename(script)
+        print(f"==== {name}", flush=True)
+        start = time.perf_counter()
+        returncode = subprocess.run([sys.executable, script], cwd=HERE, env=env).returncode
+        results.append((name, returncode, time.perf_counter() - start))
+        print(flush=True)
+
+    print(f"{'benchmark':<36}{'result':>8}{'seconds':>10}")
+    for name, returncode, seconds in results:
+        print(f"{name:<36}{'ok' if returncode == 0 else 'FAILED':>8}{seconds:10.1f}")
+    sys.exit(1 if any(returncode for _, returncode, _ in results) else 0)
@@ -0,0 +1,114 @@
+"""
+Checks that event detection on scan indices with a ScanClock reports the same
+events as the former version of main.py, which timestamped every scan, then
+compares their per-read cost. Both are the per-channel detection main.py used
+before the EventDetector; event_detector_benchmark.py covers that.
+
+Usage:
+    python benchmarks/scan_clock_benchmark.py
+
+Author: Liam Eime
+"""
+
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+import ljm_stand_in
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import main  # noqa: E402
+from t7stream import ScanClock  # noqa: E402
+
+SCAN_RATE = 30000
+NUM_READS = 60
+START_TIME = 1.7e9
+
+
+def chunks():
+    """One-second chunks of g values, channel-major, with events that
+    straddle read boundaries."""
+    waveform = ljm_stand_in.accelerometer_waveform(SCAN_RATE, event_interval=0.37, event_duration=0.03)
+    for read in range(NUM_READS):
+        volts = waveform(read * SCAN_RATE, SCAN_RATE, main.NUMBER_OF_AINS)
+        yield ((volts - main.ACCEL_TO_G_OFFSET) / main.ACCEL_TO_G_SENSITIVITY).reshape(-1, main.NUMBER_OF_AINS).T
+
+
+def legacy_run():
+    """The former pipeline: timestamps for every scan, compared in time."""
+    last_spike_times = np.zeros(main.NUMBER_OF_AINS)
+    max_values = np.zeros(main.NUMBER_OF_AINS)
+    in_event = np.zeros(main.NUMBER_OF_AINS, dtype=bool)
+    lines = []
+    times = []
+    for read, data in enumerate(chunks()):
+        start = time.perf_counter()
+        current_time = START_TIME + (read * SCAN_RATE + np.arange(data.shape[1])) / SCAN_RATE
+        above_threshold = data > main.THRESHOLDS[:, None]
+        for i in range(main.NUMBER_OF_AINS):
+            if above_threshold[i].any():
+                max_values[i] = np.maximum(max_values[i], data[i][above_threshold[i]].max())
+                last_spike_times[i] = current_time[above_threshold[i]].max()
+                in_event[i] = True
+        below_and_passed = np.logical_and(~above_threshold,
+                                          (current_time - last_spike_times[:, None]) > main.BUFFER_PERIOD)
+        for i in np.where(np.logical_and(below_and_passed.any(axis=1), in_event))[0]:
+            time_str = datetime.fromtimestamp(last_spike_times[i]).strftime('%y/%m/%d %H:%M:%S.%f')[:21]
+            lines.append(f"\nMax value for channel {i}: {max_values[i]:.5f}g at {time_str}")
+            max_values[i] = 0
+            in_event[i] = False
+        times.append(time.perf_counter() - start)
+    return lines, times
+
+
+def clock_run():
+    """The same detection on scan indices, timestamping spikes with a
+    ScanClock."""
+    scan_clock = ScanClock(START_TIME, SCAN_RATE)
+    last_spike_scans = np.zeros(main.NUMBER_OF_AINS, dtype=np.int64)
+    max_values = np.zeros(main.NUMBER_OF_AINS)
+    in_event = np.zeros(main.NUMBER_OF_AINS, dtype=bool)
+    buffer_scans = int(main.BUFFER_PERIOD * SCAN_RATE)
+    lines = []
+    times = []
+    for read, data in enumerate(chunks()):
+        start = time.perf_counter()
+        first_scan = read * SCAN_RATE
+        num_scans = data.shape[1]
+        above_threshold = data > main.THRESHOLDS[:, None]
+        for i in range(main.NUMBER_OF_AINS):
+            if above_threshold[i].any():
+                max_values[i] = np.maximum(max_values[i], data[i][above_threshold[i]].max())
+                last_spike_scans[i] = first_scan + num_scans - 1 - np.argmax(above_threshold[i][::-1])
+                in_event[i] = True
+        buffer_passed_from = np.clip(last_spike_scans + buffer_scans + 1 - first_scan, 0, num_scans)
+        for i in np.where(in_event)[0]:
+            if (~above_threshold[i, buffer_passed_from[i]:]).any():
+                time_str = datetime.fromtimestamp(scan_clock.time_of(last_spike_scans[i])).strftime(
+                    '%y/%m/%d %H:%M:%S.%f')[:21]
+                lines.append(f"\nMax value for channel {i}: {max_values[i]:.5f}g at {time_str}")
+                max_values[i] = 0
+                in_event[i] = False
+        times.append(time.perf_counter() - start)
+    return lines, times
+
+
+if __name__ == "__main__":
+    clock = ScanClock(START_TIME, SCAN_RATE)
+    indices = np.arange(0, 10 ** 9, 997)
+    assert np.allclose(clock.time_of(indices), START_TIME + indices / SCAN_RATE, rtol=0, atol=1e-6)
+    assert np.array_equal(clock.index_of(clock.time_of(indices) + 0.5 / SCAN_RATE), indices)
+
+    legacy_lines, legacy_times = legacy_run()
+    clock_lines, clock_times = clock_run()
+    assert [line.strip() for line in legacy_lines] == [line.strip() for line in clock_lines], \
+        (legacy_lines[:3], clock_lines[:3])
+    print(f"Both report the same {len(clock_lines)} events over {NUM_READS} one-second reads\n")
+
+    print(f"Event detection per one-second read of {SCAN_RATE} scans x {main.NUMBER_OF_AINS} channels")
+    print(f"{'timestamps':<28}{'ms/read':>10}{'timestamp MB per retained s':>30}")
+    print(f"{'every scan (former)':<28}{np.median(legacy_times) * 1000:10.2f}{SCAN_RATE * 8 / 2 ** 20:30.3f}")
+    print(f"{'ScanClock, events only':<28}{np.median(clock_times) * 1000:10.2f}{0:30.3f}")
@@ -0,0 +1,163 @@
+"""
+Streams from a real-time stand-in T7 in an acquisition process that reads
+into a t7stream SharedRing, and measures how late each eStreamRead returns
+with and without analysis processes that cannot keep up. For comparison the
+same analysis also runs as threads of the acquisition process, where it
+competes with the reads for the GIL.
+
+Each analyser spins in pure Python for ANALYSIS_LOAD times the duration of
+the scans it consumes, so together they need more CPU than the machine has,
+fall behind, skip overwritten scans and report them as lost. Reads are timed
+once every analyser is running.
+
+Also checks that a SharedRingReader consumes scans in order, counts exactly
+the scans it missed, and sees the writer's ScanClock.
+
+Usage:
+    python benchmarks/shared_ring_benchmark.py
+
+Author: Liam Eime
+"""
+
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+
+import numpy as np
+
+import ljm_stand_in
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from t7stream import ScanClock  # noqa: E402
+from t7stream.shared import SharedRing, SharedRingReader  # noqa: E402
+
+NUM_CHANNELS = 8
+SCAN_RATE = 50000
+SCANS_PER_READ = 500  # 10 ms reads
+RING_READS = 20
+RUN_SECONDS = 4.0
+NUM_ANALYSERS = 2
+ANALYSIS_LOAD = 1.5  # Analysis seconds per second of scans, per analyser
+
+
+def check_sequence():
+    with SharedRing.for_reads(2, 10, 4) as ring:
+        reader = SharedRingReader(ring.name)
+        values = np.arange(200.0).reshape(-1, 2)  # 100 scans
+        for i in range(3):
+            ring.slot(10)[:] = values[i * 10:(i + 1) * 10]
+            ring.publish(10)
+        first, scans, lost = reader.read()
+        assert (first, lost) == (0, 0) and np.array_equal(scans, values[:30])
+        assert reader.read(timeout=0.01) is None
+
+        ring.write(values[30:100])  # 70 scans into a ring of 40: 30 are overwritten unread
+        first, scans, lost = reader.read()
+        assert (first, lost) == (60, 30) and np.array_equal(scans, values[60:100]), (first, lost)
+        assert reader.consumed + reader.lost == ring.total == 100
+
+        clock = ScanClock(1.7e9, 30000)
+        clock.update(1.7e9 + 0.25, 1 / 29999.5)
+        ring.publish_clock(clock)
+        assert reader.scan_clock().time_of(12345) == clock.time_of(12345)
+        reader.close()
+
+
+def acquire(ring_names, results, measure, stop):
+    """The acquisition process: stream into a SharedRing and, for
+    RUN_SECONDS after measure is set, record how late each read returned, in
+    seconds."""
+    library = ljm_stand_in.StandInLibrary(real_time=True)
+    ljm_stand_in.install(library)
+    from labjack import ljm
+    handle = ljm.openS("T7", "USB", "ANY")
+    ring = SharedRing.for_reads(NUM_CHANNELS, SCANS_PER_READ, RING_READS)
+    ljm.eStreamStart(handle, SCANS_PER_READ, NUM_CHANNELS, list(range(0, 2 * NUM_CHANNELS, 2)), SCAN_RATE)
+    stream = library._streams[handle]
+    ring_names.put(ring.name)
+    lateness = []
+    end = None
+    while end is None or time.perf_counter() < end:
+        ljm.eStreamReadInto(handle, ring.slot(SCANS_PER_READ))
+        late = time.perf_counter() - (stream.start + stream.reads * stream.read_period)
+        ring.publish(SCANS_PER_READ)
+        if end is not None:
+            lateness.append(late)
+        elif measure.is_set():
+            end = time.perf_counter() + RUN_SECONDS
+    total = ring.total
+    ljm.eStreamStop(handle)
+    ljm.close(handle)
+    ring.close()
+    results.put(("acquisition", (lateness, total)))
+    stop.wait()
+
+
+def analyse(ring_name, results):
+    """An analysis process or thread: consume the ring until it closes."""
+    reader = SharedRingReader(ring_name)
+    first_scan = reader.next_scan
+    results.put(("ready", None))
+    while True:
+        chunk = reader.read(max_scans=SCANS_PER_READ)
+        if chunk is None:
+            break
+        busy_until = time.perf_counter() + len(chunk[1]) / SCAN_RATE * ANALYSIS_LOAD
+        while time.perf_counter() < busy_until:
+            pass
+    results.put(("analysis", (first_scan, reader.consumed, reader.lost)))
+    reader.close()
+
+
+def run(num_analysers, processes=True):
+    """Returns (lateness array, scans written, [(first scan, consumed, lost)]
+    per analyser)."""
+    if processes:
+        context = multiprocessing.get_context("spawn")
+        worker, queues, event = context.Process, context.Queue, context.Event
+    else:
+        worker, queues, event = threading.Thread, queue.Queue, threading.Event
+    ring_names, results, measure, stop = queues(), queues(), event(), event()
+    acquisition = worker(target=acquire, args=(ring_names, results, measure, stop))
+    acquisition.start()
+    ring_name = ring_names.get()
+    analysers = [worker(target=analyse, args=(ring_name, results)) for _ in range(num_analysers)]
+    for analyser in analysers:
+        analyser.start()
+    outcomes = [results.get() for _ in range(num_analysers)]
+    measure.set()
+    outcomes += [results.get() for _ in range(num_analysers + 1)]
+    stop.set()
+    for process in [acquisition, *analysers]:
+        process.join()
+    lateness, total = [value for name, value in outcomes if name == "acquisition"][0]
+    return np.array(lateness), total, [value for name, value in outcomes if name == "analysis"]
+
+
+if __name__ == "__main__":
+    check_sequence()
+    print("Reader consumed scans in order, counted the overwritten scans as lost and saw the writer's clock\n")
+
+    print(f"{NUM_CHANNELS} channels at {SCAN_RATE} scans/s, {SCANS_PER_READ / SCAN_RATE * 1000:g} ms reads, "
+          f"{RUN_SECONDS:g} s, analysis load {ANALYSIS_LOAD:g}x real time each, {os.cpu_count()} CPU(s)")
+    print(f"{'':<34}{'read late ms':>24}{'analysis scans':>26}")
+    print(f"{'':<34}{'median':>8}{'p99':>8}{'max':>8}{'consumed':>13}{'lost':>13}")
+    rows = [("acquisition process, no analysis", run(0)),
+            (f"+ {NUM_ANALYSERS} analysis processes", run(NUM_ANALYSERS)),
+            (f"+ {NUM_ANALYSERS} analysis threads (GIL)", run(NUM_ANALYSERS, processes=False))]
+    p99 = {}
+    for name, (lateness, total, counts) in rows:
+        p99[name] = np.percentile(lateness, 99) * 1000
+        consumed = sum(c for _, c, _ in counts)
+        lost = sum(lost for _, _, lost in counts)
+        print(f"{name:<34}{np.median(lateness) * 1000:8.2f}{p99[name]:8.2f}{lateness.max() * 1000:8.2f}"
+              f"{consumed:13,}{lost:13,}")
+        for first_scan, reader_consumed, reader_lost in counts:
+            assert first_scan + reader_consumed + reader_lost == total, (first_scan, reader_consumed, reader_lost)
+    idle, processes, threads = p99.values()
+    if os.cpu_count() > 1:  # On one CPU the analysis processes share it with acquisition
+        assert processes < 2 * idle + 1.0, (idle, processes)
+    assert processes < threads, (processes, threads)
@@ -0,0 +1,105 @@
+"""
+Measures how much headroom main.py's per-read pipeline has at 10k-100k scans/s:
+the read period divided by the time one read takes to consume (eStreamReadInto,
+conversion to g and analysis). Below 1x the stream
+backlog grows until the device buffer overflows.
+
+The simulated T7 streams accelerometer channels with one event per second.
+Reads are taken back to back rather than in real time, and each read's
+analysis finishes before the next read so its cost is counted. The first and
+last READS_PER_RATE // 4 reads are reported separately because main.py keeps
+every sample, so its per-read cost grows with the run.
+
+Before timing, the stand-in's injections are checked: real-time pacing, LJM
+backlog from reading late, injected backlog, and skipped scans (-9999).
+
+Usage:
+    python benchmarks/stream_headroom_benchmark.py
+
+Author: Liam Eime
+"""
+
+import contextlib
+import importlib
+import os
+import sys
+import time
+
+import numpy as np
+from labjack import ljm
+
+import ljm_stand_in
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import main  # noqa: E402
+
+SCAN_RATES = [10000, 30000, 50000, 100000]
+READS_PER_RATE = 40
+
+
+def check_stand_in():
+    library = ljm_stand_in.install(ljm_stand_in.StandInLibrary(real_time=True))
+    handle = ljm.openS("T7", "USB", "ANY")
+    buffer = np.empty(100 * 2)
+    ljm.eStreamStart(handle, 100, 2, [0, 2], 10000)
+    start = time.perf_counter()
+    for _ in range(5):
+        ljm.eStreamReadInto(handle, buffer)
+    elapsed = time.perf_counter() - start
+    assert 0.045 < elapsed < 0.1, f"5 reads of 10 ms took {elapsed * 1000:.1f} ms"
+
+    time.sleep(0.05)  # 500 scans arrive while nothing reads
+    device_backlog, ljm_backlog = ljm.eStreamReadInto(handle, buffer)
+    assert device_backlog == 0 and 350 <= ljm_backlog <= 600, (device_backlog, ljm_backlog)
+
+    library.backlog = lambda h, read_index: (1000, 0)
+    library.skipped_scans = lambda h, read_index: [(10, 5)]
+    device_backlog, _ = ljm.eStreamReadInto(handle, buffer)
+    assert device_backlog == 1000, device_backlog
+    skipped = np.flatnonzero(buffer == ljm.constants.DUMMY_VALUE)
+    assert list(skipped) == list(range(20, 30)), skipped
+    ljm.eStreamStop(handle)
+    ljm.close(handle)
+
+
+def consume(scan_rate):
+    """Run READS_PER_RATE reads through main.py at scan_rate and return the
+    seconds each read took to consume."""
+    importlib.reload(main)  # Fresh module state for each rate
+    main.SCAN_RATE = scan_rate
+    main.RECORD_DATA = False  # Timed by recorder_benchmark.py
+    main.CAPTURE_EVENTS = False  # Timed by capture_benchmark.py
+    library = ljm_stand_in.install()
+    library.waveform = ljm_stand_in.accelerometer_waveform(scan_rate)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        handle = main.open_device()
+        aScanList = main.configure_device(handle)
+        scansPerRead = int(main.SCAN_RATE)
+        stream_buffer = np.empty(scansPerRead * len(aScanList))
+        main.start_stream(handle, aScanList, scansPerRead)
+        times = []
+        try:
+            for _ in range(READS_PER_RATE):
+                start = time.perf_counter()
+                ljm.eStreamReadInto(handle, stream_buffer)
+                main.handle_stream_read(stream_buffer)
+                main.pipeline.join()
+                times.append(time.perf_counter() - start)
+        finally:
+            main.stop_stream(handle)
+            ljm.close(handle)
+    return times
+
+
+if __name__ == "__main__":
+    check_stand_in()
+    print("Stand-in pacing, backlog and skipped-scan injection checks passed\n")
+
+    quarter = READS_PER_RATE // 4
+    print(f"main.py pipeline, {main.NUMBER_OF_AINS} channels, one-second reads, {READS_PER_RATE} reads per rate")
+    print(f"{'scans/s':>10}{'first ms/read':>16}{'last ms/read':>15}{'headroom first':>17}{'headroom last':>16}")
+    for scan_rate in SCAN_RATES:
+        times = consume(scan_rate)
+        first = np.mean(times[:quarter])
+        last = np.mean(times[-quarter:])
+        print(f"{scan_rate:10d}{first * 1000:16.2f}{last * 1000:15.2f}{1 / first:16.1f}x{1 / last:15.1f}x")
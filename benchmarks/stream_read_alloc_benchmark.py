@@ -0,0 +1,87 @@
+"""
+Compares the per-read cost of ljm.eStreamRead, which builds a new list each
+read, with ljm.eStreamReadInto, which fills a preallocated NumPy buffer.
+Also reads into each read's view of a multi-read buffer in turn, as main.py's
+read loop and the shared ring do, against slicing a new view for every read.
+Runs against the LJM stand-in so no device is needed. The stand-in is itself
+Python, so its own per-call allocations are reported as a floor; a read that
+allocates no more than the floor allocates nothing in the wrapper.
+
+Usage:
+    python benchmarks/stream_read_alloc_benchmark.py
+
+Author: Liam Eime
+"""
+
+import ctypes
+import itertools
+import time
+import tracemalloc
+
+import numpy as np
+from labjack import ljm
+
+import ljm_stand_in
+
+HANDLE = 1
+NUMBER_OF_AINS = 3
+SCAN_RATE = 30000
+SCANS_PER_READ = SCAN_RATE
+NUM_READS = 50
+NUM_VIEWS = 4  # Reads in the multi-read buffer
+
+
+def read_list():
+    """The main.py read path: list from eStreamRead converted to an ndarray."""
+    ret = ljm.eStreamRead(HANDLE)
+    return np.array(ret[0])
+
+
+def read_into(buffer):
+    """Read straight into the caller-owned buffer."""
+    return ljm.eStreamReadInto(HANDLE, buffer)
+
+
+def read_floor(library, buffer, backlogs):
+    """Call the stand-in directly; the cost every wrapper pays at minimum."""
+    return library.LJM_eStreamRead(HANDLE, buffer, backlogs[0], backlogs[1])
+
+
+def measure(name, read):
+    """Print the mean time and the bytes allocated per read, and return
+    the bytes."""
+    read()  # Warm up, so one-off view creation is not counted
+    start = time.perf_counter()
+    for _ in range(NUM_READS):
+        read()
+    per_read_s = (time.perf_counter() - start) / NUM_READS
+
+    tracemalloc.start()
+    peak_bytes = 0
+    for _ in range(NUM_READS):
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        read()
+        peak_bytes = max(peak_bytes, tracemalloc.get_traced_memory()[1] - baseline)
+    tracemalloc.stop()
+    print(f"{name:<34} {per_read_s * 1e3:9.3f} ms/read {peak_bytes:12d} bytes allocated/read")
+    return peak_bytes
+
+
+if __name__ == "__main__":
+    library = ljm_stand_in.install()
+    buffer = np.empty(SCANS_PER_READ * NUMBER_OF_AINS)
+    ljm.eStreamStart(HANDLE, SCANS_PER_READ, NUMBER_OF_AINS, list(range(0, 2 * NUMBER_OF_AINS, 2)), SCAN_RATE)
+    print(f"{NUMBER_OF_AINS} channels x {SCANS_PER_READ} scans per read, {NUM_READS} reads\n")
+    floor_buffer = (ctypes.c_double * (SCANS_PER_READ * NUMBER_OF_AINS))()
+    floor_backlogs = (ctypes.byref(ctypes.c_int32()), ctypes.byref(ctypes.c_int32()))
+    floor = measure("stand-in call only (floor)", lambda: read_floor(library, floor_buffer, floor_backlogs))
+    measure("eStreamRead + np.array", read_list)
+    into = measure("eStreamReadInto", lambda: read_into(buffer))
+    reads = np.empty((NUM_VIEWS, SCANS_PER_READ * NUMBER_OF_AINS))
+    views = itertools.cycle(list(reads))  # One view object per read, as main.read_chunk keeps
+    in_turn = measure(f"eStreamReadInto, {NUM_VIEWS} views in turn", lambda: read_into(next(views)))
+    slices = itertools.cycle(range(NUM_VIEWS))
+    measure("eStreamReadInto, new slice per read", lambda: read_into(reads[next(slices)]))
+    ljm.eStreamStop(HANDLE)
+    assert into <= floor and in_turn <= floor, (floor, into, in_turn)
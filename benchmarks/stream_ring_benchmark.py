@@ -0,0 +1,198 @@
+"""
+Checks labjack.ljm's StreamRing on the real-time stand-in T7: every read
+arrives in order and complete, a consumer that stalls longer than the ring
+holds leaves the scans in the LJM backlog instead of losing them, and
+main.py's read loop finds every event when reading from the ring.
+
+Then compares the cost on LJM's stream thread of a setStreamCallback
+callback that calls eStreamRead, as LJM's stream_callback.py example does,
+with StreamRing's callback, and the handoff latency of each in real time:
+how long after a chunk is due a consumer thread has it.
+
+Usage:
+    python benchmarks/stream_ring_benchmark.py
+
+Author: Liam Eime
+"""
+
+import contextlib
+import io
+import os
+import queue
+import statistics
+import sys
+import time
+
+import numpy as np
+from labjack import ljm
+
+import ljm_stand_in
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import main  # noqa: E402
+
+NUM_CHANNELS = 3
+SCAN_RATE = 10000
+SCANS_PER_READ = 250  # 25 ms reads, main.py's READ_SECONDS
+NUM_SLOTS = 8
+NUM_HANDOFFS = 80
+RUN_SECONDS = 3
+TIMED_SCAN_RATE = 30000  # One-second reads for the callback cost
+TIMED_CALLBACKS = 50
+
+
+def index_waveform(first_scan, num_scans, num_addresses):
+    """Each value is its position in the stream, so gaps and repeats show."""
+    return np.arange(first_scan * num_addresses, (first_scan + num_scans) * num_addresses, dtype=np.float64)
+
+
+def start(scan_rate, scans_per_read, real_time=True, waveform=index_waveform):
+    library = ljm_stand_in.install(ljm_stand_in.StandInLibrary(real_time=real_time))
+    library.waveform = waveform
+    handle = ljm.openS("T7", "USB", "ANY")
+    ljm.eStreamStart(handle, scans_per_read, NUM_CHANNELS, [0, 2, 4], scan_rate)
+    return library, handle
+
+
+def check():
+    library, handle = start(SCAN_RATE, SCANS_PER_READ)
+    period = SCANS_PER_READ / SCAN_RATE
+    values = SCANS_PER_READ * NUM_CHANNELS
+    ring = ljm.StreamRing(handle, SCANS_PER_READ, NUM_SLOTS)
+    read = np.empty(values)
+    try:
+        assert not ring.wait(0) and ring.readInto(read, 0) is None  # Nothing is due yet
+        for i in range(10):
+            ring.readInto(read)
+            assert np.array_equal(read, np.arange(i * values, (i + 1) * values)), i
+        # Stall for twice the ring: the callback leaves the rest in the LJM buffer
+        time.sleep(2 * NUM_SLOTS * period)
+        assert ring.available == NUM_SLOTS and ring.fullCallbacks > 0
+        backlogs = []
+        for i in range(10, 10 + 4 * NUM_SLOTS):
+            backlogs.append(ring.readInto(read)[1])
+            assert np.array_equal(read, np.arange(i * values, (i + 1) * values)), i
+        assert max(backlogs) >= NUM_SLOTS * SCANS_PER_READ // 2 and backlogs[-1] < SCANS_PER_READ, backlogs
+    finally:
+        ljm.eStreamStop(handle)
+    ring.close()  # Already removed by eStreamStop
+    ljm.close(handle)
+    try:
+        ljm.StreamRing(handle, SCANS_PER_READ, NUM_SLOTS)
+    except ljm.LJMError:
+        pass
+    else:
+        raise AssertionError("a StreamRing without a stream")
+
+
+def stream_main():
+    """Run main.py's read loop from a StreamRing for RUN_SECONDS and return
+    (events, reads, largest LJM backlog)."""
+    main.SCAN_RATE = 30000
+    main.RECORD_DATA = False  # Timed by recorder_benchmark.py
+    main.CAPTURE_EVENTS = False  # Timed by capture_benchmark.py
+    library = ljm_stand_in.install(ljm_stand_in.StandInLibrary(real_time=True))
+    library.waveform = ljm_stand_in.accelerometer_waveform(main.SCAN_RATE)
+    events = []
+    print_events = main.print_events
+    main.print_events = events.append
+    reads = max_backlog = 0
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            handle = main.open_device()
+            aScanList = main.configure_device(handle)
+            scansPerRead = int(main.SCAN_RATE * main.READ_SECONDS)
+            scanRate, _ = main.start_stream(handle, aScanList, scansPerRead)
+            main.cadence = main.ReadCadence(scanRate, scansPerRead, main.MAX_CHUNK_SECONDS, main.MAX_CHUNK_OVERHEAD)
+            main.stream_ring = ljm.StreamRing(handle, scansPerRead, main.STREAM_RING_READS)
+            stream_buffer = np.empty(main.cadence.max_reads * scansPerRead * len(aScanList))
+            total_reads = int(RUN_SECONDS * scanRate) // scansPerRead
+            try:
+                while reads < total_reads:
+                    # The last chunk stops at RUN_SECONDS, before the next second's events
+                    main.cadence.reads_per_chunk = min(main.cadence.reads_per_chunk, total_reads - reads)
+                    reads += main.cadence.reads_per_chunk
+                    chunk, backlogs = main.read_chunk(handle, stream_buffer, scansPerRead)
+                    main.handle_stream_read(chunk)
+                    max_backlog = max(max_backlog, backlogs[1])
+            finally:
+                main.stop_stream(handle)
+                ljm.close(handle)
+    finally:
+        main.print_events = print_events
+        main.cadence = main.stream_ring = None
+    return np.concatenate(events), reads, max_backlog
+
+
+def callback_cost():
+    """Return the seconds each callback holds LJM's stream thread for a
+    one-second read, calling eStreamRead and with StreamRing."""
+    _, handle = start(TIMED_SCAN_RATE, TIMED_SCAN_RATE, real_time=False, waveform=None)  # The stand-in's ramp
+    try:
+        ring = ljm.StreamRing(handle, TIMED_SCAN_RATE, NUM_SLOTS)
+        ring.close()  # The stand-in would call it back to back; it is driven by hand below
+        seconds = {}
+        begin = time.perf_counter()
+        for _ in range(TIMED_CALLBACKS):
+            ljm.eStreamRead(handle)
+        seconds["eStreamRead"] = (time.perf_counter() - begin) / TIMED_CALLBACKS
+        begin = time.perf_counter()
+        for _ in range(TIMED_CALLBACKS):
+            ring._read = ring._written  # Consumed, so the callback has a free slot
+            ring._callback(None)
+        seconds["StreamRing"] = (time.perf_counter() - begin) / TIMED_CALLBACKS
+    finally:
+        ljm.eStreamStop(handle)
+        ljm.close(handle)
+    return seconds
+
+
+def handoff_ms(use_ring):
+    """Return how late after each chunk was due a consumer thread had it,
+    in real time, with StreamRing or with a callback that calls eStreamRead
+    and queues the list."""
+    library, handle = start(SCAN_RATE, SCANS_PER_READ)
+    stream_start = library._streams[handle].start
+    done_times = []
+
+    if use_ring:
+        ring = ljm.StreamRing(handle, SCANS_PER_READ, NUM_SLOTS)
+        read = np.empty(SCANS_PER_READ * NUM_CHANNELS)
+        for _ in range(NUM_HANDOFFS):
+            ring.readInto(read)
+            done_times.append(time.perf_counter())
+    else:
+        chunks = queue.Queue()
+        ljm.setStreamCallback(handle, lambda callback_handle: chunks.put(ljm.eStreamRead(callback_handle)))
+        for _ in range(NUM_HANDOFFS):
+            chunks.get()
+            done_times.append(time.perf_counter())
+    ljm.eStreamStop(handle)
+    ljm.close(handle)
+    period = SCANS_PER_READ / SCAN_RATE
+    return sorted((t - (stream_start + (i + 1) * period)) * 1000 for i, t in enumerate(done_times))
+
+
+if __name__ == "__main__":
+    check()
+    print("StreamRing delivered every read in order and kept the scans in the LJM backlog while the ring was full\n")
+
+    events, reads, max_backlog = stream_main()
+    expected = RUN_SECONDS * main.NUMBER_OF_AINS
+    print(f"main.py from a StreamRing for {RUN_SECONDS} s: {reads} reads, {len(events)} events of {expected}, "
+          f"largest LJM backlog {max_backlog} scans\n")
+    assert len(events) == expected
+
+    seconds = callback_cost()
+    print(f"Time on LJM's stream thread per callback, {NUM_CHANNELS} channels, {TIMED_SCAN_RATE}-scan reads")
+    for name, value in seconds.items():
+        print(f"{name:>14}{value * 1e6:10.0f} us")
+    assert seconds["StreamRing"] < seconds["eStreamRead"]
+
+    print(f"\nHandoff to a consumer thread, {SCANS_PER_READ} scans every {SCANS_PER_READ / SCAN_RATE * 1000:g} ms, "
+          f"{NUM_HANDOFFS} chunks")
+    print(f"{'':>26}{'median ms':>11}{'max ms':>9}")
+    for name, use_ring in [("callback + eStreamRead", False), ("StreamRing", True)]:
+        lateness = handoff_ms(use_ring)
+        print(f"{name:>26}{statistics.median(lateness):11.3f}{lateness[-1]:9.3f}")
+        assert statistics.median(lateness) < 5
@@ -0,0 +1,96 @@
+"""
+Checks t7stream's threshold sweep against EventDetector run over a whole
+recording, then sweeps a grid of thresholds and buffer periods over a
+recording of the stand-in accelerometer waveform with 1, 2, 4, ... worker
+processes, up to the CPU count, and reports how the sweep scales.
+
+Usage:
+    python benchmarks/sweep_benchmark.py
+
+Author: Liam Eime
+"""
+
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import ljm_stand_in
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from t7stream import EventDetector, Recorder, ScanClock  # noqa: E402
+from t7stream.sweep import format_table, sweep  # noqa: E402
+
+NUM_CHANNELS = 3
+SCAN_RATE = 30000
+RECORD_SECONDS = 240
+SHARD_SECONDS = 10
+THRESHOLDS = np.linspace(0.1, 1.5, 15)
+BUFFER_PERIODS = [0.01, 0.02, 0.05, 0.1, 0.2]
+CALIBRATION = {"offset": 2.5, "sensitivity": 1.0, "unit": "g"}
+
+
+def record(path, scan_rate, seconds, event_interval, dtype=np.float64):
+    """Record seconds of the waveform in one-second reads, in four files,
+    and return the files."""
+    waveform = ljm_stand_in.accelerometer_waveform(scan_rate, event_interval=event_interval, event_duration=0.01,
+                                                   noise_g=0.05)
+    channel_names = [f"AIN{i}" for i in range(NUM_CHANNELS)]
+    with Recorder(path, channel_names, scan_rate, ScanClock(1.7e9, scan_rate), CALIBRATION, dtype, block=True,
+                  max_seconds=seconds / 4) as recorder:
+        for read in range(seconds):
+            recorder.write_interleaved(waveform(read * scan_rate, scan_rate, NUM_CHANNELS))
+    return recorder.files
+
+
+def check(directory):
+    scan_rate = 10000
+    files = record(os.path.join(directory, "check.t7r"), scan_rate, 20, event_interval=0.37)
+    thresholds = [0.3, 0.6, 1.2]
+    table = sweep(files, thresholds, [0.01, 0.05], shard_seconds=3, workers=2)
+    waveform = ljm_stand_in.accelerometer_waveform(scan_rate, event_interval=0.37, event_duration=0.01, noise_g=0.05)
+    g = (waveform(0, 20 * scan_rate, NUM_CHANNELS) - 2.5).reshape(-1, NUM_CHANNELS).T
+    for row in table:
+        detector = EventDetector(np.full(NUM_CHANNELS, row["threshold"]), int(row["buffer_period"] * scan_rate))
+        events = np.concatenate((detector.process(g, 0), detector.flush()))
+        events = events[events["channel"] == row["channel"]]
+        assert row["events"] == len(events), (row, len(events))
+        if len(events):
+            assert np.isclose(row["peak_mean"], events["peak"].mean()) and row["peak_max"] == events["peak"].max()
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as directory:
+        check(directory)
+        print("Sweep matches EventDetector across shards and rotated files\n")
+
+        files = record(os.path.join(directory, "sweep.t7r"), SCAN_RATE, RECORD_SECONDS, event_interval=0.5,
+                       dtype=np.float32)
+        combinations = len(THRESHOLDS) ** NUM_CHANNELS * len(BUFFER_PERIODS)
+        print(f"{RECORD_SECONDS} s of {NUM_CHANNELS} channels at {SCAN_RATE} scans/s, {len(THRESHOLDS)} thresholds "
+              f"per channel x {len(BUFFER_PERIODS)} buffer periods ({combinations:,} combinations), "
+              f"{SHARD_SECONDS} s shards, {os.cpu_count()} CPU(s)")
+        print(f"{'workers':>8}{'seconds':>10}{'x real time':>13}{'speedup':>10}{'efficiency':>12}")
+        workers, single, tables = 1, None, []
+        while workers <= (os.cpu_count() or 1):
+            with ProcessPoolExecutor(workers) as pool:
+                # Start the workers first, so the times leave out process start-up
+                list(pool.map(time.sleep, [0.2] * workers))
+                start = time.perf_counter()
+                tables.append(sweep(files, THRESHOLDS, BUFFER_PERIODS, SHARD_SECONDS, executor=pool))
+                seconds = time.perf_counter() - start
+            single = single or seconds
+            print(f"{workers:8d}{seconds:10.2f}{RECORD_SECONDS / seconds:13.0f}{single / seconds:10.2f}"
+                  f"{single / seconds / workers:12.0%}")
+            if 2 <= workers <= (os.cpu_count() or 1) // 2:  # Physical cores, if there is hyper-threading
+                assert single / seconds > 0.7 * workers, (workers, single / seconds)
+            workers *= 2
+        assert all(np.array_equal(table[field], tables[0][field], equal_nan=True)
+                   for table in tables for field in table.dtype.names)
+
+    print()
+    rows = tables[0][(tables[0]["buffer_period"] == 0.05) & (tables[0]["channel"] == 0)]
+    print(format_table(rows[::3], [f"AIN{i}" for i in range(NUM_CHANNELS)]))
@@ -57,6 +57,16 @@ def eAddressesIteration(handle, numFrames, aAddresses, aTypes, aWrites,
     results.extend(r)
 
 
+def framePlanIteration(handle, plan, results):
+    """Function for timit.Timer. Executes a prebuilt FramePlan to do
+    LabJack operations. Takes the FramePlan and a list for results which
+    will be filled.
+
+    """
+    del results[:]
+    results.extend(plan.execute(handle))
+
+
 # Open first found LabJack
 handle = ljm.openS("ANY", "ANY", "ANY")  # Any device, Any connection, Any identifier
 #handle = ljm.openS("T7", "ANY", "ANY")  # T7 device, Any connection, Any identifier
@@ -87,6 +97,11 @@ writeDACs = False
 # is faster than eNames.
 useAddresses = True
 
+# Use a prebuilt FramePlan (True) in the operations loop instead of eAddresses
+# or eNames. The plan converts its arrays once, so only the LJM call remains
+# per iteration.
+useFramePlan = False
+
 # Device specific configuration
 if deviceType == ljm.constants.dtT4:
     # T4 analog input configuration
@@ -190,7 +205,12 @@ minMS = 0
 totalMS = 0
 results = []
 t = None
-if useAddresses:
+if useFramePlan:
+    plan = ljm.FramePlan(numFrames, aAddresses, aTypes, aWrites, aNumValues,
+                         aValues)
+    t = timeit.Timer(functools.partial(framePlanIteration, handle, plan,
+                                       results))
+elif useAddresses:
     t = timeit.Timer(functools.partial(eAddressesIteration, handle, numFrames,
                                        aAddresses, aTypes, aWrites, aNumValues,
                                        aValues, results))
@@ -199,7 +219,7 @@ else:
                                        aNames, aWrites, aNumValues, aValues,
                                        results))
 
-# eAddresses or eNames loop
+# FramePlan, eAddresses or eNames loop
 for i in range(numIterations):
     ttMS = t.timeit(number=1)
     if minMS == 0:
@@ -214,7 +234,9 @@ print("    Average time per iteration: %.3f ms" %
       (totalMS / numIterations * 1000))
 print("    Min / Max time for one iteration: %.3f ms / %.3f ms" %
       (minMS * 1000, maxMS * 1000))
-if useAddresses:
+if useFramePlan:
+    print("\nLast FramePlan results: ")
+elif useAddresses:
     print("\nLast eAddresses results: ")
 else:
     print("\nLast eNames results: ")
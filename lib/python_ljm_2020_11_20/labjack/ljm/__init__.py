@@ -4,6 +4,9 @@ Package for cross-platform wrapper for the LJM library.
 """
 
 from labjack.ljm.ljm import *
+from labjack.ljm.frameplan import FramePlan
+from labjack.ljm.registers import RegisterMap
+from labjack.ljm.streamring import StreamRing
 
 
 __version__ = "1.21.0"
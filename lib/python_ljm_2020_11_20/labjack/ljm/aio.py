@@ -0,0 +1,277 @@
+"""
+asyncio interface to the labjack.ljm functions.
+
+The LJM calls block, and eStreamRead waits inside the library until
+scansPerRead scans arrive. Each handle therefore gets one dedicated I/O
+thread that runs its calls in the order they were awaited, and the event
+loop is only woken with the results. One event loop can drive many devices
+and their analysis coroutines without starting a thread per call.
+
+Stream reads the stream of a handle as an async iterator. The next
+eStreamRead is only started once the consumer has room for its chunk, and
+leaving the stream or cancelling its consumer stops the stream with
+eStreamStop.
+
+Requires Python 3.5 or later.
+
+"""
+import asyncio
+import collections
+import threading
+
+from labjack.ljm import constants
+from labjack.ljm import ljm
+
+
+_g_threads = {}
+_g_threadsLock = threading.Lock()
+
+
+def _setResult(future, result):
+    if not future.cancelled():
+        future.set_result(result)
+
+
+def _setException(future, exception):
+    if not future.cancelled():
+        future.set_exception(exception)
+
+
+class _HandleThread(object):
+    """A thread that runs blocking LJM calls one at a time, in order."""
+    def __init__(self, name):
+        self._calls = collections.deque()
+        self._ready = threading.Condition(threading.Lock())
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name=name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def submit(self, function, *args):
+        """Queues function(*args) and returns an asyncio future for its
+        result."""
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        with self._ready:
+            self._calls.append((loop, future, function, args))
+            self._ready.notify()
+        return future
+
+    def stop(self):
+        """Ends the thread once the queued calls are done."""
+        with self._ready:
+            self._stopping = True
+            self._ready.notify()
+
+    def _run(self):
+        while True:
+            with self._ready:
+                while not self._calls and not self._stopping:
+                    self._ready.wait()
+                if not self._calls:
+                    return
+                loop, future, function, args = self._calls.popleft()
+            if future.cancelled():
+                continue
+            try:
+                result = function(*args)
+            except Exception as e:
+                loop.call_soon_threadsafe(_setException, future, e)
+            else:
+                loop.call_soon_threadsafe(_setResult, future, result)
+
+
+def _getThread(handle):
+    """Returns the I/O thread of handle, starting one for handles opened
+    with labjack.ljm directly."""
+    with _g_threadsLock:
+        thread = _g_threads.get(handle)
+        if thread is None:
+            thread = _g_threads[handle] = _HandleThread("ljm-aio-" + str(handle))
+        return thread
+
+
+def call(handle, function, *args):
+    """Runs function(handle, *args) on the handle's I/O thread.
+
+    Args:
+        handle: A valid handle to an open device.
+        function: A blocking function taking the handle as its first
+            argument, such as a labjack.ljm function.
+        args: The function's remaining arguments.
+
+    Returns:
+        An awaitable for the function's return value. Exceptions raised
+        by the function are raised by the await.
+
+    """
+    return _getThread(handle).submit(function, handle, *args)
+
+
+async def _open(openFunction, deviceType, connectionType, identifier):
+    thread = _HandleThread("ljm-aio-open")
+    try:
+        handle = await thread.submit(openFunction, deviceType, connectionType, identifier)
+    except:
+        thread.stop()
+        raise
+    with _g_threadsLock:
+        previous = _g_threads.get(handle)
+        _g_threads[handle] = thread
+    if previous is not None:
+        previous.stop()
+    return handle
+
+
+async def open(deviceType=constants.ctANY, connectionType=constants.ctANY, identifier="ANY"):
+    """Awaitable labjack.ljm.open. The handle's I/O thread is started
+    here and used for its later calls.
+
+    """
+    return await _open(ljm.open, deviceType, connectionType, identifier)
+
+
+async def openS(deviceType="ANY", connectionType="ANY", identifier="ANY"):
+    """Awaitable labjack.ljm.openS. The handle's I/O thread is started
+    here and used for its later calls.
+
+    """
+    return await _open(ljm.openS, deviceType, connectionType, identifier)
+
+
+async def close(handle):
+    """Awaitable labjack.ljm.close. Waits for the handle's queued calls,
+    closes the handle and ends its I/O thread.
+
+    """
+    thread = _getThread(handle)
+    try:
+        await thread.submit(ljm.close, handle)
+    finally:
+        with _g_threadsLock:
+            if _g_threads.get(handle) is thread:
+                del _g_threads[handle]
+        thread.stop()
+
+
+def _handleFunction(function):
+    async def wrapper(handle, *args):
+        return await _getThread(handle).submit(function, handle, *args)
+    wrapper.__name__ = function.__name__
+    wrapper.__doc__ = ("Awaitable labjack.ljm." + function.__name__ + ", run on the handle's I/O thread. Takes the "
+                       "same arguments and returns the same value.")
+    return wrapper
+
+
+eReadAddress = _handleFunction(ljm.eReadAddress)
+eReadAddresses = _handleFunction(ljm.eReadAddresses)
+eReadAddressArray = _handleFunction(ljm.eReadAddressArray)
+eReadName = _handleFunction(ljm.eReadName)
+eReadNames = _handleFunction(ljm.eReadNames)
+eReadNameArray = _handleFunction(ljm.eReadNameArray)
+eWriteAddress = _handleFunction(ljm.eWriteAddress)
+eWriteAddresses = _handleFunction(ljm.eWriteAddresses)
+eWriteAddressArray = _handleFunction(ljm.eWriteAddressArray)
+eWriteName = _handleFunction(ljm.eWriteName)
+eWriteNames = _handleFunction(ljm.eWriteNames)
+eWriteNameArray = _handleFunction(ljm.eWriteNameArray)
+eAddresses = _handleFunction(ljm.eAddresses)
+eNames = _handleFunction(ljm.eNames)
+eStreamStart = _handleFunction(ljm.eStreamStart)
+eStreamRead = _handleFunction(ljm.eStreamRead)
+eStreamReadInto = _handleFunction(ljm.eStreamReadInto)
+eStreamStop = _handleFunction(ljm.eStreamStop)
+getHandleInfo = _handleFunction(ljm.getHandleInfo)
+
+
+class Stream(object):
+    """A handle's stream as an async iterator of eStreamRead results.
+
+    Args:
+        handle: A valid handle to an open device.
+        scansPerRead, numAddresses, aScanList, scanRate: As for
+            labjack.ljm.eStreamStart.
+        maxChunks: The most chunks read ahead of the consumer. When they
+            are all waiting, no eStreamRead is started and the data
+            stays in the LJM buffer, which shows in ljmBacklog. Default
+            is 4.
+
+    Each iteration returns (aData, deviceBacklog, ljmBacklog), as
+    labjack.ljm.eStreamRead does. Use it as an async context manager:
+
+        async with aio.Stream(handle, 1000, 2, aScanList, 10000) as stream:
+            async for aData, deviceBacklog, ljmBacklog in stream:
+                ...
+
+    Leaving the block, including by an exception or cancellation, stops
+    the stream with eStreamStop after any eStreamRead in progress.
+    Other calls on the handle run between the stream's reads.
+
+    """
+    def __init__(self, handle, scansPerRead, numAddresses, aScanList, scanRate, maxChunks=4):
+        self.handle = handle
+        self.scanRate = scanRate
+        self._startArgs = (scansPerRead, numAddresses, aScanList, scanRate)
+        self._maxChunks = maxChunks
+        self._chunks = None
+        self._pump = None
+        self._stopped = False
+        self._failed = False
+
+    async def start(self):
+        """Starts the stream and the reads. Returns the actual scan rate.
+
+        Raises:
+            LJMError: eStreamStart failed.
+
+        """
+        self.scanRate = await eStreamStart(self.handle, *self._startArgs)
+        self._chunks = asyncio.Queue(self._maxChunks)
+        self._pump = asyncio.ensure_future(self._readChunks())
+        return self.scanRate
+
+    async def _readChunks(self):
+        thread = _getThread(self.handle)
+        try:
+            while True:
+                chunk = await thread.submit(ljm.eStreamRead, self.handle)
+                await self._chunks.put(chunk)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Passed to the consumer after the chunks already read.
+            await self._chunks.put(e)
+
+    async def stop(self):
+        """Stops the reads and then the stream. Safe to call more than
+        once.
+
+        Raises:
+            LJMError: eStreamStop failed.
+
+        """
+        if self._stopped or self._pump is None:
+            return
+        self._stopped = True
+        self._pump.cancel()
+        # Queued on the I/O thread after any read in progress.
+        await eStreamStop(self.handle)
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, excType, excValue, traceback):
+        await asyncio.shield(self.stop())
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._stopped or self._failed:
+            raise StopAsyncIteration
+        chunk = await self._chunks.get()
+        if isinstance(chunk, Exception):
+            self._failed = True
+            raise chunk
+        return chunk
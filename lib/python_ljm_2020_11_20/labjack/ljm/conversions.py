@@ -0,0 +1,316 @@
+"""
+Big-endian conversions between register values and bytes, done in Python
+instead of the LJM library.
+
+The functions match float32ToByteArray, byteArrayToFLOAT32 and the other
+LJM byte array conversions bit for bit, but take and return bytes,
+bytearray and NumPy arrays directly instead of lists. Large payloads such
+as SD card file dumps, SPI/I2C data and raw Modbus responses are converted
+without building a list per byte. NumPy is used when it is installed,
+otherwise the struct module.
+
+"""
+import ctypes
+import struct
+
+
+# ctypes type, struct format character and NumPy big-endian dtype of the
+# values for each conversion. Values are converted with the ctypes type's
+# rules before packing, as the LJM wrapper functions do.
+_FLOAT32 = (ctypes.c_float, "f", ">f4")
+_UINT16 = (ctypes.c_uint16, "H", ">u2")
+_UINT32 = (ctypes.c_uint32, "I", ">u4")
+_INT32 = (ctypes.c_int32, "i", ">i4")
+
+_g_numpy = None
+
+
+def _numpy():
+    """Returns the numpy module, or None if it is not installed. NumPy is
+    imported on first use so importing labjack.ljm stays fast.
+
+    """
+    global _g_numpy
+    if _g_numpy is None:
+        try:
+            import numpy
+            _g_numpy = numpy
+        except ImportError:
+            _g_numpy = False
+    return _g_numpy or None
+
+
+def _isWritableBuffer(obj):
+    try:
+        return not memoryview(obj).readonly
+    except TypeError:
+        return False
+
+
+def _valuesToBytes(values, kind, registerOffset, numValues, aBytes):
+    cType, structChar, dtype = kind
+    size = ctypes.sizeof(cType)
+    if numValues is None:
+        numValues = len(values)
+    start = registerOffset*2
+    end = start + numValues*size
+    if aBytes is None:
+        aBytes = bytearray(end)
+    elif not _isWritableBuffer(aBytes):
+        aBytes = bytearray(aBytes)
+    numBytes = memoryview(aBytes).nbytes
+    if numBytes < end:
+        raise ValueError("aBytes has " + str(numBytes) + " bytes but " + str(end) + " are needed.")
+
+    numpy = _numpy()
+    if numpy is not None:
+        source = numpy.asarray(values)[:numValues]
+        if structChar == "f" and source.dtype != numpy.float32:
+            # Round through doubles, as ctypes.c_float does.
+            source = source.astype(numpy.float64, copy=False)
+        with numpy.errstate(over="ignore"):
+            # Out of range floats become infinity without a warning, as
+            # with ctypes.c_float.
+            numpy.frombuffer(aBytes, dtype=numpy.uint8)[start:end].view(dtype)[:] = source
+    else:
+        converted = (cType*numValues)(*values[:numValues])
+        struct.pack_into(">" + str(numValues) + structChar, aBytes, start, *converted)
+    return aBytes
+
+
+def _bytesToValues(aBytes, kind, registerOffset, numValues, aValues):
+    cType, structChar, dtype = kind
+    size = ctypes.sizeof(cType)
+    try:
+        numBytes = memoryview(aBytes).nbytes
+    except TypeError:
+        aBytes = bytearray(aBytes)
+        numBytes = len(aBytes)
+    start = registerOffset*2
+    if numValues is None:
+        numValues = max(numBytes - start, 0)//size
+    if start + numValues*size > numBytes:
+        raise ValueError("aBytes has " + str(numBytes) + " bytes but " + str(start + numValues*size) + " are needed.")
+
+    numpy = _numpy()
+    if numpy is not None:
+        raw = numpy.frombuffer(aBytes, dtype=numpy.uint8)[start:start + numValues*size]
+        values = raw.view(dtype).astype(numpy.dtype(dtype).newbyteorder("="))
+        if aValues is None:
+            return values
+        aValues = numpy.asarray(aValues)
+        aValues[:numValues] = values
+        return aValues
+    values = list(struct.unpack_from(">" + str(numValues) + structChar, aBytes, start))
+    if aValues is None:
+        return values
+    aValues = list(aValues)
+    aValues[:numValues] = values
+    return aValues
+
+
+def float32ToByteArray(aFLOAT32, registerOffset=0, numFLOAT32=None, aBytes=None):
+    """Converts values from 32-bit floats to bytes (big-endian).
+
+    Args:
+        aFLOAT32: The 32-bit float values to be converted. A list,
+            tuple or NumPy array.
+        registerOffset: The register offset to put the converted values
+            in aBytes. Default is 0.
+        numFLOAT32: The number of values to convert. Default is None
+            and will be set to the length of aFLOAT32.
+        aBytes: Bytes to convert into. A writable buffer, such as a
+            bytearray or uint8 NumPy array, is written in place. Other
+            bytes-like objects and lists are copied to a new bytearray.
+            It should be at least registerOffset*2 + numFLOAT32*4 in
+            size. Default is None, which creates a bytearray of the
+            correct size filled with zeros.
+
+    Returns:
+        aBytes with the converted values in byte form.
+
+    Raises:
+        ValueError: aBytes is too small.
+
+    """
+    return _valuesToBytes(aFLOAT32, _FLOAT32, registerOffset, numFLOAT32, aBytes)
+
+
+def byteArrayToFLOAT32(aBytes, registerOffset=0, numFLOAT32=None, aFLOAT32=None):
+    """Converts values from bytes (big-endian) to 32-bit floats.
+
+    Args:
+        aBytes: The bytes to be converted. A bytes-like object, uint8
+            NumPy array or list of byte values.
+        registerOffset: The register offset to get the values from in
+            aBytes. Default is 0.
+        numFLOAT32: The number of 32-bit float values to convert.
+            Default is None, and will be the length of aBytes divided
+            by 4.
+        aFLOAT32: Values to convert into. A NumPy array is written in
+            place. It should be at least numFLOAT32 in size. Default is
+            None, which creates an array of the correct size.
+
+    Returns:
+        A float32 NumPy array of the converted values, or a list of
+        floats if NumPy is not installed.
+
+    Raises:
+        ValueError: aBytes is too small.
+
+    """
+    return _bytesToValues(aBytes, _FLOAT32, registerOffset, numFLOAT32, aFLOAT32)
+
+
+def uint16ToByteArray(aUINT16, registerOffset=0, numUINT16=None, aBytes=None):
+    """Converts values from 16-bit unsigned integers to bytes
+    (big-endian).
+
+    Args:
+        aUINT16: The 16-bit unsigned integer values to be converted. A
+            list, tuple or NumPy array.
+        registerOffset: The register offset to put the converted values
+            in aBytes. Default is 0.
+        numUINT16: The number of values to convert. Default is None and
+            will be set to the length of aUINT16.
+        aBytes: Bytes to convert into, as for float32ToByteArray. It
+            should be at least registerOffset*2 + numUINT16*2 in size.
+            Default is None, which creates a bytearray of the correct
+            size filled with zeros.
+
+    Returns:
+        aBytes with the converted values in byte form.
+
+    Raises:
+        ValueError: aBytes is too small.
+
+    """
+    return _valuesToBytes(aUINT16, _UINT16, registerOffset, numUINT16, aBytes)
+
+
+def byteArrayToUINT16(aBytes, registerOffset=0, numUINT16=None, aUINT16=None):
+    """Converts values from bytes (big-endian) to 16-bit unsigned
+    integers.
+
+    Args:
+        aBytes: The bytes to be converted, as for byteArrayToFLOAT32.
+        registerOffset: The register offset to get the values from in
+            aBytes. Default is 0.
+        numUINT16: The number of 16-bit unsigned integer values to
+            convert. Default is None, and will be the length of aBytes
+            divided by 2.
+        aUINT16: Values to convert into. A NumPy array is written in
+            place. It should be at least numUINT16 in size. Default is
+            None, which creates an array of the correct size.
+
+    Returns:
+        A uint16 NumPy array of the converted values, or a list of
+        integers if NumPy is not installed.
+
+    Raises:
+        ValueError: aBytes is too small.
+
+    """
+    return _bytesToValues(aBytes, _UINT16, registerOffset, numUINT16, aUINT16)
+
+
+def uint32ToByteArray(aUINT32, registerOffset=0, numUINT32=None, aBytes=None):
+    """Converts values from 32-bit unsigned integers to bytes
+    (big-endian).
+
+    Args:
+        aUINT32: The 32-bit unsigned integer values to be converted. A
+            list, tuple or NumPy array.
+        registerOffset: The register offset to put the converted values
+            in aBytes. Default is 0.
+        numUINT32: The number of values to convert. Default is None and
+            will be set to the length of aUINT32.
+        aBytes: Bytes to convert into, as for float32ToByteArray. It
+            should be at least registerOffset*2 + numUINT32*4 in size.
+            Default is None, which creates a bytearray of the correct
+            size filled with zeros.
+
+    Returns:
+        aBytes with the converted values in byte form.
+
+    Raises:
+        ValueError: aBytes is too small.
+
+    """
+    return _valuesToBytes(aUINT32, _UINT32, registerOffset, numUINT32, aBytes)
+
+
+def byteArrayToUINT32(aBytes, registerOffset=0, numUINT32=None, aUINT32=None):
+    """Converts values from bytes (big-endian) to 32-bit unsigned
+    integers.
+
+    Args:
+        aBytes: The bytes to be converted, as for byteArrayToFLOAT32.
+        registerOffset: The register offset to get the values from in
+            aBytes. Default is 0.
+        numUINT32: The number of 32-bit unsigned integer values to
+            convert. Default is None, and will be the length of aBytes
+            divided by 4.
+        aUINT32: Values to convert into. A NumPy array is written in
+            place. It should be at least numUINT32 in size. Default is
+            None, which creates an array of the correct size.
+
+    Returns:
+        A uint32 NumPy array of the converted values, or a list of
+        integers if NumPy is not installed.
+
+    Raises:
+        ValueError: aBytes is too small.
+
+    """
+    return _bytesToValues(aBytes, _UINT32, registerOffset, numUINT32, aUINT32)
+
+
+def int32ToByteArray(aINT32, registerOffset=0, numINT32=None, aBytes=None):
+    """Converts values from 32-bit signed integers to bytes (big-endian).
+
+    Args:
+        aINT32: The 32-bit signed integer values to be converted. A
+            list, tuple or NumPy array.
+        registerOffset: The register offset to put the converted values
+            in aBytes. Default is 0.
+        numINT32: The number of values to convert. Default is None and
+            will be set to the length of aINT32.
+        aBytes: Bytes to convert into, as for float32ToByteArray. It
+            should be at least registerOffset*2 + numINT32*4 in size.
+            Default is None, which creates a bytearray of the correct
+            size filled with zeros.
+
+    Returns:
+        aBytes with the converted values in byte form.
+
+    Raises:
+        ValueError: aBytes is too small.
+
+    """
+    return _valuesToBytes(aINT32, _INT32, registerOffset, numINT32, aBytes)
+
+
+def byteArrayToINT32(aBytes, registerOffset=0, numINT32=None, aINT32=None):
+    """Converts values from bytes (big-endian) to 32-bit signed integers.
+
+    Args:
+        aBytes: The bytes to be converted, as for byteArrayToFLOAT32.
+        registerOffset: The register offset to get the values from in
+            aBytes. Default is 0.
+        numINT32: The number of 32-bit signed integer values to convert.
+            Default is None, and will be the length of aBytes divided
+            by 4.
+        aINT32: Values to convert into. A NumPy array is written in
+            place. It should be at least numINT32 in size. Default is
+            None, which creates an array of the correct size.
+
+    Returns:
+        An int32 NumPy array of the converted values, or a list of
+        integers if NumPy is not installed.
+
+    Raises:
+        ValueError: aBytes is too small.
+
+    """
+    return _bytesToValues(aBytes, _INT32, registerOffset, numINT32, aINT32)
@@ -0,0 +1,149 @@
+"""
+Compiled frame plans for repeated eAddresses/eNames transactions.
+
+"""
+import ctypes
+
+from labjack.ljm import constants
+from labjack.ljm import errorcodes
+from labjack.ljm import ljm
+
+
+class FramePlan:
+    """A reusable eAddresses transaction.
+
+    The addresses, data types, directions and value counts are converted
+    to ctypes arrays once, when the plan is created. Each execute call
+    then passes the same arrays to LJM_eAddresses, so command-response
+    loops do not rebuild them or re-encode register names.
+
+    Args:
+        numFrames: The total number of reads/writes to perform.
+        aAddresses: List of addresses to read/write. This list needs to
+            be at least size numFrames.
+        aDataTypes: List of data types corresponding to aAddresses
+            (labjack.ljm.constants.FLOAT32, labjack.ljm.constants.INT32,
+            etc.). This list needs to be at least size numFrames.
+        aWrites: List of directions (labjack.ljm.constants.READ or
+            labjack.ljm.constants.WRITE) corresponding to aAddresses.
+            This list needs to be at least size numFrames.
+        aNumValues: List of the number of values to read/write,
+            corresponding to aWrites and aAddresses. This list needs to
+            be at least size numFrames.
+        aValues: Initial list of values. This list needs to be the length
+            of the sum of the aNumValues list's values. Values
+            corresponding to writes are written on every execute call
+            until replaced with execute's writeValues. Default is None,
+            which starts with all values zero.
+
+    Raises:
+        ImportError: NumPy is not installed.
+
+    Notes:
+        The values array is shared by all execute calls, so a plan
+        should only be executed by one thread at a time. Copy the
+        returned values if they are needed after the next execute call.
+
+    """
+    def __init__(self, numFrames, aAddresses, aDataTypes, aWrites, aNumValues, aValues=None):
+        import numpy
+
+        self._numFrames = numFrames
+        self._cAddrs = ljm._convertListToCtypeArray(list(aAddresses[:numFrames]), ctypes.c_int32)
+        self._cTypes = ljm._convertListToCtypeArray(list(aDataTypes[:numFrames]), ctypes.c_int32)
+        self._cWrites = ljm._convertListToCtypeArray(list(aWrites[:numFrames]), ctypes.c_int32)
+        self._cNumVals = ljm._convertListToCtypeArray(list(aNumValues[:numFrames]), ctypes.c_int32)
+        numValues = sum(self._cNumVals)
+        self._cVals = (ctypes.c_double*numValues)()
+        if aValues is not None:
+            self._cVals[:] = list(aValues[:numValues])
+        self._cErrorAddr = ctypes.c_int32(-1)
+        self._cErrorAddrRef = ctypes.byref(self._cErrorAddr)
+
+        self._values = numpy.frombuffer(self._cVals, dtype=numpy.float64)
+        isWrite = numpy.repeat(numpy.array(self._cWrites[:]) == constants.WRITE, self._cNumVals[:])
+        self._readIndices = numpy.flatnonzero(~isWrite)
+        self._writeIndices = numpy.flatnonzero(isWrite)
+
+    @classmethod
+    def fromNames(cls, numFrames, aNames, aWrites, aNumValues, aValues=None):
+        """Creates a FramePlan from register names, which are resolved
+        to addresses and data types once with namesToAddresses.
+
+        Args:
+            numFrames: The total number of reads/writes to perform.
+            aNames: List of names (strings) to read/write. This list
+                needs to be at least size numFrames.
+            aWrites: List of directions corresponding to aNames.
+            aNumValues: List of the number of values to read/write,
+                corresponding to aWrites and aNames.
+            aValues: Initial list of values, as for FramePlan.
+
+        Returns:
+            The new FramePlan.
+
+        Raises:
+            TypeError: aNames is not a list of strings.
+            LJMError: A name is not a valid register name, or an error
+                was returned from the LJM library call.
+
+        """
+        aAddresses, aDataTypes = ljm.namesToAddresses(numFrames, aNames)
+        for i in range(numFrames):
+            if aAddresses[i] == constants.INVALID_NAME_ADDRESS:
+                raise ljm.LJMError(errorString="Invalid register name " + str(aNames[i]) + ".")
+        return cls(numFrames, aAddresses, aDataTypes, aWrites, aNumValues, aValues)
+
+    @property
+    def numFrames(self):
+        return self._numFrames
+
+    @property
+    def values(self):
+        """NumPy float64 view of all the plan's values, in eAddresses
+        aValues order."""
+        return self._values
+
+    @property
+    def readIndices(self):
+        """Indices of the read values in values."""
+        return self._readIndices
+
+    @property
+    def writeIndices(self):
+        """Indices of the written values in values."""
+        return self._writeIndices
+
+    def execute(self, handle, writeValues=None):
+        """Performs the plan's reads and writes on a device.
+
+        Args:
+            handle: A valid handle to an open device.
+            writeValues: Values to write, one per value in writeIndices.
+                Default is None, which writes the same values as the
+                previous call.
+
+        Returns:
+            The values NumPy view, holding the read values at
+            readIndices. It is overwritten by the next execute call.
+
+        Raises:
+            LJMError: An error was returned from the LJM library call.
+
+        """
+        if writeValues is not None:
+            self._values[self._writeIndices] = writeValues
+        self._cErrorAddr.value = -1
+
+        error = ljm._staticLib.LJM_eAddresses(handle, self._numFrames, self._cAddrs, self._cTypes, self._cWrites, self._cNumVals, self._cVals, self._cErrorAddrRef)
+        if error != errorcodes.NOERROR:
+            errAddr = self._cErrorAddr.value
+            if errAddr == -1:
+                errAddr = None
+            raise ljm.LJMError(error, errAddr)
+
+        return self._values
+
+    def readValues(self):
+        """Returns a copy of the values read by the last execute call."""
+        return self._values[self._readIndices]
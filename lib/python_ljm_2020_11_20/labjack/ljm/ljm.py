@@ -4,9 +4,12 @@ Cross-platform wrapper for the LJM library.
 """
 import ctypes
 import sys
+import threading
+import weakref
 
 from labjack.ljm import constants
 from labjack.ljm import errorcodes
+from labjack.ljm import registers
 
 
 class _StreamCallbackData:
@@ -30,6 +33,97 @@ class _ReconnectCallbackData:
         self.argInner = ctypes.c_int(handle)
 
 
+class _StreamReadIntoData:
+    """Class containing the ctypes objects eStreamReadInto reuses across
+    reads of a caller-owned buffer."""
+    def __init__(self, aData, numValues):
+        self.aData = aData
+        self.cData = _convertBufferToCtypeArray(aData, ctypes.c_double, numValues)
+        self.cDataRef = ctypes.byref(self.cData)
+        self.cD_SBL = ctypes.c_int32(0)
+        self.cD_SBLRef = ctypes.byref(self.cD_SBL)
+        self.cLJM_SBL = ctypes.c_int32(0)
+        self.cLJM_SBLRef = ctypes.byref(self.cLJM_SBL)
+
+
+class _HandleScratch:
+    """Class containing ctypes objects that the multiple-frame
+    functions reuse instead of creating new ones on every call. Each
+    thread gets its own objects per handle (see _getScratch)."""
+    def __init__(self):
+        self.cErrorAddr = ctypes.c_int32(-1)
+        self.cErrorAddrRef = ctypes.byref(self.cErrorAddr)
+        self._arrays = {}
+        self._sources = {}
+
+    def emptyArray(self, key, cType, size):
+        """Returns the reusable ctypes array key of size cType items."""
+        cArray = self._arrays.get(key)
+        if cArray is None or len(cArray) != size or cArray._type_ is not cType:
+            cArray = (cType*size)()
+            self._arrays[key] = cArray
+            self._sources.pop(key, None)
+        return cArray
+
+    def array(self, key, cType, li):
+        """Returns the reusable ctypes array key filled with the values of
+        li. The copy is skipped when li is a list or tuple equal to the
+        values last copied. Other sequences and buffers are converted
+        with _convertListToCtypeArray instead."""
+        if not isinstance(li, (list, tuple)):
+            return _convertListToCtypeArray(li, cType)
+        cArray = self._arrays.get(key)
+        if cArray is not None and len(cArray) == len(li) and cArray._type_ is cType:
+            source = self._sources.get(key)
+            # A list never equals a tuple, so compare like with like
+            if source is not None and type(source) is type(li) and source == li:
+                return cArray
+            cArray[:] = li
+        else:
+            cArray = _convertListToCtypeArray(li, cType)
+            self._arrays[key] = cArray
+        # A tuple cannot change, so it is kept as is; a list is copied
+        self._sources[key] = li if type(li) is tuple else list(li)
+        return cArray
+
+
+class _ScratchTable(dict):
+    """A thread's _HandleScratch by handle. A dict subclass so
+    _g_scratchTables can refer to it weakly."""
+
+
+_g_threadScratch = threading.local()
+# Every thread's _ScratchTable by id, so close can drop a handle's scratch in
+# all of them. A table goes when its thread ends.
+_g_scratchTables = weakref.WeakValueDictionary()
+_g_scratchTablesLock = threading.Lock()
+
+
+def _getScratch(handle):
+    """Returns the calling thread's _HandleScratch for handle."""
+    try:
+        return _g_threadScratch.scratches[handle]
+    except AttributeError:
+        table = _g_threadScratch.scratches = _ScratchTable()
+        with _g_scratchTablesLock:
+            _g_scratchTables[id(table)] = table
+    except KeyError:
+        pass
+    scratch = _g_threadScratch.scratches[handle] = _HandleScratch()
+    return scratch
+
+
+def _dropScratch(handle=None):
+    """Drops every thread's _HandleScratch for handle, or for every
+    handle if handle is None, so a reused handle number starts afresh."""
+    with _g_scratchTablesLock:
+        for table in list(_g_scratchTables.values()):
+            if handle is None:
+                table.clear()
+            else:
+                table.pop(handle, None)
+
+
 # Dictionaries for maintaining callback data objects. References need to be kept
 # for the callback duration, otherwise the callback data collector will delete
 # them causing a segfault when LJM tries to call the callback.
@@ -80,45 +174,192 @@ class LJMError(Exception):
 
 
 def _loadLibrary():
-    """Returns a ctypes pointer to the LJM library."""
+    """Returns a ctypes pointer to the LJM library.
+
+    Raises:
+        LJMError: The LJM library could not be loaded.
+
+    """
+    libraryName = None
     try:
-        libraryName = None
+        if(sys.platform.startswith("win32") or sys.platform.startswith("cygwin")):
+            # Windows
+            libraryName = "LabJackM.dll"
+        if(sys.platform.startswith("linux")):
+            # Linux
+            libraryName = "libLabJackM.so"
+        if(sys.platform.startswith("darwin")):
+            # Mac OS X
+            libraryName = "libLabJackM.dylib"
+
+        if libraryName is not None:
+            if libraryName == "LabJackM.dll" and sys.platform.startswith("win32"):
+                return ctypes.WinDLL(libraryName)
+            else:
+                return ctypes.CDLL(libraryName)
+    except Exception:
+        if(sys.platform.startswith("darwin")):
+            # Mac OS X load failed. Try with absolute path.
+            try:
+                libraryName = "/usr/local/lib/libLabJackM.dylib"
+                return ctypes.CDLL(libraryName)
+            except Exception:
+                pass
+        e = sys.exc_info()[1]
+        raise LJMError(errorString="Cannot load the LJM library "+str(libraryName)+". "+str(e))
+
+    # Unsupported operating system
+    raise LJMError(errorString="Cannot load the LJM library. Unsupported platform "+sys.platform+".")
+
+
+class _LazyLibrary(object):
+    """Stands in for the LJM library until the first LJM function is
+    used, then loads the library and declares its prototypes. Importing
+    labjack.ljm therefore does not load the library, and code that only
+    needs constants, errorcodes or the pure Python conversions never
+    does.
+
+    Each function is cached as an attribute after its first lookup, so
+    later calls do not go through __getattr__.
+
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._library = None
+
+    def __getattr__(self, name):
+        if not name.startswith("LJM_"):
+            raise AttributeError(name)
+        library = self._library
+        if library is None:
+            with self._lock:
+                library = self._library
+                if library is None:
+                    library = self._library = _declarePrototypes(_loadLibrary())
+        function = getattr(library, name)
+        setattr(self, name, function)
+        return function
+
+
+_INT = ctypes.c_int32
+_UINT = ctypes.c_uint32
+_DBL = ctypes.c_double
+_STR = ctypes.c_char_p
+_PTR = ctypes.c_void_p
+
+# (restype, argtypes) of the LJM functions, declared once when the library is
+# loaded so ctypes does not infer argument conversions on every call. Pointer
+# parameters are void pointers, which accept ctypes arrays and byref objects.
+_FUNCTION_PROTOTYPES = {
+    "LJM_ListAll": (_INT, [_INT, _INT, _PTR, _PTR, _PTR, _PTR, _PTR]),
+    "LJM_ListAllS": (_INT, [_STR, _STR, _PTR, _PTR, _PTR, _PTR, _PTR]),
+    "LJM_ListAllExtended": (_INT, [_INT, _INT, _INT, _PTR, _PTR, _INT, _PTR, _PTR, _PTR, _PTR, _PTR, _PTR]),
+    "LJM_OpenS": (_INT, [_STR, _STR, _STR, _PTR]),
+    "LJM_Open": (_INT, [_INT, _INT, _STR, _PTR]),
+    "LJM_GetHandleInfo": (_INT, [_INT, _PTR, _PTR, _PTR, _PTR, _PTR, _PTR]),
+    "LJM_Close": (_INT, [_INT]),
+    "LJM_CloseAll": (_INT, []),
+    "LJM_CleanInfo": (_INT, [_INT]),
+    "LJM_eWriteAddress": (_INT, [_INT, _INT, _INT, _DBL]),
+    "LJM_eReadAddress": (_INT, [_INT, _INT, _INT, _PTR]),
+    "LJM_eWriteName": (_INT, [_INT, _STR, _DBL]),
+    "LJM_eReadName": (_INT, [_INT, _STR, _PTR]),
+    "LJM_eReadAddresses": (_INT, [_INT, _INT, _PTR, _PTR, _PTR, _PTR]),
+    "LJM_eReadNames": (_INT, [_INT, _INT, _PTR, _PTR, _PTR]),
+    "LJM_eWriteAddresses": (_INT, [_INT, _INT, _PTR, _PTR, _PTR, _PTR]),
+    "LJM_eWriteNames": (_INT, [_INT, _INT, _PTR, _PTR, _PTR]),
+    "LJM_eReadAddressArray": (_INT, [_INT, _INT, _INT, _INT, _PTR, _PTR]),
+    "LJM_eReadNameArray": (_INT, [_INT, _STR, _INT, _PTR, _PTR]),
+    "LJM_eWriteAddressArray": (_INT, [_INT, _INT, _INT, _INT, _PTR, _PTR]),
+    "LJM_eWriteNameArray": (_INT, [_INT, _STR, _INT, _PTR, _PTR]),
+    "LJM_eReadAddressByteArray": (_INT, [_INT, _INT, _INT, _PTR, _PTR]),
+    "LJM_eReadNameByteArray": (_INT, [_INT, _STR, _INT, _PTR, _PTR]),
+    "LJM_eWriteAddressByteArray": (_INT, [_INT, _INT, _INT, _PTR, _PTR]),
+    "LJM_eWriteNameByteArray": (_INT, [_INT, _STR, _INT, _PTR, _PTR]),
+    "LJM_eAddresses": (_INT, [_INT, _INT, _PTR, _PTR, _PTR, _PTR, _PTR, _PTR]),
+    "LJM_eNames": (_INT, [_INT, _INT, _PTR, _PTR, _PTR, _PTR, _PTR]),
+    "LJM_eReadNameString": (_INT, [_INT, _STR, _STR]),
+    "LJM_eReadAddressString": (_INT, [_INT, _INT, _STR]),
+    "LJM_eWriteNameString": (_INT, [_INT, _STR, _STR]),
+    "LJM_eWriteAddressString": (_INT, [_INT, _INT, _STR]),
+    "LJM_eStreamStart": (_INT, [_INT, _INT, _INT, _PTR, _PTR]),
+    "LJM_eStreamRead": (_INT, [_INT, _PTR, _PTR, _PTR]),
+    "LJM_SetStreamCallback": (_INT, [_INT, _PTR, _PTR]),
+    "LJM_eStreamStop": (_INT, [_INT]),
+    "LJM_StreamBurst": (_INT, [_INT, _INT, _PTR, _PTR, _UINT, _PTR]),
+    "LJM_GetStreamTCPReceiveBufferStatus": (_INT, [_INT, _PTR, _PTR]),
+    "LJM_InitializeAperiodicStreamOut": (_INT, [_INT, _INT, _INT, _DBL]),
+    "LJM_WriteAperiodicStreamOut": (_INT, [_INT, _INT, _INT, _PTR, _PTR]),
+    "LJM_PeriodicStreamOut": (_INT, [_INT, _INT, _INT, _DBL, _INT, _PTR]),
+    "LJM_WriteRaw": (_INT, [_INT, _PTR, _INT]),
+    "LJM_ReadRaw": (_INT, [_INT, _PTR, _INT]),
+    "LJM_AddressesToMBFB": (_INT, [_INT, _PTR, _PTR, _PTR, _PTR, _PTR, _PTR, _PTR]),
+    "LJM_MBFBComm": (_INT, [_INT, ctypes.c_ubyte, _PTR, _PTR]),
+    "LJM_UpdateValues": (_INT, [_PTR, _PTR, _PTR, _PTR, _INT, _PTR]),
+    "LJM_NamesToAddresses": (_INT, [_INT, _PTR, _PTR, _PTR]),
+    "LJM_NameToAddress": (_INT, [_STR, _PTR, _PTR]),
+    "LJM_AddressesToTypes": (_INT, [_INT, _PTR, _PTR]),
+    "LJM_AddressToType": (_INT, [_INT, _PTR]),
+    "LJM_LookupConstantValue": (_INT, [_STR, _STR, _PTR]),
+    "LJM_LookupConstantName": (_INT, [_STR, _DBL, _STR]),
+    "LJM_ErrorToString": (None, [_INT, _STR]),
+    "LJM_LoadConstants": (None, []),
+    "LJM_LoadConstantsFromFile": (_INT, [_STR]),
+    "LJM_LoadConstantsFromString": (_INT, [_STR]),
+    "LJM_TCVoltsToTemp": (_INT, [_INT, _DBL, _DBL, _PTR]),
+    "LJM_FLOAT32ToByteArray": (None, [_PTR, _INT, _INT, _PTR]),
+    "LJM_ByteArrayToFLOAT32": (None, [_PTR, _INT, _INT, _PTR]),
+    "LJM_UINT16ToByteArray": (None, [_PTR, _INT, _INT, _PTR]),
+    "LJM_ByteArrayToUINT16": (None, [_PTR, _INT, _INT, _PTR]),
+    "LJM_UINT32ToByteArray": (None, [_PTR, _INT, _INT, _PTR]),
+    "LJM_ByteArrayToUINT32": (None, [_PTR, _INT, _INT, _PTR]),
+    "LJM_INT32ToByteArray": (None, [_PTR, _INT, _INT, _PTR]),
+    "LJM_ByteArrayToINT32": (None, [_PTR, _INT, _INT, _PTR]),
+    "LJM_NumberToIP": (_INT, [_UINT, _STR]),
+    "LJM_IPToNumber": (_INT, [_STR, _PTR]),
+    "LJM_NumberToMAC": (_INT, [ctypes.c_uint64, _STR]),
+    "LJM_MACToNumber": (_INT, [_STR, _PTR]),
+    "LJM_GetHostTick": (ctypes.c_uint64, []),
+    "LJM_GetHostTick32Bit": (None, [_PTR, _PTR]),
+    "LJM_StartInterval": (_INT, [_INT, _INT]),
+    "LJM_WaitForNextInterval": (_INT, [_INT, _PTR]),
+    "LJM_CleanInterval": (_INT, [_INT]),
+    "LJM_WriteLibraryConfigS": (_INT, [_STR, _DBL]),
+    "LJM_WriteLibraryConfigStringS": (_INT, [_STR, _STR]),
+    "LJM_ReadLibraryConfigS": (_INT, [_STR, _PTR]),
+    "LJM_ReadLibraryConfigStringS": (_INT, [_STR, _STR]),
+    "LJM_LoadConfigurationFile": (_INT, [_STR]),
+    "LJM_GetSpecificIPsInfo": (_INT, [_PTR, _PTR]),
+    "LJM_GetDeepSearchInfo": (_INT, [_PTR, _PTR]),
+    "LJM_Log": (_INT, [_INT, _STR]),
+    "LJM_ResetLog": (_INT, []),
+    "LJM_RegisterDeviceReconnectCallback": (_INT, [_INT, _PTR]),
+}
+
+# Only the restype of these hot functions is declared. ctypes converts every
+# declared argument on each call, which measured slower than passing ints and
+# ctypes objects as they are (see benchmarks/binding_overhead_benchmark.py).
+# Their wrappers pass nothing that needs converting.
+_UNDECLARED_ARGTYPES = frozenset(["LJM_eReadAddress", "LJM_eReadAddresses", "LJM_eAddresses", "LJM_eStreamRead"])
+
+
+def _declarePrototypes(library):
+    """Sets the restype and argtypes of every LJM function in
+    _FUNCTION_PROTOTYPES that library provides, except the argtypes of
+    _UNDECLARED_ARGTYPES, and returns library."""
+    for name, (restype, argtypes) in _FUNCTION_PROTOTYPES.items():
         try:
-            if(sys.platform.startswith("win32") or sys.platform.startswith("cygwin")):
-                # Windows
-                libraryName = "LabJackM.dll"
-            if(sys.platform.startswith("linux")):
-                # Linux
-                libraryName = "libLabJackM.so"
-            if(sys.platform.startswith("darwin")):
-                # Mac OS X
-                libraryName = "libLabJackM.dylib"
-
-            if libraryName is not None:
-                if libraryName == "LabJackM.dll" and sys.platform.startswith("win32"):
-                    return ctypes.WinDLL(libraryName)
-                else:
-                    return ctypes.CDLL(libraryName)
-        except Exception:
-            if(sys.platform.startswith("darwin")):
-                # Mac OS X load failed. Try with absolute path.
-                try:
-                    libraryName = "/usr/local/lib/libLabJackM.dylib"
-                    return ctypes.CDLL(libraryName)
-                except Exception:
-                    pass
-            e = sys.exc_info()[1]
-            raise LJMError(errorString="Cannot load the LJM library "+str(libraryName)+". "+str(e))
+            function = getattr(library, name)
+        except AttributeError:
+            # Older LJM versions do not have every function
+            continue
+        function.restype = restype
+        if name not in _UNDECLARED_ARGTYPES:
+            function.argtypes = argtypes
+    return library
 
-        # Unsupported operating system
-        raise LJMError(errorString="Cannot load the LJM library. Unsupported platform "+sys.platform+".")
-    except LJMError:
-        ljme = sys.exc_info()[1]
-        print(str(type(ljme)) + ": " + str(ljme))
-        return None
 
-
-_staticLib = _loadLibrary()
+_staticLib = _LazyLibrary()
 
 
 def listAll(deviceType, connectionType):
@@ -451,6 +692,8 @@ def close(handle):
     if error != errorcodes.NOERROR:
         raise LJMError(error)
 
+    _dropScratch(handle)
+
 
 def closeAll():
     """Closes all connections to all devices.
@@ -463,6 +706,8 @@ def closeAll():
     if error != errorcodes.NOERROR:
         raise LJMError(error)
 
+    _dropScratch()
+
 
 def cleanInfo(infoHandle):
     """Cleans/deallocates an infoHandle.
@@ -525,11 +770,9 @@ def eReadAddress(handle, address, dataType):
         LJMError: An error was returned from the LJM library call.
 
     """
-    cAddr = ctypes.c_int32(address)
-    cType = ctypes.c_int32(dataType)
     cVal = ctypes.c_double(0)
 
-    error = _staticLib.LJM_eReadAddress(handle, cAddr, cType, ctypes.byref(cVal))
+    error = _staticLib.LJM_eReadAddress(handle, address, dataType, ctypes.byref(cVal))
     if error != errorcodes.NOERROR:
         raise LJMError(error)
 
@@ -603,15 +846,15 @@ def eReadAddresses(handle, numFrames, aAddresses, aDataTypes):
         LJMError: An error was returned from the LJM library call.
 
     """
-    cNumFrames = ctypes.c_int32(numFrames)
-    cAddrs = _convertListToCtypeArray(aAddresses, ctypes.c_int32)
-    cTypes = _convertListToCtypeArray(aDataTypes, ctypes.c_int32)
-    cVals = (ctypes.c_double*numFrames)()
-    cErrorAddr = ctypes.c_int32(-1)
+    scratch = _getScratch(handle)
+    cAddrs = scratch.array("eReadAddresses.aAddresses", ctypes.c_int32, aAddresses)
+    cTypes = scratch.array("eReadAddresses.aDataTypes", ctypes.c_int32, aDataTypes)
+    cVals = scratch.emptyArray("eReadAddresses.aValues", ctypes.c_double, numFrames)
+    scratch.cErrorAddr.value = -1
 
-    error = _staticLib.LJM_eReadAddresses(handle, cNumFrames, ctypes.byref(cAddrs), ctypes.byref(cTypes), ctypes.byref(cVals), ctypes.byref(cErrorAddr))
+    error = _staticLib.LJM_eReadAddresses(handle, numFrames, cAddrs, cTypes, cVals, scratch.cErrorAddrRef)
     if error != errorcodes.NOERROR:
-        errAddr = cErrorAddr.value
+        errAddr = scratch.cErrorAddr.value
         if errAddr == -1:
             errAddr = None
         raise LJMError(error, errAddr)
@@ -1064,17 +1307,17 @@ def eAddresses(handle, numFrames, aAddresses, aDataTypes, aWrites, aNumValues, a
         values, and then 2 values to be written.
 
     """
-    cNumFrames = ctypes.c_int32(numFrames)
-    cAddrs = _convertListToCtypeArray(aAddresses, ctypes.c_int32)
-    cTypes = _convertListToCtypeArray(aDataTypes, ctypes.c_int32)
-    cWrites = _convertListToCtypeArray(aWrites, ctypes.c_int32)
-    cNumVals = _convertListToCtypeArray(aNumValues, ctypes.c_int32)
-    cVals = _convertListToCtypeArray(aValues, ctypes.c_double)
-    cErrorAddr = ctypes.c_int32(-1)
+    scratch = _getScratch(handle)
+    cAddrs = scratch.array("eAddresses.aAddresses", ctypes.c_int32, aAddresses)
+    cTypes = scratch.array("eAddresses.aDataTypes", ctypes.c_int32, aDataTypes)
+    cWrites = scratch.array("eAddresses.aWrites", ctypes.c_int32, aWrites)
+    cNumVals = scratch.array("eAddresses.aNumValues", ctypes.c_int32, aNumValues)
+    cVals = _convertListToCtypeArray(aValues, ctypes.c_double, copy=True)
+    scratch.cErrorAddr.value = -1
 
-    error = _staticLib.LJM_eAddresses(handle, cNumFrames, ctypes.byref(cAddrs), ctypes.byref(cTypes), ctypes.byref(cWrites), ctypes.byref(cNumVals), ctypes.byref(cVals), ctypes.byref(cErrorAddr))
+    error = _staticLib.LJM_eAddresses(handle, numFrames, cAddrs, cTypes, cWrites, cNumVals, cVals, scratch.cErrorAddrRef)
     if error != errorcodes.NOERROR:
-        errAddr = cErrorAddr.value
+        errAddr = scratch.cErrorAddr.value
         if errAddr == -1:
             errAddr = None
         raise LJMError(error, errAddr)
@@ -1133,7 +1376,7 @@ def eNames(handle, numFrames, aNames, aWrites, aNumValues, aValues):
     cNames = _convertListToCtypeArray(asciiNames, ctypes.c_char_p)
     cWrites = _convertListToCtypeArray(aWrites, ctypes.c_int32)
     cNumVals = _convertListToCtypeArray(aNumValues, ctypes.c_int32)
-    cVals = _convertListToCtypeArray(aValues, ctypes.c_double)
+    cVals = _convertListToCtypeArray(aValues, ctypes.c_double, copy=True)
     cErrorAddr = ctypes.c_int32(-1)
 
     error = _staticLib.LJM_eNames(handle, cNumFrames, ctypes.byref(cNames), ctypes.byref(cWrites), ctypes.byref(cNumVals), ctypes.byref(cVals), ctypes.byref(cErrorAddr))
@@ -1247,9 +1490,14 @@ def eWriteAddressString(handle, address, string):
 
 
 _g_eStreamDataSize = {}
+_g_eStreamReadIntoData = {}
+# The _StreamReadIntoData of every buffer eStreamReadInto has read into, by
+# handle and id of the buffer, which each entry keeps alive.
+_g_eStreamReadIntoViews = {}
+_MAX_READ_INTO_BUFFERS = 1024
 
 
-def eStreamStart(handle, scansPerRead, numAddresses, aScanList, scanRate):
+def eStreamStart(handle, scansPerRead, numAddresses, aScanList, scanRate, aData=None):
     """Initializes a stream object and begins streaming. This includes
        creating a buffer in LJM that collects data from the device.
 
@@ -1263,11 +1511,17 @@ def eStreamStart(handle, scansPerRead, numAddresses, aScanList, scanRate):
         aScanList: List of Modbus addresses to collect samples from,
             per scan.
         scanRate: Sets the desired number of scans per second.
+        aData: Optional writable, C-contiguous buffer of 64-bit floats
+            (numpy.float64 array, array.array("d"), memoryview, etc.)
+            of at least scansPerRead*numAddresses values. When given,
+            it becomes the default destination of eStreamReadInto for
+            this stream. Default is None.
 
     Returns:
         The actual scan rate the device will scan at.
 
     Raises:
+        TypeError: aData is not a suitable buffer.
         LJMError: An error was returned from the LJM library call.
 
     Notes:
@@ -1280,12 +1534,19 @@ def eStreamStart(handle, scansPerRead, numAddresses, aScanList, scanRate):
     cNumAddrs = ctypes.c_int32(numAddresses)
     cSL_p = _convertListToCtypeArray(aScanList, ctypes.c_int32)
     cScanRate = ctypes.c_double(scanRate)
+    if aData is not None:
+        readIntoData = _StreamReadIntoData(aData, scansPerRead*numAddresses)
     _g_eStreamDataSize[handle] = scansPerRead*numAddresses
+    _g_eStreamReadIntoData.pop(handle, None)
+    _g_eStreamReadIntoViews.pop(handle, None)
 
     error = _staticLib.LJM_eStreamStart(handle, cSPR, cNumAddrs, ctypes.byref(cSL_p), ctypes.byref(cScanRate))
     if error != errorcodes.NOERROR:
         raise LJMError(error)
 
+    if aData is not None:
+        _g_eStreamReadIntoData[handle] = readIntoData
+
     return cScanRate.value
 
 
@@ -1319,20 +1580,83 @@ def eStreamRead(handle):
             the aData size cannot be determined.
 
     """
-    # May need to change to optimize
     if handle not in _g_eStreamDataSize:
         raise LJMError(errorString="Streaming has not been started for the given handle. Please call eStreamStart first.")
     cData = (ctypes.c_double*_g_eStreamDataSize[handle])()
     cD_SBL = ctypes.c_int32(0)
     cLJM_SBL = ctypes.c_int32(0)
 
-    error = _staticLib.LJM_eStreamRead(handle, ctypes.byref(cData), ctypes.byref(cD_SBL), ctypes.byref(cLJM_SBL))
+    error = _staticLib.LJM_eStreamRead(handle, cData, ctypes.byref(cD_SBL), ctypes.byref(cLJM_SBL))
     if error != errorcodes.NOERROR:
         raise LJMError(error)
 
     return _convertCtypeArrayToList(cData), cD_SBL.value, cLJM_SBL.value
 
 
+def eStreamReadInto(handle, aData=None):
+    """Reads data from an initialized and running LJM stream buffer
+    directly into a caller-owned buffer. Waits for data to become
+    available, if necessary.
+
+    Args:
+        handle: A valid handle to an open device.
+        aData: A writable, C-contiguous buffer of 64-bit floats
+            (numpy.float64 array, array.array("d"), memoryview, etc.)
+            with room for at least scansPerRead*numAddresses values.
+            Default is None, which uses the buffer passed to
+            eStreamStart.
+
+    Returns:
+        A tuple containing:
+        (deviceScanBacklog, ljmScanBackLog)
+
+        deviceScanBacklog: The number of scans left in the device
+            buffer, as measured from when data was last collected from
+            the device.
+        ljmScanBacklog: The number of scans left in the LJM buffer, as
+            measured from after the data read into aData is removed
+            from the LJM buffer.
+
+    Raises:
+        TypeError: aData is not a suitable buffer.
+        LJMError: An error was returned from the LJM library call,
+            eStreamStart was not called first on the handle, or aData
+            is None and no buffer was passed to eStreamStart.
+
+    Notes:
+        The first scansPerRead*numAddresses values of aData are
+        overwritten with the interleaved stream data; no list or array
+        is allocated. The ctypes view of each buffer object passed is
+        kept until eStreamStop, so reading repeatedly into the same
+        buffer objects, such as one view per slot of a ring, costs no
+        per-read allocations. Pass the same view objects each time:
+        a new slice of the same memory is a new buffer object. While
+        the views are kept, resizable buffers such as bytearray cannot
+        be resized.
+
+    """
+    if handle not in _g_eStreamDataSize:
+        raise LJMError(errorString="Streaming has not been started for the given handle. Please call eStreamStart first.")
+    readIntoData = _g_eStreamReadIntoData.get(handle)
+    if aData is None:
+        if readIntoData is None:
+            raise LJMError(errorString="No stream buffer was given. Please pass aData to eStreamReadInto or eStreamStart.")
+    elif readIntoData is None or readIntoData.aData is not aData:
+        views = _g_eStreamReadIntoViews.setdefault(handle, {})
+        readIntoData = views.get(id(aData))
+        if readIntoData is None:
+            if len(views) >= _MAX_READ_INTO_BUFFERS:
+                views.clear()
+            readIntoData = views[id(aData)] = _StreamReadIntoData(aData, _g_eStreamDataSize[handle])
+        _g_eStreamReadIntoData[handle] = readIntoData
+
+    error = _staticLib.LJM_eStreamRead(handle, readIntoData.cDataRef, readIntoData.cD_SBLRef, readIntoData.cLJM_SBLRef)
+    if error != errorcodes.NOERROR:
+        raise LJMError(error)
+
+    return readIntoData.cD_SBL.value, readIntoData.cLJM_SBL.value
+
+
 def setStreamCallback(handle, callback):
     """Sets a callback that is called by LJM when the stream has
     collected scansPerRead scans (see eStreamStart) or if an error has
@@ -1357,6 +1681,8 @@ def setStreamCallback(handle, callback):
         The handle is passed as the argument to callback because if you
         have multiple devices running with setStreamCallback, you might
         want to check which handle had stream data ready.
+        StreamRing is a built-in callback that reads each chunk into a
+        preallocated ring without calling Python code per read.
 
     """
     if callback is None or callback == 0:
@@ -1387,6 +1713,10 @@ def eStreamStop(handle):
     """
     if handle in _g_eStreamDataSize:
         del _g_eStreamDataSize[handle]
+    if handle in _g_eStreamReadIntoData:
+        del _g_eStreamReadIntoData[handle]
+    if handle in _g_eStreamReadIntoViews:
+        del _g_eStreamReadIntoViews[handle]
     if handle in _g_streamCallbackData:
         del _g_streamCallbackData[handle]
 
@@ -1681,7 +2011,7 @@ def addressesToMBFB(maxBytesPerMBFB, aAddresses, aDataTypes, aWrites, aNumValues
     if aMBFBCommand is None:
         cComm = (ctypes.c_ubyte*maxBytesPerMBFB)()
     else:
-        cComm = _convertListToCtypeArray(aMBFBCommand, ctypes.c_ubyte)
+        cComm = _convertListToCtypeArray(aMBFBCommand, ctypes.c_ubyte, copy=True)
 
     error = _staticLib.LJM_AddressesToMBFB(cMaxBytes, ctypes.byref(cAddrs), ctypes.byref(cTypes), ctypes.byref(cWrites), ctypes.byref(cNumVals), ctypes.byref(cVals), ctypes.byref(cNumFrames), ctypes.byref(cComm))
     if error != errorcodes.NOERROR:
@@ -1711,7 +2041,7 @@ def mbfbComm(handle, unitID, aMBFB):
 
     """
     cUnitID = ctypes.c_ubyte(unitID)
-    cMBFB = _convertListToCtypeArray(aMBFB, ctypes.c_ubyte)
+    cMBFB = _convertListToCtypeArray(aMBFB, ctypes.c_ubyte, copy=True)
     cErrorAddr = ctypes.c_int32(-1)
 
     error = _staticLib.LJM_MBFBComm(handle, unitID, ctypes.byref(cMBFB), ctypes.byref(cErrorAddr))
@@ -1755,7 +2085,7 @@ def updateValues(aMBFBResponse, aDataTypes, aWrites, aNumValues, numFrames, aVal
     if aValues is None:
         cVals = (ctypes.c_double*(sum(aNumValues)))()
     else:
-        cVals = _convertListToCtypeArray(aValues, ctypes.c_double)
+        cVals = _convertListToCtypeArray(aValues, ctypes.c_double, copy=True)
 
     error = _staticLib.LJM_UpdateValues(ctypes.byref(cMBFB), ctypes.byref(cTypes), ctypes.byref(cWrites), ctypes.byref(cNumVals), cNumFrames, ctypes.byref(cVals))
     if error != errorcodes.NOERROR:
@@ -1764,6 +2094,49 @@ def updateValues(aMBFBResponse, aDataTypes, aWrites, aNumValues, numFrames, aVal
     return _convertCtypeArrayToList(cVals)
 
 
+# In-process register map index and caches for the name/address lookup
+# functions. _g_registerMap is None until first use and False if the
+# constants file could not be indexed.
+_g_registerMap = None
+_g_registerMapLock = threading.Lock()
+_g_nameCache = registers.LRUCache()
+_g_typeCache = registers.LRUCache()
+
+
+def _getRegisterMap():
+    """Returns the register map index, building it from the LJM Modbus
+    map constants file on first use. Returns None if the file could not
+    be indexed.
+
+    """
+    global _g_registerMap
+    registerMap = _g_registerMap
+    if registerMap is None:
+        with _g_registerMapLock:
+            registerMap = _g_registerMap
+            if registerMap is None:
+                try:
+                    fileName = readLibraryConfigStringS(constants.MODBUS_MAP_CONSTANTS_FILE)
+                    registerMap = registers.RegisterMap.fromFile(fileName)
+                except (LJMError, EnvironmentError, KeyError, TypeError, ValueError):
+                    registerMap = False
+                _g_registerMap = registerMap
+    return registerMap or None
+
+
+def _setRegisterMap(registerMap):
+    """Replaces the register map index and clears the lookup caches.
+    registerMap None rebuilds the index from the LJM Modbus map
+    constants file on next use.
+
+    """
+    global _g_registerMap
+    with _g_registerMapLock:
+        _g_registerMap = registerMap
+        _g_nameCache.clear()
+        _g_typeCache.clear()
+
+
 def namesToAddresses(numFrames, aNames, aAddresses=None, aDataTypes=None):
     """Takes a list of Modbus register names and returns two lists
     containing the corresponding addresses and data types.
@@ -1797,28 +2170,49 @@ def namesToAddresses(numFrames, aNames, aAddresses=None, aDataTypes=None):
         corresponding aAddresses value will be set to
         labjack.ljm.constants.INVALID_NAME_ADDRESS.
 
+        Names are resolved from the in-process register map index when
+        it is available. Only names it does not contain are passed to
+        LJM_NamesToAddresses, and their results are cached.
+
     """
-    cNumFrames = ctypes.c_int32(numFrames)
-    asciiNames = []
     for x in aNames:
         if not isinstance(x, str):
             raise TypeError("Expected a string list but found an item " + str(type(x)) + ".")
-        asciiNames.append(x.encode("ascii"))
-    cNames = _convertListToCtypeArray(asciiNames, ctypes.c_char_p)
-    if aAddresses is None:
-        cAddrs = (ctypes.c_int32*numFrames)()
+    names = list(aNames[:numFrames])
+    registerMap = _getRegisterMap()
+    if registerMap is not None:
+        addrs, types = registerMap.resolveMany(names)
     else:
-        cAddrs = _convertListToCtypeArray(aAddresses, ctypes.c_int32)
-    if aDataTypes is None:
-        cTypes = (ctypes.c_int32*numFrames)()
-    else:
-        cTypes = _convertListToCtypeArray(aDataTypes, ctypes.c_int32)
+        addrs = [constants.INVALID_NAME_ADDRESS]*len(names)
+        types = [0]*len(names)
+    misses = []
+    for i, address in enumerate(addrs):
+        if address == constants.INVALID_NAME_ADDRESS:
+            cached = _g_nameCache.get(names[i])
+            if cached is None:
+                misses.append(i)
+            else:
+                addrs[i], types[i] = cached
+    if misses:
+        # Resolve the names the index and cache do not know with one
+        # LJM_NamesToAddresses call, which also reports any errors.
+        missNames = [names[i] for i in misses]
+        cNumFrames = ctypes.c_int32(len(missNames))
+        cNames = _convertListToCtypeArray([x.encode("ascii") for x in missNames], ctypes.c_char_p)
+        cAddrs = (ctypes.c_int32*len(missNames))()
+        cTypes = (ctypes.c_int32*len(missNames))()
 
-    error = _staticLib.LJM_NamesToAddresses(cNumFrames, ctypes.byref(cNames), ctypes.byref(cAddrs), ctypes.byref(cTypes))
-    if error != errorcodes.NOERROR:
-        raise LJMError(error)
+        error = _staticLib.LJM_NamesToAddresses(cNumFrames, ctypes.byref(cNames), ctypes.byref(cAddrs), ctypes.byref(cTypes))
+        if error != errorcodes.NOERROR:
+            raise LJMError(error)
+
+        for i, address, dataType in zip(misses, cAddrs, cTypes):
+            addrs[i] = address
+            types[i] = dataType
+            if address != constants.INVALID_NAME_ADDRESS:
+                _g_nameCache.put(names[i], (address, dataType))
 
-    return _convertCtypeArrayToList(cAddrs), _convertCtypeArrayToList(cTypes)
+    return addrs, types
 
 
 def nameToAddress(name):
@@ -1839,9 +2233,21 @@ def nameToAddress(name):
         TypeError: name is not a string.
         LJMError: An error was returned from the LJM library call.
 
+    Note: The name is resolved from the in-process register map index
+        when it is available. Otherwise the LJM_NameToAddress result is
+        kept in a least recently used cache.
+
     """
     if not isinstance(name, str):
         raise TypeError("Expected a string instead of " + str(type(name)) + ".")
+    registerMap = _getRegisterMap()
+    if registerMap is not None:
+        found = registerMap.get(name)
+        if found is not None:
+            return found
+    found = _g_nameCache.get(name)
+    if found is not None:
+        return found
     cAddr = ctypes.c_int32(0)
     cType = ctypes.c_int32(0)
 
@@ -1849,7 +2255,10 @@ def nameToAddress(name):
     if error != errorcodes.NOERROR:
         raise LJMError(error)
 
-    return cAddr.value, cType.value
+    found = (cAddr.value, cType.value)
+    if cAddr.value != constants.INVALID_NAME_ADDRESS:
+        _g_nameCache.put(name, found)
+    return found
 
 
 def addressesToTypes(numAddresses, aAddresses):
@@ -1869,6 +2278,11 @@ def addressesToTypes(numAddresses, aAddresses):
         LJMError: An error was returned from the LJM library call.
 
     """
+    registerMap = _getRegisterMap()
+    if registerMap is not None:
+        types = [registerMap.getType(address) for address in aAddresses[:numAddresses]]
+        if None not in types and len(types) == numAddresses:
+            return types
     cNumAddrs = ctypes.c_int32(numAddresses)
     cAddrs = _convertListToCtypeArray(aAddresses, ctypes.c_int32)
     cTypes = (ctypes.c_int32*numAddresses)()
@@ -1893,6 +2307,14 @@ def addressToType(address):
         LJMError: An error was returned from the LJM library call.
 
     """
+    registerMap = _getRegisterMap()
+    if registerMap is not None:
+        dataType = registerMap.getType(address)
+        if dataType is not None:
+            return dataType
+    dataType = _g_typeCache.get(address)
+    if dataType is not None:
+        return dataType
     cAddr = ctypes.c_int32(address)
     cType = ctypes.c_int32(0)
 
@@ -1900,6 +2322,7 @@ def addressToType(address):
     if error != errorcodes.NOERROR:
         raise LJMError(error)
 
+    _g_typeCache.put(address, cType.value)
     return cType.value
 
 
@@ -1995,6 +2418,7 @@ def loadConstants():
 
     """
     _staticLib.LJM_LoadConstants()
+    _setRegisterMap(None)
 
 
 def loadConstantsFromFile(fileName):
@@ -2019,6 +2443,12 @@ def loadConstantsFromFile(fileName):
     if error != errorcodes.NOERROR:
         raise LJMError(error)
 
+    try:
+        registerMap = registers.RegisterMap.fromFile(fileName)
+    except (EnvironmentError, KeyError, TypeError, ValueError):
+        registerMap = False
+    _setRegisterMap(registerMap)
+
 
 def loadConstantsFromString(jsonString):
     """Parses jsonString as the constants file and loads it.
@@ -2045,6 +2475,13 @@ def loadConstantsFromString(jsonString):
     if error != errorcodes.NOERROR:
         raise LJMError(error)
 
+    if "\"registers\"" in jsonString:
+        try:
+            registerMap = registers.RegisterMap.fromJSON(jsonString)
+        except (KeyError, TypeError, ValueError):
+            registerMap = False
+        _setRegisterMap(registerMap)
+
 
 def tcVoltsToTemp(tcType, tcVolts, cjTempK):
     """Converts thermocouple voltage to a temperature.
@@ -2105,7 +2542,7 @@ def float32ToByteArray(aFLOAT32, registerOffset=0, numFLOAT32=None, aBytes=None)
     numBytes = numFLOAT32*4 + registerOffset*2
     if aBytes is None:
         aBytes = [0]*numBytes
-    cUbytes = _convertListToCtypeArray(aBytes, ctypes.c_ubyte)
+    cUbytes = _convertListToCtypeArray(aBytes, ctypes.c_ubyte, copy=True)
 
     _staticLib.LJM_FLOAT32ToByteArray(ctypes.byref(cFloats), cRegOffset, cNumFloat, ctypes.byref(cUbytes))
 
@@ -2139,7 +2576,7 @@ def byteArrayToFLOAT32(aBytes, registerOffset=0, numFLOAT32=None, aFLOAT32=None)
     cNumFloat = ctypes.c_int32(numFLOAT32)
     if aFLOAT32 is None:
         aFLOAT32 = [0]*numFLOAT32
-    cFloats = _convertListToCtypeArray(aFLOAT32, ctypes.c_float)
+    cFloats = _convertListToCtypeArray(aFLOAT32, ctypes.c_float, copy=True)
 
     _staticLib.LJM_ByteArrayToFLOAT32(ctypes.byref(cUbytes), cRegOffset, cNumFloat, ctypes.byref(cFloats))
 
@@ -2173,7 +2610,7 @@ def uint16ToByteArray(aUINT16, registerOffset=0, numUINT16=None, aBytes=None):
     numBytes = numUINT16*2 + registerOffset*2
     if aBytes is None:
         aBytes = [0]*numBytes
-    cUbytes = _convertListToCtypeArray(aBytes, ctypes.c_ubyte)
+    cUbytes = _convertListToCtypeArray(aBytes, ctypes.c_ubyte, copy=True)
 
     _staticLib.LJM_UINT16ToByteArray(ctypes.byref(cUint16s), cRegOffset, cNumUint16, ctypes.byref(cUbytes))
 
@@ -2207,7 +2644,7 @@ def byteArrayToUINT16(aBytes, registerOffset=0, numUINT16=None, aUINT16=None):
     cNumUint16 = ctypes.c_int32(numUINT16)
     if aUINT16 is None:
         aUINT16 = [0]*numUINT16
-    cUint16s = _convertListToCtypeArray(aUINT16, ctypes.c_uint16)
+    cUint16s = _convertListToCtypeArray(aUINT16, ctypes.c_uint16, copy=True)
 
     _staticLib.LJM_ByteArrayToUINT16(ctypes.byref(cUbytes), cRegOffset, cNumUint16, ctypes.byref(cUint16s))
 
@@ -2242,7 +2679,7 @@ def uint32ToByteArray(aUINT32, registerOffset=0, numUINT32=None, aBytes=None):
     numBytes = numUINT32*4 + registerOffset*2
     if aBytes is None:
         aBytes = [0]*numBytes
-    cUbytes = _convertListToCtypeArray(aBytes, ctypes.c_ubyte)
+    cUbytes = _convertListToCtypeArray(aBytes, ctypes.c_ubyte, copy=True)
 
     _staticLib.LJM_UINT32ToByteArray(ctypes.byref(cUint32s), cRegOffset, cNumUint32, ctypes.byref(cUbytes))
 
@@ -2277,7 +2714,7 @@ def byteArrayToUINT32(aBytes, registerOffset=0, numUINT32=None, aUINT32=None):
     cNumUint32 = ctypes.c_int32(numUINT32)
     if aUINT32 is None:
         aUINT32 = [0]*numUINT32
-    cUint32s = _convertListToCtypeArray(aUINT32, ctypes.c_uint32)
+    cUint32s = _convertListToCtypeArray(aUINT32, ctypes.c_uint32, copy=True)
 
     _staticLib.LJM_ByteArrayToUINT32(ctypes.byref(cUbytes), cRegOffset, cNumUint32, ctypes.byref(cUint32s))
 
@@ -2312,7 +2749,7 @@ def int32ToByteArray(aINT32, registerOffset=0, numINT32=None, aBytes=None):
     numBytes = numINT32*4 + registerOffset*2
     if aBytes is None:
         aBytes = [0]*numBytes
-    cUbytes = _convertListToCtypeArray(aBytes, ctypes.c_ubyte)
+    cUbytes = _convertListToCtypeArray(aBytes, ctypes.c_ubyte, copy=True)
 
     _staticLib.LJM_INT32ToByteArray(ctypes.byref(cInt32s), cRegOffset, cNumInt32, ctypes.byref(cUbytes))
 
@@ -2346,7 +2783,7 @@ def byteArrayToINT32(aBytes, registerOffset=0, numINT32=None, aINT32=None):
     cNumInt32 = ctypes.c_int32(numINT32)
     if aINT32 is None:
         aINT32 = [0]*numINT32
-    cInt32s = _convertListToCtypeArray(aINT32, ctypes.c_int32)
+    cInt32s = _convertListToCtypeArray(aINT32, ctypes.c_int32, copy=True)
 
     _staticLib.LJM_ByteArrayToINT32(ctypes.byref(cUbytes), cRegOffset, cNumInt32, ctypes.byref(cInt32s))
 
@@ -2426,7 +2863,6 @@ def numberToMAC(number):
     cNum = ctypes.c_uint64(number)
     macString = ("\0"*constants.MAC_STRING_SIZE).encode("ascii")
 
-    _staticLib.LJM_NumberToMAC.argtypes = [ctypes.c_uint64, ctypes.c_char_p]
     error = _staticLib.LJM_NumberToMAC(number, macString)
     if error != errorcodes.NOERROR:
         raise LJMError(error)
@@ -2471,7 +2907,6 @@ def getHostTick():
         The current clock tick in microseconds.
 
     """
-    _staticLib.LJM_GetHostTick.restype = ctypes.c_uint64
     return _staticLib.LJM_GetHostTick()
 
 
@@ -2605,6 +3040,9 @@ def writeLibraryConfigStringS(parameter, string):
     if error != errorcodes.NOERROR:
         raise LJMError(error)
 
+    if parameter.upper() in (constants.CONSTANTS_FILE, constants.MODBUS_MAP_CONSTANTS_FILE):
+        _setRegisterMap(None)
+
 
 def readLibraryConfigS(parameter):
     """Reads a configuration/setting value from the library.
@@ -2826,11 +3264,74 @@ def _coerceToByteArrayIfString(aBytes):
     return aBytes
 
 
-def _convertListToCtypeArray(li, cType):
-    """Returns a ctypes list converted from a normal list."""
+def _convertListToCtypeArray(li, cType, copy=False):
+    """Returns a ctypes list converted from a normal list.
+
+    C-contiguous buffers holding cType values (numpy arrays,
+    array.array, bytearray, etc.) are used in place without copying.
+    They are copied in one block instead if copy is True, for arrays
+    LJM writes to, or if they are read-only. NumPy arrays of another
+    dtype of the same kind are converted in one pass."""
+    if not isinstance(li, (list, tuple)):
+        try:
+            view = memoryview(li)
+        except TypeError:
+            view = None
+        if view is not None:
+            if view.c_contiguous and _bufferMatchesCtype(view, cType):
+                numValues = view.nbytes//view.itemsize
+                if copy or view.readonly:
+                    return (cType*numValues).from_buffer_copy(view)
+                return (cType*numValues).from_buffer(li)
+            if hasattr(li, "astype"):
+                try:
+                    converted = li.astype(cType._type_, order="C", casting="same_kind")
+                except TypeError:
+                    pass
+                else:
+                    return (cType*converted.size).from_buffer(converted)
     return (cType*len(li))(*li)
 
 
+def _bufferFormatKind(formatChar):
+    """Returns the kind ("f" float, "i" signed, "u" unsigned) of a
+    struct/ctypes format character, or None for other formats."""
+    if formatChar in "fd":
+        return "f"
+    if formatChar in "bhilq":
+        return "i"
+    if formatChar in "BHILQ":
+        return "u"
+    return None
+
+
+def _bufferMatchesCtype(view, cType):
+    """Returns True if the memoryview holds native-endian items with the
+    same kind and size as cType."""
+    formatChar = view.format.lstrip("@=" + ("<" if sys.byteorder == "little" else ">!"))
+    return (len(formatChar) == 1 and view.itemsize == ctypes.sizeof(cType) and
+            _bufferFormatKind(formatChar) is not None and
+            _bufferFormatKind(formatChar) == _bufferFormatKind(cType._type_))
+
+
+def _convertBufferToCtypeArray(aBuffer, cType, numValues):
+    """Returns a ctypes array of numValues cType items sharing memory
+    with the writable, C-contiguous buffer aBuffer."""
+    try:
+        view = memoryview(aBuffer)
+    except TypeError:
+        raise TypeError("Expected a buffer instead of " + str(type(aBuffer)) + ".")
+    if view.readonly:
+        raise TypeError("Expected a writable buffer.")
+    if not view.c_contiguous:
+        raise TypeError("Expected a C-contiguous buffer.")
+    if not _bufferMatchesCtype(view, cType):
+        raise TypeError("Expected a buffer of " + cType.__name__ + " values instead of format \"" + view.format + "\".")
+    if view.nbytes < numValues*ctypes.sizeof(cType):
+        raise TypeError("Expected a buffer of at least " + str(numValues) + " values instead of " + str(view.nbytes//view.itemsize) + ".")
+    return (cType*numValues).from_buffer(aBuffer)
+
+
 def _convertCtypeArrayToList(listCtype):
     """Returns a normal list from a ctypes list."""
     return listCtype[:]
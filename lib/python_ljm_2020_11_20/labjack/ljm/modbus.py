@@ -0,0 +1,516 @@
+"""
+Pure Python Modbus TCP backend for T-series devices connected with TCP
+over Ethernet or WiFi.
+
+Reads and writes are sent as Modbus Feedback (MBFB, function 76) packets
+straight to the device's Modbus TCP port, without the LJM library. Each
+handle keeps a pool of persistent sockets, and the packets of one call are
+pipelined on a socket and matched to their responses by transaction ID.
+AsyncDevice offers the same calls as coroutines, so one asyncio event loop
+can poll many devices.
+
+Requires Python 3.5 or later.
+
+"""
+import asyncio
+import itertools
+import socket
+import struct
+import threading
+
+from labjack.ljm import constants
+from labjack.ljm import errorcodes
+from labjack.ljm.ljm import LJMError
+
+
+MBFB_FUNCTION = 76
+UNIT_ID = 1
+MAX_BYTES_PER_MBFB = 1040  # T7 Ethernet and WiFi TCP packet limit
+MAX_CONNECTIONS = 2
+
+_MBFB_READ = 0
+_MBFB_WRITE = 1
+_MAX_REGISTERS_PER_FRAME = 255
+_EXCEPTION_FLAG = 0x80
+_HEADER = struct.Struct(">HHHBB")  # Transaction ID, protocol ID, length, unit ID, function
+_FRAME = struct.Struct(">BHB")  # Direction, address, number of registers
+_MBAP_SIZE = 7  # Header bytes up to and including the unit ID
+
+# struct format character of each data type's values
+_VALUE_FORMATS = {
+    constants.UINT16: "H",
+    constants.UINT32: "I",
+    constants.INT32: "i",
+    constants.FLOAT32: "f",
+    constants.BYTE: "B"
+}
+
+_TCP_CONNECTION_TYPES = (constants.ctTCP, constants.ctETHERNET, constants.ctWIFI)
+
+
+def _error(errorCode, errorString):
+    return LJMError(errorCode, errorString=errorString)
+
+
+class _Packet(object):
+    """One MBFB command and how to unpack its response.
+
+    command holds the frames that follow the function code. reads holds a
+    (valueIndex, format, responseOffset) tuple for each read frame.
+
+    """
+    __slots__ = ("command", "reads", "responseSize")
+
+    def __init__(self):
+        self.command = bytearray()
+        self.reads = []
+        self.responseSize = 0
+
+
+def buildPackets(numFrames, aAddresses, aDataTypes, aWrites, aNumValues, aValues, maxBytesPerMBFB=MAX_BYTES_PER_MBFB):
+    """Encodes eAddresses style frames as MBFB packets. Frames are packed
+    into as few packets as fit in maxBytesPerMBFB, in order.
+
+    Args:
+        numFrames, aAddresses, aDataTypes, aWrites, aNumValues, aValues:
+            As for labjack.ljm.eAddresses.
+        maxBytesPerMBFB: The largest command or response packet the
+            device accepts, including the Modbus TCP header.
+
+    Returns:
+        A list of packets for encodePacket and parseResponse.
+
+    Raises:
+        LJMError: A frame has an unsupported data type, an invalid
+            address or value, or does not fit in one packet.
+
+    Note: A frame is never split across packets, since the device treats
+        buffer registers differently from consecutive registers. Frames
+        are limited to 255 registers and maxBytesPerMBFB.
+
+    """
+    capacity = maxBytesPerMBFB - _MBAP_SIZE - 1
+    packets = []
+    packet = None
+    valueIndex = 0
+    for i in range(numFrames):
+        address = aAddresses[i]
+        numValues = aNumValues[i]
+        try:
+            valueFormat = ">" + str(numValues) + _VALUE_FORMATS[aDataTypes[i]]
+        except KeyError:
+            raise _error(errorcodes.FUNCTION_DOES_NOT_SUPPORT_THIS_TYPE, "Data type " + str(aDataTypes[i]) + " is not supported.")
+        if not 0 <= address <= 0xFFFF:
+            raise _error(errorcodes.INVALID_ADDRESS, "Address " + str(address) + " is out of range.")
+        numBytes = struct.calcsize(valueFormat)
+        numRegisters = (numBytes + 1)//2
+        if numRegisters > _MAX_REGISTERS_PER_FRAME:
+            raise _error(errorcodes.INVALID_NUM_REGISTERS, "Frame " + str(i) + " needs " + str(numRegisters) + " registers.")
+        write = aWrites[i] == constants.WRITE
+        commandSize = _FRAME.size + (numRegisters*2 if write else 0)
+        responseSize = 0 if write else numRegisters*2
+        if commandSize > capacity or responseSize > capacity:
+            raise _error(errorcodes.PACKET_SIZE_TOO_LARGE, "Frame " + str(i) + " does not fit in a packet.")
+        if (packet is None or len(packet.command) + commandSize > capacity or
+                packet.responseSize + responseSize > capacity):
+            packet = _Packet()
+            packets.append(packet)
+
+        packet.command += _FRAME.pack(_MBFB_WRITE if write else _MBFB_READ, address, numRegisters)
+        if write:
+            values = aValues[valueIndex:valueIndex + numValues]
+            if valueFormat[-1] != "f":
+                values = [int(v) for v in values]
+            try:
+                packet.command += struct.pack(valueFormat, *values)
+            except (struct.error, OverflowError):
+                raise _error(errorcodes.INVALID_VALUE, "Frame " + str(i) + " has a value out of range for its data type.")
+            if numBytes % 2:
+                packet.command.append(0)
+        else:
+            packet.reads.append((valueIndex, valueFormat, packet.responseSize))
+            packet.responseSize += responseSize
+        valueIndex += numValues
+    return packets
+
+
+def encodePacket(packet, transactionID, unitID=UNIT_ID):
+    """Returns the Modbus TCP bytes of packet with the given transaction
+    ID."""
+    return _HEADER.pack(transactionID, 0, len(packet.command) + 2, unitID, MBFB_FUNCTION) + packet.command
+
+
+def parseResponse(packet, function, data, aValues):
+    """Checks the response to packet and stores its read values.
+
+    Args:
+        packet: The packet the response is for.
+        function: The response function code.
+        data: The response bytes after the function code.
+        aValues: The list to store read values in, at the positions
+            given to buildPackets.
+
+    Raises:
+        LJMError: The device returned a Modbus exception, or the
+            response does not match the packet.
+
+    """
+    if function == MBFB_FUNCTION | _EXCEPTION_FLAG:
+        exceptionCode = data[0] if len(data) else 0
+        raise _error(errorcodes.MODBUS_ERRORS_BEGIN + exceptionCode, "Modbus exception " + str(exceptionCode) + ".")
+    if function != MBFB_FUNCTION:
+        raise _error(errorcodes.FUNCTION_ERR, "Unexpected function code " + str(function) + ".")
+    if len(data) != packet.responseSize:
+        raise _error(errorcodes.INCORRECT_NUM_RESPONSE_BYTES_RECEIVED,
+                     "Expected " + str(packet.responseSize) + " response bytes but received " + str(len(data)) + ".")
+    for valueIndex, valueFormat, offset in packet.reads:
+        values = struct.unpack_from(valueFormat, data, offset)
+        aValues[valueIndex:valueIndex + len(values)] = [float(v) for v in values]
+
+
+class _Connection(object):
+    """A persistent Modbus TCP socket."""
+    def __init__(self, identifier, port, openTimeout, timeout):
+        try:
+            self._socket = socket.create_connection((identifier, port), openTimeout)
+            self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._socket.settimeout(timeout)
+        except (socket.error, socket.timeout) as e:
+            raise _error(errorcodes.CANNOT_CONNECT, "Cannot connect to " + str(identifier) + ":" + str(port) + ". " + str(e))
+        self._header = bytearray(_MBAP_SIZE + 1)
+        self._transactionIDs = itertools.count()
+
+    def close(self):
+        self._socket.close()
+
+    def _receiveInto(self, buffer):
+        view = memoryview(buffer)
+        while len(view):
+            received = self._socket.recv_into(view)
+            if received == 0:
+                raise _error(errorcodes.DEVICE_DISCONNECTED, "The device closed the connection.")
+            view = view[received:]
+
+    def transact(self, packets, unitID, aValues):
+        """Sends all packets back to back, then receives their responses
+        in any order."""
+        pending = {}
+        command = bytearray()
+        for packet in packets:
+            transactionID = next(self._transactionIDs) & 0xFFFF
+            pending[transactionID] = packet
+            command += encodePacket(packet, transactionID, unitID)
+        try:
+            self._socket.sendall(command)
+            while pending:
+                self._receiveInto(self._header)
+                transactionID, protocolID, length, unitID, function = _HEADER.unpack(self._header)
+                if protocolID != 0:
+                    raise _error(errorcodes.PROTOCOL_ID_ERR, "Unexpected protocol ID " + str(protocolID) + ".")
+                data = bytearray(length - 2)
+                self._receiveInto(data)
+                packet = pending.pop(transactionID, None)
+                if packet is None:
+                    raise _error(errorcodes.TRANSACTION_ID_ERR, "Unexpected transaction ID " + str(transactionID) + ".")
+                parseResponse(packet, function, data, aValues)
+        except socket.timeout:
+            raise _error(errorcodes.NO_RESPONSE_BYTES_RECEIVED, "Timed out waiting for a response.")
+        except socket.error as e:
+            raise _error(errorcodes.SOCKET_LEVEL_ERROR, str(e))
+
+
+class _Device(object):
+    """An open handle's settings and socket pool."""
+    def __init__(self, identifier, port, unitID, maxBytesPerMBFB, maxConnections, openTimeout, timeout):
+        self.unitID = unitID
+        self.maxBytesPerMBFB = maxBytesPerMBFB
+        self._address = (identifier, port, openTimeout, timeout)
+        self._idle = [_Connection(*self._address)]
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(maxConnections)
+
+    def transact(self, packets, aValues):
+        """Runs packets on an idle pooled socket, opening one if none are
+        idle. A socket that fails is closed instead of returned to the
+        pool, so the next call reconnects."""
+        with self._slots:
+            with self._lock:
+                connection = self._idle.pop() if self._idle else None
+            if connection is None:
+                connection = _Connection(*self._address)
+            try:
+                connection.transact(packets, self.unitID, aValues)
+            except:
+                connection.close()
+                raise
+            with self._lock:
+                self._idle.append(connection)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+
+_g_devices = {}
+_g_devicesLock = threading.Lock()
+_g_handles = itertools.count(1)
+
+
+def _getDevice(handle):
+    try:
+        return _g_devices[handle]
+    except KeyError:
+        raise _error(errorcodes.INVALID_HANDLE, "Handle " + str(handle) + " is not an open Modbus TCP handle.")
+
+
+def open(identifier, port=constants.TCP_PORT, connectionType=constants.ctTCP, unitID=UNIT_ID,
+         maxBytesPerMBFB=MAX_BYTES_PER_MBFB, maxConnections=MAX_CONNECTIONS,
+         openTimeoutMS=constants.DEFAULT_ETHERNET_OPEN_TIMEOUT_MS,
+         timeoutMS=constants.DEFAULT_ETHERNET_SEND_RECEIVE_TIMEOUT_MS):
+    """Opens a Modbus TCP connection to a device and returns a handle for
+    the other functions in this module.
+
+    Args:
+        identifier: The device's IP address or host name.
+        port: The Modbus TCP port. Default is labjack.ljm.constants.
+            TCP_PORT.
+        connectionType: labjack.ljm.constants.ctTCP, ctETHERNET or
+            ctWIFI. Default is ctTCP.
+        unitID: The Modbus unit ID. Default is 1.
+        maxBytesPerMBFB: The largest packet the device accepts. Default
+            is 1040, the T7 Ethernet and WiFi limit.
+        maxConnections: The most sockets the handle may have open at
+            once, for calls made from several threads. Default is 2.
+        openTimeoutMS: The connect timeout in milliseconds.
+        timeoutMS: The send/receive timeout in milliseconds.
+
+    Returns:
+        The new handle.
+
+    Raises:
+        LJMError: connectionType is not a TCP type, or the device could
+            not be connected to.
+
+    Note: Handles from this module are not LJM handles and only work
+        with the functions in this module.
+
+    """
+    if connectionType not in _TCP_CONNECTION_TYPES:
+        raise _error(errorcodes.INVALID_CONNECTION_TYPE, "Connection type " + str(connectionType) + " is not a TCP type.")
+    device = _Device(identifier, port, unitID, maxBytesPerMBFB, maxConnections, openTimeoutMS/1000.0, timeoutMS/1000.0)
+    with _g_devicesLock:
+        handle = next(_g_handles)
+        _g_devices[handle] = device
+    return handle
+
+
+def close(handle):
+    """Closes a handle and its sockets.
+
+    Raises:
+        LJMError: handle is not open.
+
+    """
+    with _g_devicesLock:
+        device = _getDevice(handle)
+        del _g_devices[handle]
+    device.close()
+
+
+def closeAll():
+    """Closes every handle opened with this module."""
+    with _g_devicesLock:
+        devices = list(_g_devices.values())
+        _g_devices.clear()
+    for device in devices:
+        device.close()
+
+
+def eAddresses(handle, numFrames, aAddresses, aDataTypes, aWrites, aNumValues, aValues):
+    """Performs Modbus operations that reads/writes values to a device.
+    The arguments and return value are the same as
+    labjack.ljm.eAddresses.
+
+    Raises:
+        LJMError: The operations could not be encoded, the device
+            returned an error, or communication failed.
+
+    """
+    device = _getDevice(handle)
+    packets = buildPackets(numFrames, aAddresses, aDataTypes, aWrites, aNumValues, aValues, device.maxBytesPerMBFB)
+    aValues = list(aValues[:sum(aNumValues[:numFrames])])
+    device.transact(packets, aValues)
+    return aValues
+
+
+def eReadAddresses(handle, numFrames, aAddresses, aDataTypes):
+    """Reads one value from each address. Returns the list of values read.
+    See labjack.ljm.eReadAddresses.
+
+    """
+    return eAddresses(handle, numFrames, aAddresses, aDataTypes, [constants.READ]*numFrames, [1]*numFrames, [0.0]*numFrames)
+
+
+def eReadAddress(handle, address, dataType):
+    """Reads one value from an address and returns it. See
+    labjack.ljm.eReadAddress.
+
+    """
+    return eReadAddresses(handle, 1, [address], [dataType])[0]
+
+
+def eWriteAddresses(handle, numFrames, aAddresses, aDataTypes, aValues):
+    """Writes one value to each address. See labjack.ljm.eWriteAddresses.
+
+    """
+    eAddresses(handle, numFrames, aAddresses, aDataTypes, [constants.WRITE]*numFrames, [1]*numFrames, aValues)
+
+
+def eWriteAddress(handle, address, dataType, value):
+    """Writes one value to an address. See labjack.ljm.eWriteAddress."""
+    eWriteAddresses(handle, 1, [address], [dataType], [value])
+
+
+class AsyncDevice(object):
+    """A Modbus TCP connection for asyncio. Calls from any number of
+    coroutines are pipelined on the one socket, and a reader task matches
+    the responses to them by transaction ID.
+
+    Use AsyncDevice.open to create one. The methods take the same
+    arguments as the functions of this module, without the handle.
+
+    """
+    def __init__(self, reader, writer, unitID=UNIT_ID, maxBytesPerMBFB=MAX_BYTES_PER_MBFB,
+                 timeoutMS=constants.DEFAULT_ETHERNET_SEND_RECEIVE_TIMEOUT_MS):
+        self.unitID = unitID
+        self.maxBytesPerMBFB = maxBytesPerMBFB
+        self._timeout = timeoutMS/1000.0
+        self._reader = reader
+        self._writer = writer
+        self._pending = {}
+        self._transactionIDs = itertools.count()
+        self._error = None
+        self._readerTask = asyncio.ensure_future(self._readResponses())
+
+    @classmethod
+    async def open(cls, identifier, port=constants.TCP_PORT, unitID=UNIT_ID, maxBytesPerMBFB=MAX_BYTES_PER_MBFB,
+                   openTimeoutMS=constants.DEFAULT_ETHERNET_OPEN_TIMEOUT_MS,
+                   timeoutMS=constants.DEFAULT_ETHERNET_SEND_RECEIVE_TIMEOUT_MS):
+        """Connects to a device. See open for the arguments.
+
+        Raises:
+            LJMError: The device could not be connected to.
+
+        """
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(identifier, port), openTimeoutMS/1000.0)
+        except (OSError, asyncio.TimeoutError) as e:
+            raise _error(errorcodes.CANNOT_CONNECT, "Cannot connect to " + str(identifier) + ":" + str(port) + ". " + str(e))
+        sock = writer.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return cls(reader, writer, unitID, maxBytesPerMBFB, timeoutMS)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, excType, excValue, traceback):
+        await self.close()
+
+    async def close(self):
+        """Closes the connection. Calls still waiting fail with LJMError."""
+        self._readerTask.cancel()
+        self._writer.close()
+        self._failPending(_error(errorcodes.DEVICE_NOT_OPEN, "The connection was closed."))
+
+    def _failPending(self, error):
+        self._error = self._error or error
+        pending, self._pending = self._pending, {}
+        for future, packet, aValues in pending.values():
+            if not future.done():
+                future.set_exception(error)
+
+    async def _readResponses(self):
+        try:
+            while True:
+                header = await self._reader.readexactly(_MBAP_SIZE + 1)
+                transactionID, protocolID, length, unitID, function = _HEADER.unpack(header)
+                data = await self._reader.readexactly(length - 2)
+                if protocolID != 0:
+                    raise _error(errorcodes.PROTOCOL_ID_ERR, "Unexpected protocol ID " + str(protocolID) + ".")
+                # Responses to calls that timed out are dropped.
+                future, packet, aValues = self._pending.pop(transactionID, (None, None, None))
+                if future is None or future.done():
+                    continue
+                try:
+                    parseResponse(packet, function, data, aValues)
+                except LJMError as e:
+                    future.set_exception(e)
+                else:
+                    future.set_result(None)
+        except asyncio.CancelledError:
+            raise
+        except asyncio.IncompleteReadError:
+            self._failPending(_error(errorcodes.DEVICE_DISCONNECTED, "The device closed the connection."))
+        except LJMError as e:
+            self._failPending(e)
+        except OSError as e:
+            self._failPending(_error(errorcodes.SOCKET_LEVEL_ERROR, str(e)))
+
+    async def eAddresses(self, numFrames, aAddresses, aDataTypes, aWrites, aNumValues, aValues):
+        """Performs Modbus operations that reads/writes values to the
+        device. See labjack.ljm.eAddresses.
+
+        Raises:
+            LJMError: The operations could not be encoded, the device
+                returned an error, communication failed, or the device
+                did not respond within the timeout.
+
+        """
+        if self._error is not None:
+            raise self._error
+        packets = buildPackets(numFrames, aAddresses, aDataTypes, aWrites, aNumValues, aValues, self.maxBytesPerMBFB)
+        aValues = list(aValues[:sum(aNumValues[:numFrames])])
+        loop = asyncio.get_event_loop()
+        transactionIDs = []
+        futures = []
+        command = bytearray()
+        for packet in packets:
+            transactionID = next(self._transactionIDs) & 0xFFFF
+            future = loop.create_future()
+            self._pending[transactionID] = (future, packet, aValues)
+            transactionIDs.append(transactionID)
+            futures.append(future)
+            command += encodePacket(packet, transactionID, self.unitID)
+        self._writer.write(command)
+        try:
+            await self._writer.drain()
+            await asyncio.wait_for(asyncio.gather(*futures), self._timeout)
+        except asyncio.TimeoutError:
+            raise _error(errorcodes.NO_RESPONSE_BYTES_RECEIVED, "Timed out waiting for a response.")
+        except OSError as e:
+            raise _error(errorcodes.SOCKET_LEVEL_ERROR, str(e))
+        finally:
+            # Forget transactions that timed out or were cancelled.
+            for transactionID in transactionIDs:
+                self._pending.pop(transactionID, None)
+        return aValues
+
+    async def eReadAddresses(self, numFrames, aAddresses, aDataTypes):
+        """Reads one value from each address. See eReadAddresses."""
+        return await self.eAddresses(numFrames, aAddresses, aDataTypes, [constants.READ]*numFrames, [1]*numFrames,
+                                     [0.0]*numFrames)
+
+    async def eReadAddress(self, address, dataType):
+        """Reads one value from an address. See eReadAddress."""
+        return (await self.eReadAddresses(1, [address], [dataType]))[0]
+
+    async def eWriteAddresses(self, numFrames, aAddresses, aDataTypes, aValues):
+        """Writes one value to each address. See eWriteAddresses."""
+        await self.eAddresses(numFrames, aAddresses, aDataTypes, [constants.WRITE]*numFrames, [1]*numFrames, aValues)
+
+    async def eWriteAddress(self, address, dataType, value):
+        """Writes one value to an address. See eWriteAddress."""
+        await self.eWriteAddresses(1, [address], [dataType], [value])
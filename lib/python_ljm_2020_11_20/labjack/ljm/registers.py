@@ -0,0 +1,237 @@
+"""
+In-process Modbus register map index built from the LJM constants JSON.
+
+"""
+import collections
+import threading
+
+from labjack.ljm import constants
+
+
+DATA_TYPES = {
+    "UINT16": constants.UINT16,
+    "UINT32": constants.UINT32,
+    "INT32": constants.INT32,
+    "FLOAT32": constants.FLOAT32,
+    "BYTE": constants.BYTE,
+    "STRING": constants.STRING
+}
+
+# Number of 16-bit Modbus registers each data type occupies. An expanded
+# name's address advances by this much per index.
+REGISTER_SIZES = {
+    constants.UINT16: 1,
+    constants.UINT32: 2,
+    constants.INT32: 2,
+    constants.FLOAT32: 2,
+    constants.BYTE: 1,
+    constants.STRING: (constants.STRING_MAX_SIZE + 1)//2
+}
+
+# Compiled on first use, so importing labjack.ljm does not import re.
+_g_expansion = None
+
+
+def expandName(name, address, dataType):
+    """Expands a constants file register name such as "AIN#(0:254)" into
+    its individual names and addresses.
+
+    Args:
+        name: The register name, with or without a #(first:last) or
+            #(first:last:step) expansion.
+        address: The address of the first expanded register.
+        dataType: The data type of the register (labjack.ljm.constants
+            UINT16, FLOAT32, etc.).
+
+    Returns:
+        A list of (name, address) tuples. A name without an expansion
+        returns a single tuple.
+
+    """
+    global _g_expansion
+    if "#(" not in name:
+        return [(name, address)]
+    if _g_expansion is None:
+        import re
+        _g_expansion = re.compile(r"#\((\d+):(\d+)(?::(\d+))?\)")
+    match = _g_expansion.search(name)
+    if match is None:
+        return [(name, address)]
+    first = int(match.group(1))
+    last = int(match.group(2))
+    step = int(match.group(3) or 1)
+    prefix = name[:match.start()]
+    suffix = name[match.end():]
+    size = REGISTER_SIZES.get(dataType, 2)
+    return [(prefix + str(i) + suffix, address + (i - first)*size)
+            for i in range(first, last + 1, step)]
+
+
+class RegisterMap(object):
+    """A name to (address, dataType) index of the Modbus map.
+
+    The index is a dictionary of every expanded register name and
+    alternate name, so each lookup is a single hash lookup instead of a
+    call into the LJM library.
+
+    Args:
+        registers: The "registers" list of a constants file. Each entry
+            is a dictionary with "name", "address" and "type" keys and
+            an optional "altnames" list.
+
+    Raises:
+        KeyError: A register entry is missing a required key.
+        ValueError: A register entry has an unknown data type.
+
+    """
+    def __init__(self, registers):
+        names = {}
+        types = {}
+        ambiguous = set()
+        for register in registers:
+            typeName = register["type"]
+            if typeName not in DATA_TYPES:
+                raise ValueError("Unknown data type " + str(typeName) + " for register " + str(register["name"]) + ".")
+            dataType = DATA_TYPES[typeName]
+            for name in [register["name"]] + list(register.get("altnames", [])):
+                for expandedName, address in expandName(name, register["address"], dataType):
+                    names.setdefault(expandedName, (address, dataType))
+                    if types.setdefault(address, dataType) != dataType:
+                        ambiguous.add(address)
+        for address in ambiguous:
+            del types[address]
+        self._names = names
+        self._types = types
+
+    @classmethod
+    def fromJSON(cls, jsonString):
+        """Builds a RegisterMap from a constants JSON string.
+
+        Args:
+            jsonString: A JSON string containing a "registers" array and
+                optionally a "registers_beta" array.
+
+        Returns:
+            The new RegisterMap.
+
+        Raises:
+            ValueError: jsonString is not valid JSON or has no "registers"
+                array.
+
+        """
+        import json
+        return cls._fromConstants(json.loads(jsonString))
+
+    @classmethod
+    def fromFile(cls, fileName):
+        """Builds a RegisterMap from a constants file, such as the
+        ljm_constants.json installed with LJM.
+
+        Args:
+            fileName: The path of the constants file.
+
+        Returns:
+            The new RegisterMap.
+
+        Raises:
+            EnvironmentError: The file could not be read.
+            ValueError: The file is not valid JSON or has no "registers"
+                array.
+
+        """
+        import json
+        with open(fileName, "r") as f:
+            return cls._fromConstants(json.load(f))
+
+    @classmethod
+    def _fromConstants(cls, parsed):
+        if not isinstance(parsed, dict) or "registers" not in parsed:
+            raise ValueError("The constants JSON does not contain a \"registers\" array.")
+        return cls(list(parsed["registers"]) + list(parsed.get("registers_beta", [])))
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, name):
+        return name in self._names
+
+    def get(self, name, default=None):
+        """Returns the (address, dataType) tuple of name, or default if
+        name is not in the map.
+
+        """
+        return self._names.get(name, default)
+
+    def getType(self, address, default=None):
+        """Returns the data type of address, or default if address is not
+        in the map or is shared by registers of different data types.
+
+        """
+        return self._types.get(address, default)
+
+    def resolveMany(self, names):
+        """Resolves a sequence of register names in bulk.
+
+        Args:
+            names: An iterable of register name strings.
+
+        Returns:
+            A tuple containing:
+            (aAddresses, aDataTypes)
+
+            aAddresses: A list of addresses corresponding to names. Names
+                not in the map are labjack.ljm.constants.
+                INVALID_NAME_ADDRESS.
+            aDataTypes: A list of data types corresponding to names.
+                Names not in the map are 0.
+
+        """
+        missing = (constants.INVALID_NAME_ADDRESS, 0)
+        lookup = self._names.get
+        pairs = [lookup(name, missing) for name in names]
+        if not pairs:
+            return [], []
+        aAddresses, aDataTypes = zip(*pairs)
+        return list(aAddresses), list(aDataTypes)
+
+
+class LRUCache(object):
+    """A small thread-safe least recently used cache.
+
+    Args:
+        maxSize: The maximum number of entries to keep.
+
+    """
+    def __init__(self, maxSize=1024):
+        self._maxSize = maxSize
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Returns the value cached for key and marks it as most recently
+        used, or returns default if key is not cached.
+
+        """
+        with self._lock:
+            try:
+                value = self._entries.pop(key)
+            except KeyError:
+                return default
+            self._entries[key] = value
+            return value
+
+    def put(self, key, value):
+        """Caches value for key, evicting the least recently used entry if
+        the cache is full.
+
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = value
+            if len(self._entries) > self._maxSize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Removes all entries."""
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,221 @@
+"""
+Stream reads on LJM's stream thread into a preallocated ring.
+
+"""
+import ctypes
+import threading
+
+from labjack.ljm import errorcodes
+from labjack.ljm import ljm
+
+
+class StreamRing:
+    """A stream callback that reads each chunk into the next free slot of
+    a preallocated ring of stream reads.
+
+    setStreamCallback calls a Python callback that has to call eStreamRead
+    itself, which allocates a list for every read. A StreamRing installs
+    its own callback instead. LJM's stream thread calls it as soon as
+    scansPerRead scans are ready, and it only calls LJM_eStreamRead into
+    the next free slot, with the ctypes arguments of every slot built
+    once, and notifies a condition variable. The GIL is released during
+    the read. Consumers on other threads block on or poll the ring, so
+    reads reach them without a reader thread of their own.
+
+    When every slot is unread, the callback leaves the scans in the LJM
+    buffer, where they show up in the LJM scan backlog. Later callbacks
+    read them as slots are freed, so no scans are lost.
+
+    Args:
+        handle: A valid handle to an open device with a running stream.
+        scansPerRead: The scansPerRead passed to eStreamStart.
+        numSlots: The number of stream reads the ring holds. Must be at
+            least 2.
+        aBuffer: Optional writable, C-contiguous buffer of 64-bit floats
+            (numpy.float64 array, array.array("d"), etc.) of at least
+            numSlots*scansPerRead*numAddresses values to use as the
+            slots. Default is None, which allocates one.
+
+    Raises:
+        ValueError: numSlots is less than 2, or scansPerRead does not
+            match the stream.
+        TypeError: aBuffer is not a suitable buffer.
+        LJMError: eStreamStart was not called first on the handle, or an
+            error was returned from the LJM library call.
+
+    Notes:
+        Create the StreamRing after eStreamStart. It replaces any
+        callback set with setStreamCallback, and eStreamStop or close
+        removes it. Slot i holds the values of read i % numSlots, with
+        all channels interleaved as by eStreamRead.
+        One thread at a time should consume the ring.
+
+    """
+    def __init__(self, handle, scansPerRead, numSlots, aBuffer=None):
+        if handle not in ljm._g_eStreamDataSize:
+            raise ljm.LJMError(errorString="Streaming has not been started for the given handle. Please call eStreamStart first.")
+        numValues = ljm._g_eStreamDataSize[handle]
+        if scansPerRead < 1 or numValues % scansPerRead != 0:
+            raise ValueError("scansPerRead " + str(scansPerRead) + " does not match the stream's " + str(numValues) + " values per read.")
+        if numSlots < 2:
+            raise ValueError("numSlots must be at least 2, not " + str(numSlots) + ".")
+        self._handle = handle
+        self._scansPerRead = scansPerRead
+        self._numSlots = numSlots
+        self._numValues = numValues
+        self._slotBytes = numValues*ctypes.sizeof(ctypes.c_double)
+        if aBuffer is None:
+            self._cData = (ctypes.c_double*(numSlots*numValues))()
+        else:
+            self._cData = ljm._convertBufferToCtypeArray(aBuffer, ctypes.c_double, numSlots*numValues)
+        self._buffer = self._cData if aBuffer is None else aBuffer
+        self._address = ctypes.addressof(self._cData)
+        # The arguments of every slot's LJM_eStreamRead, so the callback builds none.
+        self._cD_SBLs = (ctypes.c_int32*numSlots)()
+        self._cLJM_SBLs = (ctypes.c_int32*numSlots)()
+        self._slotArgs = [(ctypes.byref(self._cData, i*self._slotBytes), ctypes.byref(self._cD_SBLs, i*4),
+                           ctypes.byref(self._cLJM_SBLs, i*4)) for i in range(numSlots)]
+        self._eStreamRead = ljm._staticLib.LJM_eStreamRead
+        self._readIntoViews = {}  # The ctypes view of each aData of readInto, by id
+
+        self._written = 0  # Reads completed, only changed by the callback
+        self._read = 0  # Reads consumed, only changed by the consumer
+        self._error = None
+        self._fullCallbacks = 0
+        self._ready = threading.Condition(threading.Lock())
+
+        self._callbackLjm = ctypes.CFUNCTYPE(None, ctypes.c_void_p)(self._callback)
+        # Kept alive with the stream, like setStreamCallback's data, until eStreamStop.
+        ljm._g_streamCallbackData[handle] = self
+        error = ljm._staticLib.LJM_SetStreamCallback(handle, self._callbackLjm, 0)
+        if error != errorcodes.NOERROR:
+            del ljm._g_streamCallbackData[handle]
+            raise ljm.LJMError(error)
+
+    def _callback(self, arg):
+        """Reads every ready chunk that fits into free slots. Runs on
+        LJM's stream thread."""
+        while self._written - self._read < self._numSlots:
+            slot = self._written % self._numSlots
+            error = self._eStreamRead(self._handle, *self._slotArgs[slot])
+            with self._ready:
+                if error != errorcodes.NOERROR:
+                    self._error = error
+                    self._ready.notify_all()
+                    return
+                self._written += 1
+                self._ready.notify_all()
+            if self._cLJM_SBLs[slot] < self._scansPerRead:
+                return
+        self._fullCallbacks += 1
+
+    @property
+    def numSlots(self):
+        return self._numSlots
+
+    @property
+    def buffer(self):
+        """The slots' buffer: aBuffer, or the ctypes array allocated."""
+        return self._buffer
+
+    @property
+    def reads(self):
+        """The number of stream reads the callback has completed."""
+        return self._written
+
+    @property
+    def available(self):
+        """The number of reads in the ring that have not been consumed.
+        Polling it never blocks."""
+        return self._written - self._read
+
+    @property
+    def fullCallbacks(self):
+        """The number of callbacks that left scans in the LJM buffer
+        because every slot was unread."""
+        return self._fullCallbacks
+
+    def wait(self, timeout=None):
+        """Waits until the ring holds an unread read.
+
+        Args:
+            timeout: The most seconds to wait. Default is None, which
+                waits until a read arrives.
+
+        Returns:
+            True if there is an unread read, False if timeout passed
+            first.
+
+        Raises:
+            LJMError: The callback's LJM_eStreamRead returned an error
+                since the last one was raised, and every read before it
+                has been consumed.
+
+        """
+        with self._ready:
+            while self._written == self._read:
+                if self._error is not None:
+                    error, self._error = self._error, None
+                    raise ljm.LJMError(error)
+                if not self._ready.wait(timeout):
+                    return False
+        return True
+
+    def readInto(self, aData, timeout=None):
+        """Copies the oldest unread read into a caller-owned buffer and
+        frees its slot. Waits for a read, as by wait, if there is none.
+
+        Args:
+            aData: A writable, C-contiguous buffer of 64-bit floats with
+                room for at least scansPerRead*numAddresses values.
+            timeout: As for wait.
+
+        Returns:
+            The read's (deviceScanBacklog, ljmScanBackLog), as returned
+            by eStreamReadInto, or None if timeout passed first.
+
+        Raises:
+            TypeError: aData is not a suitable buffer.
+            LJMError: As for wait.
+
+        Notes:
+            The ctypes view of each aData object is kept, as by
+            eStreamReadInto, so pass the same objects each time.
+
+        """
+        view = self._readIntoViews.get(id(aData))
+        if view is None:
+            if len(self._readIntoViews) >= ljm._MAX_READ_INTO_BUFFERS:
+                self._readIntoViews.clear()
+            # Keeps aData alive, so its id is not reused while cached
+            view = self._readIntoViews[id(aData)] = (aData, ljm._convertBufferToCtypeArray(aData, ctypes.c_double, self._numValues))
+        if self._written == self._read and not self.wait(timeout):
+            return None
+        slot = self._read % self._numSlots
+        ctypes.memmove(view[1], self._address + slot*self._slotBytes, self._slotBytes)
+        backlogs = self._cD_SBLs[slot], self._cLJM_SBLs[slot]
+        self._read += 1
+        return backlogs
+
+    def close(self):
+        """Removes the callback. Reads already in the ring can still be
+        consumed.
+
+        Raises:
+            LJMError: An error was returned from the LJM library call.
+
+        Notes:
+            close may not be called from within a callback.
+
+        """
+        if ljm._g_streamCallbackData.get(self._handle) is self:
+            del ljm._g_streamCallbackData[self._handle]
+            error = ljm._staticLib.LJM_SetStreamCallback(self._handle, 0, 0)
+            if error != errorcodes.NOERROR:
+                raise ljm.LJMError(error)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -1,109 +1,108 @@
-    """
-    This example demonstrates how to stream data from a LabJack at high scan/sample rate for multiple analog inputs and process the data in real time.
-    
-    Author: Liam Eime
-    Date: 2023-12-21
-    """
+"""
+This example demonstrates how to stream data from a LabJack at high scan/sample rate for multiple analog inputs and process the data in real time.
+
+Run it with `python main.py`. The stream steps are functions so that the benchmarks in benchmarks/ can drive them
+against a simulated device.
+
+Author: Liam Eime
+Date: 2023-12-21
+"""
 
 from labjack import ljm
 from datetime import datetime
 import numpy as np
-import threading
 import time
 import atexit
+import os
+import multiprocessing
+import queue
+from t7stream import (AinCalibration, AnalysisPipeline, ClockSynchronizer, EventCapture, EventDetector, GapMap,
+                      ReadCadence, Recorder, ReplaySource, RingBuffer, ScanClock, SharedRing, SharedRingReader,
+                      StreamHealth, find_gaps, mask_gaps)
 
 # Define constants for convenience
 FIRST_AIN_CHANNEL = 0  # 0 = AIN0
 NUMBER_OF_AINS = 3
 OUTPUT_DIR = "data"
-OUTPUT_FILENAME = "data.csv"
+OUTPUT_FILENAME = "data.t7r"  # Recorded as data_<start time>_<sequence>.t7r files
 ACCEL_TO_G_OFFSET = 2.5  # 2.5 V = 0 g
 ACCEL_TO_G_SENSITIVITY = 1  # 1 V/g
+AIN_RANGE = 10.0  # +/-10 V
+STREAM_BINARY = False  # Stream raw 16-bit codes, calibrated to g by main.py and recorded as uint16, instead of volts
 BUFFER_PERIOD = 0.05  # Buffer period in seconds
 SCAN_RATE = 30000  # Hz
+READ_SECONDS = 0.025  # Seconds of scans returned by each stream read; reads are analysed in chunks of one or more
+MAX_CHUNK_SECONDS = 1  # Most seconds of scans analysed as one chunk when the host is loaded
+MAX_CHUNK_OVERHEAD = 0.05  # Grow chunks until their fixed analysis cost is at most this fraction of stream time
+STREAM_CALLBACK = False  # Read the stream on LJM's stream thread into a ring as soon as each read is ready
+STREAM_RING_READS = 40  # Stream reads the ring holds before further scans wait in the LJM buffer
 THRESHOLDS = np.array([0.6, 0.6, 1.2])  # x, y, z
+RELEASE_THRESHOLDS = THRESHOLDS  # An event's run ends at or below these; set lower for hysteresis
 TICK_PER_SECOND = 40e6  # T7 core timer ticks per second
+RETENTION_SECONDS = 10  # Seconds of samples kept in memory
+CLOCK_SYNC_INTERVAL = 5  # Seconds between CORE_TIMER resynchronizations
+STATUS_INTERVAL = 1  # Seconds between the read loop's status lines
+MAX_PENDING_READS = 4  # Stream reads queued for analysis before the read loop waits
+ACQUISITION_PROCESS = False  # Read the stream in its own process and analyse it in another
+SHARED_RING_READS = 400  # Stream reads kept in shared memory for the analysis process, 10 s of READ_SECONDS reads
+RECORD_DATA = False  # Record the stream's volts to OUTPUT_DIR/OUTPUT_FILENAME, until the disk is full
+RECORD_MAX_BYTES = 1 << 30  # Start a new recording file after this many bytes...
+RECORD_MAX_SECONDS = 3600  # ...or this many seconds of scans
+CAPTURE_EVENTS = False  # Save the g values around each event to CAPTURE_DIR
+CAPTURE_DIR = os.path.join(OUTPUT_DIR, "events")
+CAPTURE_PRE_SECONDS = 0.1  # Seconds saved before each event's peak...
+CAPTURE_POST_SECONDS = 0.2  # ...and after it
+CAPTURE_MAX_PER_MINUTE = 60  # Events beyond this many a minute are not saved
+CAPTURE_MAX_MB = 64  # Captures waiting to be written beyond this are not saved
+REPLAY_FILES = None  # Recording files to analyse instead of streaming, e.g. "data/data_*.t7r"
+REPLAY_SPEED = None  # Multiple of real time to replay at; None replays as fast as analysis allows
+STREAM_BUFFER_SIZE_BYTES = 32768  # The device's stream buffer; 32768 bytes is the maximum
+HEALTH_WARN_SECONDS = 30  # Warn and shed analysis load when the device buffer would overflow within this...
+MAX_LJM_BACKLOG_SECONDS = 5  # ...or the LJM backlog would pass this many seconds of scans
 
 # Initialize variables
-last_spike_times = np.zeros(NUMBER_OF_AINS)
-max_values = np.zeros(NUMBER_OF_AINS)
-in_event = np.array([False, False, False])
-total_data_points = 0
-raw_data = []
+detector = None  # EventDetector carrying events across reads, created by create_analysis
+samples = None  # RingBuffer of g values, allocated by create_analysis
+scan_clock = None  # ScanClock mapping scan indices to system time, created by start_stream
+stream_start_ticks = 0  # STREAM_START_TIME_STAMP of the stream, read by start_stream
+pipeline = None  # AnalysisPipeline running process_data in read order, created by create_analysis
+recorder = None  # Recorder writing the stream to disk, created by start_stream when RECORD_DATA is set
+capture = None  # EventCapture saving the scans around events, created by create_analysis when CAPTURE_EVENTS is set
+health = None  # StreamHealth tracking the backlogs of each stream read, created by create_analysis
+gap_map = None  # GapMap of the scans LJM skipped, created by create_analysis
+cadence = None  # ReadCadence choosing the stream reads per analysis chunk, created by main
+ain_calibration = None  # AinCalibration of the raw codes read from the device by main when STREAM_BINARY is set
+read_scratch = None  # One stream read of raw codes as LJM returns them, as float64, allocated by main
+stream_ring = None  # ljm.StreamRing filled by LJM's stream thread, created by main when STREAM_CALLBACK is set
+read_views = None  # (stream_buffer, a view of each of its reads), so every read passes LJM the same objects
 scan_backlog = 0
 total_errors = 0
-total_time_elapsed = 0
-
-# Create a lock for scan_system_times
-scan_system_times_lock = threading.Lock()
 
 # Define process data function for stream
-scan_system_times = []
-
-def process_data(data):
+def process_data(data, first_scan):
     """Process data from the stream.
 
     Args:
-        data: A list of data from the stream.
-    """
-    global total_data_points, max_values, last_spike_times, in_event
-    # Convert data to numpy arrays
-    data = np.array(data)
-    # Reshape the data into a 2D array with one row per channel
-    data = data.reshape(-1, NUMBER_OF_AINS).T
-    current_time = scan_system_times[total_data_points:total_data_points + data.shape[1]]
-    # Calculate a boolean array where the data is above the threshold
-    above_threshold = data > THRESHOLDS[:, None]
-    # Update max_values and last_spike_times where the data is above the threshold
-    for i in range(NUMBER_OF_AINS):
-        if above_threshold[i].any():
-            max_values[i] = np.maximum(max_values[i], data[i][above_threshold[i]].max())
-            last_spike_times[i] = current_time[above_threshold[i]].max()
-            in_event[i] = True
-    # Calculate a boolean array where the data is below the threshold and the buffer period has passed
-    below_threshold_and_buffer_passed = np.logical_and(~above_threshold, (current_time - last_spike_times[:, None]) > BUFFER_PERIOD)
-    # Print and reset max_values where below_threshold_and_buffer_passed is True and an event has occurred
-    for i in np.where(np.logical_and(below_threshold_and_buffer_passed.any(axis=1), in_event))[0]:
-        time_str = datetime.fromtimestamp(last_spike_times[i]).strftime('%y/%m/%d %H:%M:%S.%f')[:21]
-        print(f"\nMax value for channel {i}: {max_values[i]:.5f}g at {time_str}")
-        max_values[i] = 0
-        in_event[i] = False
-    total_data_points += data.shape[1]
-    
-
-# Open first found LabJack T7 via USB.
-handle = ljm.open(
-    deviceType=ljm.constants.dtT7, 
-    connectionType=ljm.constants.ctUSB,
-    identifier="ANY"
-)
-
-# Print device info to confirm it is opened.
-info = ljm.getHandleInfo(handle)
-print("Opened a LabJack with Device type: %i, Connection type: %i,\n"
-      "Serial number: %i, IP address: %s, Port: %i,\nMax bytes per MB: %i" %
-      (info[0], info[1], info[2], ljm.numberToIP(info[3]), info[4], info[5]))
-
-# T7 configuration
-# Ensure triggered stream is disabled.
-ljm.eWriteName(handle, "STREAM_TRIGGER_INDEX", 0)
-# Enabling internally-clocked stream.
-ljm.eWriteName(handle, "STREAM_CLOCK_SOURCE", 0)
-# Set the stream buffer size to the maximum value, 32768 bytes.
-max_buffer_size = 32768
-ljm.eWriteName(handle, "STREAM_BUFFER_SIZE_BYTES", max_buffer_size)
-
-# AIN ranges are +/-10 V, stream resolution index is 0 (default).
-# Negative Channel = GND (single-ended), settling = 0 (default).
-aNames = ["AIN_ALL_RANGE", "STREAM_RESOLUTION_INDEX", "AIN_ALL_NEGATIVE_CH", "STREAM_SETTLING_US"]
-aValues = [10.0, 0, ljm.constants.GND, 0]
-ljm.eWriteNames(handle, len(aNames), aNames, aValues)
-
-# Stream Configuration
-aScanListNames = ["AIN%i" % i for i in range(FIRST_AIN_CHANNEL, FIRST_AIN_CHANNEL + NUMBER_OF_AINS)]  # Scan list names to stream
-numAddresses = len(aScanListNames)
-aScanList = ljm.namesToAddresses(numAddresses, aScanListNames)[0]
-scansPerRead = int(SCAN_RATE)
+        data: A 2D array of g values from the stream with one row per channel.
+        first_scan: The scan index of the first column of data.
+    """
+    events = detector.process(data, first_scan)
+    print_events(events)
+    if capture is not None:
+        capture.add(events)
+        capture.poll()  # Saves the windows whose scans have all arrived
+
+
+def print_events(events):
+    """Print each event's peak and the time of the peak.
+
+    Args:
+        events: Events from the EventDetector.
+    """
+    for event in events:
+        time_str = datetime.fromtimestamp(scan_clock.time_of(event["peak_index"])).strftime('%y/%m/%d %H:%M:%S.%f')[:21]
+        print(f"\nMax value for channel {event['channel']}: {event['peak']:.5f}g at {time_str}")
+
 
 def tick_diff_with_roll(start, end):  # The core timer is a uint32 value that will overflow/rollover
     diffTicks = 0
@@ -113,46 +112,471 @@ def tick_diff_with_roll(start, end):  # The core timer is a uint32 value that wi
         diffTicks = end - start
     return diffTicks
 
-# Perform data acquisition
-try:
+
+def open_device():
+    """Open the first found LabJack T7 via USB and print its info.
+
+    Returns:
+        The handle of the opened device.
+    """
+    handle = ljm.open(
+        deviceType=ljm.constants.dtT7,
+        connectionType=ljm.constants.ctUSB,
+        identifier="ANY"
+    )
+    # Print device info to confirm it is opened.
+    info = ljm.getHandleInfo(handle)
+    print("Opened a LabJack with Device type: %i, Connection type: %i,\n"
+          "Serial number: %i, IP address: %s, Port: %i,\nMax bytes per MB: %i" %
+          (info[0], info[1], info[2], ljm.numberToIP(info[3]), info[4], info[5]))
+    return handle
+
+
+def configure_device(handle, binary=False):
+    """Configure the T7 for stream and return the scan list.
+
+    Args:
+        handle: The handle of the opened device.
+        binary: Stream raw 16-bit codes instead of volts.
+
+    Returns:
+        The Modbus addresses of the analog inputs to stream.
+    """
+    # Ensure triggered stream is disabled.
+    ljm.eWriteName(handle, "STREAM_TRIGGER_INDEX", 0)
+    # Enabling internally-clocked stream.
+    ljm.eWriteName(handle, "STREAM_CLOCK_SOURCE", 0)
+    # Set the stream buffer size, by default to the maximum value, 32768 bytes.
+    ljm.eWriteName(handle, "STREAM_BUFFER_SIZE_BYTES", STREAM_BUFFER_SIZE_BYTES)
+
+    # AIN ranges are AIN_RANGE (+/-10 V), stream resolution index is 0 (default).
+    # Negative Channel = GND (single-ended), settling = 0 (default).
+    aNames = ["AIN_ALL_RANGE", "STREAM_RESOLUTION_INDEX", "AIN_ALL_NEGATIVE_CH", "STREAM_SETTLING_US"]
+    aValues = [AIN_RANGE, 0, ljm.constants.GND, 0]
+    ljm.eWriteNames(handle, len(aNames), aNames, aValues)
+    # eStreamRead returns raw codes, still as doubles, instead of calibrated volts.
+    ljm.writeLibraryConfigS(ljm.constants.STREAM_AIN_BINARY, int(binary))
+
+    # Stream Configuration
+    aScanListNames = ["AIN%i" % i for i in range(FIRST_AIN_CHANNEL, FIRST_AIN_CHANNEL + NUMBER_OF_AINS)]  # Scan list names to stream
+    return ljm.namesToAddresses(len(aScanListNames), aScanListNames)[0]
+
+
+def on_stream_health(warnings, status):
+    """Shed analysis load while the stream is predicted to fall behind, and restore it once it has recovered.
+
+    While there are warnings the pipeline drops reads for analysis instead of holding up the stream reads.
+
+    Args:
+        warnings: The active StreamHealth warnings.
+        status: StreamHealth.status() at the change.
+    """
+    pipeline.block = not warnings
+    if warnings:
+        print(f"\nStream health warning: {', '.join(sorted(warnings))}. Device backlog {status['device_backlog']} "
+              f"of {status['device_capacity']} scans, growing {status['device_growth']:.0f} scans/s, overflow in "
+              f"{status['seconds_to_overflow']:.1f} s; LJM backlog {status['ljm_backlog']} scans, growing "
+              f"{status['ljm_growth']:.0f} scans/s. Skipping analysis of reads that would wait.")
+    else:
+        print("\nStream health recovered, analysing every read again.")
+
+
+def record_stream_read(backlogs, read_seconds):
+    """Record the backlogs returned by a stream read with StreamHealth.
+
+    Args:
+        backlogs: The (deviceScanBacklog, ljmScanBacklog) returned by the read.
+        read_seconds: How long the read took.
+    """
+    deviceScanBacklog, ljmScanBacklog = backlogs
+    health.record(deviceScanBacklog, ljmScanBacklog, read_seconds)
+
+
+def analyse_chunk(chunk):
+    """Run process_data on a chunk from the pipeline and report its analysis time to the read cadence.
+
+    Args:
+        chunk: The (data, first_scan) submitted by handle_stream_read.
+    """
+    start = time.perf_counter()
+    process_data(*chunk)
+    if cadence is not None:
+        cadence.observe(chunk[0].shape[1], time.perf_counter() - start)
+
+
+def read_chunk(handle, stream_buffer, scansPerRead):
+    """Read cadence.reads_per_chunk stream reads back to back into stream_buffer and choose the next chunk length.
+
+    The reads come from stream_ring when it is set, where LJM's stream thread has already read them.
+
+    Args:
+        handle: The handle of the streaming device.
+        stream_buffer: A buffer for cadence.max_reads reads, of uint16 codes when ain_calibration is set.
+        scansPerRead: The number of scans returned by each stream read.
+
+    Returns:
+        The chunk, a view of stream_buffer, and the (deviceScanBacklog, ljmScanBacklog) of its last read.
+    """
+    global read_views
+    if read_views is None or read_views[0] is not stream_buffer:
+        # eStreamReadInto keeps its ctypes view of each buffer object, so a new slice per read would rebuild it
+        read_views = (stream_buffer, list(stream_buffer.reshape(-1, scansPerRead * NUMBER_OF_AINS)))
+    chunk = stream_buffer[:cadence.reads_per_chunk * scansPerRead * NUMBER_OF_AINS]
+    for read in read_views[1][:cadence.reads_per_chunk]:
+        read_start = time.perf_counter()
+        # Raw codes arrive as doubles; only this one read is kept as doubles before they become uint16
+        into = read if ain_calibration is None else read_scratch
+        if stream_ring is None:
+            backlogs = ljm.eStreamReadInto(handle, into)
+        else:
+            backlogs = stream_ring.readInto(into)  # Already read by LJM's stream thread, or waits for it
+        if ain_calibration is not None:
+            np.copyto(read, read_scratch, casting="unsafe")
+        record_stream_read(backlogs, time.perf_counter() - read_start)
+    cadence.update(backlogs[1])
+    return chunk, backlogs
+
+
+def create_analysis(scanRate, scansPerRead):
+    """Create the sample ring buffer, event detector, analysis pipeline, event capture, stream health monitor and gap
+    map for a stream. Call once scan_clock is set.
+
+    Args:
+        scanRate: The actual scan rate of the stream.
+        scansPerRead: The number of scans returned by each stream read.
+    """
+    global samples, pipeline, detector, capture, health, gap_map
+    samples = RingBuffer.for_retention(NUMBER_OF_AINS, scanRate, RETENTION_SECONDS)
+    detector = EventDetector(THRESHOLDS, int(BUFFER_PERIOD * scanRate), RELEASE_THRESHOLDS)
+    # A read is late if its analysis finishes after the next read is due
+    pipeline = AnalysisPipeline(analyse_chunk, max_pending=MAX_PENDING_READS, late_seconds=scansPerRead / scanRate)
+    if CAPTURE_EVENTS:
+        channel_names = ["AIN%i" % i for i in range(FIRST_AIN_CHANNEL, FIRST_AIN_CHANNEL + NUMBER_OF_AINS)]
+        capture = EventCapture(samples, CAPTURE_DIR, scanRate, scan_clock, CAPTURE_PRE_SECONDS, CAPTURE_POST_SECONDS,
+                               channel_names, max_per_minute=CAPTURE_MAX_PER_MINUTE, max_bytes=CAPTURE_MAX_MB << 20)
+    health = StreamHealth(scanRate, scansPerRead, NUMBER_OF_AINS, STREAM_BUFFER_SIZE_BYTES,
+                          warn_seconds=HEALTH_WARN_SECONDS, max_ljm_backlog_seconds=MAX_LJM_BACKLOG_SECONDS,
+                          on_change=on_stream_health)
+    gap_map = GapMap()
+
+
+def report_gaps(gaps):
+    """Add the gaps in a stream read to gap_map and print the new ones.
+
+    Args:
+        gaps: The GAP_DTYPE runs of skipped scans found in the read.
+    """
+    if gap_map.add(gaps):
+        time_str = datetime.fromtimestamp(scan_clock.time_of(gaps["start"][0])).strftime('%y/%m/%d %H:%M:%S.%f')[:21]
+        print(f"\nStream skipped {gaps['scans'].sum()} scans in {gaps.size} gap(s) from {time_str}; "
+              f"{gap_map.skipped_scans} skipped in total")
+
+
+def start_stream(handle, aScanList, scansPerRead):
+    """Start the stream, align its start with the system time, and create the scan clock, analysis and recorder.
+
+    Args:
+        handle: The handle of the configured device.
+        aScanList: The Modbus addresses to stream.
+        scansPerRead: The number of scans returned by each stream read.
+
+    Returns:
+        The actual scan rate and the system timestamp of the start of the stream.
+    """
     # Configure and start stream
-    scanRate = ljm.eStreamStart(handle, scansPerRead, numAddresses, aScanList, SCAN_RATE)
+    scanRate = ljm.eStreamStart(handle, scansPerRead, len(aScanList), aScanList, SCAN_RATE)
     print("\nStream started with a scan rate of %0.0f Hz." % scanRate)
+    global scan_clock, stream_start_ticks, recorder
     # Get stream start time as a CORE_TIMER value
     start_time = ljm.eReadName(handle, "STREAM_START_TIME_STAMP")
+    stream_start_ticks = int(start_time)
     # Read CORE_TIMER
     syncCoreRead = ljm.eReadName(handle, "CORE_TIMER")
     # Calculate system timestamp corresponding to the start of stream
     sysTimestamp = time.time()
     diffTicks = tick_diff_with_roll(start_time, syncCoreRead)  # start_time is the var storing the stream start timestamp
-    diffSeconds = diffTicks / TICK_PER_SECOND 
+    diffSeconds = diffTicks / TICK_PER_SECOND
     streamStartTimeSystemAligned = sysTimestamp - diffSeconds  # system timestamp corresponding to the start of stream
-    while True:
-        # Read stream data
-        ret = ljm.eStreamRead(handle)
-        starting = time.time()
-        new_data = ((np.array(ret[0]) - ACCEL_TO_G_OFFSET)/ACCEL_TO_G_SENSITIVITY).tolist()  # Convert to g
-        raw_data.extend(new_data)
-        # Calculate the scan timestamps for the new data
-        num_new_scans = len(new_data) / NUMBER_OF_AINS
-        new_scanTimesElapsed = np.arange(num_new_scans) / scanRate
-        total_time_elapsed += new_scanTimesElapsed[-1]
-        new_scanTimestamps = streamStartTimeSystemAligned + new_scanTimesElapsed + total_time_elapsed
-        with scan_system_times_lock:
-            # scan_system_times = scanTimestamps
-            scan_system_times = np.concatenate((scan_system_times, new_scanTimestamps))
-        # Start a new thread to process the data
-        t = threading.Thread(target=process_data, args=(new_data,))
-        t.start()
-        ending = time.time()
-        print(f"\nTime to read data: {ending - starting:.5f} s")
-except Exception as e:
-    print("\nUnexpected error: %s" % str(e))
-except KeyboardInterrupt:  # Ctrl+C
-    print("\nKeyboard Interrupt caught.")
-finally:
-    # Stop stream
+    scan_clock = ScanClock(streamStartTimeSystemAligned, scanRate)
+    create_analysis(scanRate, scansPerRead)
+    if RECORD_DATA:
+        channel_names = ["AIN%i" % i for i in range(FIRST_AIN_CHANNEL, FIRST_AIN_CHANNEL + NUMBER_OF_AINS)]
+        calibration = {"offset": ACCEL_TO_G_OFFSET, "sensitivity": ACCEL_TO_G_SENSITIVITY, "unit": "g"}
+        dtype = np.float64
+        if ain_calibration is not None:
+            calibration, dtype = ain_calibration.to_dict(), np.uint16  # Lossless raw codes, a quarter of the size
+        recorder = Recorder(os.path.join(OUTPUT_DIR, OUTPUT_FILENAME), channel_names, scanRate, scan_clock,
+                            calibration, dtype, max_bytes=RECORD_MAX_BYTES, max_seconds=RECORD_MAX_SECONDS)
+    return scanRate, streamStartTimeSystemAligned
+
+
+def handle_stream_read(stream_buffer):
+    """Convert one stream read to g, mask the scans LJM skipped, store it and queue it for process_data.
+
+    Waits while MAX_PENDING_READS reads are already queued, which leaves new scans in the LJM buffer.
+
+    Args:
+        stream_buffer: The volts from the latest stream read, or its uint16 codes when ain_calibration is set.
+    """
+    if ain_calibration is None:
+        new_data = (stream_buffer - ACCEL_TO_G_OFFSET)/ACCEL_TO_G_SENSITIVITY  # Convert to g
+        # Reshape the data into a 2D array with one row per channel
+        new_data = new_data.reshape(-1, NUMBER_OF_AINS).T
+    else:
+        # Look the raw codes up in the calibration's g table, one row per channel
+        new_data = ain_calibration.convert(stream_buffer.reshape(-1, NUMBER_OF_AINS).T)
+    # Skipped scans keep their index, so scan_clock stays right after them, but are NaN to the analysis
+    gaps = find_gaps(stream_buffer, NUMBER_OF_AINS, samples.total)
+    if gaps.size:
+        mask_gaps(new_data, gaps, samples.total)
+        report_gaps(gaps)
+    # Scans are timestamped on demand by scan_clock from their index
+    first_scan = samples.write(new_data)
+    if recorder is not None:
+        recorder.write_interleaved(stream_buffer, first_scan)  # Copied and written by the recorder's thread
+    pipeline.submit((new_data, first_scan))
+
+
+def finish_analysis():
+    """Finish analysing and recording the reads already queued."""
+    if pipeline is not None:
+        pipeline.close()
+    if detector is not None:
+        events = detector.flush()  # Events still within their buffer period
+        print_events(events)
+        if capture is not None:
+            capture.add(events)
+    if capture is not None:
+        capture.close()
+        print(f"\nCaptured {capture.captured} events to {CAPTURE_DIR}, skipped {capture.rate_limited} over the rate "
+              f"limit and {capture.dropped} over the memory limit, write errors: {capture.errors}")
+    if health is not None and health.reads:
+        status = health.status()
+        print(f"\nStream health: largest backlogs device {health.max_device_backlog} of {health.device_capacity} "
+              f"scans, LJM {health.max_ljm_backlog} scans; read jitter {status['jitter_rms'] * 1000:.1f} ms RMS")
+    if gap_map is not None and gap_map.count:
+        print(f"\nLJM skipped {gap_map.skipped_scans} scans in {gap_map.count} gap(s), the largest {gap_map.largest} "
+              f"scans")
+    if recorder is not None:
+        recorder.close()
+        print(f"\nRecorded {recorder.scans} scans to {len(recorder.files)} file(s), "
+              f"dropped {recorder.dropped} reads, write errors: {recorder.errors}")
+
+
+def stop_stream(handle):
+    """Finish analysing and recording the reads already queued, then stop the stream.
+
+    Args:
+        handle: The handle of the streaming device.
+    """
+    finish_analysis()
     print("\nStop Stream")
     ljm.eStreamStop(handle)
-    # Close handle
-    ljm.close(handle)
\ No newline at end of file
+
+
+def main():
+    handle = open_device()
+    aScanList = configure_device(handle, STREAM_BINARY)
+    scansPerRead = max(int(SCAN_RATE * READ_SECONDS), 1)
+
+    # Perform data acquisition
+    global cadence, ain_calibration, read_scratch, stream_ring
+    clock_sync = None
+    try:
+        if STREAM_BINARY:
+            # The device's calibration constants are read once; codes are converted as they are analysed
+            ain_calibration = AinCalibration.from_device(handle, [AIN_RANGE] * NUMBER_OF_AINS,
+                                                         offset=ACCEL_TO_G_OFFSET, sensitivity=ACCEL_TO_G_SENSITIVITY,
+                                                         unit="g")
+            read_scratch = np.empty(scansPerRead * len(aScanList))
+        scanRate, _ = start_stream(handle, aScanList, scansPerRead)
+        cadence = ReadCadence(scanRate, scansPerRead, MAX_CHUNK_SECONDS, MAX_CHUNK_OVERHEAD)
+        if STREAM_CALLBACK:
+            # Until eStreamStop, LJM's stream thread reads each chunk into the ring as soon as it is ready
+            stream_ring = ljm.StreamRing(handle, scansPerRead, STREAM_RING_READS)
+        # Reused by every chunk
+        stream_buffer = np.empty(cadence.max_reads * scansPerRead * len(aScanList),
+                                 np.float64 if ain_calibration is None else np.uint16)
+        # Keep correcting scan_clock for clock drift in the background
+        clock_sync = ClockSynchronizer(handle, scan_clock, stream_start_ticks, scanRate, interval=CLOCK_SYNC_INTERVAL)
+        clock_sync.start()
+        last_status = time.time()
+        slowest = 0.0
+        chunks = 0
+        while True:
+            # Read stream data, one chunk of reads at a time
+            chunk, backlogs = read_chunk(handle, stream_buffer, scansPerRead)
+            starting = time.time()
+            handle_stream_read(chunk)
+            ending = time.time()
+            slowest = max(slowest, ending - starting)
+            chunks += 1
+            # Chunks arrive up to 1 / READ_SECONDS times a second; report them at most every STATUS_INTERVAL
+            if ending - last_status >= STATUS_INTERVAL:
+                print(f"\nTime to read data: {slowest:.5f} s (slowest of {chunks} chunks), "
+                      f"chunk: {len(chunk) // NUMBER_OF_AINS} scans, "
+                      f"analysis queue: {pipeline.depth} (max {pipeline.max_depth}), late reads: {pipeline.late}, "
+                      f"analysis errors: {pipeline.errors}, backlogs: device {backlogs[0]}, LJM {backlogs[1]}, "
+                      f"skipped reads: {pipeline.dropped}, skipped scans: {gap_map.skipped_scans}")
+                last_status = ending
+                slowest = 0.0
+                chunks = 0
+    except Exception as e:
+        print("\nUnexpected error: %s" % str(e))
+    except KeyboardInterrupt:  # Ctrl+C
+        print("\nKeyboard Interrupt caught.")
+    finally:
+        if clock_sync is not None:
+            clock_sync.stop()
+        # Drain the analysis queue and stop stream
+        stop_stream(handle)
+        # Close handle
+        ljm.close(handle)
+
+
+def main_replay(files, speed=None):
+    """Run the analysis on a recording instead of a live stream and report the throughput.
+
+    Args:
+        files: The recording files, as a path, list or glob pattern.
+        speed: The multiple of real time to replay at. None replays as fast as the analysis keeps up.
+
+    Returns:
+        The ReplaySource that was played.
+    """
+    global scan_clock
+    source = ReplaySource(files, max(int(SCAN_RATE * READ_SECONDS), 1), speed)
+    if source.num_channels != NUMBER_OF_AINS:
+        raise ValueError(f"the recording has {source.num_channels} channels, not NUMBER_OF_AINS = {NUMBER_OF_AINS}")
+    scan_clock = source.scan_clock  # Follows the clock model recorded with each read
+    create_analysis(source.scan_rate, source.scans_per_read)
+    stream_buffer = np.empty(source.scans_per_read * source.num_channels)
+    try:
+        while True:
+            # The same read and analysis as the live loop
+            read_start = time.perf_counter()
+            record_stream_read(source.eStreamReadInto(stream_buffer), time.perf_counter() - read_start)
+            handle_stream_read(stream_buffer)
+    except EOFError:
+        pass
+    except KeyboardInterrupt:  # Ctrl+C
+        print("\nKeyboard Interrupt caught.")
+    finally:
+        finish_analysis()
+        source.close()  # After the analysis, so the throughput includes it
+    print(f"\nReplayed {source.scans} scans in {source.elapsed:.2f} s: {source.scans_per_second:,.0f} scans/s, "
+          f"{source.scans_per_second / source.scan_rate:.1f} x real time")
+    if source.missing:
+        print(f"{source.missing} scans were missing from the recording and replayed as skipped scans")
+    return source
+
+
+def acquisition_process(ring_names, stop):
+    """Stream into a SharedRing until stop is set. Runs in its own process, so analysis never delays the reads.
+
+    Args:
+        ring_names: A multiprocessing queue that receives the name of the SharedRing once the stream has started.
+        stop: A multiprocessing event that ends the stream.
+    """
+    handle = open_device()
+    aScanList = configure_device(handle)
+    scansPerRead = max(int(SCAN_RATE * READ_SECONDS), 1)
+    ring = None
+    clock_sync = None
+    try:
+        scanRate, _ = start_stream(handle, aScanList, scansPerRead)
+        clock_sync = ClockSynchronizer(handle, scan_clock, stream_start_ticks, scanRate, interval=CLOCK_SYNC_INTERVAL)
+        clock_sync.start()
+        ring = SharedRing.for_reads(len(aScanList), scansPerRead, SHARED_RING_READS)
+        ring.publish_clock(scan_clock)
+        ring_names.put(ring.name)
+        while not stop.is_set():
+            # Stream data goes straight into the shared ring
+            first_scan = ring.total
+            slot = ring.slot(scansPerRead)
+            read_start = time.perf_counter()
+            record_stream_read(ljm.eStreamReadInto(handle, slot), time.perf_counter() - read_start)
+            ring.publish(scansPerRead)
+            if recorder is not None:
+                recorder.write(slot.T, first_scan)
+            ring.publish_clock(scan_clock)
+    except Exception as e:
+        print("\nUnexpected error: %s" % str(e))
+    except KeyboardInterrupt:  # Ctrl+C reaches every process
+        pass
+    finally:
+        if clock_sync is not None:
+            clock_sync.stop()
+        stop_stream(handle)
+        ljm.close(handle)
+        # After eStreamStop, which releases the stream's view of the ring
+        if ring is not None:
+            ring.close()
+
+
+def analysis_process(ring_name):
+    """Run process_data on the scans of a SharedRing until the ring is closed. Runs in its own process.
+
+    Args:
+        ring_name: The name of the SharedRing written by acquisition_process.
+    """
+    global scan_clock, detector
+    reader = SharedRingReader(ring_name)
+    scan_clock = reader.scan_clock()
+    detector = EventDetector(THRESHOLDS, int(BUFFER_PERIOD * scan_clock.scan_rate), RELEASE_THRESHOLDS)
+    try:
+        while True:
+            chunk = reader.read()
+            if chunk is None:  # The ring was closed
+                break
+            first_scan, volts, lost = chunk
+            if lost:
+                print(f"\nAnalysis fell behind and lost {lost} scans ({reader.lost} in total)")
+            scan_clock = reader.scan_clock()  # Picks up the latest drift correction
+            data = ((volts - ACCEL_TO_G_OFFSET)/ACCEL_TO_G_SENSITIVITY).T
+            gaps = find_gaps(volts, NUMBER_OF_AINS, first_scan)
+            if gaps.size:
+                mask_gaps(data, gaps, first_scan)
+                print(f"\nStream skipped {gaps['scans'].sum()} scans from scan {gaps['start'][0]}")
+            process_data(data, first_scan)
+        print_events(detector.flush())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        reader.close()
+
+
+def main_with_acquisition_process():
+    """Run the stream in an acquisition process and process_data in an analysis process."""
+    context = multiprocessing.get_context("spawn")
+    ring_names = context.Queue()
+    stop = context.Event()
+    acquisition = context.Process(target=acquisition_process, args=(ring_names, stop), name="acquisition")
+    acquisition.start()
+    analysis = None
+    try:
+        while acquisition.is_alive():
+            try:
+                ring_name = ring_names.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            analysis = context.Process(target=analysis_process, args=(ring_name,), name="analysis")
+            analysis.start()
+            break
+        acquisition.join()
+    except KeyboardInterrupt:  # Ctrl+C
+        print("\nKeyboard Interrupt caught.")
+    finally:
+        stop.set()
+        acquisition.join()
+        if analysis is not None:
+            analysis.join()
+
+
+if __name__ == "__main__":
+    if REPLAY_FILES:
+        main_replay(REPLAY_FILES, REPLAY_SPEED)
+    elif ACQUISITION_PROCESS:
+        main_with_acquisition_process()
+    else:
+        main()
@@ -0,0 +1,20 @@
+"""
+Building blocks for long-running LabJack T7 stream acquisition and analysis,
+used by main.py.
+
+Author: Liam Eime
+"""
+
+from t7stream.cadence import ReadCadence
+from t7stream.calibration import AinCalibration
+from t7stream.capture import EventCapture, load_capture
+from t7stream.clock import ScanClock
+from t7stream.events import EventDetector
+from t7stream.gaps import GapMap, find_gaps, mask_gaps
+from t7stream.health import StreamHealth
+from t7stream.pipeline import AnalysisPipeline
+from t7stream.recorder import Recorder, RecordingReader
+from t7stream.replay import ArrayRecording, ReplaySource
+from t7stream.ring import RingBuffer
+from t7stream.shared import SharedRing, SharedRingReader
+from t7stream.sync import ClockSynchronizer
@@ -0,0 +1,150 @@
+"""
+Adaptive read cadence: how many stream reads to analyse as one chunk.
+
+LJM fixes scansPerRead when the stream starts, and changing it means
+restarting the stream, which leaves a gap in the scans. Instead the stream
+is started with short reads, and a ReadCadence chooses how many of them
+the acquisition loop reads back to back and hands to the analysis as one
+chunk. Short chunks keep detection latency low. Every chunk also costs a
+fixed amount of analysis time however many scans it holds, and long
+chunks spread that cost over more scans.
+
+The cadence fits the analysis time of recent chunks as
+fixed_seconds + seconds_per_read * reads, by least squares that forgets
+older chunks so it follows changes in the host's load. It then picks the
+shortest chunk for which the fixed cost stays under max_overhead of the
+chunk's stream time and the whole cost under max_load. Every
+probe_interval chunks one is a read longer or shorter, so the fit always
+sees more than one chunk length. When the LJM backlog after a chunk is
+above backlog_setpoint the loop is behind, and chunks grow until it
+catches up.
+
+Author: Liam Eime
+"""
+
+import math
+import threading
+
+
+class ReadCadence:
+    """Chooses the number of stream reads per analysis chunk from the
+    measured analysis cost and the LJM backlog.
+
+    Args:
+        scan_rate: The stream's scan rate.
+        scans_per_read: The scans returned by each stream read.
+        max_latency: The most seconds of scans in one chunk.
+        max_overhead: The largest fraction of stream time to spend on the
+            fixed cost of each chunk.
+        max_load: The largest fraction of stream time to spend analysing.
+        backlog_setpoint: The LJM backlog in scans to stay under. Default
+            is one read.
+        gain: The reads added to the chunk length per read of backlog above
+            the setpoint after each chunk. Below the setpoint the added
+            reads shrink by gain / 2 of themselves per chunk.
+        forget: The weight kept by the previous chunks' costs each time a
+            chunk is observed.
+        probe_interval: Every this many chunks, one is a read longer or
+            shorter than chosen.
+
+    Attributes:
+        reads_per_chunk: The chunk length to read next.
+        fixed_seconds, seconds_per_read: The fitted analysis cost.
+        chunks: The number of chunks updated.
+        changes: The number of times the chosen chunk length changed.
+    """
+
+    def __init__(self, scan_rate, scans_per_read, max_latency=1.0, max_overhead=0.05, max_load=0.5,
+                 backlog_setpoint=None, gain=0.5, forget=0.9, probe_interval=5):
+        self.scans_per_read = scans_per_read
+        self.read_seconds = scans_per_read / scan_rate
+        self.max_reads = max(int(max_latency / self.read_seconds), 1)
+        self.max_overhead = max_overhead
+        self.max_load = max_load
+        self.backlog_setpoint = scans_per_read if backlog_setpoint is None else backlog_setpoint
+        self.gain = gain
+        self.forget = forget
+        self.probe_interval = probe_interval
+        self.reads_per_chunk = 1
+        self.fixed_seconds = 0.0
+        self.seconds_per_read = 0.0
+        self.chunks = 0
+        self.changes = 0
+        self._chosen = 1
+        self._sums = [0.0] * 5  # Forgetting sums of 1, reads, reads**2, seconds and reads * seconds
+        self._boost = 0.0  # Reads added while the LJM backlog is above the setpoint
+        self._lock = threading.Lock()
+
+    def observe(self, num_scans, seconds):
+        """Record the analysis time of one chunk. May be called from the
+        analysis thread.
+
+        Args:
+            num_scans: The scans in the chunk.
+            seconds: The seconds the chunk took to analyse.
+        """
+        reads = num_scans / self.scans_per_read
+        with self._lock:
+            self._sums = [self.forget * total + value
+                          for total, value in zip(self._sums, (1.0, reads, reads * reads, seconds, reads * seconds))]
+
+    def _fit(self):
+        """Return the fixed_seconds and seconds_per_read, neither negative,
+        that fit the observed chunks."""
+        with self._lock:
+            weight, reads, reads_squared, seconds, reads_seconds = self._sums
+        if weight == 0:
+            return 0.0, 0.0
+        spread = weight * reads_squared - reads * reads
+        if spread <= 1e-9 * weight * reads_squared:
+            # One chunk length says nothing about the split, so assume half of its cost is fixed
+            return seconds / weight / 2, seconds / reads / 2
+        seconds_per_read = (weight * reads_seconds - reads * seconds) / spread
+        fixed_seconds = (seconds - seconds_per_read * reads) / weight
+        if seconds_per_read < 0:
+            return seconds / weight, 0.0
+        if fixed_seconds < 0:
+            return 0.0, reads_seconds / reads_squared
+        return fixed_seconds, seconds_per_read
+
+    def update(self, ljm_backlog):
+        """Choose the next chunk length. Call after reading each chunk.
+
+        Args:
+            ljm_backlog: The ljmScanBacklog returned by the chunk's last read.
+
+        Returns:
+            The new reads_per_chunk.
+        """
+        self.chunks += 1
+        self.fixed_seconds, self.seconds_per_read = self._fit()
+        # The shortest chunk whose fixed cost is under max_overhead and whole cost under max_load
+        reads = self.fixed_seconds / (self.max_overhead * self.read_seconds)
+        spare = self.max_load * self.read_seconds - self.seconds_per_read
+        reads = max(reads, self.fixed_seconds / spare if spare > 0 else math.inf)
+        behind = (ljm_backlog - self.backlog_setpoint) / self.scans_per_read
+        if behind > 0:
+            self._boost = min(self._boost + self.gain * behind, self.max_reads)
+        else:
+            self._boost *= 1 - self.gain / 2
+        chosen = int(min(max(math.ceil(reads - 1e-6) + round(self._boost), 1), self.max_reads))
+        if chosen != self._chosen:
+            self._chosen = chosen
+            self.changes += 1
+        self.reads_per_chunk = chosen
+        if self.chunks % self.probe_interval == 0 and self.max_reads > 1:
+            step = max(chosen // 4, 1)
+            self.reads_per_chunk = chosen + step if chosen + step <= self.max_reads else chosen - step
+        return self.reads_per_chunk
+
+    def status(self):
+        """Return a dict of the chosen chunk length, its latency and the
+        fitted cost."""
+        return {
+            "reads_per_chunk": self._chosen,
+            "chunk_seconds": self._chosen * self.read_seconds,
+            "fixed_seconds": self.fixed_seconds,
+            "seconds_per_read": self.seconds_per_read,
+            "chunks": self.chunks,
+            "changes": self.changes,
+        }
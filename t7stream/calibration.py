@@ -0,0 +1,148 @@
+"""
+Calibration of raw 16-bit T7 stream codes.
+
+With LJM_STREAM_AIN_BINARY set, eStreamRead returns each analog input as
+its raw 16-bit code instead of calibrated volts, and the codes can be kept
+as uint16, a quarter of the memory and disk bandwidth of float64 volts. An
+AinCalibration converts them later, on demand.
+
+The T7 stores calibration constants for each of its four ranges in flash,
+and converts a code to volts as (code - Center) * PSlope at or above Center
+and (Center - code) * NSlope below it. AinCalibration.from_device() reads
+the high speed converter's constants, which stream uses, once. Conversion
+looks each code up in a 65536 entry table per channel, built on first use,
+so a block is converted in one vectorized pass, straight to volts or to
+units such as g. The code of a skipped sample, 0xFFFF, converts to
+DUMMY_VALUE (-9999) volts, as in a stream of volts, and to NaN units.
+
+Author: Liam Eime
+"""
+
+import numpy as np
+
+from t7stream.gaps import BINARY_DUMMY_VALUE
+
+RANGES = (10.0, 1.0, 0.1, 0.01)  # The order of the ranges in flash
+CALIBRATION_FLASH_ADDRESS = 0x3C4000
+INTERNAL_FLASH_READ_POINTER_ADDRESS = 61810
+INTERNAL_FLASH_READ_ADDRESS = 61812
+# PSlope, NSlope and Center of the +/-10 V range of an uncalibrated T7. The slopes scale with the range.
+NOMINAL = (0.000315805780, -0.000315805800, 33523.0)
+NUM_CODES = 1 << 16
+DUMMY_VALUE = -9999.0  # ljm.constants.DUMMY_VALUE, the volts of a skipped sample
+
+
+def read_flash_calibration(handle):
+    """Return the high speed calibration constants of a T7 as a (4, 4)
+    array of (PSlope, NSlope, Center, Offset) for each of RANGES."""
+    # Imported here so conversions, e.g. of recordings, do not need the LJM library
+    from labjack import ljm
+
+    # One transaction: point the flash reader at the constants, then read 16 float32 words.
+    values = ljm.eAddresses(handle, 2, [INTERNAL_FLASH_READ_POINTER_ADDRESS, INTERNAL_FLASH_READ_ADDRESS],
+                            [ljm.constants.UINT32, ljm.constants.UINT32], [ljm.constants.WRITE, ljm.constants.READ],
+                            [1, 16], [CALIBRATION_FLASH_ADDRESS] + [0] * 16)
+    return np.array(values[1:], dtype=np.uint32).view(np.float32).astype(np.float64).reshape(4, 4)
+
+
+class AinCalibration:
+    """Converts (num_channels, n) arrays of raw stream codes to volts and
+    to calibrated units.
+
+    Args:
+        positive_slope, negative_slope, center: The PSlope, NSlope and
+            Center of each channel's range, one value per channel.
+        offset, sensitivity: Units are (volts - offset) / sensitivity, one
+            value or one per channel.
+        unit: The name of the units.
+    """
+
+    def __init__(self, positive_slope, negative_slope, center, offset=0.0, sensitivity=1.0, unit="V"):
+        self.positive_slope = np.asarray(positive_slope, dtype=np.float64).reshape(-1)
+        self.negative_slope = np.asarray(negative_slope, dtype=np.float64).reshape(-1)
+        self.center = np.asarray(center, dtype=np.float64).reshape(-1)
+        self.num_channels = len(self.center)
+        self.offset = np.broadcast_to(np.asarray(offset, dtype=np.float64), (self.num_channels,)).copy()
+        self.sensitivity = np.broadcast_to(np.asarray(sensitivity, dtype=np.float64), (self.num_channels,)).copy()
+        self.unit = unit
+        self._volts_table = None
+        self._units_table = None
+
+    @classmethod
+    def from_constants(cls, constants, ranges, **units):
+        """Return the calibration of channels at the given ranges, from a
+        (4, 4) array of constants as read_flash_calibration returns.
+
+        Args:
+            constants: (PSlope, NSlope, Center, Offset) for each of RANGES.
+            ranges: Each channel's range in volts, e.g. [10, 10, 1].
+            units: offset, sensitivity and unit, as for AinCalibration.
+        """
+        rows = np.asarray(constants)[[RANGES.index(float(r)) for r in ranges]]
+        return cls(rows[:, 0], rows[:, 1], rows[:, 2], **units)
+
+    @classmethod
+    def from_device(cls, handle, ranges, **units):
+        """Read the calibration of channels at the given ranges from a T7's
+        flash, as from_constants."""
+        return cls.from_constants(read_flash_calibration(handle), ranges, **units)
+
+    @classmethod
+    def nominal(cls, ranges, **units):
+        """Return the nominal calibration of an uncalibrated T7, as
+        from_constants."""
+        slopes = np.array(RANGES) / 10
+        constants = np.column_stack([NOMINAL[0] * slopes, NOMINAL[1] * slopes, np.full(4, NOMINAL[2]), np.zeros(4)])
+        return cls.from_constants(constants, ranges, **units)
+
+    def to_dict(self):
+        """Return the calibration as a JSON-serializable dict, e.g. for a
+        Recorder header."""
+        return {"positive_slope": self.positive_slope.tolist(), "negative_slope": self.negative_slope.tolist(),
+                "center": self.center.tolist(), "offset": self.offset.tolist(),
+                "sensitivity": self.sensitivity.tolist(), "unit": self.unit}
+
+    @classmethod
+    def from_dict(cls, calibration):
+        """Return the calibration saved by to_dict."""
+        return cls(calibration["positive_slope"], calibration["negative_slope"], calibration["center"],
+                   calibration.get("offset", 0.0), calibration.get("sensitivity", 1.0), calibration.get("unit", "V"))
+
+    def volts_table(self):
+        """Return the (num_channels, 65536) table of the volts of every
+        code."""
+        if self._volts_table is None:
+            above = np.arange(NUM_CODES, dtype=np.float64) - self.center[:, None]
+            self._volts_table = np.where(above >= 0, above * self.positive_slope[:, None],
+                                         -above * self.negative_slope[:, None])
+            self._volts_table[:, BINARY_DUMMY_VALUE] = DUMMY_VALUE
+        return self._volts_table
+
+    def units_table(self):
+        """Return the (num_channels, 65536) table of the units of every
+        code."""
+        if self._units_table is None:
+            self._units_table = (self.volts_table() - self.offset[:, None]) / self.sensitivity[:, None]
+            self._units_table[:, BINARY_DUMMY_VALUE] = np.nan
+        return self._units_table
+
+    @staticmethod
+    def _look_up(table, codes, out):
+        codes = np.asarray(codes)
+        if codes.ndim != 2 or codes.shape[0] != table.shape[0]:
+            raise ValueError(f"expected a ({table.shape[0]}, n) array of codes, not {codes.shape}")
+        if out is None:
+            out = np.empty(codes.shape)
+        for channel in range(table.shape[0]):
+            np.take(table[channel], codes[channel], out=out[channel])
+        return out
+
+    def volts(self, codes, out=None):
+        """Convert a (num_channels, n) array of codes to volts, into out if
+        given."""
+        return self._look_up(self.volts_table(), codes, out)
+
+    def convert(self, codes, out=None):
+        """Convert a (num_channels, n) array of codes to units, into out if
+        given."""
+        return self._look_up(self.units_table(), codes, out)
@@ -0,0 +1,212 @@
+"""
+Captures the scans around events from the live ring buffer.
+
+An EventCapture takes the events found by EventDetector and saves every
+channel from pre_seconds before each event's peak to post_seconds after it.
+The scans are copied from the RingBuffer that the acquisition loop writes.
+A window whose later scans have not been read yet stays pending, and
+poll() completes it after a later read. poll() may run on another thread
+than the writes: a window the ring's writer reached while it was being
+copied is counted as lost rather than saved with newer scans in it. Nothing waits for those scans, so
+acquisition is never held up. An event that peaks inside a pending window,
+such as the same shock on another channel, is added to that capture
+instead of starting another.
+
+Captures are written as .npz files by a background thread. Each holds the
+scans and a JSON header that describes them. Captures are limited to
+max_per_minute of stream time, and to max_bytes waiting to be written, so
+a storm of events cannot exhaust memory. Captures over either limit are
+skipped and counted.
+
+Author: Liam Eime
+"""
+
+import collections
+import json
+import os
+import queue
+import threading
+from datetime import datetime
+
+import numpy as np
+
+_STOP = object()
+
+
+def load_capture(path):
+    """Return (header, scans) of a capture file, with scans as a
+    (num_channels, num_scans) array."""
+    with np.load(path) as capture:
+        return json.loads(str(capture["header"])), capture["scans"]
+
+
+class EventCapture:
+    """Saves the scans around events from a RingBuffer to files.
+
+    Args:
+        ring: The RingBuffer the stream's scans are written to.
+        directory: The directory for the capture files, created if needed.
+        scan_rate: The stream's scan rate.
+        scan_clock: The stream's ScanClock, for the times in the headers.
+        pre_seconds: The seconds kept before each event's peak.
+        post_seconds: The seconds kept after each event's peak.
+        channel_names: Optional names of the channels, for the headers.
+        unit: The unit of the ring's values, for the headers.
+        max_per_minute: The most captures started in any minute of scans.
+        max_bytes: The most bytes of captures waiting to be written.
+
+    Attributes:
+        files: The paths of the captures written so far.
+        captured: Captures copied from the ring.
+        rate_limited: Events skipped because of max_per_minute.
+        dropped: Captures skipped because of max_bytes.
+        lost: Captures whose scans were overwritten before or while they
+            were copied.
+        errors, last_error: Failed writes and the last exception.
+    """
+
+    def __init__(self, ring, directory, scan_rate, scan_clock, pre_seconds=0.1, post_seconds=0.2, channel_names=None,
+                 unit="g", max_per_minute=60, max_bytes=64 << 20):
+        self.ring = ring
+        self.directory = directory
+        self.scan_rate = scan_rate
+        self.scan_clock = scan_clock
+        self.pre_scans = int(round(pre_seconds * scan_rate))
+        self.post_scans = int(round(post_seconds * scan_rate))
+        self.channel_names = channel_names or [f"channel {i}" for i in range(ring.num_channels)]
+        self.unit = unit
+        self.max_per_minute = max_per_minute
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self.files = []
+        self.captured = 0
+        self.rate_limited = 0
+        self.dropped = 0
+        self.lost = 0
+        self.errors = 0
+        self.last_error = None
+        self._pending = collections.deque()  # [start, stop, events] windows not copied yet
+        self._recent = collections.deque()  # Peak scan indices of the captures in the last minute
+        self._queued_bytes = 0
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="event-capture", daemon=True)
+        self._thread.start()
+
+    @property
+    def pending(self):
+        """The number of windows waiting for their later scans."""
+        return len(self._pending)
+
+    def add(self, events):
+        """Start a capture for each event, or add it to the pending capture
+        its peak falls in.
+
+        Args:
+            events: Events from EventDetector, in order of their start.
+        """
+        minute = int(60 * self.scan_rate)
+        for event in events:
+            peak_index = int(event["peak_index"])
+            start, stop = max(peak_index - self.pre_scans, 0), peak_index + self.post_scans + 1
+            if self._pending and self._pending[-1][0] <= peak_index < self._pending[-1][1]:
+                self._pending[-1][2].append(event)
+                continue
+            while self._recent and self._recent[0] <= peak_index - minute:
+                self._recent.popleft()
+            if len(self._recent) >= self.max_per_minute:
+                self.rate_limited += 1
+                continue
+            self._recent.append(peak_index)
+            self._pending.append([start, stop, [event]])
+
+    def poll(self, final=False):
+        """Copy the pending windows whose scans have all been written and
+        queue them to be saved. Call after each read.
+
+        Args:
+            final: Also copy the windows still waiting, cut short at the
+                last scan written, as at the end of the stream.
+        """
+        while self._pending and (final or self._pending[0][1] <= self.ring.total):
+            start, wanted, events = self._pending.popleft()
+            stop = min(wanted, self.ring.total)
+            if self._overwritten(start) or stop <= start:
+                self.lost += 1
+                continue
+            nbytes = self.ring.num_channels * (stop - start) * self.ring.data.itemsize
+            with self._lock:
+                if self._queued_bytes + nbytes > self.max_bytes:
+                    self.dropped += 1
+                    continue
+                self._queued_bytes += nbytes
+            try:
+                scans = self.ring.read(start, stop, out=np.empty((self.ring.num_channels, stop - start),
+                                                                 self.ring.data.dtype))
+            except IndexError:  # Overwritten since the check above
+                scans = None
+            # The acquisition loop may have overwritten the start while it was copied.
+            if scans is None or self._overwritten(start):
+                self.lost += 1
+                with self._lock:
+                    self._queued_bytes -= nbytes
+                continue
+            self.captured += 1
+            self._queue.put((start, scans, events, stop < wanted))
+
+    def _overwritten(self, start):
+        """Whether the ring's writer has overwritten, or is overwriting,
+        scan start."""
+        return start < max(self.ring.reserved - self.ring.capacity, 0)
+
+    def _header(self, start, scans, events, truncated):
+        return {
+            "first_scan": start,
+            "num_scans": scans.shape[1],
+            "scan_rate": self.scan_rate,
+            "start_time": float(self.scan_clock.time_of(start)),
+            "seconds_per_scan": self.scan_clock.seconds_per_scan,
+            "channel_names": self.channel_names,
+            "unit": self.unit,
+            "pre_scans": self.pre_scans,
+            "post_scans": self.post_scans,
+            "truncated": bool(truncated),
+            "events": [{"channel": int(event["channel"]), "start": int(event["start"]), "end": int(event["end"]),
+                        "peak": float(event["peak"]), "peak_index": int(event["peak_index"]),
+                        "peak_time": float(self.scan_clock.time_of(event["peak_index"]))} for event in events],
+        }
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            start, scans, events, truncated = item
+            try:
+                header = self._header(start, scans, events, truncated)
+                peak_time = datetime.fromtimestamp(header["events"][0]["peak_time"]).strftime("%Y%m%d-%H%M%S.%f")
+                path = os.path.join(self.directory, f"event_{peak_time}_{start}.npz")
+                np.savez(path, scans=scans, header=np.array(json.dumps(header)))
+                self.files.append(path)
+            except Exception as e:
+                self.errors += 1
+                self.last_error = e
+            with self._lock:
+                self._queued_bytes -= scans.nbytes
+
+    def close(self):
+        """Capture the windows still pending with the scans there are, then
+        write every capture and stop the writer thread. Safe to call more
+        than once."""
+        if self._thread is None:
+            return
+        self.poll(final=True)
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
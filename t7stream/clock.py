@@ -0,0 +1,57 @@
+"""
+Affine clock model that maps stream scan indices to host time.
+
+The T7 clocks stream scans uniformly, so the host time of scan index i is
+start_time + i * seconds_per_scan. A ScanClock keeps just those two numbers
+and converts indices on demand, so only the scans that are reported need a
+timestamp. Drift correction replaces the model with update(), which is safe
+while other threads convert.
+
+Author: Liam Eime
+"""
+
+import numpy as np
+
+
+class ScanClock:
+    """Maps scan indices of one stream to host time.
+
+    Args:
+        start_time: The host time (time.time() seconds) of scan index 0.
+        scan_rate: The stream's actual scan rate, in scans per second.
+    """
+
+    def __init__(self, start_time, scan_rate):
+        # One tuple so readers never see a half-updated model.
+        self._model = (float(start_time), 1.0 / scan_rate)
+
+    @property
+    def start_time(self):
+        """The host time of scan index 0."""
+        return self._model[0]
+
+    @property
+    def seconds_per_scan(self):
+        """The host seconds between consecutive scans."""
+        return self._model[1]
+
+    @property
+    def scan_rate(self):
+        """Scans per host second."""
+        return 1.0 / self._model[1]
+
+    def update(self, start_time, seconds_per_scan):
+        """Replace the model, e.g. with a drift-corrected fit."""
+        self._model = (float(start_time), float(seconds_per_scan))
+
+    def time_of(self, index):
+        """Return the host time of a scan index or an array of them."""
+        start_time, seconds_per_scan = self._model
+        return start_time + np.asarray(index, dtype=np.float64) * seconds_per_scan
+
+    def index_of(self, host_time):
+        """Return the index of the last scan at or before host_time, for a
+        time or an array of them."""
+        start_time, seconds_per_scan = self._model
+        index = np.floor((np.asarray(host_time, dtype=np.float64) - start_time) / seconds_per_scan).astype(np.int64)
+        return int(index) if index.ndim == 0 else index
@@ -0,0 +1,183 @@
+"""
+Vectorized event detection across stream chunks.
+
+An event on a channel starts when its value rises above the channel's
+threshold. It continues while the value stays above the release threshold,
+which sits below the threshold for hysteresis, and it takes in later
+above-threshold runs that begin within hold_off scans of its end, like
+main.py's BUFFER_PERIOD. Every event in a chunk is found, not just the
+largest, with its start, end, peak and peak scan index.
+
+Each (channels, scans) chunk is handled in one pass of NumPy operations on
+boolean masks. Only the positions above the release threshold are visited
+after the first comparison, and the state carried between chunks is one
+unfinished run and one unfinished event per channel.
+
+Author: Liam Eime
+"""
+
+import numpy as np
+
+EVENT_DTYPE = np.dtype([("channel", np.int64), ("start", np.int64), ("end", np.int64),
+                        ("peak", np.float64), ("peak_index", np.int64)])
+
+
+def _first_max(groups, values):
+    """For values split into sorted groups, return the position of the first
+    maximum of each group."""
+    order = np.lexsort((-values, groups))
+    first = np.flatnonzero(np.r_[True, groups[order][1:] != groups[order][:-1]])
+    return order[first]
+
+
+class EventDetector:
+    """Finds threshold events in consecutive chunks of a stream.
+
+    Args:
+        thresholds: The level each channel must exceed to start an event.
+        hold_off_scans: Above-threshold runs that begin within this many
+            scans of an event's end belong to that event.
+        release_thresholds: The level each channel must fall to, or below,
+            to end a run. Default is thresholds, i.e. no hysteresis.
+
+    Events are returned as structured arrays of EVENT_DTYPE, ordered by
+    start: channel, start and end scan index (end exclusive), peak value and
+    the scan index of the peak.
+    """
+
+    def __init__(self, thresholds, hold_off_scans, release_thresholds=None):
+        self.thresholds = np.asarray(thresholds, dtype=np.float64)
+        self.release_thresholds = (self.thresholds if release_thresholds is None
+                                   else np.asarray(release_thresholds, dtype=np.float64))
+        if np.any(self.release_thresholds > self.thresholds):
+            raise ValueError("release thresholds must not be above the thresholds")
+        self.hold_off_scans = int(hold_off_scans)
+        num_channels = len(self.thresholds)
+        self.next_scan = None
+        # A run still above the release threshold at the end of the last chunk
+        self._run = np.zeros(num_channels, dtype=EVENT_DTYPE)
+        self._run_open = np.zeros(num_channels, dtype=bool)
+        self._run_hot = np.zeros(num_channels, dtype=bool)
+        # An event that a later run may still join
+        self._event = np.zeros(num_channels, dtype=EVENT_DTYPE)
+        self._event_open = np.zeros(num_channels, dtype=bool)
+
+    def _find_runs(self, block, first_scan):
+        """Return the runs above the release threshold in block, as
+        EVENT_DTYPE records, and whether each reaches the threshold."""
+        num_channels, num_scans = block.shape
+        # One spare column per row keeps runs from joining across channels.
+        above = np.zeros((num_channels, num_scans + 1), dtype=bool)
+        np.greater(block, self.release_thresholds[:, None], out=above[:, :num_scans])
+        positions = np.flatnonzero(above)
+        runs = np.zeros(0, dtype=EVENT_DTYPE)
+        if positions.size == 0:
+            return runs, np.zeros(0, dtype=bool)
+        channels, columns = np.divmod(positions, num_scans + 1)
+        values = block[channels, columns]
+        starts = np.r_[True, np.diff(positions) > 1]
+        run_ids = np.cumsum(starts) - 1
+        first = np.flatnonzero(starts)
+        last = np.r_[first[1:], positions.size] - 1
+        hot = np.logical_or.reduceat(values > self.thresholds[channels], first)
+        peaks = _first_max(run_ids, values)
+
+        runs = np.zeros(first.size, dtype=EVENT_DTYPE)
+        runs["channel"] = channels[first]
+        runs["start"] = first_scan + columns[first]
+        runs["end"] = first_scan + columns[last] + 1
+        runs["peak"] = values[peaks]
+        runs["peak_index"] = first_scan + columns[peaks]
+        return runs, hot
+
+    def _merge(self, segments):
+        """Join segments sorted by channel and start that are within
+        hold_off_scans of each other into events."""
+        if segments.size == 0:
+            return segments
+        new_event = np.r_[True, (segments["channel"][1:] != segments["channel"][:-1])
+                          | (segments["start"][1:] - segments["end"][:-1] > self.hold_off_scans)]
+        first = np.flatnonzero(new_event)
+        event_ids = np.cumsum(new_event) - 1
+        peaks = _first_max(event_ids, segments["peak"])
+        events = segments[first].copy()
+        events["end"] = np.maximum.reduceat(segments["end"], first)
+        events["peak"] = segments["peak"][peaks]
+        events["peak_index"] = segments["peak_index"][peaks]
+        return events
+
+    def process(self, block, first_scan):
+        """Find the events that a chunk completes.
+
+        Args:
+            block: A (channels, scans) array of values.
+            first_scan: The scan index of the block's first column. A gap
+                since the last chunk ends the runs that were in progress.
+
+        Returns:
+            The events that are over: their last run has ended and no run
+            has begun within hold_off_scans since. Events that may continue
+            into the next chunk are kept until then.
+        """
+        block = np.asarray(block, dtype=np.float64)
+        num_scans = block.shape[1]
+        end_scan = first_scan + num_scans
+        runs, hot = self._find_runs(block, first_scan)
+
+        # Runs carried from the last chunk either continue at column 0 or
+        # ended with it.
+        carried = np.flatnonzero(self._run_open)
+        if carried.size:
+            starts_at_zero = runs["start"] == first_scan if first_scan == self.next_scan else np.zeros(runs.size, bool)
+            continued = np.zeros(len(self.thresholds), dtype=bool)
+            for i in np.flatnonzero(starts_at_zero & self._run_open[runs["channel"]]):
+                channel = runs["channel"][i]
+                previous = self._run[channel]
+                if previous["peak"] >= runs["peak"][i]:
+                    runs["peak"][i] = previous["peak"]
+                    runs["peak_index"][i] = previous["peak_index"]
+                runs["start"][i] = previous["start"]
+                hot[i] |= self._run_hot[channel]
+                continued[channel] = True
+            ended = carried[~continued[carried]]
+            runs = np.concatenate((self._run[ended], runs))
+            hot = np.concatenate((self._run_hot[ended], hot))
+            self._run_open[:] = False
+
+        # Runs that reach the end of the block may continue in the next one.
+        at_end = runs["end"] == end_scan
+        channels = runs["channel"][at_end]
+        self._run[channels] = runs[at_end]
+        self._run_hot[channels] = hot[at_end]
+        self._run_open[channels] = True
+        runs, hot = runs[~at_end], hot[~at_end]
+
+        events = self._merge(self._sorted(np.concatenate((self._event[self._event_open], runs[hot]))))
+        self._event_open[:] = False
+        self.next_scan = end_scan
+
+        # An event stays open while hold-off has not passed, or a carried run
+        # close enough to join it has not yet shown whether it is an event.
+        carry_start = np.where(self._run_open, self._run["start"], np.iinfo(np.int64).max)
+        pending = ((end_scan - events["end"] <= self.hold_off_scans)
+                   | (carry_start[events["channel"]] - events["end"] <= self.hold_off_scans))
+        self._event[events["channel"][pending]] = events[pending]
+        self._event_open[events["channel"][pending]] = True
+        return self._by_start(events[~pending])
+
+    def flush(self):
+        """End every run and event in progress, as at the end of the stream,
+        and return the events among them."""
+        carried = self._run[self._run_open & self._run_hot]
+        events = self._merge(self._sorted(np.concatenate((self._event[self._event_open], carried))))
+        self._run_open[:] = False
+        self._event_open[:] = False
+        return self._by_start(events)
+
+    @staticmethod
+    def _sorted(segments):
+        return segments[np.lexsort((segments["start"], segments["channel"]))]
+
+    @staticmethod
+    def _by_start(events):
+        return events[np.lexsort((events["channel"], events["start"]))]
@@ -0,0 +1,120 @@
+"""
+Skipped-sample detection with run-length gap maps.
+
+When the device buffer overflows, LJM's auto-recovery discards scans until
+the device catches up, then returns the scans it missed filled with
+constants.DUMMY_VALUE (-9999), or 0xFFFF in binary stream mode. Samples that
+were never read hold constants.SCAN_NOT_READ (-8888). Left in the data they
+convert to about -10000 g and look like events.
+
+find_gaps() locates every scan holding such a sample in one vectorized pass
+over a stream read and returns them as a compact run-length map of
+(start, scans) records. The common case, a read without gaps, costs one
+min() or max() reduction. mask_gaps() sets those scans to NaN so analysis
+skips them, and a GapMap keeps the gaps of a whole stream, joining runs
+split across reads.
+
+Gap scans keep their place in the stream: they are still counted in the
+scan index, so a ScanClock maps every later scan to the right time, however
+long auto-recovery took.
+
+Author: Liam Eime
+"""
+
+import collections
+
+import numpy as np
+
+GAP_DTYPE = np.dtype([("start", np.int64), ("scans", np.int64)])
+# Volts at or below this are skipped. DUMMY_VALUE and SCAN_NOT_READ are both far below every AIN range.
+SKIPPED_LEVEL = -1000.0
+BINARY_DUMMY_VALUE = 0xFFFF  # DUMMY_VALUE in binary stream mode
+
+
+def find_gaps(values, num_channels, first_scan=0):
+    """Return the runs of scans in a stream read that hold skipped samples.
+
+    Args:
+        values: The interleaved values of the read: volts, or uint16 codes
+            of a binary stream.
+        num_channels: The number of channels in each scan.
+        first_scan: The scan index of the read's first scan.
+
+    Returns:
+        A GAP_DTYPE array of the start scan index and length of each run,
+        in order. Empty if the read has no skipped samples.
+    """
+    values = np.asarray(values).reshape(-1)
+    if values.size == 0:
+        return np.zeros(0, dtype=GAP_DTYPE)
+    if values.dtype.kind in "ui":
+        if values.max() < BINARY_DUMMY_VALUE:
+            return np.zeros(0, dtype=GAP_DTYPE)
+        skipped = values == BINARY_DUMMY_VALUE
+    else:
+        if values.min() > SKIPPED_LEVEL:
+            return np.zeros(0, dtype=GAP_DTYPE)
+        skipped = values <= SKIPPED_LEVEL
+    scans = skipped.reshape(-1, num_channels).any(axis=1)
+    # Runs start and end where the flag changes
+    edges = np.flatnonzero(np.diff(scans, prepend=False, append=False))
+    gaps = np.zeros(edges.size // 2, dtype=GAP_DTYPE)
+    gaps["start"] = first_scan + edges[::2]
+    gaps["scans"] = edges[1::2] - edges[::2]
+    return gaps
+
+
+def mask_gaps(block, gaps, first_scan):
+    """Set the scans of the gaps to NaN in a (num_channels, n) block, which
+    analysis never counts as above a threshold.
+
+    Args:
+        block: The block, changed in place.
+        gaps: GAP_DTYPE records, as returned by find_gaps.
+        first_scan: The scan index of the block's first column.
+    """
+    for start, num_scans in zip(gaps["start"] - first_scan, gaps["scans"]):
+        block[:, max(start, 0):start + num_scans] = np.nan
+
+
+class GapMap:
+    """The gaps of a stream, read after read.
+
+    Args:
+        history: The number of latest gaps kept.
+
+    Attributes:
+        skipped_scans: The scans in every gap added.
+        count: The number of gaps, counting a run split across reads once.
+        largest: The most scans in one gap.
+    """
+
+    def __init__(self, history=1024):
+        self._gaps = collections.deque(maxlen=history)
+        self.skipped_scans = 0
+        self.count = 0
+        self.largest = 0
+
+    def add(self, gaps):
+        """Add the gaps of the next read, as returned by find_gaps.
+
+        Returns:
+            The number of new gaps. A run that continues the last gap from
+            the previous read extends it instead.
+        """
+        new = 0
+        for start, num_scans in zip(gaps["start"].tolist(), gaps["scans"].tolist()):
+            self.skipped_scans += num_scans
+            if self._gaps and sum(self._gaps[-1]) == start:
+                start, previous = self._gaps.pop()
+                num_scans += previous
+            else:
+                new += 1
+                self.count += 1
+            self._gaps.append((start, num_scans))
+            self.largest = max(self.largest, num_scans)
+        return new
+
+    def gaps(self):
+        """Return the latest gaps as a GAP_DTYPE array, in order."""
+        return np.array(list(self._gaps), dtype=GAP_DTYPE)
@@ -0,0 +1,164 @@
+"""
+Stream health monitoring with backlog trends and overflow prediction.
+
+Every eStreamRead returns the scans still waiting in the device buffer and
+in the LJM buffer. A StreamHealth keeps those backlogs, with how long each
+read took and the time between reads, for the latest `history` reads in a
+RingBuffer. It fits the growth of each backlog in scans per second over the
+last `window` reads.
+
+The device buffer holds STREAM_BUFFER_SIZE_BYTES of 2-byte samples, so the
+device backlog's growth gives the seconds left before it overflows and
+scans are lost. A growing LJM backlog means the read loop is falling behind
+and will reach the device buffer next. Warnings go to a callback as soon
+as either trend predicts trouble within warn_seconds, while there is still
+time to shed analysis load.
+
+Author: Liam Eime
+"""
+
+import time
+
+import numpy as np
+
+from t7stream.ring import RingBuffer
+
+BYTES_PER_SAMPLE = 2  # T7 stream samples are 16-bit
+HEALTH_FIELDS = ("time", "device_backlog", "ljm_backlog", "read_seconds", "interval")
+DEVICE_OVERFLOW = "device buffer overflow"
+LJM_BACKLOG = "LJM backlog growing"
+
+
+def _slope(x, y):
+    """The least-squares slope of y against x."""
+    x = x - x.mean()
+    denominator = np.dot(x, x)
+    return float(np.dot(x, y - y.mean()) / denominator) if denominator > 0 else 0.0
+
+
+class StreamHealth:
+    """Records stream reads and warns before the device buffer overflows.
+
+    Args:
+        scan_rate: The stream's scan rate.
+        scans_per_read: The scans returned by each read.
+        num_channels: The number of channels in each scan.
+        buffer_size_bytes: The device's STREAM_BUFFER_SIZE_BYTES.
+        history: The number of reads kept.
+        window: The number of latest reads the backlog trends are fitted
+            over.
+        warn_seconds: Warn when the device buffer is predicted to overflow
+            within this many seconds...
+        max_ljm_backlog_seconds: ...or the LJM backlog to exceed this many
+            seconds of scans within warn_seconds.
+        on_change: Called as on_change(warnings, status) whenever the set
+            of active warnings changes, with the new set and status().
+        clock: The time source. Default is time.perf_counter.
+
+    Attributes:
+        reads: The number of reads recorded.
+        max_device_backlog, max_ljm_backlog: The largest backlogs seen.
+        warnings: The active warnings, a frozenset of DEVICE_OVERFLOW and
+            LJM_BACKLOG.
+    """
+
+    def __init__(self, scan_rate, scans_per_read, num_channels, buffer_size_bytes=32768, history=1024, window=30,
+                 warn_seconds=30.0, max_ljm_backlog_seconds=5.0, on_change=None, clock=time.perf_counter):
+        self.scan_rate = scan_rate
+        self.read_period = scans_per_read / scan_rate
+        self.device_capacity = buffer_size_bytes // (BYTES_PER_SAMPLE * num_channels)
+        self.window = window
+        self.warn_seconds = warn_seconds
+        self.ljm_backlog_limit = max_ljm_backlog_seconds * scan_rate
+        self.on_change = on_change
+        self.clock = clock
+        self.reads = 0
+        self.max_device_backlog = 0
+        self.max_ljm_backlog = 0
+        self.warnings = frozenset()
+        self._history = RingBuffer(len(HEALTH_FIELDS), history)
+        self._last_time = None
+        self._record = np.zeros((len(HEALTH_FIELDS), 1))
+
+    def record(self, device_backlog, ljm_backlog, read_seconds=0.0):
+        """Record one read and check the trends.
+
+        Args:
+            device_backlog: The deviceScanBacklog returned by the read.
+            ljm_backlog: The ljmScanBacklog returned by the read.
+            read_seconds: How long the read call took.
+
+        Returns:
+            The active warnings.
+        """
+        now = self.clock()
+        interval = np.nan if self._last_time is None else now - self._last_time
+        self._last_time = now
+        self._record[:, 0] = (now, device_backlog, ljm_backlog, read_seconds, interval)
+        self._history.write(self._record)
+        self.reads += 1
+        self.max_device_backlog = max(self.max_device_backlog, device_backlog)
+        self.max_ljm_backlog = max(self.max_ljm_backlog, ljm_backlog)
+        warnings = self._check()
+        if warnings != self.warnings:
+            self.warnings = warnings
+            if self.on_change is not None:
+                self.on_change(warnings, self.status())
+        return warnings
+
+    def history(self, num_reads=None):
+        """Return the latest num_reads reads, or all kept, as a dict of
+        arrays keyed by HEALTH_FIELDS."""
+        rows = self._history.latest(len(self._history) if num_reads is None else num_reads)
+        return dict(zip(HEALTH_FIELDS, rows))
+
+    def trends(self):
+        """Return the growth of the device and LJM backlogs in scans per
+        second, fitted over the last window reads."""
+        reads = self.history(self.window)
+        if len(reads["time"]) < 3:
+            return 0.0, 0.0
+        return _slope(reads["time"], reads["device_backlog"]), _slope(reads["time"], reads["ljm_backlog"])
+
+    def seconds_to_overflow(self):
+        """Return the predicted seconds until the device buffer overflows,
+        or inf while its backlog is not growing."""
+        device_growth, _ = self.trends()
+        if self.reads == 0 or device_growth <= 0:
+            return np.inf
+        device_backlog = self._history.latest(1)[1, 0]
+        return max(self.device_capacity - device_backlog, 0.0) / device_growth
+
+    def _check(self):
+        if self.reads == 0:
+            return frozenset()
+        device_growth, ljm_growth = self.trends()
+        _, device_backlog, ljm_backlog, _, _ = self._history.latest(1)[:, 0]
+        warnings = set()
+        if device_backlog >= self.device_capacity or self.seconds_to_overflow() < self.warn_seconds:
+            warnings.add(DEVICE_OVERFLOW)
+        if ljm_backlog + max(ljm_growth, 0.0) * self.warn_seconds > self.ljm_backlog_limit:
+            warnings.add(LJM_BACKLOG)
+        return frozenset(warnings)
+
+    def status(self):
+        """Return a dict summarizing the latest reads: backlogs and their
+        growth, the predicted seconds to overflow, and read timing."""
+        reads = self.history(self.window)
+        device_growth, ljm_growth = self.trends()
+        intervals = reads["interval"][~np.isnan(reads["interval"])]
+        jitter = intervals - self.read_period
+        return {
+            "reads": self.reads,
+            "device_backlog": int(reads["device_backlog"][-1]) if self.reads else 0,
+            "ljm_backlog": int(reads["ljm_backlog"][-1]) if self.reads else 0,
+            "device_capacity": self.device_capacity,
+            "device_growth": device_growth,
+            "ljm_growth": ljm_growth,
+            "seconds_to_overflow": self.seconds_to_overflow(),
+            "read_seconds_mean": float(reads["read_seconds"].mean()) if self.reads else 0.0,
+            "read_seconds_max": float(reads["read_seconds"].max()) if self.reads else 0.0,
+            "jitter_rms": float(np.sqrt(np.mean(jitter ** 2))) if jitter.size else 0.0,
+            "jitter_max": float(np.abs(jitter).max()) if jitter.size else 0.0,
+            "warnings": sorted(self.warnings),
+        }
@@ -0,0 +1,171 @@
+"""
+Acquisition to analysis pipeline with a bounded queue and persistent workers.
+
+The acquisition loop submits each stream chunk and goes straight back to
+eStreamRead. A fixed set of worker threads takes chunks from a bounded queue,
+optionally runs a stateless prepare step on several chunks at once, and then
+calls process on every chunk strictly in submission order, so analysis state
+carried from one chunk to the next needs no locking.
+
+When analysis falls behind, the queue fills up and submit either blocks,
+leaving the unread data in the LJM buffer, or drops the chunk. Queue depth,
+dropped and late chunks are counted so the pressure is visible before data
+is lost.
+
+Author: Liam Eime
+"""
+
+import queue
+import threading
+import time
+
+_STOP = object()
+
+
+class AnalysisPipeline:
+    """Runs process(chunk) on worker threads, in the order chunks were
+    submitted.
+
+    Args:
+        process: Called with each chunk, one chunk at a time, in submission
+            order.
+        prepare: Optional stateless step called with each chunk before
+            process, on any worker and possibly for several chunks at once.
+            process then receives its return value.
+        workers: The number of worker threads. More than one only helps
+            when prepare does the heavy lifting.
+        max_pending: The most chunks queued and not yet taken by a worker.
+        block: When the queue is full, True makes submit wait for room and
+            False drops the chunk.
+        late_seconds: A chunk processed more than this many seconds after
+            it was submitted counts as late. None disables the count.
+
+    Attributes:
+        submitted, processed, dropped, late, errors: Chunk counts.
+        max_depth: The deepest the queue has been.
+        last_error: The last exception raised by prepare or process.
+    """
+
+    def __init__(self, process, prepare=None, workers=1, max_pending=4, block=True, late_seconds=None):
+        self.process = process
+        self.prepare = prepare
+        self.block = block
+        self.late_seconds = late_seconds
+        self.submitted = 0
+        self.processed = 0
+        self.dropped = 0
+        self.late = 0
+        self.errors = 0
+        self.max_depth = 0
+        self.last_error = None
+        self._queue = queue.Queue(max_pending)
+        self._submit_lock = threading.Lock()
+        self._turn = threading.Condition()
+        self._next_sequence = 0
+        self._skipped = set()
+        self._finished = 0
+        self._closed = False
+        self._workers = [threading.Thread(target=self._work, name=f"analysis-{i}", daemon=True)
+                         for i in range(workers)]
+        for worker in self._workers:
+            worker.start()
+
+    @property
+    def depth(self):
+        """The number of chunks waiting for a worker."""
+        return self._queue.qsize()
+
+    def submit(self, chunk, timeout=None):
+        """Queue a chunk for analysis.
+
+        Args:
+            chunk: The chunk to pass to prepare or process.
+            timeout: With block, the most seconds to wait for room before
+                dropping the chunk. None waits as long as needed.
+
+        Returns:
+            True if the chunk was queued, False if it was dropped.
+        """
+        if self._closed:
+            raise RuntimeError("the pipeline is closed")
+        # Held while queueing so chunks are queued in sequence order.
+        with self._submit_lock:
+            with self._turn:
+                sequence = self.submitted
+                self.submitted += 1
+            try:
+                self._queue.put((sequence, chunk, time.perf_counter()), self.block, timeout)
+            except queue.Full:
+                with self._turn:
+                    self.dropped += 1
+                    # Later chunks must not wait for this one.
+                    self._skipped.add(sequence)
+                    self._advance()
+                return False
+        self.max_depth = max(self.max_depth, self._queue.qsize())
+        return True
+
+    def _advance(self):
+        """Step past finished sequence numbers that were dropped and wake the
+        workers waiting for their turn. Call with self._turn held."""
+        while self._next_sequence in self._skipped:
+            self._skipped.discard(self._next_sequence)
+            self._next_sequence += 1
+            self._finished += 1
+        self._turn.notify_all()
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            sequence, chunk, submitted_at = item
+            try:
+                if self.prepare is not None:
+                    chunk = self.prepare(chunk)
+                error = None
+            except Exception as e:
+                error = e
+            with self._turn:
+                while self._next_sequence != sequence:
+                    self._turn.wait()
+            if error is None:
+                try:
+                    self.process(chunk)
+                except Exception as e:
+                    error = e
+            with self._turn:
+                if error is None:
+                    self.processed += 1
+                    if self.late_seconds is not None and time.perf_counter() - submitted_at > self.late_seconds:
+                        self.late += 1
+                else:
+                    self.errors += 1
+                    self.last_error = error
+                self._next_sequence += 1
+                self._finished += 1
+                self._advance()
+
+    def join(self):
+        """Wait until every submitted chunk has been processed or dropped."""
+        with self._turn:
+            while self._finished < self.submitted:
+                self._turn.wait()
+
+    def close(self):
+        """Process the chunks already submitted, then stop the workers.
+        Safe to call more than once."""
+        if self._closed:
+            return
+        self._closed = True
+        self.join()
+        for _ in self._workers:
+            self._queue.put(_STOP)
+        for worker in self._workers:
+            worker.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
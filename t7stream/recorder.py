@@ -0,0 +1,525 @@
+"""
+Rotating binary recorder for stream data, and a memory-mapped reader.
+
+A Recorder appends each stream chunk to a recording file on a background
+thread. The acquisition loop only copies the chunk and queues it. The
+writer batches queued chunks and writes each batch sequentially with
+os.writev, in pieces of at most WRITE_PIECE bytes, yielding between them.
+A single multi-megabyte write keeps the writer in the kernel for
+hundreds of milliseconds, which on a single core holds up the
+acquisition loop for as long. If the disk cannot keep up, the
+queue fills and chunks are dropped and counted rather than holding up
+eStreamRead.
+
+Each file starts with a JSON header padded to HEADER_ALIGN bytes. The
+header holds the channel names, scan rate, ScanClock model and
+calibration. Chunks follow, each stored channel-major as (num_channels,
+num_scans), like RingBuffer. A sidecar index (the file name plus ".idx")
+holds one INDEX_DTYPE record per chunk: its byte offset, first scan index,
+scan count and the clock model in force when it was recorded. A record is
+only written after its chunk, so a file can be read while it is still
+being recorded. A new file is started when the current one reaches
+max_bytes or max_seconds of scans.
+
+A RecordingReader memory-maps the files of a recording and returns any
+scan or time range by reading only the chunks that hold it.
+
+Author: Liam Eime
+"""
+
+import glob
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from t7stream.calibration import AinCalibration
+from t7stream.clock import ScanClock
+from t7stream.gaps import SKIPPED_LEVEL
+
+MAGIC = b"T7REC001"
+HEADER_ALIGN = 4096
+INDEX_DTYPE = np.dtype([("offset", "<i8"), ("first_scan", "<i8"), ("num_scans", "<i8"),
+                        ("start_time", "<f8"), ("seconds_per_scan", "<f8")])
+WRITE_PIECE = 256 << 10
+_IOV_MAX = 1024  # The smallest IOV_MAX of Linux, macOS and the BSDs
+_BINARY = getattr(os, "O_BINARY", 0)  # Windows
+_STOP = object()
+
+
+def _write_all(fd, buffers):
+    """Write byte buffers to fd in order, with os.writev where available,
+    at most WRITE_PIECE bytes per call and letting other threads run
+    between calls."""
+    buffers = [memoryview(buffer).cast("B") for buffer in buffers]
+    i = 0
+    while i < len(buffers):
+        piece, size = [], 0
+        for buffer in buffers[i:i + _IOV_MAX]:
+            piece.append(buffer[:WRITE_PIECE - size])
+            size += len(piece[-1])
+            if size >= WRITE_PIECE:
+                break
+        if hasattr(os, "writev"):
+            written = os.writev(fd, piece)
+        else:
+            written = os.write(fd, piece[0])
+        time.sleep(0)
+        # Step past what was written, which may end part way into a buffer.
+        while written:
+            if written >= len(buffers[i]):
+                written -= len(buffers[i])
+                i += 1
+            else:
+                buffers[i] = buffers[i][written:]
+                written = 0
+
+
+def _read_header(path):
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a recording")
+        length = int.from_bytes(f.read(4), "little")
+        return json.loads(f.read(length))
+
+
+class Recorder:
+    """Records stream chunks to rotating binary files on a writer thread.
+
+    Args:
+        path: The recording's path, such as OUTPUT_DIR/OUTPUT_FILENAME.
+            Files are named after it with the start time of the recording
+            and a sequence number, e.g. data_20231221-101500_0000.t7r when
+            path is data.t7r. The directory is created if needed.
+        channel_names: The name of each channel, in scan order.
+        scan_rate: The stream's actual scan rate.
+        scan_clock: The stream's ScanClock. Its model is read when each
+            chunk is written. Default is a clock started now.
+        calibration: Optional dict stored in the header, e.g. {"offset":
+            [...], "sensitivity": [...], "unit": "g"}, which
+            RecordingReader.calibrated() applies as
+            (value - offset) / sensitivity. For raw stream codes, the
+            AinCalibration.to_dict() of the stream.
+        dtype: The sample type on disk. Default is float64. Raw stream
+            codes are recorded losslessly as uint16.
+        max_bytes: Start a new file once a file holds this many bytes.
+        max_seconds: Start a new file once a file holds this many seconds
+            of scans. None disables the limit.
+        batch_bytes: Queued chunks are written together once they add up
+            to this many bytes...
+        flush_interval: ...or once the oldest has waited this many seconds.
+        max_pending: The most chunks queued for the writer.
+        block: When the queue is full, True makes write wait and False drops
+            the chunk.
+
+    Attributes:
+        files: The paths of the files written so far.
+        chunks, scans, bytes: Counts of what has been written to disk.
+        dropped: Chunks dropped because the queue was full.
+        errors, last_error: Failed writes and the last OSError.
+        max_depth: The deepest the queue has been.
+    """
+
+    def __init__(self, path, channel_names, scan_rate, scan_clock=None, calibration=None, dtype=np.float64,
+                 max_bytes=1 << 30, max_seconds=3600, batch_bytes=4 << 20, flush_interval=1.0, max_pending=64,
+                 block=False):
+        self.channel_names = list(channel_names)
+        self.num_channels = len(self.channel_names)
+        self.scan_rate = scan_rate
+        self.scan_clock = scan_clock if scan_clock is not None else ScanClock(time.time(), scan_rate)
+        self.calibration = calibration
+        self.dtype = np.dtype(dtype)
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.batch_bytes = batch_bytes
+        self.flush_interval = flush_interval
+        self.block = block
+        directory, name = os.path.split(path)
+        stem, self._extension = os.path.splitext(name)
+        self._extension = self._extension or ".t7r"
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        session = datetime.fromtimestamp(self.scan_clock.start_time).strftime("%Y%m%d-%H%M%S")
+        self._prefix = os.path.join(directory, f"{stem}_{session}")
+        self.files = []
+        self.chunks = 0
+        self.scans = 0
+        self.bytes = 0
+        self.dropped = 0
+        self.errors = 0
+        self.last_error = None
+        self.max_depth = 0
+        self._next_scan = 0
+        self._fd = self._index_fd = None
+        self._file_bytes = self._index_bytes = 0
+        self._file_first_scan = 0
+        self._closed = False
+        self._queue = queue.Queue(max_pending)
+        self._thread = threading.Thread(target=self._run, name="recorder", daemon=True)
+        self._thread.start()
+
+    def write(self, block, first_scan=None):
+        """Queue a (num_channels, num_scans) block of scans for recording.
+        The block is copied, so it may be reused straight away.
+
+        Args:
+            block: The scans.
+            first_scan: The scan index of the block's first scan. Default
+                is the scan after the previous block.
+
+        Returns:
+            True if the block was queued, False if it was dropped.
+        """
+        if self._closed:
+            raise RuntimeError("the recorder is closed")
+        block = np.array(block, dtype=self.dtype, order="C")
+        if block.ndim != 2 or block.shape[0] != self.num_channels:
+            raise ValueError(f"expected a ({self.num_channels}, num_scans) block, not {block.shape}")
+        if first_scan is None:
+            first_scan = self._next_scan
+        self._next_scan = first_scan + block.shape[1]
+        clock = self.scan_clock
+        try:
+            self._queue.put((first_scan, block, clock.start_time, clock.seconds_per_scan), self.block)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.max_depth = max(self.max_depth, self._queue.qsize())
+        return True
+
+    def write_interleaved(self, values, first_scan=None):
+        """Queue scans given as interleaved stream values, as returned by
+        eStreamRead, as by write()."""
+        return self.write(np.reshape(values, (-1, self.num_channels)).T, first_scan)
+
+    def _run(self):
+        pending = []
+        pending_bytes = 0
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0.0)
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item is not _STOP and item is not None:
+                pending.append(item)
+                pending_bytes += item[1].nbytes
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+            if pending and (item is None or item is _STOP or pending_bytes >= self.batch_bytes):
+                self._flush(pending)
+                pending, pending_bytes, deadline = [], 0, None
+            if item is _STOP:
+                return
+
+    def _flush(self, pending):
+        """Write a batch of chunks and then their index records."""
+        try:
+            buffers, records = [], []
+            # The offsets the batch's chunks will have. self._file_bytes
+            # only moves once they are written.
+            file_bytes = self._file_bytes
+            for first_scan, block, start_time, seconds_per_scan in pending:
+                if self._fd is None or file_bytes >= self.max_bytes or (
+                        self.max_seconds is not None
+                        and first_scan - self._file_first_scan >= self.max_seconds * self.scan_rate):
+                    self._write_batch(buffers, records)
+                    buffers, records = [], []
+                    self._rotate(first_scan)
+                    file_bytes = self._file_bytes
+                records.append((file_bytes, first_scan, block.shape[1], start_time, seconds_per_scan))
+                buffers.append(block)
+                file_bytes += block.nbytes
+            self._write_batch(buffers, records)
+        except OSError as e:
+            self.errors += 1
+            self.last_error = e
+
+    def _write_batch(self, buffers, records):
+        if not buffers:
+            return
+        index = np.array(records, dtype=INDEX_DTYPE)
+        try:
+            _write_all(self._fd, buffers)
+            _write_all(self._index_fd, [index])
+        except OSError:
+            self._rewind()
+            raise
+        data_bytes = sum(block.nbytes for block in buffers)
+        self._file_bytes += data_bytes
+        self._index_bytes += index.nbytes
+        self.chunks += len(buffers)
+        self.scans += sum(block.shape[1] for block in buffers)
+        self.bytes += data_bytes
+
+    def _rewind(self):
+        """Cut both files back to their last complete chunk after a failed
+        write. If that fails too, give the files up so that the next chunk
+        starts a new file."""
+        try:
+            for fd, size in ((self._fd, self._file_bytes), (self._index_fd, self._index_bytes)):
+                os.ftruncate(fd, size)
+                os.lseek(fd, size, os.SEEK_SET)
+        except OSError:
+            for fd in (self._fd, self._index_fd):
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+            self._fd = self._index_fd = None
+
+    def _rotate(self, first_scan):
+        """Close the current file and start the next at first_scan."""
+        self._close_files()
+        path = f"{self._prefix}_{len(self.files):04d}{self._extension}"
+        header = {
+            "version": 1,
+            "channel_names": self.channel_names,
+            "scan_rate": self.scan_rate,
+            "dtype": self.dtype.str,
+            "layout": "channel-major chunks",
+            "first_scan": first_scan,
+            "clock": {"start_time": self.scan_clock.start_time,
+                      "seconds_per_scan": self.scan_clock.seconds_per_scan},
+            "calibration": self.calibration,
+            "session": os.path.basename(self._prefix),
+            "sequence": len(self.files),
+        }
+        encoded = json.dumps(header).encode()
+        size = -(-(len(MAGIC) + 4 + len(encoded)) // HEADER_ALIGN) * HEADER_ALIGN
+        prefix = MAGIC + len(encoded).to_bytes(4, "little") + encoded
+        flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | _BINARY
+        self._fd = os.open(path, flags)
+        self._index_fd = os.open(path + ".idx", flags)
+        _write_all(self._fd, [prefix + bytes(size - len(prefix))])
+        self.files.append(path)
+        self._file_bytes = size
+        self._index_bytes = 0
+        self._file_first_scan = first_scan
+
+    def _close_files(self):
+        for fd in (self._fd, self._index_fd):
+            if fd is not None:
+                os.fsync(fd)
+                os.close(fd)
+        self._fd = self._index_fd = None
+
+    def close(self):
+        """Write the chunks already queued and close the files. Safe to call
+        more than once."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+        try:
+            self._close_files()
+        except OSError as e:
+            self.errors += 1
+            self.last_error = e
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class RecordingReader:
+    """Reads scans from the files of one recording through memory maps,
+    touching only the chunks a range needs.
+
+    Args:
+        paths: A recording file, a list of them, or a glob pattern such as
+            "data/data_20231221-101500_*.t7r". The files must be from one
+            recording.
+
+    Attributes:
+        header: The header of the first file.
+        channel_names, num_channels, scan_rate, dtype, calibration: From
+            the header.
+        raw: True if the scans are raw stream codes, with an AinCalibration
+            in the header.
+        index: The INDEX_DTYPE records of every chunk, in scan order, with
+            the number of the file holding each in a "file" field.
+        first, total: The scan index of the first scan recorded and one
+            past the last.
+    """
+
+    def __init__(self, paths):
+        if isinstance(paths, str):
+            paths = sorted(glob.glob(paths)) if glob.has_magic(paths) else [paths]
+        if not paths:
+            raise FileNotFoundError("no recording files given")
+        headers = [_read_header(path) for path in paths]
+        order = np.argsort([header["first_scan"] for header in headers], kind="stable")
+        self.paths = [paths[i] for i in order]
+        headers = [headers[i] for i in order]
+        if len({header["session"] for header in headers}) > 1:
+            raise ValueError("the files are from more than one recording")
+        self.header = headers[0]
+        self.channel_names = self.header["channel_names"]
+        self.num_channels = len(self.channel_names)
+        self.scan_rate = self.header["scan_rate"]
+        self.dtype = np.dtype(self.header["dtype"])
+        self.calibration = self.header["calibration"]
+        self.raw = bool(self.calibration) and "center" in self.calibration
+        self._ain = AinCalibration.from_dict(self.calibration) if self.raw else None
+        indexes = []
+        for number, path in enumerate(self.paths):
+            with open(path + ".idx", "rb") as f:
+                data = f.read()
+            # Ignores a record that is still being written.
+            records = np.frombuffer(data, INDEX_DTYPE, len(data) // INDEX_DTYPE.itemsize)
+            with_file = np.empty(len(records), INDEX_DTYPE.descr + [("file", "<i8")])
+            for field in INDEX_DTYPE.names:
+                with_file[field] = records[field]
+            with_file["file"] = number
+            indexes.append(with_file)
+        self.index = np.concatenate(indexes)
+        self.index = self.index[np.argsort(self.index["first_scan"], kind="stable")]
+        self._ends = self.index["first_scan"] + self.index["num_scans"]
+        self.first = int(self.index["first_scan"][0]) if len(self.index) else 0
+        self.total = int(self._ends[-1]) if len(self.index) else 0
+        self._maps = [None] * len(self.paths)
+
+    def __len__(self):
+        return self.total - self.first
+
+    def _chunk(self, i):
+        """Return chunk i as a (num_channels, num_scans) memory-mapped view."""
+        record = self.index[i]
+        number = int(record["file"])
+        if self._maps[number] is None:
+            self._maps[number] = np.memmap(self.paths[number], np.uint8, "r")
+        offset = int(record["offset"])
+        num_scans = int(record["num_scans"])
+        nbytes = num_scans * self.num_channels * self.dtype.itemsize
+        return self._maps[number][offset:offset + nbytes].view(self.dtype).reshape(self.num_channels, num_scans)
+
+    def segments(self, start, stop):
+        """Return memory-mapped views of scans start:stop without copying,
+        one (num_channels, n) view per chunk the range covers.
+
+        Raises:
+            IndexError: Part of the range was not recorded.
+        """
+        if not self.first <= start <= stop <= self.total:
+            raise IndexError(f"scans {start}:{stop} are not in the recording, which holds {self.first}:{self.total}")
+        if start == stop:
+            return [np.empty((self.num_channels, 0), self.dtype)]
+        begin = int(np.searchsorted(self._ends, start, "right"))
+        end = int(np.searchsorted(self.index["first_scan"], stop, "left"))
+        firsts = self.index["first_scan"][begin:end]
+        if begin == end or firsts[0] > start or np.any(firsts[1:] != self._ends[begin:end - 1]):
+            raise IndexError(f"scans {start}:{stop} include scans that were not recorded")
+        parts = []
+        for i in range(begin, end):
+            first = int(self.index["first_scan"][i])
+            parts.append(self._chunk(i)[:, max(start - first, 0):stop - first])
+        return parts
+
+    def recorded(self, start, stop):
+        """Return the runs of scans start:stop that were recorded, as a list
+        of (start, stop) ranges in order. The scans between runs are
+        missing, e.g. chunks the Recorder dropped when its queue was full.
+        """
+        begin = int(np.searchsorted(self._ends, start, "right"))
+        end = int(np.searchsorted(self.index["first_scan"], stop, "left"))
+        runs = []
+        for first, last in zip(self.index["first_scan"][begin:end].tolist(), self._ends[begin:end].tolist()):
+            first, last = max(first, start), min(last, stop)
+            if runs and runs[-1][1] >= first:
+                runs[-1] = (runs[-1][0], max(runs[-1][1], last))
+            else:
+                runs.append((first, last))
+        return runs
+
+    def read(self, start, stop, out=None):
+        """Return scans start:stop as one contiguous (num_channels, n)
+        array. The array is a read-only memory-mapped view when the range
+        is within one chunk and out is not given, otherwise a copy.
+
+        Raises:
+            IndexError: Part of the range was not recorded.
+        """
+        parts = self.segments(start, stop)
+        if len(parts) == 1 and out is None:
+            return parts[0]
+        if out is None:
+            out = np.empty((self.num_channels, stop - start), dtype=self.dtype)
+        np.concatenate(parts, axis=1, out=out)
+        return out
+
+    def _clock_chunk(self, index):
+        """The index of the chunk whose clock model applies to scan index."""
+        return np.clip(np.searchsorted(self.index["first_scan"], index, "right") - 1, 0, len(self.index) - 1)
+
+    def time_of(self, index):
+        """Return the host time of a scan index or an array of them, using
+        the clock model recorded with its chunk."""
+        record = self.index[self._clock_chunk(index)]
+        return record["start_time"] + np.asarray(index, dtype=np.float64) * record["seconds_per_scan"]
+
+    def clock_model(self, index):
+        """Return the (start_time, seconds_per_scan) clock model recorded
+        with the chunk of a scan index."""
+        record = self.index[self._clock_chunk(index)]
+        return float(record["start_time"]), float(record["seconds_per_scan"])
+
+    def index_range(self, start_time, stop_time):
+        """Return the scan range (start, stop) of the recorded scans at host
+        times from start_time up to but not including stop_time."""
+        records = self.index
+        chunk_times = records["start_time"] + records["first_scan"] * records["seconds_per_scan"]
+        bounds = []
+        for host_time in (start_time, stop_time):
+            chunk = max(int(np.searchsorted(chunk_times, host_time, "right")) - 1, 0)
+            record = records[chunk]
+            scans = (host_time - chunk_times[chunk]) / record["seconds_per_scan"]
+            # Host times near the epoch are only exact to np.spacing(host_time), a sizeable fraction of a
+            # scan at high scan rates. The tolerance keeps a scan exactly at host_time despite that rounding.
+            tolerance = max(4 * np.spacing(host_time) / record["seconds_per_scan"], 1e-6)
+            index = int(record["first_scan"]) + int(np.ceil(scans - tolerance))
+            bounds.append(min(max(index, self.first), self.total))
+        return bounds[0], max(bounds)
+
+    def read_time(self, start_time, stop_time, out=None):
+        """Return (first_scan, scans) for the scans recorded at host times
+        from start_time up to but not including stop_time, as by read()."""
+        start, stop = self.index_range(start_time, stop_time)
+        return start, self.read(start, stop, out)
+
+    def calibrated(self, scans):
+        """Apply the recorded calibration to a (num_channels, n) array of
+        scans, returning a new array. Skipped samples become NaN."""
+        if self.raw:
+            return self._ain.convert(scans)
+        if not self.calibration:
+            return np.array(scans)
+        offset = np.asarray(self.calibration.get("offset", 0.0), dtype=np.float64).reshape(-1, 1)
+        sensitivity = np.asarray(self.calibration.get("sensitivity", 1.0), dtype=np.float64).reshape(-1, 1)
+        calibrated = (scans - offset) / sensitivity
+        np.putmask(calibrated, scans <= SKIPPED_LEVEL, np.nan)  # Skipped samples
+        return calibrated
+
+    def volts(self, scans):
+        """Return a (num_channels, n) array of scans as volts: converted
+        from raw stream codes, otherwise as they are."""
+        return self._ain.volts(scans) if self.raw else scans
+
+    def close(self):
+        """Release the memory maps. Views returned earlier keep their file
+        mapped until they are garbage collected."""
+        self._maps = [None] * len(self.paths)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,200 @@
+"""
+Replays recorded stream data through the calls of a live stream.
+
+A ReplaySource reads a recording made by Recorder, or a CSV or NumPy file
+of scans, and hands it out one read at a time through eStreamRead and
+eStreamReadInto, so the loop that reads a live T7 can run unchanged on
+recorded data. Reads are returned as fast as they are asked for, or paced
+at a multiple of real time. The source counts the scans it played and
+reports the throughput, so detector settings can be tuned and timed on
+hours of data in minutes.
+
+Scans missing from a recording, such as chunks a Recorder dropped, are
+played as DUMMY_VALUE, as LJM returns the scans it skipped, so find_gaps()
+reports them and later scans keep their index.
+
+Author: Liam Eime
+"""
+
+import os
+import time
+
+import numpy as np
+
+from t7stream.calibration import DUMMY_VALUE
+from t7stream.clock import ScanClock
+from t7stream.recorder import RecordingReader
+
+
+class ArrayRecording:
+    """Scans held in memory, read like a RecordingReader.
+
+    Args:
+        scans: A (num_scans, num_channels) array of scans, e.g. the rows of
+            a CSV file.
+        scan_rate: The scan rate the scans were recorded at.
+        start_time: The host time of the first scan.
+        channel_names: Optional names of the channels.
+    """
+
+    def __init__(self, scans, scan_rate, start_time=0.0, channel_names=None):
+        self.data = np.ascontiguousarray(np.asarray(scans, dtype=np.float64).T)
+        self.num_channels = self.data.shape[0]
+        self.channel_names = channel_names or [f"channel {i}" for i in range(self.num_channels)]
+        self.scan_rate = scan_rate
+        self.first = 0
+        self.total = self.data.shape[1]
+        self._model = (float(start_time), 1.0 / scan_rate)
+
+    def read(self, start, stop, out=None):
+        """Return scans start:stop as a (num_channels, n) array."""
+        if not self.first <= start <= stop <= self.total:
+            raise IndexError(f"scans {start}:{stop} are not in the recording, which holds {self.first}:{self.total}")
+        if out is None:
+            return self.data[:, start:stop]
+        out[...] = self.data[:, start:stop]
+        return out
+
+    def recorded(self, start, stop):
+        """Return [(start, stop)], as every scan is held."""
+        return [(start, stop)]
+
+    def clock_model(self, index):
+        """Return the (start_time, seconds_per_scan) clock model of the scans."""
+        return self._model
+
+
+class ReplaySource:
+    """Plays a recording back one read of scans_per_read scans at a time.
+
+    Args:
+        recording: A RecordingReader, an ArrayRecording, or a path or glob
+            pattern of recording files as RecordingReader takes.
+        scans_per_read: The scans returned by each read.
+        speed: Pace reads at this multiple of real time. None returns them
+            as fast as they are read.
+        start, stop: The scan range to play. Default is the whole
+            recording.
+
+    A final read of fewer than scans_per_read scans is not played.
+
+    Attributes:
+        scan_clock: A ScanClock carrying the clock model recorded with the
+            scans read last.
+        scans, reads: Counts of what has been played.
+        missing: The scans played as DUMMY_VALUE because they were not
+            recorded.
+    """
+
+    def __init__(self, recording, scans_per_read, speed=None, start=None, stop=None):
+        if not hasattr(recording, "read"):
+            recording = RecordingReader(recording)
+        self.recording = recording
+        self.scans_per_read = scans_per_read
+        self.speed = speed
+        self.num_channels = recording.num_channels
+        self.scan_rate = recording.scan_rate
+        self.position = recording.first if start is None else start
+        self.stop = recording.total if stop is None else stop
+        self.scan_clock = ScanClock(0.0, self.scan_rate)
+        self.scan_clock.update(*recording.clock_model(self.position))
+        self.scans = 0
+        self.reads = 0
+        self.missing = 0
+        self._started = None
+        self._finished = None
+
+    @classmethod
+    def from_file(cls, path, scan_rate, scans_per_read, speed=None, start_time=0.0):
+        """Return a ReplaySource of the scans in a CSV file of one row per
+        scan, or a .npy file of a (num_scans, num_channels) array."""
+        if os.path.splitext(path)[1] == ".npy":
+            scans = np.load(path, mmap_mode="r")
+        else:
+            scans = np.loadtxt(path, delimiter=",", ndmin=2)
+        return cls(ArrayRecording(scans, scan_rate, start_time), scans_per_read, speed)
+
+    @property
+    def remaining(self):
+        """The number of scans left to play, including a final partial read."""
+        return self.stop - self.position
+
+    @property
+    def elapsed(self):
+        """Seconds from the first read to the last, or to now while playing."""
+        if self._started is None:
+            return 0.0
+        return (self._finished or time.perf_counter()) - self._started
+
+    @property
+    def scans_per_second(self):
+        """The replay's throughput in scans per second."""
+        elapsed = self.elapsed
+        return self.scans / elapsed if elapsed > 0 else 0.0
+
+    def eStreamReadInto(self, aData):
+        """Copy the next read into aData, as interleaved stream values, like
+        ljm.eStreamReadInto. Waits when pacing to speed.
+
+        Returns:
+            (deviceScanBacklog, ljmScanBacklog). The device backlog is
+            always 0. When paced, the LJM backlog is the number of scans
+            that would have arrived but were not read yet.
+
+        Raises:
+            EOFError: The recording has no full read left.
+        """
+        if self.remaining < self.scans_per_read:
+            if self._finished is None:
+                self._finished = time.perf_counter()
+            raise EOFError(f"the replay ended after {self.scans} scans")
+        now = time.perf_counter()
+        if self._started is None:
+            self._started = now
+        backlog = 0
+        if self.speed is not None:
+            due = self._started + (self.scans + self.scans_per_read) / (self.scan_rate * self.speed)
+            if due > now:
+                time.sleep(due - now)
+            else:
+                backlog = int((now - self._started) * self.scan_rate * self.speed) - self.scans - self.scans_per_read
+        start = self.position
+        stop = start + self.scans_per_read
+        out = np.asarray(aData)[:self.scans_per_read * self.num_channels].reshape(self.scans_per_read, -1).T
+        runs = self.recording.recorded(start, stop)
+        if runs != [(start, stop)]:
+            out[...] = DUMMY_VALUE
+            self.missing += self.scans_per_read - sum(last - first for first, last in runs)
+        for first, last in runs:
+            scans = self.recording.read(first, last)
+            if getattr(self.recording, "raw", False):
+                scans = self.recording.volts(scans)  # Played as volts, like a stream that is not binary
+            np.copyto(out[:, first - start:last - start], scans)
+        self.scan_clock.update(*self.recording.clock_model(start))
+        self.position += self.scans_per_read
+        self.scans += self.scans_per_read
+        self.reads += 1
+        return 0, max(backlog, 0)
+
+    def eStreamRead(self):
+        """Return the next read like ljm.eStreamRead, as (aData,
+        deviceScanBacklog, ljmScanBacklog) with aData a new array.
+
+        Raises:
+            EOFError: The recording has no full read left.
+        """
+        aData = np.empty(self.scans_per_read * self.num_channels)
+        return (aData, *self.eStreamReadInto(aData))
+
+    def close(self):
+        """Stop the throughput clock and close the recording."""
+        if self._started is not None and self._finished is None:
+            self._finished = time.perf_counter()
+        if hasattr(self.recording, "close"):
+            self.recording.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,133 @@
+"""
+Fixed-capacity, channel-major ring buffer for stream samples.
+
+A RingBuffer keeps the most recent `capacity` scans of every channel in one
+preallocated NumPy array, so storing a read costs the same after a week of
+streaming as after a second. Scans are addressed by their absolute scan index
+(0 for the first scan of the stream), which keeps growing while the buffer
+wraps around underneath it.
+
+Author: Liam Eime
+"""
+
+import numpy as np
+
+
+class RingBuffer:
+    """Preallocated store of the latest `capacity` scans of `num_channels`
+    channels.
+
+    Args:
+        num_channels: The number of channels in each scan.
+        capacity: The number of scans kept. Older scans are overwritten.
+        dtype: The sample type. Default is float64.
+
+    Attributes:
+        data: The (num_channels, capacity) storage array. Scan index i is
+            in column i % capacity while it is retained.
+        total: The number of scans ever written, which is also the scan
+            index of the next scan.
+        reserved: One past the last scan of the write in progress, or
+            total between writes. It moves before any scan is overwritten,
+            so a reader on another thread that copied scans from start
+            can check start >= reserved - capacity afterwards to know that
+            the writer did not overtake it.
+    """
+
+    def __init__(self, num_channels, capacity, dtype=np.float64):
+        if capacity < 1:
+            raise ValueError(f"capacity must be at least 1, not {capacity}")
+        self.num_channels = num_channels
+        self.capacity = capacity
+        self.data = np.zeros((num_channels, capacity), dtype=dtype)
+        self.total = self.reserved = 0
+
+    @classmethod
+    def for_retention(cls, num_channels, scan_rate, retention_seconds, dtype=np.float64):
+        """Return a RingBuffer that keeps the last retention_seconds of a
+        stream at scan_rate."""
+        return cls(num_channels, max(int(np.ceil(scan_rate * retention_seconds)), 1), dtype)
+
+    @property
+    def first(self):
+        """The scan index of the oldest scan still retained."""
+        return max(self.total - self.capacity, 0)
+
+    def __len__(self):
+        return self.total - self.first
+
+    def write(self, block):
+        """Append a (num_channels, num_scans) block of scans.
+
+        Returns:
+            The scan index of the first scan of the block.
+        """
+        block = np.asarray(block)
+        if block.ndim != 2 or block.shape[0] != self.num_channels:
+            raise ValueError(f"expected a ({self.num_channels}, num_scans) block, not {block.shape}")
+        num_scans = block.shape[1]
+        first_index = self.total
+        if num_scans > self.capacity:
+            # Only the last capacity scans would survive the write.
+            block = block[:, -self.capacity:]
+        start = (self.total + num_scans - block.shape[1]) % self.capacity
+        self.reserved = self.total + num_scans
+        head = min(self.capacity - start, block.shape[1])
+        self.data[:, start:start + head] = block[:, :head]
+        self.data[:, :block.shape[1] - head] = block[:, head:]
+        self.total += num_scans
+        return first_index
+
+    def write_interleaved(self, values):
+        """Append scans given as interleaved stream values, as returned by
+        eStreamRead (scan 0 channel 0, scan 0 channel 1, ...).
+
+        Returns:
+            The scan index of the first scan written.
+        """
+        return self.write(np.reshape(values, (-1, self.num_channels)).T)
+
+    def _check_range(self, start, stop):
+        if not self.first <= start <= stop <= self.total:
+            raise IndexError(f"scans {start}:{stop} are not in the buffer, which holds {self.first}:{self.total}")
+
+    def segments(self, start, stop):
+        """Return views of scans start:stop without copying.
+
+        Returns:
+            A list of one (num_channels, n) view, or two when the range
+            wraps around the end of the storage. The views show later
+            writes, so use them before the range is overwritten.
+
+        Raises:
+            IndexError: Part of the range is not retained or not written
+                yet.
+        """
+        self._check_range(start, stop)
+        begin = start % self.capacity
+        end = begin + stop - start
+        if end <= self.capacity:
+            return [self.data[:, begin:end]]
+        return [self.data[:, begin:], self.data[:, :end - self.capacity]]
+
+    def read(self, start, stop, out=None):
+        """Return scans start:stop as one contiguous (num_channels, n)
+        array. The array is a view when the range does not wrap and out is
+        not given, otherwise a copy into out or a new array.
+
+        Raises:
+            IndexError: Part of the range is not retained or not written
+                yet.
+        """
+        parts = self.segments(start, stop)
+        if len(parts) == 1 and out is None:
+            return parts[0]
+        if out is None:
+            out = np.empty((self.num_channels, stop - start), dtype=self.data.dtype)
+        np.concatenate(parts, axis=1, out=out)
+        return out
+
+    def latest(self, num_scans):
+        """Return the last num_scans scans, or all retained scans if fewer,
+        as by read()."""
+        return self.read(max(self.total - num_scans, self.first), self.total)
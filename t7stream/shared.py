@@ -0,0 +1,277 @@
+"""
+Shared-memory stream ring for a separate acquisition process.
+
+The acquisition process reads the stream straight into a SharedRing, a
+block of multiprocessing.shared_memory that holds the latest `capacity`
+scans as interleaved stream values, and publishes the number of scans
+written. Any number of analysis processes attach a SharedRingReader by the
+ring's name and consume scans in order of their scan index, which serves as
+the sequence number. The writer never waits for readers: a reader that
+falls more than `capacity` scans behind skips to the oldest scan still
+retained and counts the scans it lost.
+
+Analysis then runs in other processes, with their own GIL, so it cannot
+delay eStreamRead however heavy it gets.
+
+The header also carries the stream's ScanClock model, so readers timestamp
+scans exactly as the acquisition process does. Publication relies on
+aligned 8-byte stores being atomic and kept in order, as they are on x86
+and ARM64 for CPython.
+
+Author: Liam Eime
+"""
+
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from t7stream.clock import ScanClock
+
+HEADER_BYTES = 128
+# int64 header slots
+_WRITTEN, _RESERVED, _CAPACITY, _CHANNELS, _DTYPE, _CLOSED, _CLOCK_VERSION = range(7)
+# float64 header slots
+_START_TIME, _SECONDS_PER_SCAN = 8, 9
+
+
+class SharedRing:
+    """The writing end of a stream ring in shared memory.
+
+    Args:
+        num_channels: The number of channels in each scan.
+        capacity: The number of scans kept. Make it a multiple of the
+            scans per read so every read has a contiguous slot().
+        name: The shared memory name. Default is a generated name.
+        dtype: The sample type. Default is float64, as eStreamRead returns.
+
+    Attributes:
+        name: The name readers attach with.
+        data: The (capacity, num_channels) storage array. Scan index i is in
+            row i % capacity while it is retained.
+    """
+
+    def __init__(self, num_channels, capacity, name=None, dtype=np.float64):
+        if capacity < 1:
+            raise ValueError(f"capacity must be at least 1, not {capacity}")
+        dtype = np.dtype(dtype)
+        self.num_channels = num_channels
+        self.capacity = capacity
+        self._shm = shared_memory.SharedMemory(name, create=True,
+                                               size=HEADER_BYTES + capacity * num_channels * dtype.itemsize)
+        self.name = self._shm.name
+        self._ints = np.ndarray(HEADER_BYTES // 8, np.int64, self._shm.buf)
+        self._floats = np.ndarray(HEADER_BYTES // 8, np.float64, self._shm.buf)
+        self._ints[:] = 0
+        self._ints[_CAPACITY] = capacity
+        self._ints[_CHANNELS] = num_channels
+        self._ints[_DTYPE] = ord(dtype.char)
+        self.data = np.ndarray((capacity, num_channels), dtype, self._shm.buf, HEADER_BYTES)
+        self._slots = {}  # The view returned by slot() for each (start, num_scans)
+
+    @classmethod
+    def for_reads(cls, num_channels, scans_per_read, num_reads, name=None, dtype=np.float64):
+        """Return a SharedRing holding num_reads stream reads."""
+        return cls(num_channels, scans_per_read * num_reads, name, dtype)
+
+    @property
+    def total(self):
+        """The number of scans published, which is also the scan index of
+        the next scan."""
+        return int(self._ints[_WRITTEN])
+
+    def slot(self, num_scans):
+        """Return the writable (num_scans, num_channels) rows for the next
+        num_scans scans, e.g. to pass to eStreamReadInto. Call publish() when
+        they are filled. The same rows are always returned as the same view
+        object, so eStreamReadInto reuses its ctypes view of them.
+
+        Raises:
+            ValueError: The rows would wrap around the end of the ring.
+        """
+        start = self.total % self.capacity
+        if start + num_scans > self.capacity:
+            raise ValueError(f"{num_scans} scans from row {start} wrap around a ring of {self.capacity}; "
+                             "make the capacity a multiple of the read size")
+        # Readers treat these rows as overwritten from now on.
+        self._ints[_RESERVED] = self.total + num_scans
+        try:
+            return self._slots[start, num_scans]
+        except KeyError:
+            rows = self._slots[start, num_scans] = self.data[start:start + num_scans]
+            return rows
+
+    def publish(self, num_scans):
+        """Make the next num_scans scans, already written, visible to readers."""
+        self._ints[_WRITTEN] = self.total + num_scans
+
+    def write(self, values):
+        """Copy in and publish scans given as interleaved stream values or
+        as (num_scans, num_channels) rows.
+
+        Returns:
+            The scan index of the first scan written.
+        """
+        rows = np.asarray(values).reshape(-1, self.num_channels)
+        first_index = self.total
+        num_scans = rows.shape[0]
+        if num_scans > self.capacity:
+            rows = rows[-self.capacity:]
+        self._ints[_RESERVED] = first_index + num_scans
+        start = (first_index + num_scans - rows.shape[0]) % self.capacity
+        head = min(self.capacity - start, rows.shape[0])
+        self.data[start:start + head] = rows[:head]
+        self.data[:rows.shape[0] - head] = rows[head:]
+        self.publish(num_scans)
+        return first_index
+
+    def publish_clock(self, scan_clock):
+        """Share the model of a ScanClock with the readers."""
+        version = self._ints[_CLOCK_VERSION]
+        self._ints[_CLOCK_VERSION] = version + 1  # Odd while the model is being written
+        self._floats[_START_TIME] = scan_clock.start_time
+        self._floats[_SECONDS_PER_SCAN] = scan_clock.seconds_per_scan
+        self._ints[_CLOCK_VERSION] = version + 2
+
+    def close(self):
+        """Tell readers no more scans are coming and release the memory.
+        Readers that are attached keep their mapping until they close."""
+        if self._shm is None:
+            return
+        self._ints[_CLOSED] = 1
+        self.data = self._ints = self._floats = None
+        self._slots.clear()  # The views would keep the memory exported
+        self._shm.close()
+        self._shm.unlink()
+        self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class SharedRingReader:
+    """A consumer of a SharedRing, attached by name from any process.
+
+    Start reader processes with multiprocessing from the process that starts
+    the writer, so they share its resource tracker, which would otherwise
+    unlink the ring when a reader exits.
+
+    Args:
+        name: The SharedRing's name.
+        start: "next" to consume from the next scan published, or "oldest"
+            to start with the oldest scan still retained.
+        poll_interval: Seconds between checks for new scans while waiting.
+
+    Attributes:
+        next_scan: The scan index of the next scan to consume.
+        consumed: The number of scans returned by read().
+        lost: The number of scans overwritten before they were read.
+    """
+
+    def __init__(self, name, start="next", poll_interval=0.0005):
+        self._shm = shared_memory.SharedMemory(name)
+        self._ints = np.ndarray(HEADER_BYTES // 8, np.int64, self._shm.buf)
+        self._floats = np.ndarray(HEADER_BYTES // 8, np.float64, self._shm.buf)
+        self.capacity = int(self._ints[_CAPACITY])
+        self.num_channels = int(self._ints[_CHANNELS])
+        self.dtype = np.dtype(chr(self._ints[_DTYPE]))
+        self.data = np.ndarray((self.capacity, self.num_channels), self.dtype, self._shm.buf, HEADER_BYTES)
+        self.poll_interval = poll_interval
+        total = int(self._ints[_WRITTEN])
+        self.next_scan = total if start == "next" else max(total - self.capacity, 0)
+        self.consumed = 0
+        self.lost = 0
+
+    @property
+    def closed(self):
+        """True once the writer has closed the ring."""
+        return bool(self._ints[_CLOSED])
+
+    @property
+    def available(self):
+        """The number of scans published and not yet consumed."""
+        return int(self._ints[_WRITTEN]) - self.next_scan
+
+    def _skip_lost(self, reserved):
+        oldest = reserved - self.capacity
+        if self.next_scan < oldest:
+            self.lost += oldest - self.next_scan
+            self.next_scan = oldest
+
+    def read(self, max_scans=None, timeout=None, out=None):
+        """Consume the scans published since the last read.
+
+        Args:
+            max_scans: The most scans to return. Default is all available,
+                up to capacity.
+            timeout: The most seconds to wait for a scan. None waits until
+                one is published or the ring is closed.
+            out: Optional array of at least (max_scans, num_channels) to
+                copy into instead of allocating.
+
+        Returns:
+            (first_scan, scans, lost) where scans is a (num_scans,
+            num_channels) copy and lost is the number of scans skipped just
+            before first_scan because they were overwritten, or None if no
+            scan came before the timeout or the ring closed.
+        """
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while True:
+            total = int(self._ints[_WRITTEN])
+            if total > self.next_scan:
+                break
+            if self.closed or (deadline is not None and time.perf_counter() >= deadline):
+                return None
+            time.sleep(self.poll_interval)
+        lost_before = self.lost
+        self._skip_lost(int(self._ints[_RESERVED]))
+        num_scans = total - self.next_scan
+        if max_scans is not None:
+            num_scans = min(num_scans, max_scans)
+        if out is None:
+            scans = np.empty((num_scans, self.num_channels), self.dtype)
+        else:
+            scans = out[:num_scans]
+        start = self.next_scan % self.capacity
+        head = min(self.capacity - start, num_scans)
+        scans[:head] = self.data[start:start + head]
+        scans[head:] = self.data[:num_scans - head]
+        # Scans the writer overwrote while they were being copied are lost too.
+        first_scan = self.next_scan
+        overwritten = min(int(self._ints[_RESERVED]) - self.capacity - first_scan, num_scans)
+        if overwritten > 0:
+            self.lost += overwritten
+            first_scan += overwritten
+            scans = scans[overwritten:]
+        self.next_scan = first_scan + len(scans)
+        self.consumed += len(scans)
+        return first_scan, scans, self.lost - lost_before
+
+    def scan_clock(self):
+        """Return a ScanClock with the model the writer last published."""
+        while True:
+            version = self._ints[_CLOCK_VERSION]
+            start_time = float(self._floats[_START_TIME])
+            seconds_per_scan = float(self._floats[_SECONDS_PER_SCAN])
+            if version % 2 == 0 and self._ints[_CLOCK_VERSION] == version:
+                break
+        clock = ScanClock(start_time, 1.0)
+        clock.update(start_time, seconds_per_scan)
+        return clock
+
+    def close(self):
+        """Detach from the ring."""
+        if self._shm is None:
+            return
+        self.data = self._ints = self._floats = None
+        self._shm.close()
+        self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,223 @@
+"""
+Parallel sweeps of event detection settings over recordings.
+
+A sweep finds how many events, and how large, main.py's event detection
+would have reported on recorded data for every combination of candidate
+THRESHOLDS and BUFFER_PERIOD values. The recordings are cut into shards of
+shard_seconds, which a process pool handles independently.
+
+A shard is read once, through the recording's memory maps. Each channel
+is compared with its lowest candidate threshold, and only the scans above
+it are kept. Every threshold and buffer period is then evaluated on those
+few scans with array operations. The runs above a threshold are joined
+into events when they are within the buffer period, as EventDetector does
+with release thresholds equal to the thresholds.
+
+Channels are detected independently, so results are kept per channel. The
+results for a set of per-axis thresholds are the rows of its thresholds.
+
+An event is counted by the shard it starts in. Shards also read
+overlap_seconds on either side to see events that cross their edges, so an
+event chain longer than that may be counted twice.
+
+Author: Liam Eime
+"""
+
+import glob
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from t7stream.recorder import RecordingReader, _read_header
+
+SWEEP_DTYPE = np.dtype([("channel", np.int64), ("threshold", np.float64), ("buffer_period", np.float64),
+                        ("events", np.int64), ("events_per_hour", np.float64), ("peak_mean", np.float64),
+                        ("peak_max", np.float64)])
+
+_readers = {}  # RecordingReaders opened by this worker process, by their files
+
+
+def recordings(paths):
+    """Group recording files into recordings, one list of files for each.
+
+    Args:
+        paths: A file, a glob pattern, or a list of them, e.g.
+            "data/data_*.t7r" to take every recording in data.
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+    files = []
+    for path in paths:
+        files += sorted(glob.glob(path)) if glob.has_magic(path) else [path]
+    sessions = {}
+    for path in files:
+        sessions.setdefault(_read_header(path)["session"], []).append(path)
+    return [sessions[session] for session in sorted(sessions)]
+
+
+def plan_shards(reader, shard_scans):
+    """Split the recorded scans of a reader into (start, stop, span_start,
+    span_stop) shards of up to shard_scans, within spans of scans recorded
+    without gaps."""
+    index = reader.index
+    if index.size == 0:
+        return []
+    ends = index["first_scan"] + index["num_scans"]
+    breaks = np.flatnonzero(index["first_scan"][1:] != ends[:-1]) + 1
+    shards = []
+    for first, last in zip(np.r_[0, breaks], np.r_[breaks, index.size] - 1):
+        span_start, span_stop = int(index["first_scan"][first]), int(ends[last])
+        for start in range(span_start, span_stop, shard_scans):
+            shards.append((start, min(start + shard_scans, span_stop), span_start, span_stop))
+    return shards
+
+
+def _above(reader, start, stop, floors):
+    """Return, for each channel, the scan indices and calibrated values of
+    the scans in start:stop that are above the channel's floor."""
+    positions = [[] for _ in floors]
+    values = [[] for _ in floors]
+    scan = start
+    for segment in reader.segments(start, stop):
+        scans = reader.calibrated(segment)
+        for channel, floor in enumerate(floors):
+            columns = np.flatnonzero(scans[channel] > floor)
+            positions[channel].append(scan + columns)
+            values[channel].append(scans[channel, columns])
+        scan += segment.shape[1]
+    return ([np.concatenate(p) for p in positions], [np.concatenate(v) for v in values])
+
+
+def _sweep_shard(files, start, stop, read_start, read_stop, thresholds, buffer_periods):
+    """Evaluate every threshold and buffer period on one shard.
+
+    Returns:
+        (events, peak sums, peak maxima), each a list per channel of
+        (thresholds, buffer periods) arrays.
+    """
+    key = tuple(files)
+    if key not in _readers:
+        _readers[key] = RecordingReader(list(files))
+    reader = _readers[key]
+    # The same hold-off in scans as main.py's int(BUFFER_PERIOD * scanRate)
+    hold_offs = (buffer_periods * reader.scan_rate).astype(np.int64)
+    positions, values = _above(reader, read_start, read_stop, [t.min() for t in thresholds])
+    results = ([], [], [])
+    for channel, channel_thresholds in enumerate(thresholds):
+        events = np.zeros((len(channel_thresholds), len(hold_offs)), np.int64)
+        peak_sums = np.zeros(events.shape)
+        peak_maxima = np.full(events.shape, np.nan)
+        for i, threshold in enumerate(channel_thresholds):
+            above = values[channel] > threshold
+            scans, scan_values = positions[channel][above], values[channel][above]
+            if scans.size == 0:
+                continue
+            # Runs of consecutive scans above the threshold
+            first = np.flatnonzero(np.r_[True, np.diff(scans) > 1])
+            run_starts = scans[first]
+            run_ends = scans[np.r_[first[1:], scans.size] - 1] + 1
+            run_peaks = np.maximum.reduceat(scan_values, first)
+            gaps = run_starts[1:] - run_ends[:-1]
+            for j, hold_off in enumerate(hold_offs):
+                event_first = np.flatnonzero(np.r_[True, gaps > hold_off])
+                counted = (run_starts[event_first] >= start) & (run_starts[event_first] < stop)
+                if not counted.any():
+                    continue
+                peaks = np.maximum.reduceat(run_peaks, event_first)[counted]
+                events[i, j] = peaks.size
+                peak_sums[i, j] = peaks.sum()
+                peak_maxima[i, j] = peaks.max()
+        for result, array in zip(results, (events, peak_sums, peak_maxima)):
+            result.append(array)
+    return results
+
+
+def sweep(paths, thresholds, buffer_periods, shard_seconds=600, overlap_seconds=None, workers=None, executor=None):
+    """Count the events of every threshold and buffer period on recordings.
+
+    Args:
+        paths: Recording files as recordings() takes, possibly from several
+            recordings with the same channels.
+        thresholds: The candidate thresholds, either one sequence for every
+            channel or one sequence per channel, in the recording's
+            calibrated units (g for main.py's recordings).
+        buffer_periods: The candidate buffer periods in seconds.
+        shard_seconds: The seconds of scans in each shard.
+        overlap_seconds: The seconds read on either side of a shard.
+            Default is twice the longest buffer period, or one second if
+            that is longer.
+        workers: The number of worker processes. Default is one per CPU.
+        executor: Optional concurrent.futures executor to run the shards
+            on instead, e.g. a process pool kept for several sweeps.
+
+    Returns:
+        A SWEEP_DTYPE array with one row per channel, threshold and buffer
+        period, in that order.
+    """
+    groups = recordings(paths)
+    if not groups:
+        raise FileNotFoundError("no recording files given")
+    buffer_periods = np.asarray(buffer_periods, dtype=np.float64)
+    if overlap_seconds is None:
+        overlap_seconds = max(2 * buffer_periods.max(), 1.0)
+    tasks = []
+    num_channels = None
+    seconds = 0.0
+    for files in groups:
+        reader = RecordingReader(files)
+        if num_channels not in (None, reader.num_channels):
+            raise ValueError("the recordings have different numbers of channels")
+        num_channels = reader.num_channels
+        overlap = int(np.ceil(overlap_seconds * reader.scan_rate))
+        shard_scans = max(int(shard_seconds * reader.scan_rate), 1)
+        for start, stop, span_start, span_stop in plan_shards(reader, shard_scans):
+            tasks.append((files, start, stop, max(start - overlap, span_start), min(stop + overlap, span_stop)))
+            seconds += (stop - start) / reader.scan_rate
+        reader.close()
+    if np.ndim(thresholds[0]) == 0:
+        thresholds = [thresholds] * num_channels
+    thresholds = [np.sort(np.asarray(t, dtype=np.float64)) for t in thresholds]
+    if len(thresholds) != num_channels:
+        raise ValueError(f"expected thresholds for {num_channels} channels, not {len(thresholds)}")
+
+    events = [np.zeros((len(t), len(buffer_periods)), np.int64) for t in thresholds]
+    peak_sums = [np.zeros(e.shape) for e in events]
+    peak_maxima = [np.full(e.shape, np.nan) for e in events]
+    pool = executor or ProcessPoolExecutor(workers, multiprocessing.get_context("spawn"))
+    try:
+        futures = [pool.submit(_sweep_shard, *task, thresholds, buffer_periods) for task in tasks]
+        for future in futures:
+            shard_events, shard_sums, shard_maxima = future.result()
+            for channel in range(num_channels):
+                events[channel] += shard_events[channel]
+                peak_sums[channel] += shard_sums[channel]
+                peak_maxima[channel] = np.fmax(peak_maxima[channel], shard_maxima[channel])
+    finally:
+        if executor is None:
+            pool.shutdown()
+
+    rows = []
+    for channel in range(num_channels):
+        table = np.zeros(events[channel].shape, SWEEP_DTYPE)
+        table["channel"] = channel
+        table["threshold"] = thresholds[channel][:, None]
+        table["buffer_period"] = buffer_periods[None, :]
+        table["events"] = events[channel]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            table["events_per_hour"] = events[channel] / seconds * 3600
+            table["peak_mean"] = np.where(events[channel] > 0, peak_sums[channel] / events[channel], np.nan)
+        table["peak_max"] = peak_maxima[channel]
+        rows.append(table.ravel())
+    return np.concatenate(rows)
+
+
+def format_table(table, channel_names=None):
+    """Return a sweep table as text, one line per row."""
+    lines = [f"{'channel':<10}{'threshold':>10}{'buffer s':>10}{'events':>10}{'per hour':>10}"
+             f"{'mean peak':>11}{'max peak':>10}"]
+    for row in table:
+        name = channel_names[row["channel"]] if channel_names else str(row["channel"])
+        lines.append(f"{name:<10}{row['threshold']:10.3f}{row['buffer_period']:10.3f}{row['events']:10d}"
+                     f"{row['events_per_hour']:10.1f}{row['peak_mean']:11.3f}{row['peak_max']:10.3f}")
+    return "\n".join(lines)
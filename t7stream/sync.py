@@ -0,0 +1,238 @@
+"""
+Continuous CORE_TIMER synchronization with drift estimation.
+
+main.py aligns the stream with the system time once, from one CORE_TIMER read
+at the start of the stream, so timestamps drift away from the system clock
+by the crystal error of the T7 (tens of ppm, i.e. tens of ms a day).
+A ClockSynchronizer keeps sampling CORE_TIMER against the host clock, fits
+host time as a + b * device seconds over a sliding window with a robust
+(Huber) weighted regression, and republishes the ScanClock of the stream.
+Samples are timed with time.perf_counter, which NTP cannot step, and mapped
+to the host clock by one offset taken when the synchronizer is created.
+
+Each sample is one short command-response read of CORE_TIMER. LJM collects
+stream data on its own thread and serializes command-response calls with it,
+so the reads never block eStreamRead; they can run on a background thread
+with start() or between stream reads with sample().
+
+Author: Liam Eime
+"""
+
+import collections
+import threading
+import time
+
+import numpy as np
+from labjack import ljm
+
+CORE_TIMER_ADDRESS = 61520
+TICKS_PER_SECOND = 40e6  # T7 CORE_TIMER ticks per second
+TICK_ROLLOVER = 1 << 32
+ROLLOVER_SECONDS = TICK_ROLLOVER / TICKS_PER_SECOND  # About 107 s
+
+
+class TickUnwrapper:
+    """Turns uint32 CORE_TIMER reads into a count of ticks since a start
+    tick that keeps growing through rollovers (every 107 s at 40 MHz).
+
+    Reads must be less than one rollover period apart, unless the seconds
+    elapsed since the last read are given to count the rollovers missed.
+
+    Args:
+        start_ticks: The CORE_TIMER value that counts as tick 0, such as
+            STREAM_START_TIME_STAMP.
+    """
+
+    def __init__(self, start_ticks):
+        self._last = int(start_ticks) % TICK_ROLLOVER
+        self.ticks = 0
+
+    def unwrap(self, ticks, elapsed=None):
+        """Return the ticks since the start tick of a newer CORE_TIMER read.
+
+        Args:
+            ticks: The CORE_TIMER value read.
+            elapsed: The host seconds since the last read, if known. The
+                whole rollovers nearest to it are added, so reads may be
+                any time apart as long as the device clock stays within a
+                half rollover (53 s) of the host clock between them.
+        """
+        ticks = int(ticks) % TICK_ROLLOVER
+        delta = (ticks - self._last) % TICK_ROLLOVER
+        if elapsed is not None:
+            delta += TICK_ROLLOVER * max(round((elapsed * TICKS_PER_SECOND - delta) / TICK_ROLLOVER), 0)
+        self.ticks += delta
+        self._last = ticks
+        return self.ticks
+
+
+class DriftEstimator:
+    """Sliding-window robust fit of host time = offset + slope * device
+    seconds.
+
+    Samples are weighted by their round-trip time, since the host time of a
+    read is only known to within it, and by Huber weights of their residuals,
+    so a read delayed by the host or USB stack does not pull the fit.
+
+    Args:
+        window: The number of most recent samples fitted.
+    """
+
+    def __init__(self, window=64):
+        self._samples = collections.deque(maxlen=window)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def reset(self):
+        """Forget every sample."""
+        self._samples.clear()
+
+    def add(self, device_seconds, host_time, round_trip):
+        """Add a sample. host_time should be the midpoint of the read."""
+        self._samples.append((device_seconds, host_time, round_trip))
+
+    def fit(self, iterations=3):
+        """Return (offset, slope) mapping device seconds to host time, with
+        slope 1 until the samples span at least a second."""
+        device, host, round_trip = np.array(self._samples).T
+        prior = (round_trip.min() + 1e-6) ** 2 / (round_trip + 1e-6) ** 2
+        if device.max() - device.min() < 1.0:
+            best = np.argmax(prior)
+            return host[best] - device[best], 1.0
+        # Centered on the latest sample, so the offset is well conditioned.
+        x = device - device[-1]
+        weights = prior
+        for _ in range(iterations):
+            x_mean = np.average(x, weights=weights)
+            y_mean = np.average(host, weights=weights)
+            slope = np.sum(weights * (x - x_mean) * (host - y_mean)) / np.sum(weights * (x - x_mean) ** 2)
+            intercept = y_mean - slope * x_mean
+            residuals = np.abs(host - (intercept + slope * x))
+            scale = 1.4826 * np.median(residuals) + 1e-9
+            weights = prior * np.minimum(1.0, 1.345 * scale / np.maximum(residuals, 1e-12))
+        return intercept - slope * device[-1], slope
+
+
+class ClockSynchronizer:
+    """Keeps the ScanClock of a running stream aligned with the host clock.
+
+    Args:
+        handle: A handle to the streaming device. A second connection to
+            the device also works.
+        scan_clock: The stream's ScanClock, updated after every sample.
+        stream_start_ticks: STREAM_START_TIME_STAMP of the stream.
+        scan_rate: The stream's actual scan rate in device time.
+        interval: Seconds between samples taken by the background thread.
+        window: The number of samples fitted.
+        slew_seconds: Corrections are spread over this many seconds of
+            scans, so published times never jump or run backwards.
+        host_clock: The host time source the scan clock is published in.
+            Default is time.time, as main.py timestamps with. It is read
+            once; samples are timed with time.perf_counter.
+
+    Use start() and stop() to sample on a background thread, or call
+    sample() between stream reads. When no sample succeeds for more than
+    MAX_SAMPLE_GAP seconds, the next one restarts the fit: the CORE_TIMER
+    rollovers missed are counted from the host time elapsed.
+    """
+
+    MAX_SAMPLE_GAP = ROLLOVER_SECONDS / 2
+
+    def __init__(self, handle, scan_clock, stream_start_ticks, scan_rate, interval=5.0, window=64,
+                 slew_seconds=30.0, host_clock=time.time):
+        self.handle = handle
+        self.scan_clock = scan_clock
+        self.scan_rate = scan_rate
+        self.interval = interval
+        self.slew_seconds = slew_seconds
+        self.host_clock = host_clock
+        # Host time at perf_counter() == 0, so an NTP step after this never reaches the fit
+        self._host_offset = host_clock() - time.perf_counter()
+        self.estimator = DriftEstimator(window)
+        self.offset, self.slope = None, 1.0
+        self.last_round_trip = None
+        self.last_error = None
+        self._unwrapper = TickUnwrapper(stream_start_ticks)
+        self._last_sample = None  # perf_counter() after the last successful read
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def device_drift_ppm(self):
+        """How fast the device clock runs relative to the host clock, in ppm."""
+        return (1.0 / self.slope - 1.0) * 1e6
+
+    def sample(self):
+        """Read CORE_TIMER once, refit and republish the scan clock.
+
+        Returns:
+            The device seconds since the start of the stream at the read.
+
+        Raises:
+            LJMError: The CORE_TIMER read failed.
+        """
+        before = time.perf_counter()
+        ticks = ljm.eReadAddress(self.handle, CORE_TIMER_ADDRESS, ljm.constants.UINT32)
+        after = time.perf_counter()
+        with self._lock:
+            elapsed = None if self._last_sample is None else after - self._last_sample
+            if elapsed is not None and elapsed > self.MAX_SAMPLE_GAP:
+                # The samples before the gap no longer say how the clocks run now
+                self.estimator.reset()
+            device_seconds = self._unwrapper.unwrap(ticks, elapsed) / TICKS_PER_SECOND
+            self._last_sample = after
+            self.last_round_trip = after - before
+            self.estimator.add(device_seconds, (before + after) / 2, after - before)
+            offset, self.slope = self.estimator.fit()
+            self.offset = offset + self._host_offset
+            self._publish(device_seconds)
+        return device_seconds
+
+    def _publish(self, device_seconds):
+        """Steer the scan clock from its current time at the latest scan
+        to the fitted time slew_seconds later."""
+        fitted_start = self.offset
+        fitted_per_scan = self.slope / self.scan_rate
+        now_index = device_seconds * self.scan_rate
+        target_index = now_index + max(self.slew_seconds, 0.0) * self.scan_rate
+        target_time = fitted_start + target_index * fitted_per_scan
+        current_time = self.scan_clock.time_of(now_index)
+        if target_index > now_index:
+            per_scan = (target_time - current_time) / (target_index - now_index)
+        else:
+            per_scan = fitted_per_scan
+        if per_scan <= 0:
+            per_scan = fitted_per_scan
+        self.scan_clock.update(current_time - now_index * per_scan, per_scan)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.sample()
+                self.last_error = None
+            except ljm.LJMError as e:
+                # Kept for the caller; the next sample tries again.
+                self.last_error = e
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """Start sampling every interval seconds on a background thread."""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="clock-sync", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the background thread, waiting for a sample in progress."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()